@@ -0,0 +1,3 @@
+"""
+Command line maintenance tasks, run as modules (python -m app.commands.<name>)
+"""
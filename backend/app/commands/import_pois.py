@@ -0,0 +1,75 @@
+"""
+Import POIs in bulk from a GeoJSON or CSV file
+
+Usage (from the backend directory):
+    python -m app.commands.import_pois madrid.geojson --author-id <user id>
+    python -m app.commands.import_pois madrid.csv --images photos/ --report madrid-import.ndjson
+
+GeoJSON features are Points whose properties hold name, description, tags,
+image and author_id; CSV files have those columns plus latitude and
+longitude. Images are http(s) URLs, which are downloaded, or paths relative
+to --images; either way they are stored through the configured file storage.
+Rows that fail are skipped and listed in the report. Exits with status 1 when
+any row fails.
+"""
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+from app.services.gamification import GamificationService
+from app.services.import_service import ImportService, detect_format, parse_rows
+from app.utils.dependencies import get_storage, shutdown_storage, startup_storage
+
+
+async def run(args: argparse.Namespace) -> int:
+    path = Path(args.file)
+    try:
+        rows = list(parse_rows(path.read_bytes(), args.format or detect_format(path.name), args.author_id))
+    except Exception as e:
+        print(f"Cannot read {path}: {str(e)}")
+        return 2
+
+    report_path = Path(args.report) if args.report else path.with_name(f"{path.stem}.import-report.ndjson")
+    await startup_storage()
+    try:
+        storage = get_storage()
+        service = ImportService(storage, GamificationService(storage))
+        result = await service.import_pois(
+            rows,
+            report_path,
+            image_root=Path(args.images) if args.images else None,
+            batch_size=args.batch_size,
+            image_concurrency=args.concurrency
+        )
+    except Exception as e:
+        print(f"Import failed: {str(e)}")
+        print(f"Report: {report_path}")
+        return 1
+    finally:
+        await shutdown_storage()
+
+    print(
+        f"{result.imported} of {result.rows} POIs imported ({result.failed} failed), "
+        f"{result.images_uploaded} images stored, {result.authors_awarded} authors awarded, "
+        f"in {result.seconds:.1f}s"
+    )
+    print(f"Report: {result.report_file}")
+    return 1 if result.failed else 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("file", help="GeoJSON (.geojson, .json) or CSV (.csv) file")
+    parser.add_argument("--format", choices=["geojson", "csv"], help="File format (default: from the extension)")
+    parser.add_argument("--author-id", help="Author of the rows without an author_id")
+    parser.add_argument("--images", help="Directory of the images given as paths")
+    parser.add_argument("--report", help="Report file (default: <file>.import-report.ndjson)")
+    parser.add_argument("--batch-size", type=int, help="Rows per batch (default: IMPORT_BATCH_SIZE)")
+    parser.add_argument("--concurrency", type=int, help="Parallel image transfers (default: IMPORT_IMAGE_CONCURRENCY)")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
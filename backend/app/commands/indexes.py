@@ -0,0 +1,89 @@
+"""
+Manage the MongoDB indexes declared in app.utils.mongodb_indexes, and
+backfill the keys of the DynamoDB indexes declared in app.utils.dynamodb_storage
+
+Usage (from the backend directory):
+    python -m app.commands.indexes ensure    # create missing indexes, report drift
+    python -m app.commands.indexes drift     # only report drift
+    python -m app.commands.indexes explain   # check hot queries for collection scans
+    python -m app.commands.indexes backfill  # DynamoDB: set composite keys on existing items
+
+Exits with status 1 when drift, index errors or collection scans are found,
+so it can gate deployments.
+"""
+import argparse
+import asyncio
+import sys
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.config import config
+from app.utils.dynamodb_storage import DynamoDBDataDB
+from app.utils.mongodb_indexes import check_drift, ensure_indexes, explain_hot_queries
+
+
+def _print_drift(drift) -> None:
+    for entry in drift:
+        line = f"  {entry['kind']:<10} {entry['collection']}.{entry['index']}"
+        if entry["kind"] == "changed":
+            line += f" expected {entry['expected']}, found {entry['actual']}"
+        print(line)
+
+
+async def backfill() -> int:
+    db = DynamoDBDataDB()
+    await db.connect()
+    try:
+        updated = await db.backfill_composite_keys()
+    finally:
+        await db.disconnect()
+    for collection, count in updated.items():
+        print(f"backfilled {collection}: {count} items")
+    return 0
+
+
+async def run(command: str) -> int:
+    if command == "backfill":
+        return await backfill()
+
+    if not config.MONGODB_URI:
+        print("MONGODB_URI is not set")
+        return 2
+
+    client = AsyncIOMotorClient(config.MONGODB_URI)
+    database = client[config.MONGODB_DATABASE]
+    try:
+        if command == "ensure":
+            report = await ensure_indexes(database)
+            for name in report["created"]:
+                print(f"created    {name}")
+            for error in report["errors"]:
+                print(f"error      {error}")
+            _print_drift(report["drift"])
+            return 1 if report["errors"] or report["drift"] else 0
+
+        if command == "drift":
+            drift = await check_drift(database)
+            _print_drift(drift)
+            if not drift:
+                print("No index drift")
+            return 1 if drift else 0
+
+        results = await explain_hot_queries(database)
+        for result in results:
+            status = "COLLSCAN" if result["collscan"] else "ok"
+            print(f"  {status:<9} {result['name']:<22} {' <- '.join(result['stages'])}")
+        return 1 if any(result["collscan"] for result in results) else 0
+    finally:
+        client.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["ensure", "drift", "explain", "backfill"])
+    args = parser.parse_args()
+    sys.exit(asyncio.run(run(args.command)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,478 @@
+"""
+Copy every collection between databases, or back it up to compressed NDJSON
+
+Usage (from the backend directory):
+    python -m app.commands.migrate copy mongodb dynamodb
+    python -m app.commands.migrate backup dynamodb backups/2025-06-01
+    python -m app.commands.migrate restore backups/2025-06-01 mongodb
+
+Databases are named like DATABASE_TYPE ("mongodb", "dynamodb", "sqlite")
+and use the connection settings of the environment. Documents are streamed
+with DataDB.iter_many, in parallel segments, and written by a pool of
+writers with bulk_write replace_one upserts, so replaying a batch is
+harmless. Backups are one gzip NDJSON file per segment and run, with
+datetimes tagged as {"$date": "<ISO 8601>"}; a resumed backup can hold the
+documents written after its last checkpoint twice, which restore upserts.
+Documents are copied one by one, so a backup of a database taking writes is
+not a point-in-time snapshot.
+
+Progress is checkpointed as batches are written: running the same command
+again resumes where it stopped (--fresh starts over). Exits with status 1
+on failure.
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from app.config import config
+from app.utils.aggregation import batched
+from app.utils.dependencies import create_data_db
+from app.utils.protocols import DataDB
+
+COLLECTIONS = ["users", "pois", "photos", "ratings"]
+
+BACKUP_SUFFIX = ".ndjson.gz"
+
+# Minimum interval between checkpoint saves; replaying the batches written
+# meanwhile is harmless
+CHECKPOINT_INTERVAL_SECONDS = 1.0
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"$date": value.isoformat()}
+    raise TypeError(f"Cannot back up a value of type {type(value).__name__}")
+
+
+def _json_object_hook(value: Dict[str, Any]) -> Any:
+    if len(value) == 1 and "$date" in value:
+        return datetime.fromisoformat(value["$date"])
+    return value
+
+
+def encode_line(document: Dict[str, Any]) -> str:
+    """Serialize a document to one NDJSON line, tagging datetimes"""
+    return json.dumps(document, default=_json_default, ensure_ascii=False, separators=(",", ":")) + "\n"
+
+
+def decode_line(line: str) -> Dict[str, Any]:
+    """Deserialize a line written by encode_line"""
+    return json.loads(line, object_hook=_json_object_hook)
+
+
+class Checkpoint:
+    """Resume position of every segment of every collection, saved atomically"""
+
+    def __init__(self, path: Path, job: Dict[str, Any], fresh: bool):
+        self.path = path
+        self.state: Dict[str, Any] = {"job": job, "collections": {}}
+        self.saved_at = 0.0
+        if path.exists() and not fresh:
+            saved = json.loads(path.read_text())
+            if saved.get("job") != job:
+                raise Exception(f"Checkpoint {path} was written by a different job; use --fresh to start over")
+            self.state = saved
+
+    @property
+    def resumed(self) -> bool:
+        return bool(self.state["collections"])
+
+    def segment(self, collection: str, segment: str) -> Dict[str, Any]:
+        segments = self.state["collections"].setdefault(collection, {})
+        return segments.setdefault(segment, {"position": None, "count": 0, "done": False})
+
+    def count(self, collection: str) -> int:
+        return sum(entry["count"] for entry in self.state["collections"].get(collection, {}).values())
+
+    def advance(self, collection: str, segment: str, position: Any, count: int) -> None:
+        entry = self.segment(collection, segment)
+        entry["position"] = position
+        entry["count"] += count
+        if time.monotonic() - self.saved_at >= CHECKPOINT_INTERVAL_SECONDS:
+            self.save()
+
+    def finish(self, collection: str, segment: str) -> None:
+        self.segment(collection, segment)["done"] = True
+        self.save()
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = self.path.with_suffix(".tmp")
+        temporary.write_text(json.dumps(self.state, indent=1))
+        os.replace(temporary, self.path)
+        self.saved_at = time.monotonic()
+
+
+class _SegmentProgress:
+    """
+    Orders the completion of a segment's batches
+
+    Writers finish batches out of order; the checkpoint may only move past a
+    batch once every earlier batch of the segment is written.
+    """
+
+    def __init__(self):
+        self.issued = 0
+        self.committed = 0
+        self.completed: Dict[int, Tuple[Any, int]] = {}
+        self.reading_done = False
+
+    def issue(self) -> int:
+        self.issued += 1
+        return self.issued - 1
+
+    def complete(self, sequence: int, position: Any, count: int) -> Optional[Tuple[Any, int]]:
+        """Record a written batch; returns the new resume position and documents committed"""
+        self.completed[sequence] = (position, count)
+        advanced = None
+        total = 0
+        while self.committed in self.completed:
+            position, count = self.completed.pop(self.committed)
+            self.committed += 1
+            advanced = position
+            total += count
+        return (advanced, total) if total or advanced is not None else None
+
+    @property
+    def finished(self) -> bool:
+        return self.reading_done and self.committed == self.issued
+
+
+class DataDBSource:
+    """Reads a collection from a database in total_segments parallel segments"""
+
+    def __init__(self, data_db: DataDB, total_segments: int):
+        self.data_db = data_db
+        self.total_segments = total_segments
+
+    def segments(self, collection: str) -> List[str]:
+        return [str(segment) for segment in range(self.total_segments)]
+
+    async def batches(
+        self, collection: str, segment: str, position: Any, batch_size: int
+    ) -> AsyncIterator[Tuple[List[Dict[str, Any]], Any]]:
+        """Yield batches of documents with the position resuming after each one (its last _id)"""
+        docs = self.data_db.iter_many(
+            collection,
+            batch_size=batch_size,
+            start_after=position,
+            segment=int(segment),
+            total_segments=self.total_segments
+        )
+        async for batch in batched(docs, batch_size):
+            yield batch, batch[-1]["_id"]
+
+
+def _read_lines(handle: Any, count: int) -> Tuple[List[str], bool]:
+    """Read up to count complete lines; also returns whether the file ended early (truncated)"""
+    lines: List[str] = []
+    try:
+        for line in handle:
+            if not line.endswith("\n"):
+                return lines, True
+            lines.append(line)
+            if len(lines) >= count:
+                break
+    except EOFError:
+        return lines, True
+    return lines, False
+
+
+class BackupSource:
+    """Reads the backup files of a collection, each file being a segment"""
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+
+    def segments(self, collection: str) -> List[str]:
+        folder = self.directory / collection
+        if not folder.is_dir():
+            return []
+        return sorted(path.name for path in folder.iterdir() if path.name.endswith(BACKUP_SUFFIX))
+
+    async def batches(
+        self, collection: str, segment: str, position: Any, batch_size: int
+    ) -> AsyncIterator[Tuple[List[Dict[str, Any]], Any]]:
+        """Yield batches of documents with the position resuming after each one (lines consumed)"""
+        path = self.directory / collection / segment
+        handle = await asyncio.to_thread(gzip.open, path, "rt", encoding="utf-8")
+        try:
+            consumed = 0
+            skip = position or 0
+            while True:
+                lines, truncated = await asyncio.to_thread(_read_lines, handle, batch_size)
+                if consumed + len(lines) <= skip:
+                    consumed += len(lines)
+                else:
+                    docs = [decode_line(line) for line in lines[max(0, skip - consumed):]]
+                    consumed += len(lines)
+                    yield docs, consumed
+                if truncated:
+                    # Interrupted backup run: its unflushed tail was backed up again on resume
+                    print(f"  {collection}/{segment} is truncated after {consumed} lines")
+                    return
+                if len(lines) < batch_size:
+                    return
+        finally:
+            await asyncio.to_thread(handle.close)
+
+
+class DataDBTarget:
+    """Writes batches to a database as upserting replacements"""
+
+    def __init__(self, data_db: DataDB):
+        self.data_db = data_db
+
+    async def write(self, collection: str, segment: str, docs: List[Dict[str, Any]]) -> None:
+        await self.data_db.bulk_write(
+            collection,
+            [{"replace_one": {"filter": {"_id": doc["_id"]}, "replacement": doc, "upsert": True}} for doc in docs],
+            ordered=False
+        )
+
+    async def close(self) -> None:
+        pass
+
+
+class BackupTarget:
+    """
+    Writes batches to gzip NDJSON files, one per segment and run
+
+    Each run starts new files, so a file truncated by an interrupted run is
+    never appended to. Files are flushed after every batch, before it is
+    checkpointed.
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+        self.files: Dict[Tuple[str, str], Any] = {}
+        self.locks: Dict[Tuple[str, str], asyncio.Lock] = {}
+
+    def _open(self, collection: str, segment: str) -> Any:
+        folder = self.directory / collection
+        folder.mkdir(parents=True, exist_ok=True)
+        run = sum(1 for path in folder.glob(f"segment-{segment}-*{BACKUP_SUFFIX}"))
+        return gzip.open(folder / f"segment-{segment}-{run:03d}{BACKUP_SUFFIX}", "wt", encoding="utf-8", compresslevel=6)
+
+    @staticmethod
+    def _append(handle: Any, lines: List[str]) -> None:
+        handle.writelines(lines)
+        handle.flush()
+
+    async def write(self, collection: str, segment: str, docs: List[Dict[str, Any]]) -> None:
+        key = (collection, segment)
+        lines = [encode_line(doc) for doc in docs]
+        async with self.locks.setdefault(key, asyncio.Lock()):
+            if key not in self.files:
+                self.files[key] = await asyncio.to_thread(self._open, collection, segment)
+            await asyncio.to_thread(self._append, self.files[key], lines)
+
+    async def close(self) -> None:
+        for handle in self.files.values():
+            await asyncio.to_thread(handle.close)
+        self.files.clear()
+
+
+class Throughput:
+    """Documents copied per collection, reported periodically and at the end"""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.counts: Dict[str, int] = {}
+        self.durations: Dict[str, float] = {}
+
+    def add(self, collection: str, count: int) -> None:
+        self.counts[collection] = self.counts.get(collection, 0) + count
+
+    def line(self) -> str:
+        elapsed = time.monotonic() - self.started
+        total = sum(self.counts.values())
+        parts = [f"{name} {count:,}" for name, count in self.counts.items()]
+        return f"[{elapsed:8.1f}s] {'  '.join(parts)}  total {total:,} ({total / max(elapsed, 1e-9):,.0f} docs/s)"
+
+    async def report_every(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            print(self.line())
+
+    def summary(self) -> None:
+        print(f"{'collection':<12}{'documents':>12}{'seconds':>10}{'docs/s':>12}")
+        for name, count in self.counts.items():
+            seconds = self.durations.get(name, 0.0)
+            print(f"{name:<12}{count:>12,}{seconds:>10.1f}{count / max(seconds, 1e-9):>12,.0f}")
+        print(self.line())
+
+
+async def copy_collection(
+    collection: str,
+    source: Any,
+    target: Any,
+    checkpoint: Checkpoint,
+    throughput: Throughput,
+    batch_size: int,
+    writers: int
+) -> None:
+    """Copy one collection: a reader per segment feeding a pool of writers"""
+    segments = source.segments(collection)
+    progress = {segment: _SegmentProgress() for segment in segments}
+    queue: asyncio.Queue = asyncio.Queue(maxsize=writers * 2)
+    started = time.monotonic()
+
+    def settle(segment: str) -> None:
+        if progress[segment].finished and not checkpoint.segment(collection, segment)["done"]:
+            checkpoint.finish(collection, segment)
+
+    async def read(segment: str) -> None:
+        state = checkpoint.segment(collection, segment)
+        if state["done"]:
+            return
+        async for docs, position in source.batches(collection, segment, state["position"], batch_size):
+            await queue.put((segment, progress[segment].issue(), docs, position))
+        progress[segment].reading_done = True
+        settle(segment)
+
+    async def write() -> None:
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            segment, sequence, docs, position = item
+            if docs:
+                await target.write(collection, segment, docs)
+                throughput.add(collection, len(docs))
+            committed = progress[segment].complete(sequence, position, len(docs))
+            if committed is not None:
+                checkpoint.advance(collection, segment, *committed)
+            settle(segment)
+
+    readers = asyncio.ensure_future(asyncio.gather(*(read(segment) for segment in segments)))
+    pool = [asyncio.ensure_future(write()) for _ in range(writers)]
+    try:
+        # Writers only return once stopped, so this returns when reading is
+        # done or any task failed
+        done, _ = await asyncio.wait([readers, *pool], return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            task.result()
+        for _ in pool:
+            await queue.put(None)
+        await asyncio.gather(*pool)
+    finally:
+        for task in [readers, *pool]:
+            task.cancel()
+        await asyncio.gather(readers, *pool, return_exceptions=True)
+        checkpoint.save()
+        throughput.durations[collection] = throughput.durations.get(collection, 0.0) + time.monotonic() - started
+
+
+async def run(args: argparse.Namespace) -> int:
+    collections = [name.strip() for name in args.collections.split(",") if name.strip()]
+    databases: List[DataDB] = []
+
+    def database(name: str) -> DataDB:
+        data_db = create_data_db(name)
+        databases.append(data_db)
+        return data_db
+
+    if args.command == "restore":
+        source_dir = Path(args.source)
+        if not source_dir.is_dir():
+            print(f"Backup directory {source_dir} does not exist")
+            return 2
+        source: Any = BackupSource(source_dir)
+        total_segments = None
+    else:
+        segments = args.segments or (config.DYNAMODB_SCAN_SEGMENTS if args.source == "dynamodb" else 1)
+        source = DataDBSource(database(args.source), segments)
+        total_segments = segments
+
+    if args.command == "backup":
+        target_dir = Path(args.target)
+        target: Any = BackupTarget(target_dir)
+        default_checkpoint = target_dir / "checkpoint.json"
+    else:
+        target = DataDBTarget(database(args.target))
+        origin = Path(args.source).name if args.command == "restore" else args.source
+        default_checkpoint = Path(f"migrate-{origin}-to-{args.target}.checkpoint.json")
+        if args.command == "restore":
+            default_checkpoint = Path(args.source) / f"restore-to-{args.target}.checkpoint.json"
+
+    job = {
+        "command": args.command,
+        "source": args.source,
+        "target": args.target,
+        "segments": total_segments,
+        "collections": collections,
+    }
+    try:
+        checkpoint = Checkpoint(Path(args.checkpoint) if args.checkpoint else default_checkpoint, job, args.fresh)
+    except Exception as e:
+        print(str(e))
+        return 1
+    if checkpoint.state.get("completed"):
+        print(f"Already completed according to {checkpoint.path}; use --fresh to run again")
+        return 0
+    if checkpoint.resumed:
+        print(f"Resuming from {checkpoint.path}")
+
+    throughput = Throughput()
+    reporter = asyncio.ensure_future(throughput.report_every(args.report_interval))
+    try:
+        for data_db in databases:
+            await data_db.connect()
+        for collection in collections:
+            await copy_collection(collection, source, target, checkpoint, throughput, args.batch_size, args.writers)
+            print(f"{collection}: {checkpoint.count(collection):,} documents")
+        await target.close()
+    except Exception as e:
+        print(f"Migration failed: {str(e)}")
+        print(f"Progress is saved in {checkpoint.path}; run the same command again to resume")
+        return 1
+    finally:
+        reporter.cancel()
+        for data_db in databases:
+            await data_db.disconnect()
+
+    checkpoint.state["completed"] = True
+    checkpoint.save()
+    if args.command == "backup":
+        manifest = {
+            "source": args.source,
+            "finished_at": datetime.utcnow().isoformat(),
+            "collections": {name: checkpoint.count(name) for name in collections},
+        }
+        (target_dir / "manifest.json").write_text(json.dumps(manifest, indent=1))
+    throughput.summary()
+    return 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["copy", "backup", "restore"])
+    parser.add_argument("source", help="Database type, or backup directory for restore")
+    parser.add_argument("target", help="Database type, or backup directory for backup")
+    parser.add_argument("--collections", default=",".join(COLLECTIONS), help="Comma-separated collections")
+    parser.add_argument(
+        "--segments", type=int, default=0,
+        help="Parallel read segments (default: DYNAMODB_SCAN_SEGMENTS from DynamoDB, else 1). "
+             "Only DynamoDB splits segments server-side; other databases read the whole cursor in each one"
+    )
+    parser.add_argument("--writers", type=int, default=4, help="Concurrent bulk writes")
+    parser.add_argument("--batch-size", type=int, default=500, help="Documents per read batch and bulk write")
+    parser.add_argument("--checkpoint", help="Checkpoint file (default depends on the command)")
+    parser.add_argument("--fresh", action="store_true", help="Ignore an existing checkpoint")
+    parser.add_argument("--report-interval", type=float, default=10.0, help="Seconds between progress lines")
+    args = parser.parse_args()
+    if args.command == "copy" and args.source == args.target:
+        parser.error("source and target must differ")
+    sys.exit(asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
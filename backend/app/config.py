@@ -15,28 +15,97 @@ class AppConfig(BaseSettings):
     LOG_LEVEL: str = "INFO"
     SECRET_KEY: str = ""
     API_KEY: str = ""  # API Key for authentication
+    ADMIN_API_KEY: str = ""  # Key for /admin routes (X-Admin-Key header), empty disables them
     
     # Database settings
-    DATABASE_TYPE: str = "mongodb"  # Options: "mongodb" or "dynamodb"
+    DATABASE_TYPE: str = "mongodb"  # Options: "mongodb", "dynamodb", "sqlite" or "memory"
     
     # MongoDB Atlas settings
     MONGODB_URI: str = ""
     MONGODB_DATABASE: str = "urbanspot"
+    MONGODB_ENSURE_INDEXES: bool = True  # Create declared indexes on startup
+    MONGODB_MAX_POOL_SIZE: int = 100  # Connections per worker process
+    MONGODB_MIN_POOL_SIZE: int = 0
+    MONGODB_MAX_IDLE_TIME_MS: int = 0  # 0 keeps idle connections open
+    MONGODB_COMPRESSORS: str = ""  # e.g. "zstd,snappy,zlib" (zstd/snappy need zstandard/python-snappy)
+    MONGODB_CONNECT_TIMEOUT_MS: int = 20000
+    MONGODB_SERVER_SELECTION_TIMEOUT_MS: int = 30000
+    MONGODB_SOCKET_TIMEOUT_MS: int = 0  # 0 waits indefinitely
+    MONGODB_WAIT_QUEUE_TIMEOUT_MS: int = 0  # Max wait for a free pooled connection, 0 waits indefinitely
+    MONGODB_READ_PREFERENCE: str = "primary"  # Default for all reads
+    MONGODB_READ_CONCERN: str = ""  # Default read concern level, e.g. "majority"
+    MONGODB_SECONDARY_READ_PREFERENCE: str = "secondaryPreferred"  # For read-only routes that tolerate lag
+    MONGODB_SECONDARY_READ_CONCERN: str = "local"
     
     # DynamoDB settings
     DYNAMODB_TABLE_PREFIX: str = "urbanspot"
+    DYNAMODB_AUTO_CREATE_TABLES: bool = True  # Provision tables and indexes on startup
+    DYNAMODB_SCAN_SEGMENTS: int = 4  # Parallel segments for full-table scans
+    DYNAMODB_INDEX_REFRESH_SECONDS: float = 60.0  # Status checks of indexes being built or backfilled
+    DYNAMODB_ESTIMATED_COUNT_TTL_SECONDS: float = 300.0  # Cache of DescribeTable ItemCount for estimated counts
     
+    # SQLite settings (single node)
+    SQLITE_PATH: str = "urbanspot.db"
+    SQLITE_READERS: int = 4  # Reader connections serving queries in parallel
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000  # Wait for locks held by other processes
+
+    # In-memory database settings (per process, data is lost on restart)
+    MEMORY_DB_LATENCY_MS: float = 0.0  # Simulated round-trip time per call
+    MEMORY_DB_JITTER_MS: float = 0.0  # Extra random delay, uniform in [0, jitter]
+    MEMORY_DB_ERROR_RATE: float = 0.0  # Fraction of calls failing with a simulated error
+    MEMORY_DB_SEED: int = 0  # Random seed for reproducible runs, 0 for a random seed
+
+    # Document cache settings (read-through cache of documents by ID, per process)
+    CACHE_ENABLED: bool = False
+    CACHE_MAX_ENTRIES: int = 10000
+    CACHE_TTL_SECONDS: float = 30.0  # Bounds staleness when other processes write
+
+    # Shared cache tier behind the document cache (requires CACHE_ENABLED)
+    SHARED_CACHE_TYPE: str = ""  # Options: "redis", "local" (in-process stand-in) or empty to disable
+    SHARED_CACHE_URL: str = "redis://localhost:6379/0"
+    SHARED_CACHE_PREFIX: str = "urbanspot:doc"
+    SHARED_CACHE_CHANNEL: str = "urbanspot:invalidate"  # Pub/sub channel for invalidations
+    SHARED_CACHE_TTL_SECONDS: float = 300.0
+    SHARED_CACHE_REDELETE_MS: float = 500.0  # Second delete of written keys, 0 to disable
+
+    # POI map snapshot (per process, rebuilt after POI writes made by this process)
+    POI_MAP_TTL_SECONDS: float = 60.0  # Bounds staleness when other processes write
+
+    # Bulk POI imports (GeoJSON/CSV)
+    IMPORT_BATCH_SIZE: int = 200  # Rows validated and inserted together
+    IMPORT_IMAGE_CONCURRENCY: int = 8  # Images fetched and uploaded in parallel
+    IMPORT_IMAGE_TIMEOUT_SECONDS: float = 30.0  # Per image download
+    IMPORT_MAX_IMAGE_BYTES: int = 10 * 1024 * 1024
+    IMPORT_REPORT_DIR: str = "import-reports"  # Reports of imports made through the API
+    IMPORT_ALLOW_PRIVATE_URLS: bool = False  # Allow image URLs on private, loopback or link-local addresses
+
     # File storage settings
     FILE_STORAGE_TYPE: str = "imgbb"  # Options: "s3" or "imgbb"
+    MAX_UPLOAD_BYTES: int = 32 * 1024 * 1024  # Largest image accepted by the API (ImgBB's own limit is 32 MB)
+    UPLOAD_CHUNK_BYTES: int = 256 * 1024  # Chunks in which uploads are streamed to the file storage
     
     # AWS S3 settings
     AWS_ACCESS_KEY_ID: str = ""
     AWS_SECRET_ACCESS_KEY: str = ""
     AWS_REGION: str = "us-east-1"
     S3_BUCKET_NAME: str = ""
+    S3_ENDPOINT_URL: str = ""  # S3-compatible endpoint (e.g. MinIO or a local stand-in), empty for AWS
+    S3_MULTIPART_THRESHOLD_MB: int = 8  # Larger files are uploaded in parts
+    S3_MULTIPART_CHUNKSIZE_MB: int = 8  # Part size
+    S3_MAX_CONCURRENCY: int = 10  # Parts of a file uploaded in parallel
+    S3_MAX_POOL_CONNECTIONS: int = 20  # Pooled connections shared by all uploads (at least S3_MAX_CONCURRENCY)
+    S3_CONNECT_TIMEOUT_SECONDS: float = 10.0
+    S3_READ_TIMEOUT_SECONDS: float = 60.0
+    S3_MAX_ATTEMPTS: int = 3  # Attempts per request, including retries
     
     # ImgBB settings
     IMGBB_API_KEY: str = ""
+    IMGBB_API_URL: str = "https://api.imgbb.com/1/upload"
+    IMGBB_MAX_CONNECTIONS: int = 20  # Pooled connections per worker process
+    IMGBB_KEEPALIVE_SECONDS: float = 30.0  # Idle time before a pooled connection is closed
+    IMGBB_DNS_CACHE_SECONDS: int = 300
+    IMGBB_CONNECT_TIMEOUT_SECONDS: float = 10.0  # Includes waiting for a free pooled connection
+    IMGBB_TIMEOUT_SECONDS: float = 60.0  # Whole upload
     
     # OAuth settings (for future frontend integration)
     GOOGLE_CLIENT_ID: str = ""
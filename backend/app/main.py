@@ -1,10 +1,13 @@
 """
 Main application entry point
 """
-from fastapi import FastAPI
+from fastapi import FastAPI, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from app.routes import users, pois, photos, ratings
-from app.utils.dependencies import startup_storage, shutdown_storage
+from app.routes import users, pois, photos, ratings, export, admin
+from app.utils.auth import verify_api_key
+from app.utils.dependencies import get_storage, startup_storage, shutdown_storage
+from app.utils.poi_map import poi_map
+from app.utils.singleflight import service_flights
 
 app = FastAPI(
     title="UrbanSpot API",
@@ -27,6 +30,8 @@ app.include_router(users.router)
 app.include_router(pois.router)
 app.include_router(photos.router)
 app.include_router(ratings.router)
+app.include_router(export.router)
+app.include_router(admin.router)
 
 
 @app.on_event("startup")
@@ -55,3 +60,9 @@ async def root():
 async def health_check():
     """Health check endpoint"""
     return {"status": "healthy"}
+
+
+@app.get("/metrics")
+async def metrics(_: bool = Depends(verify_api_key)):
+    """Storage and request coalescing metrics (connection pools, caches...) for capacity planning"""
+    return {**get_storage().metrics(), "singleflight": service_flights.metrics(), "poi_map": poi_map.metrics()}
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, field_validator
-from typing import Optional, List
+from typing import Literal, Optional, List
 from datetime import datetime
 
 
@@ -45,3 +45,37 @@ class POIDetail(POI):
     author_name: Optional[str] = Field(None, description="Name of the author")
     photo_count: int = Field(default=0, description="Number of photos associated with this POI")
 
+
+
+class POIMap(BaseModel):
+    """Columnar map payload: parallel arrays with one entry per POI"""
+    count: int = Field(..., description="Number of POIs")
+    coordinate_scale: int = Field(..., description="Divide lat and lon by this to get degrees (1 unless quantized)")
+    rating_scale: int = Field(..., description="Divide rating by this to get the average rating (1 unless quantized)")
+    ids: List[str] = Field(..., description="POI IDs")
+    lat: List[float] = Field(..., description="Latitudes, fixed-point integers when quantized")
+    lon: List[float] = Field(..., description="Longitudes, fixed-point integers when quantized")
+    rating: List[float] = Field(..., description="Average ratings, fixed-point integers when quantized")
+    tag: List[int] = Field(..., description="Index of each POI's primary tag in tags, -1 without tags")
+    tags: List[str] = Field(..., description="Distinct primary tags")
+
+
+class POIImportResult(BaseModel):
+    """Summary of a bulk POI import"""
+    rows: int = Field(..., description="Rows read from the file")
+    imported: int = Field(..., description="POIs created")
+    failed: int = Field(..., description="Rows rejected; see the report for the reasons")
+    images_uploaded: int = Field(..., description="Distinct images stored through the file storage")
+    authors_awarded: int = Field(..., description="Authors credited with their imported POIs")
+    seconds: float = Field(..., description="Duration of the import")
+    report_file: str = Field(..., description="NDJSON report with progress and per-row errors")
+
+
+class POIImportJob(BaseModel):
+    """A bulk POI import running in the background"""
+    job_id: str = Field(..., description="Import job ID")
+    status: Literal["running", "done", "failed"] = Field(..., description="Job status")
+    started_at: datetime = Field(..., description="Start timestamp")
+    report_file: str = Field(..., description="NDJSON report with progress and per-row errors")
+    result: Optional[POIImportResult] = Field(None, description="Summary, once done")
+    error: Optional[str] = Field(None, description="Reason of the failure, if failed")
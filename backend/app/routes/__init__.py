@@ -1,3 +1,3 @@
-from app.routes import users, pois, photos, ratings
+from app.routes import users, pois, photos, ratings, export, admin
 
-__all__ = ["users", "pois", "photos", "ratings"]
+__all__ = ["users", "pois", "photos", "ratings", "export", "admin"]
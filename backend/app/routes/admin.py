@@ -0,0 +1,104 @@
+import asyncio
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile, status
+
+from app.config import config
+from app.models.poi import POIImportJob
+from app.services.gamification import GamificationService
+from app.services.import_service import ImportFormat, ImportService, Row, detect_format, parse_rows
+from app.utils.auth import verify_admin_key
+from app.utils.dependencies import get_storage
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+# Import jobs of this process, and the tasks running them. Finished jobs are
+# kept for their status until MAX_FINISHED_JOBS newer ones finish.
+MAX_FINISHED_JOBS = 100
+_import_jobs: Dict[str, POIImportJob] = {}
+_import_tasks: Set[asyncio.Task] = set()
+
+
+def get_import_service() -> ImportService:
+    """
+    Dependency to get ImportService instance
+
+    Uses the shared storage rather than the request-scoped one: imports run
+    in the background, after the request that started them has ended.
+    """
+    storage = get_storage()
+    gamification = GamificationService(storage)
+    return ImportService(storage, gamification)
+
+
+def _forget_finished_jobs() -> None:
+    finished: List[str] = [job_id for job_id, job in _import_jobs.items() if job.status != "running"]
+    for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+        del _import_jobs[job_id]
+
+
+async def _run_import(job: POIImportJob, import_service: ImportService, rows: List[Row]) -> None:
+    try:
+        job.result = await import_service.import_pois(rows, Path(job.report_file))
+        job.status = "done"
+    except Exception as e:
+        job.status = "failed"
+        job.error = str(e)
+    _forget_finished_jobs()
+
+
+@router.post("/pois/import", response_model=POIImportJob, status_code=status.HTTP_202_ACCEPTED)
+async def import_pois(
+    file: UploadFile = File(..., description="GeoJSON FeatureCollection or CSV with a header row"),
+    file_format: Optional[ImportFormat] = Query(
+        None, alias="format", description="File format (default: from the file extension)"
+    ),
+    author_id: Optional[str] = Query(None, description="Author of the rows without an author_id"),
+    _: bool = Depends(verify_admin_key),
+    import_service: ImportService = Depends(get_import_service)
+):
+    """
+    Start a bulk POI import; images must be http(s) URLs on public addresses,
+    which are downloaded and stored. Poll GET /admin/pois/import/{job_id}
+    for its status.
+    """
+    try:
+        file_format = file_format or detect_format(file.filename or "")
+        rows = list(parse_rows(await file.read(), file_format, author_id))
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Invalid import file: {str(e)}"
+        )
+
+    started_at = datetime.utcnow()
+    job_id = f"{started_at:%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+    job = POIImportJob(
+        job_id=job_id,
+        status="running",
+        started_at=started_at,
+        report_file=str(Path(config.IMPORT_REPORT_DIR) / f"pois-{job_id}.ndjson")
+    )
+    _import_jobs[job_id] = job
+    task = asyncio.ensure_future(_run_import(job, import_service, rows))
+    _import_tasks.add(task)
+    task.add_done_callback(_import_tasks.discard)
+    return job
+
+
+@router.get("/pois/import/{job_id}", response_model=POIImportJob)
+async def get_import_job(
+    job_id: str,
+    _: bool = Depends(verify_admin_key)
+):
+    """Get the status of an import started by this worker process, with its summary once done"""
+    job = _import_jobs.get(job_id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Import job not found"
+        )
+    return job
@@ -0,0 +1,54 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
+
+from app.services.export_service import ExportCollection, ExportService
+from app.utils.auth import verify_api_key
+from app.utils.dependencies import get_request_storage, secondary_reads
+
+router = APIRouter(prefix="/export", tags=["export"])
+
+
+def get_export_service(request: Request) -> ExportService:
+    """Dependency to get ExportService instance"""
+    return ExportService(get_request_storage(request))
+
+
+@router.get(
+    "/{collection}.ndjson",
+    response_class=StreamingResponse,
+    dependencies=[Depends(secondary_reads)],
+    responses={200: {"content": {"application/x-ndjson": {}}}}
+)
+async def export_collection(
+    collection: ExportCollection,
+    start_after: Optional[str] = Query(
+        None, description="Resume after the document with this _id (the last line received)"
+    ),
+    segment: int = Query(0, ge=0, description="Segment to export, from 0 to total_segments - 1"),
+    total_segments: int = Query(1, ge=1, le=64, description="Split the export into this many parallel streams"),
+    batch_size: int = Query(1000, ge=1, le=10000, description="Documents per database round trip"),
+    _: bool = Depends(verify_api_key),
+    export_service: ExportService = Depends(get_export_service)
+):
+    """Stream every document of a collection as NDJSON"""
+    if segment >= total_segments:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="segment must be lower than total_segments"
+        )
+    try:
+        body = await export_service.open_ndjson(
+            collection,
+            batch_size=batch_size,
+            start_after=start_after,
+            segment=segment,
+            total_segments=total_segments
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Cannot export {collection}: {str(e)}"
+        )
+    return StreamingResponse(body, media_type="application/x-ndjson")
@@ -1,18 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Query
+from fastapi import APIRouter, Request, Depends, HTTPException, status, UploadFile, File, Query
 from typing import List
-from io import BytesIO
 from app.models.photo import Photo, PhotoCreate, PhotoDetail
 from app.services.photo_service import PhotoService
 from app.services.gamification import GamificationService
-from app.utils.dependencies import get_storage
+from app.utils.dependencies import get_request_storage, secondary_reads
 from app.utils.auth import verify_api_key
+from app.utils.uploads import store_upload
+from app.utils.serialization import TrustedJSONResponse
 
 router = APIRouter(prefix="/photos", tags=["photos"])
 
 
-def get_photo_service() -> PhotoService:
+def get_photo_service(request: Request) -> PhotoService:
     """Dependency to get PhotoService instance"""
-    storage = get_storage()
+    storage = get_request_storage(request)
     gamification = GamificationService(storage)
     return PhotoService(storage, gamification)
 
@@ -27,7 +28,7 @@ async def create_photo(
     photo_service: PhotoService = Depends(get_photo_service)
 ):
     """Upload a new photo to a POI"""
-    storage = get_storage()
+    storage = photo_service.storage
     
     # Verify POI exists
     from app.services.poi_service import POIService
@@ -39,15 +40,9 @@ async def create_photo(
             detail="POI not found"
         )
     
-    # Upload image to S3
-    image_content = await image.read()
-    image_bytes = BytesIO(image_content)
-    image_url = await storage.file_db.upload_file(
-        image_bytes,
-        image.filename or "photo.jpg",
-        image.content_type or "image/jpeg",
-        folder="photos"
-    )
+    # Upload image, streamed to the file storage
+    upload = await store_upload(storage.file_db, image, "photo.jpg", folder="photos")
+    image_url = upload["url"]
     
     # Create photo
     try:
@@ -66,14 +61,15 @@ async def create_photo(
     return await photo_service.create_photo(photo_data)
 
 
-@router.get("/poi/{poi_id}", response_model=List[Photo])
+@router.get("/poi/{poi_id}", response_model=List[Photo], dependencies=[Depends(secondary_reads)])
 async def get_photos_by_poi(
     poi_id: str,
     _: bool = Depends(verify_api_key),
     photo_service: PhotoService = Depends(get_photo_service)
 ):
     """Get all photos for a specific POI"""
-    return await photo_service.get_photos_by_poi(poi_id)
+    photos = await photo_service.get_photos_by_poi(poi_id)
+    return TrustedJSONResponse(Photo, photos)
 
 
 @router.get("/{photo_id}", response_model=PhotoDetail)
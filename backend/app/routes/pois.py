@@ -1,18 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Query
+from fastapi import APIRouter, Request, Response, Depends, HTTPException, status, UploadFile, File, Query
 from typing import List, Optional
-from io import BytesIO
-from app.models.poi import POI, POICreate, POIUpdate, POIDetail
+from app.models.poi import POI, POICreate, POIUpdate, POIDetail, POIMap
 from app.services.poi_service import POIService
 from app.services.gamification import GamificationService
-from app.utils.dependencies import get_storage
+from app.utils.dependencies import get_request_storage, secondary_reads
 from app.utils.auth import verify_api_key
+from app.utils.uploads import store_upload
+from app.utils.poi_map import JSON, MSGPACK
+from app.utils.serialization import TrustedJSONResponse
 
 router = APIRouter(prefix="/pois", tags=["pois"])
 
 
-def get_poi_service() -> POIService:
+def get_poi_service(request: Request) -> POIService:
     """Dependency to get POIService instance"""
-    storage = get_storage()
+    storage = get_request_storage(request)
     gamification = GamificationService(storage)
     return POIService(storage, gamification)
 
@@ -30,22 +32,16 @@ async def create_poi(
     poi_service: POIService = Depends(get_poi_service)
 ):
     """Create a new POI with image upload"""
-    storage = get_storage()
+    storage = poi_service.storage
 
     # Parse tags
     tag_list = []
     if tags:
         tag_list = [tag.strip() for tag in tags.split(",") if tag.strip()]
 
-    # Upload image to S3
-    image_content = await image.read()
-    image_bytes = BytesIO(image_content)
-    image_url = await storage.file_db.upload_file(
-        image_bytes,
-        image.filename or "poi_image.jpg",
-        image.content_type or "image/jpeg",
-        folder="pois"
-    )
+    # Upload image, streamed to the file storage
+    upload = await store_upload(storage.file_db, image, "poi_image.jpg", folder="pois")
+    image_url = upload["url"]
 
     # Create POI
     try:
@@ -67,7 +63,7 @@ async def create_poi(
     return await poi_service.create_poi(poi_data)
 
 
-@router.get("/", response_model=List[POI])
+@router.get("/", response_model=List[POI], dependencies=[Depends(secondary_reads)])
 async def get_all_pois(
     skip: int = Query(0, ge=0, description="Number of records to skip"),
     limit: int = Query(100, ge=1, le=1000, description="Maximum number of records to return"),
@@ -80,7 +76,34 @@ async def get_all_pois(
     if tags:
         tag_list = [tag.strip() for tag in tags.split(",") if tag.strip()]
 
-    return await poi_service.get_all_pois(skip=skip, limit=limit, tags=tag_list)
+    pois = await poi_service.get_all_pois(skip=skip, limit=limit, tags=tag_list)
+    return TrustedJSONResponse(POI, pois)
+
+
+@router.get(
+    "/map",
+    response_model=POIMap,
+    dependencies=[Depends(secondary_reads)],
+    responses={200: {"content": {MSGPACK: {}}}}
+)
+async def get_poi_map(
+    request: Request,
+    precision: Optional[int] = Query(
+        None, ge=0, le=7, description="Quantize coordinates to integers keeping this many decimals"
+    ),
+    _: bool = Depends(verify_api_key),
+    poi_service: POIService = Depends(get_poi_service)
+):
+    """Get every POI as parallel arrays for the map (JSON, or MessagePack via Accept)"""
+    accept = request.headers.get("accept", "")
+    media_type = MSGPACK if MSGPACK in accept or "application/x-msgpack" in accept else JSON
+
+    snapshot = await poi_service.get_map()
+    body, etag = snapshot.encode(media_type, precision)
+    headers = {"ETag": etag, "Vary": "Accept"}
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=body, media_type=media_type, headers=headers)
 
 
 @router.get("/{poi_id}", response_model=POIDetail)
@@ -1,18 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Request, Depends, HTTPException, status
 from app.models.rating import Rating, RatingCreate
 from app.services.rating_service import RatingService
 from app.services.poi_service import POIService
 from app.services.photo_service import PhotoService
 from app.services.gamification import GamificationService
-from app.utils.dependencies import get_storage
+from app.utils.dependencies import get_request_storage
 from app.utils.auth import verify_api_key
 
 router = APIRouter(prefix="/ratings", tags=["ratings"])
 
 
-def get_rating_service() -> RatingService:
+def get_rating_service(request: Request) -> RatingService:
     """Dependency to get RatingService instance"""
-    storage = get_storage()
+    storage = get_request_storage(request)
     gamification = GamificationService(storage)
     poi_service = POIService(storage, gamification)
     photo_service = PhotoService(storage, gamification)
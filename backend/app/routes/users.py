@@ -1,16 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Request, Depends, HTTPException, status, Query
 from typing import List
 from app.models.user import User, UserCreate, UserLogin, UserProfile
 from app.services.user_service import UserService
-from app.utils.dependencies import get_storage
+from app.utils.dependencies import get_request_storage, secondary_reads
 from app.utils.auth import verify_api_key
+from app.utils.serialization import TrustedJSONResponse
 
 router = APIRouter(prefix="/users", tags=["users"])
 
 
-def get_user_service() -> UserService:
+def get_user_service(request: Request) -> UserService:
     """Dependency to get UserService instance"""
-    storage = get_storage()
+    storage = get_request_storage(request)
     return UserService(storage)
 
 
@@ -115,12 +116,13 @@ async def get_user_profile(
     return profile
 
 
-@router.get("/ranking/global", response_model=List[UserProfile])
+@router.get("/ranking/global", response_model=List[UserProfile], dependencies=[Depends(secondary_reads)])
 async def get_global_ranking(
     limit: int = Query(100, ge=1, le=1000, description="Maximum number of users to return"),
     _: bool = Depends(verify_api_key),
     user_service: UserService = Depends(get_user_service)
 ):
     """Get global ranking of users by total score"""
-    return await user_service.get_ranking(limit=limit)
+    profiles = await user_service.get_ranking(limit=limit)
+    return TrustedJSONResponse(UserProfile, profiles)
 
@@ -0,0 +1,69 @@
+from typing import AsyncIterator, Literal, Optional
+
+from pydantic_core import to_json
+
+from app.utils.storage import Storage
+
+# Collections that can be exported (users are left out: they hold password hashes)
+ExportCollection = Literal["pois", "photos", "ratings"]
+
+
+class ExportService:
+    """Service for bulk export of collections"""
+
+    def __init__(self, storage: Storage):
+        self.storage = storage
+
+    async def open_ndjson(
+        self,
+        collection: str,
+        batch_size: int = 1000,
+        start_after: Optional[str] = None,
+        segment: int = 0,
+        total_segments: int = 1
+    ) -> AsyncIterator[bytes]:
+        """
+        Start exporting a collection as NDJSON, one document per line
+
+        The first chunk is read before returning, so errors opening the
+        iteration (e.g. an invalid cursor) are raised here rather than in the
+        middle of a response. Each later chunk holds up to batch_size lines.
+
+        Args:
+            collection: Name of the collection
+            batch_size: Documents per chunk, and per database round trip
+            start_after: Resume after the document with this _id
+            segment: Segment to export, from 0 to total_segments - 1
+            total_segments: Number of segments for parallel exports
+
+        Returns:
+            NDJSON chunks
+        """
+        docs = self.storage.data_db.iter_many(
+            collection,
+            batch_size=batch_size,
+            start_after=start_after,
+            segment=segment,
+            total_segments=total_segments
+        )
+
+        async def chunks() -> AsyncIterator[bytes]:
+            lines = []
+            async for doc in docs:
+                lines.append(to_json(doc))
+                if len(lines) >= batch_size:
+                    yield b"\n".join(lines) + b"\n"
+                    lines = []
+            if lines:
+                yield b"\n".join(lines) + b"\n"
+
+        stream = chunks()
+        first = await anext(stream, b"")
+
+        async def body() -> AsyncIterator[bytes]:
+            if first:
+                yield first
+            async for chunk in stream:
+                yield chunk
+
+        return body()
@@ -18,7 +18,11 @@ class GamificationService:
     async def award_poi_created(self, user_id: str) -> None:
         """Award points for creating a POI"""
         await self._add_points(user_id, self.POINTS_POI_CREATED, "poi")
-    
+
+    async def award_pois_created(self, user_id: str, count: int) -> None:
+        """Award points for creating several POIs at once (bulk imports)"""
+        await self._add_points(user_id, self.POINTS_POI_CREATED * count, "poi")
+
     async def award_photo_uploaded(self, user_id: str) -> None:
         """Award points for uploading a photo"""
         await self._add_points(user_id, self.POINTS_PHOTO_UPLOADED, "photo")
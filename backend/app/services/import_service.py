@@ -0,0 +1,385 @@
+import asyncio
+import csv
+import errno
+import io
+import ipaddress
+import json
+import mimetypes
+import socket
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Literal, Optional, Tuple
+from urllib.parse import urljoin, urlparse
+
+import aiohttp
+from aiohttp.abc import AbstractResolver, ResolveResult
+from aiohttp.resolver import DefaultResolver
+
+from app.config import config
+from app.models.poi import POICreate, POIImportResult
+from app.services.gamification import GamificationService
+from app.utils.poi_map import poi_map
+from app.utils.storage import Storage
+
+ImportFormat = Literal["geojson", "csv"]
+
+# A row: its number in the file (1-based) and its raw POI fields
+Row = Tuple[int, Dict[str, Any]]
+
+# Redirects followed when downloading an image, each one checked like the first URL
+MAX_REDIRECTS = 5
+
+
+def _is_public_address(address: str) -> bool:
+    """Whether an IP address is globally routable (not private, loopback, link-local...)"""
+    ip = ipaddress.ip_address(address.split("%")[0])
+    return ip.is_global and not ip.is_multicast
+
+
+class PublicAddressResolver(AbstractResolver):
+    """
+    DNS resolver refusing hosts with private, loopback or link-local addresses
+
+    Image URLs come from import files, so without it they could make the
+    server fetch internal services or cloud metadata (169.254.169.254). The
+    check is done on the addresses actually connected to, so a host cannot
+    pass it and then resolve elsewhere.
+    """
+
+    def __init__(self):
+        self._resolver = DefaultResolver()
+
+    async def resolve(
+        self, host: str, port: int = 0, family: socket.AddressFamily = socket.AF_INET
+    ) -> List[ResolveResult]:
+        results = await self._resolver.resolve(host, port, family)
+        for result in results:
+            if not _is_public_address(result["host"]):
+                # aiohttp reports strerror, so pass one
+                raise OSError(errno.EACCES, f"{host} resolves to non-public address {result['host']}")
+        return results
+
+    async def close(self) -> None:
+        await self._resolver.close()
+
+
+def _check_image_url(url: str) -> None:
+    """Refuse non-http(s) URLs and IP literals that are not public (hostnames go through the resolver)"""
+    parsed = urlparse(url)
+    if parsed.scheme not in ("http", "https") or not parsed.hostname:
+        raise Exception(f"not an http(s) URL: {url}")
+    if config.IMPORT_ALLOW_PRIVATE_URLS:
+        return
+    try:
+        public = _is_public_address(parsed.hostname)
+    except ValueError:
+        return
+    if not public:
+        raise Exception(f"non-public address {parsed.hostname}")
+
+
+def detect_format(file_name: str) -> ImportFormat:
+    """Guess the format of an import file from its extension"""
+    suffix = Path(file_name).suffix.lower()
+    if suffix in (".geojson", ".json"):
+        return "geojson"
+    if suffix == ".csv":
+        return "csv"
+    raise ValueError(f"Cannot tell the format of {file_name}: expected .geojson, .json or .csv")
+
+
+def _split_tags(tags: Any) -> List[str]:
+    if isinstance(tags, str):
+        return [tag.strip() for tag in tags.split(",") if tag.strip()]
+    return tags or []
+
+
+def _row(fields: Dict[str, Any], default_author_id: Optional[str]) -> Dict[str, Any]:
+    """POI fields of a row; the image goes in image_url until it is ingested"""
+    return {
+        "name": fields.get("name"),
+        "description": fields.get("description"),
+        "latitude": fields.get("latitude"),
+        "longitude": fields.get("longitude"),
+        "tags": _split_tags(fields.get("tags")),
+        "image_url": fields.get("image") or fields.get("image_url"),
+        "author_id": fields.get("author_id") or default_author_id,
+    }
+
+
+def parse_geojson(content: bytes, default_author_id: Optional[str] = None) -> Iterator[Row]:
+    """
+    Read the POIs of a GeoJSON FeatureCollection
+
+    Each feature is a Point whose properties hold name, description, tags
+    (list or comma-separated), image (URL or path) and author_id.
+    """
+    data = json.loads(content)
+    if data.get("type") != "FeatureCollection":
+        raise ValueError("GeoJSON must be a FeatureCollection")
+    for number, feature in enumerate(data.get("features", []), start=1):
+        fields = dict(feature.get("properties") or {})
+        geometry = feature.get("geometry") or {}
+        if geometry.get("type") == "Point" and len(geometry.get("coordinates", [])) >= 2:
+            fields["longitude"], fields["latitude"] = geometry["coordinates"][:2]
+        yield number, _row(fields, default_author_id)
+
+
+def parse_csv(content: bytes, default_author_id: Optional[str] = None) -> Iterator[Row]:
+    """
+    Read the POIs of a CSV file with a header row
+
+    Columns: name, description, latitude, longitude, tags (comma-separated),
+    image (URL or path) and author_id. Rows are numbered from the header (1).
+    """
+    reader = csv.DictReader(io.StringIO(content.decode("utf-8-sig")))
+    for number, fields in enumerate(reader, start=2):
+        yield number, _row({k: v for k, v in fields.items() if k and v != ""}, default_author_id)
+
+
+def parse_rows(content: bytes, file_format: ImportFormat, default_author_id: Optional[str] = None) -> Iterator[Row]:
+    """Read the POIs of an import file"""
+    if file_format == "geojson":
+        return parse_geojson(content, default_author_id)
+    return parse_csv(content, default_author_id)
+
+
+def _chunks(rows: Iterable[Row], size: int) -> Iterator[List[Row]]:
+    chunk: List[Row] = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class ImportReport:
+    """
+    NDJSON report of an import: per-row errors, progress lines and a summary
+
+    Lines are buffered with add() and written by flush() in a worker thread,
+    once per batch, so the event loop never waits on the disk.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.file: Optional[io.TextIOWrapper] = None
+        self.pending: List[str] = []
+
+    async def open(self) -> None:
+        await asyncio.to_thread(self._open)
+
+    def _open(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.file = open(self.path, "w", encoding="utf-8")
+
+    def add(self, event: str, **fields: Any) -> None:
+        self.pending.append(json.dumps({"event": event, **fields}, default=str) + "\n")
+
+    async def flush(self) -> None:
+        if self.pending and self.file is not None:
+            lines, self.pending = self.pending, []
+            await asyncio.to_thread(self._write, lines)
+
+    def _write(self, lines: List[str]) -> None:
+        self.file.writelines(lines)
+        self.file.flush()
+
+    async def close(self) -> None:
+        if self.file is not None:
+            await self.flush()
+            await asyncio.to_thread(self.file.close)
+            self.file = None
+
+
+class ImportService:
+    """Service for bulk POI imports"""
+
+    def __init__(self, storage: Storage, gamification: GamificationService):
+        self.storage = storage
+        self.gamification = gamification
+
+    async def import_pois(
+        self,
+        rows: Iterable[Row],
+        report_path: Path,
+        image_root: Optional[Path] = None,
+        batch_size: Optional[int] = None,
+        image_concurrency: Optional[int] = None
+    ) -> POIImportResult:
+        """
+        Import POIs in batches
+
+        Each batch is validated with POICreate, checked against the existing
+        users, has its images stored through the file storage (downloading
+        URLs, reading paths under image_root) with bounded concurrency, and
+        is written with a single create_many. Authors get one award for all
+        their imported POIs at the end. Rows failing any step are skipped and
+        reported; the others are still imported.
+
+        Args:
+            rows: Rows from parse_rows
+            report_path: Where to write the NDJSON report
+            image_root: Directory for images given as paths; None rejects paths
+            batch_size: Rows per batch (default: IMPORT_BATCH_SIZE)
+            image_concurrency: Parallel image transfers (default: IMPORT_IMAGE_CONCURRENCY)
+
+        Returns:
+            Import summary
+        """
+        batch_size = batch_size or config.IMPORT_BATCH_SIZE
+        image_concurrency = image_concurrency or config.IMPORT_IMAGE_CONCURRENCY
+        started = time.monotonic()
+        report = ImportReport(report_path)
+        await report.open()
+        totals = {"rows": 0, "imported": 0, "failed": 0}
+        created_by: Counter = Counter()
+        known_authors: Dict[str, bool] = {}
+        # One transfer per distinct image, shared by the rows that use it
+        images: Dict[str, asyncio.Task] = {}
+        semaphore = asyncio.Semaphore(image_concurrency)
+        timeout = aiohttp.ClientTimeout(total=config.IMPORT_IMAGE_TIMEOUT_SECONDS)
+        resolver = None if config.IMPORT_ALLOW_PRIVATE_URLS else PublicAddressResolver()
+
+        def fail(number: int, error: str) -> None:
+            totals["failed"] += 1
+            report.add("error", row=number, error=error)
+
+        try:
+            connector = aiohttp.TCPConnector(resolver=resolver)
+            async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+                for chunk in _chunks(rows, batch_size):
+                    totals["rows"] += len(chunk)
+
+                    valid: List[Tuple[int, POICreate]] = []
+                    for number, fields in chunk:
+                        try:
+                            valid.append((number, POICreate(**fields)))
+                        except Exception as e:
+                            fail(number, f"Invalid POI data: {str(e)}")
+
+                    unknown = list({poi.author_id for _, poi in valid} - known_authors.keys())
+                    if unknown:
+                        found = await self.storage.data_db.read_many_by_ids("users", unknown)
+                        found_ids = {user["_id"] for user in found}
+                        known_authors.update({author_id: author_id in found_ids for author_id in unknown})
+
+                    ready: List[Tuple[int, POICreate]] = []
+                    for number, poi in valid:
+                        if not known_authors[poi.author_id]:
+                            fail(number, f"Unknown author {poi.author_id}")
+                            continue
+                        if poi.image_url not in images:
+                            images[poi.image_url] = asyncio.ensure_future(
+                                self._ingest_image(session, semaphore, poi.image_url, image_root)
+                            )
+                        ready.append((number, poi))
+
+                    await asyncio.gather(*(images[poi.image_url] for _, poi in ready), return_exceptions=True)
+
+                    docs: List[Dict[str, Any]] = []
+                    for number, poi in ready:
+                        task = images[poi.image_url]
+                        if task.exception() is not None:
+                            fail(number, str(task.exception()))
+                            continue
+                        poi_dict = poi.model_dump()
+                        poi_dict["image_url"] = task.result()
+                        poi_dict["rating_count"] = 0
+                        poi_dict["average_rating"] = 0.0
+                        docs.append(poi_dict)
+
+                    if docs:
+                        await self.storage.data_db.create_many("pois", docs)
+                        poi_map.invalidate()
+                        totals["imported"] += len(docs)
+                        created_by.update(doc["author_id"] for doc in docs)
+
+                    report.add("progress", **totals, seconds=round(time.monotonic() - started, 3))
+                    await report.flush()
+
+            for author_id, count in created_by.items():
+                await self.gamification.award_pois_created(author_id, count)
+
+            result = POIImportResult(
+                **totals,
+                images_uploaded=sum(1 for task in images.values() if task.exception() is None),
+                authors_awarded=len(created_by),
+                seconds=round(time.monotonic() - started, 3),
+                report_file=str(report_path)
+            )
+            report.add("summary", **result.model_dump())
+            return result
+        except Exception as e:
+            report.add("aborted", **totals, error=str(e))
+            raise
+        finally:
+            for task in images.values():
+                task.cancel()
+            await report.close()
+
+    async def _ingest_image(
+        self,
+        session: aiohttp.ClientSession,
+        semaphore: asyncio.Semaphore,
+        source: str,
+        image_root: Optional[Path]
+    ) -> str:
+        """Download or read an image and upload it through the file storage"""
+        async with semaphore:
+            if urlparse(source).scheme in ("http", "https"):
+                content, content_type = await self._download(session, source)
+                file_name = Path(urlparse(source).path).name or "poi_image.jpg"
+            else:
+                if image_root is None:
+                    raise Exception(f"Image {source} is not an http(s) URL")
+                # Absolute and ".." paths (and symlinks) must not escape image_root
+                path = (image_root / source).resolve()
+                if not path.is_relative_to(image_root.resolve()):
+                    raise Exception(f"Image {source} is outside {image_root}")
+                if not path.is_file():
+                    raise Exception(f"Image {source} not found in {image_root}")
+                if path.stat().st_size > config.IMPORT_MAX_IMAGE_BYTES:
+                    raise Exception(f"Image {source} is larger than {config.IMPORT_MAX_IMAGE_BYTES} bytes")
+                content = await asyncio.to_thread(path.read_bytes)
+                content_type = mimetypes.guess_type(path.name)[0] or "image/jpeg"
+                file_name = path.name
+
+            try:
+                return await self.storage.file_db.upload_file(
+                    io.BytesIO(content), file_name, content_type, folder="pois"
+                )
+            except Exception as e:
+                raise Exception(f"Error storing image {source}: {str(e)}")
+
+    async def _download(self, session: aiohttp.ClientSession, url: str) -> Tuple[bytes, str]:
+        """
+        Download an image, refusing bodies over IMPORT_MAX_IMAGE_BYTES
+
+        Redirects are followed here rather than by aiohttp, so that every
+        URL on the way is checked for non-public addresses.
+        """
+        try:
+            location = url
+            for _ in range(MAX_REDIRECTS + 1):
+                _check_image_url(location)
+                async with session.get(location, allow_redirects=False) as response:
+                    if response.status in (301, 302, 303, 307, 308) and "Location" in response.headers:
+                        location = urljoin(location, response.headers["Location"])
+                        continue
+                    if response.status != 200:
+                        raise Exception(f"HTTP {response.status}")
+                    chunks = []
+                    size = 0
+                    async for chunk in response.content.iter_chunked(64 * 1024):
+                        size += len(chunk)
+                        if size > config.IMPORT_MAX_IMAGE_BYTES:
+                            raise Exception(f"larger than {config.IMPORT_MAX_IMAGE_BYTES} bytes")
+                        chunks.append(chunk)
+                    return b"".join(chunks), response.content_type or "image/jpeg"
+            raise Exception(f"more than {MAX_REDIRECTS} redirects")
+        except Exception as e:
+            raise Exception(f"Error downloading image {url}: {str(e)}")
@@ -1,7 +1,11 @@
 from typing import Optional, List
 from app.models.photo import Photo, PhotoCreate, PhotoDetail
+from app.utils.protocols import DataDB
 from app.utils.storage import Storage
 from app.services.gamification import GamificationService
+from app.utils.serialization import load_many
+from app.utils.singleflight import service_flights
+from app.utils.dataloader import unscoped
 
 
 class PhotoService:
@@ -18,6 +22,7 @@ class PhotoService:
         photo_dict["average_rating"] = 0.0
         
         created = await self.storage.data_db.create("photos", photo_dict)
+        self._forget_poi(photo_data.poi_id)
         
         # Award points for uploading photo
         await self.gamification.award_photo_uploaded(photo_data.author_id)
@@ -30,33 +35,48 @@ class PhotoService:
         return Photo(**photo) if photo else None
     
     async def get_photo_detail(self, photo_id: str) -> Optional[PhotoDetail]:
+        """Get photo with additional details, sharing one fetch between concurrent callers"""
+        # Shared by concurrent requests, so not loaded through this request's DataLoader
+        data_db = unscoped(self.storage.data_db)
+        return await service_flights.do(
+            ("photo_detail", photo_id), lambda: self._load_photo_detail(data_db, photo_id)
+        )
+
+    async def _load_photo_detail(self, data_db: DataDB, photo_id: str) -> Optional[PhotoDetail]:
         """Get photo with additional details"""
-        photo = await self.get_photo_by_id(photo_id)
-        if not photo:
+        # Author and POI names are fetched along with the photo
+        photo_dict = await data_db.read_one_with_lookups("photos", {"_id": photo_id}, [
+            {"from": "users", "local_field": "author_id", "as": "author", "fields": ["name"]},
+            {"from": "pois", "local_field": "poi_id", "as": "poi", "fields": ["name"]}
+        ])
+        if not photo_dict:
             return None
         
-        # Get author name
-        author = await self.storage.data_db.read_one("users", {"_id": photo.author_id})
-        author_name = author.get("name") if author else None
-        
-        # Get POI name
-        poi = await self.storage.data_db.read_one("pois", {"_id": photo.poi_id})
-        poi_name = poi.get("name") if poi else None
+        author = photo_dict.pop("author")
+        poi = photo_dict.pop("poi")
+        photo = Photo(**photo_dict)
         
         return PhotoDetail(
             **photo.model_dump(),
-            author_name=author_name,
-            poi_name=poi_name
+            author_name=author.get("name") if author else None,
+            poi_name=poi.get("name") if poi else None
         )
     
     async def get_photos_by_poi(self, poi_id: str) -> List[Photo]:
+        """Get all photos for a specific POI, sharing one fetch between concurrent callers"""
+        data_db = unscoped(self.storage.data_db)
+        return await service_flights.do(
+            ("photos_by_poi", poi_id), lambda: self._load_photos_by_poi(data_db, poi_id)
+        )
+
+    async def _load_photos_by_poi(self, data_db: DataDB, poi_id: str) -> List[Photo]:
         """Get all photos for a specific POI"""
-        photos = await self.storage.data_db.read_many(
+        photos = await data_db.read_many(
             "photos",
             {"poi_id": poi_id},
             sort_dict={"created_at": -1}
         )
-        return [Photo(**photo) for photo in photos]
+        return load_many(Photo, photos)
     
     async def delete_photo(self, photo_id: str) -> bool:
         """Delete a photo"""
@@ -68,35 +88,44 @@ class PhotoService:
         await self.storage.file_db.delete_file(photo.image_url)
         
         # Delete photo from database
-        return await self.storage.data_db.delete_one("photos", {"_id": photo_id})
+        deleted = await self.storage.data_db.delete_one("photos", {"_id": photo_id})
+        service_flights.forget(("photo_detail", photo_id))
+        self._forget_poi(photo.poi_id)
+        return deleted
     
     async def update_rating_stats(self, photo_id: str) -> None:
         """Update rating count and average rating for a photo"""
-        ratings = await self.storage.data_db.read_many("ratings", {
-            "target_type": "photo",
-            "target_id": photo_id
-        })
+        # Count and average are computed by the database, however many ratings there are
+        stats = await self.storage.data_db.aggregate("ratings", [
+            {"$match": {"target_type": "photo", "target_id": photo_id}},
+            {"$group": {"_id": None, "rating_count": {"$sum": 1}, "average_rating": {"$avg": "$score"}}}
+        ])
         
-        if not ratings:
+        if not stats:
             await self.storage.data_db.update_one(
                 "photos",
                 {"_id": photo_id},
                 {"$set": {"rating_count": 0, "average_rating": 0.0}}
             )
+            service_flights.forget(("photo_detail", photo_id))
             return
         
-        rating_count = len(ratings)
-        total_score = sum(r["score"] for r in ratings)
-        average_rating = total_score / rating_count
+        rating_count = stats[0]["rating_count"]
+        average_rating = stats[0]["average_rating"]
         
+        # Load the photo before updating it, so a copy already read in this request is reused
+        photo = await self.get_photo_by_id(photo_id)
+
         await self.storage.data_db.update_one(
             "photos",
             {"_id": photo_id},
             {"$set": {"rating_count": rating_count, "average_rating": round(average_rating, 1)}}
         )
+        service_flights.forget(("photo_detail", photo_id))
+        if photo:
+            self._forget_poi(photo.poi_id)
         
         # Check for high rating bonus
-        photo = await self.get_photo_by_id(photo_id)
         if photo:
             await self.gamification.check_and_award_high_rating(
                 photo.author_id,
@@ -104,3 +133,8 @@ class PhotoService:
                 "photo"
             )
 
+    @staticmethod
+    def _forget_poi(poi_id: str) -> None:
+        """Make later reads of a POI's photos and photo count start after a write"""
+        service_flights.forget(("photos_by_poi", poi_id))
+        service_flights.forget(("poi_detail", poi_id))
@@ -1,7 +1,12 @@
 from typing import Optional, List
 from app.models.poi import POI, POICreate, POIUpdate, POIDetail
+from app.utils.protocols import DataDB
 from app.utils.storage import Storage
 from app.services.gamification import GamificationService
+from app.utils.poi_map import POIMapSnapshot, poi_map
+from app.utils.serialization import load_many
+from app.utils.singleflight import service_flights
+from app.utils.dataloader import unscoped
 
 
 class POIService:
@@ -18,6 +23,7 @@ class POIService:
         poi_dict["average_rating"] = 0.0
         
         created = await self.storage.data_db.create("pois", poi_dict)
+        poi_map.invalidate()
         
         # Award points for creating POI
         await self.gamification.award_poi_created(poi_data.author_id)
@@ -30,25 +36,30 @@ class POIService:
         return POI(**poi) if poi else None
     
     async def get_poi_detail(self, poi_id: str) -> Optional[POIDetail]:
+        """Get POI with additional details, sharing one fetch between concurrent callers"""
+        # Shared by concurrent requests, so not loaded through this request's DataLoader
+        data_db = unscoped(self.storage.data_db)
+        return await service_flights.do(
+            ("poi_detail", poi_id), lambda: self._load_poi_detail(data_db, poi_id)
+        )
+
+    async def _load_poi_detail(self, data_db: DataDB, poi_id: str) -> Optional[POIDetail]:
         """Get POI with additional details"""
-        poi = await self.get_poi_by_id(poi_id)
-        if not poi:
+        # Author name and photo count are fetched along with the POI
+        poi_dict = await data_db.read_one_with_lookups("pois", {"_id": poi_id}, [
+            {"from": "users", "local_field": "author_id", "as": "author", "fields": ["name"]},
+            {"from": "photos", "foreign_field": "poi_id", "as": "photo_count", "count": True}
+        ])
+        if not poi_dict:
             return None
         
-        # Get author name
-        author = await self.storage.data_db.read_one("users", {"_id": poi.author_id})
-        author_name = author.get("name") if author else None
-        
-        # Count photos
-        photos = await self.storage.data_db.read_many(
-            "photos",
-            {"poi_id": poi_id}
-        )
-        photo_count = len(photos)
+        author = poi_dict.pop("author")
+        photo_count = poi_dict.pop("photo_count")
+        poi = POI(**poi_dict)
         
         return POIDetail(
             **poi.model_dump(),
-            author_name=author_name,
+            author_name=author.get("name") if author else None,
             photo_count=photo_count
         )
     
@@ -70,8 +81,12 @@ class POIService:
             limit=limit,
             sort_dict={"created_at": -1}
         )
-        return [POI(**poi) for poi in pois]
+        return load_many(POI, pois)
     
+    async def get_map(self) -> POIMapSnapshot:
+        """Get the columnar snapshot of every POI for the map"""
+        return await poi_map.get(unscoped(self.storage.data_db))
+
     async def update_poi(self, poi_id: str, poi_update: POIUpdate) -> Optional[POI]:
         """Update a POI"""
         update_dict = {}
@@ -89,6 +104,8 @@ class POIService:
             {"_id": poi_id},
             {"$set": update_dict}
         )
+        service_flights.forget(("poi_detail", poi_id))
+        poi_map.invalidate()
         
         return await self.get_poi_by_id(poi_id)
     
@@ -98,47 +115,56 @@ class POIService:
         if not poi:
             return False
         
-        # Delete associated photos
-        photos = await self.storage.data_db.read_many("photos", {"poi_id": poi_id})
-        for photo in photos:
-            # Delete photo file from S3
+        # Delete associated photo files from S3, reading the photos in batches
+        async for photo in self.storage.data_db.iter_many("photos", {"poi_id": poi_id}):
             await self.storage.file_db.delete_file(photo.get("image_url", ""))
-            # Delete photo from database
-            await self.storage.data_db.delete_one("photos", {"_id": photo["_id"]})
+
+        # Delete photos from database in one batch
+        await self.storage.data_db.delete_many("photos", {"poi_id": poi_id})
         
         # Delete POI image from S3
         await self.storage.file_db.delete_file(poi.image_url)
         
         # Delete POI
-        return await self.storage.data_db.delete_one("pois", {"_id": poi_id})
+        deleted = await self.storage.data_db.delete_one("pois", {"_id": poi_id})
+        service_flights.forget(("poi_detail", poi_id))
+        service_flights.forget(("photos_by_poi", poi_id))
+        poi_map.invalidate()
+        return deleted
     
     async def update_rating_stats(self, poi_id: str) -> None:
         """Update rating count and average rating for a POI"""
-        ratings = await self.storage.data_db.read_many("ratings", {
-            "target_type": "poi",
-            "target_id": poi_id
-        })
+        # Count and average are computed by the database, however many ratings there are
+        stats = await self.storage.data_db.aggregate("ratings", [
+            {"$match": {"target_type": "poi", "target_id": poi_id}},
+            {"$group": {"_id": None, "rating_count": {"$sum": 1}, "average_rating": {"$avg": "$score"}}}
+        ])
         
-        if not ratings:
+        if not stats:
             await self.storage.data_db.update_one(
                 "pois",
                 {"_id": poi_id},
                 {"$set": {"rating_count": 0, "average_rating": 0.0}}
             )
+            service_flights.forget(("poi_detail", poi_id))
+            poi_map.invalidate()
             return
         
-        rating_count = len(ratings)
-        total_score = sum(r["score"] for r in ratings)
-        average_rating = total_score / rating_count
+        rating_count = stats[0]["rating_count"]
+        average_rating = stats[0]["average_rating"]
         
+        # Load the POI before updating it, so a copy already read in this request is reused
+        poi = await self.get_poi_by_id(poi_id)
+
         await self.storage.data_db.update_one(
             "pois",
             {"_id": poi_id},
             {"$set": {"rating_count": rating_count, "average_rating": round(average_rating, 1)}}
         )
+        service_flights.forget(("poi_detail", poi_id))
+        poi_map.invalidate()
         
         # Check for high rating bonus
-        poi = await self.get_poi_by_id(poi_id)
         if poi:
             await self.gamification.check_and_award_high_rating(
                 poi.author_id,
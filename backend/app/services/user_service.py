@@ -1,4 +1,5 @@
-from typing import Optional, List
+import asyncio
+from typing import Dict, Optional, List
 from app.models.user import User, UserCreate, UserProfile
 from app.utils.storage import Storage
 from app.utils.security import get_password_hash, verify_password
@@ -73,28 +74,17 @@ class UserService:
         user = await self.get_user_by_id(user_id)
         if not user:
             return None
-        
-        # Count POIs
-        pois = await self.storage.data_db.read_many(
-            "pois",
-            {"author_id": user_id}
-        )
-        poi_count = len(pois)
-        
-        # Count photos
-        photos = await self.storage.data_db.read_many(
-            "photos",
-            {"author_id": user_id}
-        )
-        photo_count = len(photos)
-        
-        # Count ratings
-        ratings = await self.storage.data_db.read_many(
-            "ratings",
-            {"user_id": user_id}
+
+        # Count POIs, photos and ratings concurrently
+        counts = await asyncio.gather(
+            self.storage.data_db.count("pois", {"author_id": user.id}),
+            self.storage.data_db.count("photos", {"author_id": user.id}),
+            self.storage.data_db.count("ratings", {"user_id": user.id}),
         )
-        rating_count = len(ratings)
-        
+        return self._build_profile(user, *counts)
+
+    def _build_profile(self, user: User, poi_count: int, photo_count: int, rating_count: int) -> UserProfile:
+        """Build a profile from a loaded user and its contribution counts"""
         return UserProfile(
             id=user.id,
             name=user.name,
@@ -107,19 +97,52 @@ class UserService:
             rating_count=rating_count
         )
     
+    async def _count_by_user(self, collection: str, field: str, user_ids: List[str]) -> Dict[str, int]:
+        """
+        Count the documents of each user in a collection with a single grouped aggregation
+
+        Args:
+            collection: Name of the collection
+            field: Field holding the user ID
+            user_ids: Users to count for
+
+        Returns:
+            Count per user ID (users without documents are left out)
+        """
+        results = await self.storage.data_db.aggregate(collection, [
+            {"$match": {field: {"$in": user_ids}}},
+            {"$group": {"_id": f"${field}", "count": {"$sum": 1}}},
+        ])
+        return {result["_id"]: result["count"] for result in results}
+
     async def get_ranking(self, limit: int = 100) -> List[UserProfile]:
         """Get global ranking of users by total score"""
-        users = await self.storage.data_db.read_many(
+        user_docs = await self.storage.data_db.read_many(
             "users",
             sort_dict={"total_score": -1},
             limit=limit
         )
+        if not user_docs:
+            return []
         
-        profiles = []
-        for user in users:
-            profile = await self.get_user_profile(user["_id"])
-            if profile:
-                profiles.append(profile)
-        
-        return profiles
+        users = []
+        for user in user_docs:
+            user.pop("hashed_password", None)
+            users.append(User(**user))
 
+        # One grouped count per collection for all ranked users, instead of three counts per user
+        user_ids = [user.id for user in users]
+        poi_counts, photo_counts, rating_counts = await asyncio.gather(
+            self._count_by_user("pois", "author_id", user_ids),
+            self._count_by_user("photos", "author_id", user_ids),
+            self._count_by_user("ratings", "user_id", user_ids),
+        )
+        return [
+            self._build_profile(
+                user,
+                poi_counts.get(user.id, 0),
+                photo_counts.get(user.id, 0),
+                rating_counts.get(user.id, 0),
+            )
+            for user in users
+        ]
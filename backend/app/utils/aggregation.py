@@ -0,0 +1,372 @@
+"""
+Streaming evaluator for Mongo-style aggregation pipelines
+
+Documents are fed in batches (e.g. one database page at a time) and flow
+through the stages without materializing the source collection. Only
+$group and $sort hold state, bounded by the number of groups or, for a
+$sort followed by $limit, by the limit itself.
+"""
+import heapq
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.utils.query import MISSING, compare_documents, get_field, match_document, sort_key
+
+ACCUMULATORS = {"$sum", "$avg", "$count", "$max", "$min"}
+
+
+def resolve_expression(doc: Dict[str, Any], expression: Any) -> Any:
+    """Evaluate a field reference ("$field"), a document of expressions or a literal"""
+    if isinstance(expression, str) and expression.startswith("$"):
+        value = get_field(doc, expression[1:])
+        return None if value is MISSING else value
+    if isinstance(expression, dict):
+        return {key: resolve_expression(doc, value) for key, value in expression.items()}
+    return expression
+
+
+def _hashable(value: Any) -> Any:
+    """Turn a group key into something usable as a dict key"""
+    if isinstance(value, dict):
+        return tuple((k, _hashable(v)) for k, v in value.items())
+    if isinstance(value, list):
+        return tuple(_hashable(v) for v in value)
+    return value
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+class Stage:
+    """A pipeline stage consuming and producing batches of documents"""
+
+    # Set when the stage will not accept more input (e.g. $limit reached)
+    exhausted = False
+
+    def feed(self, docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Process a batch, returning the documents ready for the next stage"""
+        return docs
+
+    def finish(self) -> List[Dict[str, Any]]:
+        """Flush documents held back until the input is complete"""
+        return []
+
+
+class MatchStage(Stage):
+    def __init__(self, spec: Dict[str, Any]):
+        self.spec = spec
+
+    def feed(self, docs):
+        return [doc for doc in docs if match_document(doc, self.spec)]
+
+
+class ProjectStage(Stage):
+    def __init__(self, spec: Dict[str, Any]):
+        self.spec = spec
+        fields = {k: v for k, v in spec.items() if k != "_id"}
+        self.exclusion = bool(fields) and all(v in (0, False) for v in fields.values())
+        self.include_id = spec.get("_id", 1) not in (0, False)
+
+    def _project(self, doc: Dict[str, Any]) -> Dict[str, Any]:
+        if self.exclusion:
+            result = {k: v for k, v in doc.items() if self.spec.get(k, 1) not in (0, False)}
+            if not self.include_id:
+                result.pop("_id", None)
+            return result
+
+        result = {"_id": doc["_id"]} if self.include_id and "_id" in doc else {}
+        for field, value in self.spec.items():
+            if field == "_id":
+                if value not in (0, 1, True, False):
+                    result["_id"] = resolve_expression(doc, value)
+                continue
+            if value in (1, True):
+                found = get_field(doc, field)
+                if found is not MISSING:
+                    result[field] = found
+            elif value not in (0, False):
+                result[field] = resolve_expression(doc, value)
+        return result
+
+    def feed(self, docs):
+        return [self._project(doc) for doc in docs]
+
+
+class SkipStage(Stage):
+    def __init__(self, count: int):
+        self.remaining = count
+
+    def feed(self, docs):
+        if self.remaining <= 0:
+            return docs
+        skipped = min(self.remaining, len(docs))
+        self.remaining -= skipped
+        return docs[skipped:]
+
+
+class LimitStage(Stage):
+    def __init__(self, count: int):
+        self.remaining = count
+        self.exhausted = count <= 0
+
+    def feed(self, docs):
+        docs = docs[:max(self.remaining, 0)]
+        self.remaining -= len(docs)
+        self.exhausted = self.remaining <= 0
+        return docs
+
+
+class CountStage(Stage):
+    def __init__(self, field: str):
+        self.field = field
+        self.count = 0
+
+    def feed(self, docs):
+        self.count += len(docs)
+        return []
+
+    def finish(self):
+        return [{self.field: self.count}] if self.count else []
+
+
+class SortStage(Stage):
+    """
+    $sort, fused with a directly following $limit into a bounded top-k
+    """
+
+    def __init__(self, spec: Dict[str, int], limit: Optional[int] = None):
+        self.spec = spec
+        self.limit = limit
+        self.key = sort_key(spec)
+        self.docs: List[Dict[str, Any]] = []
+
+    def feed(self, docs):
+        if self.limit is None:
+            self.docs.extend(docs)
+        else:
+            self.docs = heapq.nsmallest(self.limit, self.docs + docs, key=self.key)
+        return []
+
+    def finish(self):
+        docs, self.docs = self.docs, []
+        docs.sort(key=self.key)
+        return docs
+
+
+class GroupStage(Stage):
+    """
+    $group with $sum, $avg, $count, $max and $min accumulators
+
+    Numeric accumulators are kept in NumPy arrays indexed by group number and
+    updated with one vectorized reduction per batch. Memory is proportional to
+    the number of groups, not to the number of input documents.
+    """
+
+    def __init__(self, spec: Dict[str, Any]):
+        self.key_expression = spec.get("_id")
+        self.accumulators: List[Tuple[str, str, Any]] = []
+        for field, accumulator in spec.items():
+            if field == "_id":
+                continue
+            if not isinstance(accumulator, dict) or len(accumulator) != 1:
+                raise ValueError(f"Invalid accumulator for field '{field}' in $group")
+            op, expression = next(iter(accumulator.items()))
+            if op not in ACCUMULATORS:
+                raise ValueError(f"Unsupported $group accumulator: {op}")
+            self.accumulators.append((field, op, expression))
+
+        self.group_ids: Dict[Any, int] = {}
+        self.group_keys: List[Any] = []
+        self.capacity = capacity = 16
+        self.sums = {f: np.zeros(capacity) for f, op, _ in self.accumulators if op in ("$sum", "$avg")}
+        self.counts = {f: np.zeros(capacity, dtype=np.int64) for f, op, _ in self.accumulators if op in ("$avg", "$count")}
+        self.extrema = {f: np.full(capacity, np.nan) for f, op, _ in self.accumulators if op in ("$max", "$min")}
+        # Non-numeric extrema (strings, dates) are tracked per group in Python
+        self.other_extrema: Dict[str, Dict[int, Any]] = {f: {} for f in self.extrema}
+        self.integral = {f: True for f in self.sums}
+
+    def _ensure_capacity(self, size: int) -> None:
+        """Grow the accumulator arrays to hold at least size groups"""
+        if size <= self.capacity:
+            return
+        self.capacity = max(size, self.capacity * 2)
+        for arrays, fill in ((self.sums, 0), (self.counts, 0), (self.extrema, np.nan)):
+            for field, array in arrays.items():
+                grown = np.full(self.capacity, fill, dtype=array.dtype)
+                grown[:array.shape[0]] = array
+                arrays[field] = grown
+
+    def feed(self, docs):
+        if not docs:
+            return []
+
+        codes = np.empty(len(docs), dtype=np.int64)
+        for i, doc in enumerate(docs):
+            key = resolve_expression(doc, self.key_expression)
+            hashable = _hashable(key)
+            code = self.group_ids.get(hashable)
+            if code is None:
+                code = len(self.group_keys)
+                self.group_ids[hashable] = code
+                self.group_keys.append(key)
+            codes[i] = code
+        self._ensure_capacity(len(self.group_keys))
+
+        for field, op, expression in self.accumulators:
+            if op == "$count":
+                self.counts[field] += np.bincount(codes, minlength=self.capacity)
+                continue
+
+            raw = [resolve_expression(doc, expression) for doc in docs]
+            numeric = np.fromiter((_is_number(v) for v in raw), dtype=bool, count=len(raw))
+            values = np.fromiter((v if _is_number(v) else 0.0 for v in raw), dtype=np.float64, count=len(raw))
+
+            if op in ("$sum", "$avg"):
+                self.sums[field] += np.bincount(codes, weights=values, minlength=self.capacity)
+                if op == "$avg":
+                    self.counts[field] += np.bincount(codes[numeric], minlength=self.capacity)
+                if any(isinstance(v, float) for v in raw):
+                    self.integral[field] = False
+            else:
+                reduce = np.fmax if op == "$max" else np.fmin
+                target = self.extrema[field]
+                batch = np.full(self.capacity, np.nan)
+                reduce.at(batch, codes[numeric], values[numeric])
+                self.extrema[field] = reduce(target, batch)
+                # Compare non-numeric values one by one
+                others = self.other_extrema[field]
+                for code, value in zip(codes[~numeric], (v for v, n in zip(raw, numeric) if not n)):
+                    if value is None:
+                        continue
+                    current = others.get(code)
+                    if current is None or (
+                        compare_documents({"v": value}, {"v": current}, {"v": 1 if op == "$min" else -1}) < 0
+                    ):
+                        others[code] = value
+        return []
+
+    def finish(self):
+        results = []
+        for code, key in enumerate(self.group_keys):
+            result = {"_id": key}
+            for field, op, _ in self.accumulators:
+                if op == "$sum":
+                    total = self.sums[field][code]
+                    result[field] = int(total) if self.integral[field] else float(total)
+                elif op == "$avg":
+                    count = self.counts[field][code]
+                    result[field] = float(self.sums[field][code] / count) if count else None
+                elif op == "$count":
+                    result[field] = int(self.counts[field][code])
+                else:
+                    numeric = self.extrema[field][code]
+                    other = self.other_extrema[field].get(code)
+                    # Mongo orders numbers before strings and dates
+                    if other is not None:
+                        result[field] = other if op == "$max" or np.isnan(numeric) else _as_number(numeric)
+                    else:
+                        result[field] = None if np.isnan(numeric) else _as_number(numeric)
+            results.append(result)
+        return results
+
+
+def _as_number(value: float) -> Any:
+    """Return integral floats as int, like the values they were computed from"""
+    return int(value) if float(value).is_integer() else float(value)
+
+
+def build_stages(pipeline: List[Dict[str, Any]]) -> List[Stage]:
+    """Compile a pipeline into stage processors"""
+    stages: List[Stage] = []
+    index = 0
+    while index < len(pipeline):
+        stage = pipeline[index]
+        if len(stage) != 1:
+            raise ValueError(f"Invalid pipeline stage: {stage}")
+        name, spec = next(iter(stage.items()))
+        if name == "$match":
+            stages.append(MatchStage(spec))
+        elif name == "$project":
+            stages.append(ProjectStage(spec))
+        elif name == "$group":
+            stages.append(GroupStage(spec))
+        elif name == "$sort":
+            following = pipeline[index + 1] if index + 1 < len(pipeline) else {}
+            if "$limit" in following:
+                stages.append(SortStage(spec, limit=int(following["$limit"])))
+                index += 1
+            else:
+                stages.append(SortStage(spec))
+        elif name == "$limit":
+            stages.append(LimitStage(int(spec)))
+        elif name == "$skip":
+            stages.append(SkipStage(int(spec)))
+        elif name == "$count":
+            stages.append(CountStage(spec))
+        else:
+            raise ValueError(f"Unsupported aggregation stage: {name}")
+        index += 1
+    return stages
+
+
+class AggregationPipeline:
+    """Evaluates a Mongo-style pipeline over a stream of document batches"""
+
+    def __init__(self, pipeline: List[Dict[str, Any]]):
+        self.stages = build_stages(pipeline)
+
+    def _push(self, docs: List[Dict[str, Any]], start: int = 0) -> List[Dict[str, Any]]:
+        """Run a batch through the stages from the given position"""
+        for stage in self.stages[start:]:
+            if not docs:
+                break
+            docs = stage.feed(docs)
+        return docs
+
+    @property
+    def exhausted(self) -> bool:
+        """True when no more input can change the result"""
+        return any(stage.exhausted for stage in self.stages)
+
+    def feed(self, docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Feed a batch of source documents, returning the output ready so far"""
+        if self.exhausted:
+            return []
+        return self._push(docs)
+
+    def finish(self) -> List[Dict[str, Any]]:
+        """Flush blocking stages once the source is exhausted"""
+        output: List[Dict[str, Any]] = []
+        for position, stage in enumerate(self.stages):
+            flushed = stage.finish()
+            if flushed:
+                output.extend(self._push(flushed, position + 1))
+        return output
+
+    async def run(self, batches: AsyncIterator[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """Consume an async stream of batches and return the pipeline result"""
+        return [doc async for doc in self.stream(batches)]
+
+    async def stream(self, batches: AsyncIterator[List[Dict[str, Any]]]) -> AsyncIterator[Dict[str, Any]]:
+        """Consume an async stream of batches, yielding results as soon as they are ready"""
+        async for batch in batches:
+            for doc in self.feed(batch):
+                yield doc
+            if self.exhausted:
+                break
+        for doc in self.finish():
+            yield doc
+
+
+async def batched(docs: AsyncIterator[Dict[str, Any]], size: int) -> AsyncIterator[List[Dict[str, Any]]]:
+    """Group an async stream of documents into lists of up to size documents"""
+    batch: List[Dict[str, Any]] = []
+    async for doc in docs:
+        batch.append(doc)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
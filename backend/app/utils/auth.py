@@ -1,8 +1,10 @@
+import secrets
 from fastapi import Security, HTTPException, status
 from fastapi.security import APIKeyHeader
 from app.config import config
 
 api_key_header = APIKeyHeader(name="X-API-Key", auto_error=False)
+admin_key_header = APIKeyHeader(name="X-Admin-Key", auto_error=False)
 
 
 async def verify_api_key(api_key: str = Security(api_key_header)) -> bool:
@@ -32,3 +34,37 @@ async def verify_api_key(api_key: str = Security(api_key_header)) -> bool:
 
     return True
 
+
+
+async def verify_admin_key(admin_key: str = Security(admin_key_header)) -> bool:
+    """
+    Verify the admin API key from request header, for administrative routes
+
+    Args:
+        admin_key: Admin API key from X-Admin-Key header
+
+    Returns:
+        True if the admin API key is valid
+
+    Raises:
+        HTTPException: If admin routes are disabled (no ADMIN_API_KEY) or the key is missing or invalid
+    """
+    if not config.ADMIN_API_KEY:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin API is disabled"
+        )
+
+    if not admin_key:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Admin API key is missing"
+        )
+
+    if not secrets.compare_digest(admin_key, config.ADMIN_API_KEY):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid admin API key"
+        )
+
+    return True
@@ -0,0 +1,271 @@
+import asyncio
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
+
+from app.utils.protocols import DataDB
+
+
+class DataLoader:
+    """
+    Batches and memoizes lookups by ID for the lifetime of one request
+
+    Every load requested during the same event-loop tick is collected and
+    resolved with a single read_many_by_ids call per collection. Results,
+    including misses, are memoized until the loader is discarded or the
+    entry is invalidated by a write.
+    """
+
+    def __init__(self, data_db: DataDB):
+        self.data_db = data_db
+        self._cache: Dict[Tuple[str, str], asyncio.Future] = {}
+        self._pending: Dict[str, Dict[str, asyncio.Future]] = {}
+        self._dispatch_scheduled = False
+        self._dispatch_tasks: Set[asyncio.Task] = set()
+
+    async def load(self, collection: str, doc_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Load a document by ID
+
+        Args:
+            collection: Name of the collection
+            doc_id: Document ID
+
+        Returns:
+            A copy of the document if found, None otherwise
+        """
+        key = (collection, str(doc_id))
+        future = self._cache.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._cache[key] = future
+            self._pending.setdefault(collection, {})[key[1]] = future
+            if not self._dispatch_scheduled:
+                self._dispatch_scheduled = True
+                # Let every coroutine runnable in this tick enqueue its keys first
+                loop.call_soon(self._start_dispatch)
+
+        doc = await asyncio.shield(future)
+        # Callers are free to mutate what they get back
+        return dict(doc) if doc is not None else None
+
+    async def load_many(self, collection: str, doc_ids: List[str]) -> List[Dict[str, Any]]:
+        """Load several documents by ID, skipping missing ones"""
+        docs = await asyncio.gather(*(self.load(collection, doc_id) for doc_id in doc_ids))
+        return [doc for doc in docs if doc is not None]
+
+    def prime(self, collection: str, doc: Dict[str, Any]) -> None:
+        """Memoize a document obtained by another query, unless already known"""
+        if not doc or "_id" not in doc:
+            return
+        key = (collection, str(doc["_id"]))
+        if key not in self._cache:
+            future = asyncio.get_running_loop().create_future()
+            future.set_result(dict(doc))
+            self._cache[key] = future
+
+    def clear(self, collection: str, doc_id: Optional[str] = None) -> None:
+        """Invalidate one memoized document, or a whole collection if no ID is given"""
+        # In-flight futures still resolve for their waiters; later loads fetch again
+        if doc_id is not None:
+            self._cache.pop((collection, str(doc_id)), None)
+            return
+        for key in [k for k in self._cache if k[0] == collection]:
+            del self._cache[key]
+
+    def _start_dispatch(self) -> None:
+        """Run the batched dispatch as a task, keeping a reference until it finishes"""
+        task = asyncio.ensure_future(self._dispatch())
+        self._dispatch_tasks.add(task)
+        task.add_done_callback(self._dispatch_tasks.discard)
+
+    async def _dispatch(self) -> None:
+        """Resolve every pending key with one batched read per collection"""
+        pending, self._pending = self._pending, {}
+        self._dispatch_scheduled = False
+
+        for collection, futures in pending.items():
+            ids = list(futures)
+            try:
+                if len(ids) == 1:
+                    doc = await self.data_db.read_one(collection, {"_id": ids[0]})
+                    docs = [doc] if doc else []
+                else:
+                    docs = await self.data_db.read_many_by_ids(collection, ids)
+            except Exception as e:
+                for doc_id, future in futures.items():
+                    # Do not memoize failures
+                    self._cache.pop((collection, doc_id), None)
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            by_id = {str(doc["_id"]): doc for doc in docs}
+            for doc_id, future in futures.items():
+                if not future.done():
+                    future.set_result(by_id.get(doc_id))
+
+
+class RequestScopedDataDB(DataDB):
+    """
+    DataDB wrapper that routes reads by ID through a request-scoped DataLoader
+
+    Writes are forwarded to the wrapped database and invalidate the affected
+    loader entries. Connection lifecycle stays with the wrapped database.
+    """
+
+    def __init__(self, data_db: DataDB):
+        self.data_db = data_db
+        self.loader = DataLoader(data_db)
+
+    @staticmethod
+    def _id_only(filter_dict: Optional[Dict[str, Any]]) -> Optional[str]:
+        """Return the ID when the filter is a plain lookup by ID"""
+        if filter_dict and len(filter_dict) == 1 and "_id" in filter_dict:
+            doc_id = filter_dict["_id"]
+            if not isinstance(doc_id, dict):
+                return str(doc_id)
+        return None
+
+    async def connect(self) -> None:
+        """Connection is owned by the wrapped database"""
+        pass
+
+    async def disconnect(self) -> None:
+        """Connection is owned by the wrapped database"""
+        pass
+
+    def metrics(self) -> Dict[str, Any]:
+        """Metrics of the wrapped database"""
+        return self.data_db.metrics()
+
+    async def create(self, collection: str, document: Dict[str, Any]) -> Dict[str, Any]:
+        """Create a document and forget any memoized miss for its ID"""
+        created = await self.data_db.create(collection, document)
+        self.loader.clear(collection, created.get("_id"))
+        return created
+
+    async def create_many(
+        self, collection: str, documents: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """Create documents and forget any memoized misses for their IDs"""
+        created = await self.data_db.create_many(collection, documents)
+        for document in created:
+            self.loader.clear(collection, document.get("_id"))
+        return created
+
+    async def read_one(
+        self, collection: str, filter_dict: Dict[str, Any]
+    ) -> Optional[Dict[str, Any]]:
+        """Read a document, through the loader when filtering by ID only"""
+        doc_id = self._id_only(filter_dict)
+        if doc_id is not None:
+            return await self.loader.load(collection, doc_id)
+
+        doc = await self.data_db.read_one(collection, filter_dict)
+        if doc:
+            self.loader.prime(collection, doc)
+        return doc
+
+    async def read_many(
+        self,
+        collection: str,
+        filter_dict: Optional[Dict[str, Any]] = None,
+        skip: int = 0,
+        limit: int = 100,
+        sort_dict: Optional[Dict[str, int]] = None,
+    ) -> List[Dict[str, Any]]:
+        """Read documents from the wrapped database and memoize them by ID"""
+        docs = await self.data_db.read_many(collection, filter_dict, skip, limit, sort_dict)
+        for doc in docs:
+            self.loader.prime(collection, doc)
+        return docs
+
+    def iter_many(
+        self,
+        collection: str,
+        filter_dict: Optional[Dict[str, Any]] = None,
+        batch_size: int = 1000,
+        start_after: Optional[str] = None,
+        segment: int = 0,
+        total_segments: int = 1,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Full scans are not memoized, so memory stays bounded by the batch"""
+        return self.data_db.iter_many(collection, filter_dict, batch_size, start_after, segment, total_segments)
+
+    async def read_many_by_ids(
+        self, collection: str, ids: List[str]
+    ) -> List[Dict[str, Any]]:
+        """Read documents by ID through the loader"""
+        return await self.loader.load_many(collection, list(dict.fromkeys(str(i) for i in ids)))
+
+    async def update_one(
+        self, collection: str, filter_dict: Dict[str, Any], update_dict: Dict[str, Any]
+    ) -> bool:
+        """Update a document and invalidate its memoized copy"""
+        doc_id = self._id_only(filter_dict)
+        updated = await self.data_db.update_one(collection, filter_dict, update_dict)
+        self.loader.clear(collection, doc_id)
+        return updated
+
+    async def delete_one(self, collection: str, filter_dict: Dict[str, Any]) -> bool:
+        """Delete a document and invalidate its memoized copy"""
+        doc_id = self._id_only(filter_dict)
+        deleted = await self.data_db.delete_one(collection, filter_dict)
+        self.loader.clear(collection, doc_id)
+        return deleted
+
+    async def delete_many(self, collection: str, filter_dict: Dict[str, Any]) -> int:
+        """Delete documents and invalidate the memoized collection"""
+        deleted = await self.data_db.delete_many(collection, filter_dict)
+        self.loader.clear(collection)
+        return deleted
+
+    async def bulk_write(
+        self, collection: str, operations: List[Dict[str, Any]], ordered: bool = True
+    ) -> Dict[str, int]:
+        """Apply write operations and invalidate the memoized collection"""
+        try:
+            return await self.data_db.bulk_write(collection, operations, ordered)
+        finally:
+            self.loader.clear(collection)
+
+    async def read_one_with_lookups(
+        self, collection: str, filter_dict: Dict[str, Any], lookups: List[Dict[str, Any]]
+    ) -> Optional[Dict[str, Any]]:
+        """Read a document with its related data from the wrapped database, which may join server-side"""
+        doc = await self.data_db.read_one_with_lookups(collection, filter_dict, lookups)
+        if doc:
+            self.loader.prime(collection, {k: v for k, v in doc.items() if k not in {lookup["as"] for lookup in lookups}})
+        return doc
+
+    async def count(
+        self,
+        collection: str,
+        filter_dict: Optional[Dict[str, Any]] = None,
+        estimated: bool = False,
+    ) -> int:
+        """Counts are not memoized"""
+        return await self.data_db.count(collection, filter_dict, estimated)
+
+    async def aggregate(
+        self, collection: str, pipeline: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """Aggregations are not memoized"""
+        return await self.data_db.aggregate(collection, pipeline)
+
+    def aggregate_iter(
+        self, collection: str, pipeline: List[Dict[str, Any]], batch_size: int = 1000
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Aggregations are not memoized"""
+        return self.data_db.aggregate_iter(collection, pipeline, batch_size)
+
+
+def unscoped(data_db: DataDB) -> DataDB:
+    """
+    The database behind a request-scoped wrapper
+
+    Work shared between requests (single-flight loads, snapshots) must not
+    go through one request's DataLoader: the other requests would share its
+    memoized entries, stale ones included.
+    """
+    return data_db.data_db if isinstance(data_db, RequestScopedDataDB) else data_db
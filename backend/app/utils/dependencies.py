@@ -1,14 +1,58 @@
+from fastapi import Request
+
 from app.config import config
+from app.utils.dataloader import RequestScopedDataDB
+from app.utils.document_cache import CachedDataDB
 from app.utils.dynamodb_storage import DynamoDBDataDB
 from app.utils.imgbb_storage import ImgBBFileDB
+from app.utils.memory_storage import MemoryDataDB
 from app.utils.mongodb_storage import MongoDBDataDB
+from app.utils.protocols import DataDB
+from app.utils.read_routing import set_read_routing
 from app.utils.s3_storage import S3FileDB
+from app.utils.shared_cache import LocalSharedCache, RedisSharedCache, SharedCache
+from app.utils.sqlite_storage import SQLiteDataDB
 from app.utils.storage import Storage
 
 # Global storage instance
 _storage: Storage | None = None
 
 
+def _create_shared_cache() -> SharedCache | None:
+    """Create the shared cache tier selected by configuration, if any"""
+    shared_cache_type = config.SHARED_CACHE_TYPE.lower()
+    options = dict(
+        prefix=config.SHARED_CACHE_PREFIX,
+        channel=config.SHARED_CACHE_CHANNEL,
+        ttl_seconds=config.SHARED_CACHE_TTL_SECONDS,
+        redelete_ms=config.SHARED_CACHE_REDELETE_MS,
+    )
+    if shared_cache_type == "redis":
+        return RedisSharedCache(config.SHARED_CACHE_URL, **options)
+    if shared_cache_type == "local":
+        return LocalSharedCache("default", **options)
+    return None
+
+
+def create_data_db(database_type: str) -> DataDB:
+    """
+    Create an (unconnected) database implementation
+
+    Args:
+        database_type: "mongodb", "dynamodb", "sqlite" or "memory"; anything
+            else selects MongoDB
+    """
+    database_type = database_type.lower()
+    if database_type == "dynamodb":
+        return DynamoDBDataDB()
+    if database_type == "sqlite":
+        return SQLiteDataDB()
+    if database_type == "memory":
+        return MemoryDataDB()
+    # Default to MongoDB
+    return MongoDBDataDB()
+
+
 def get_storage() -> Storage:
     """Get or create the global Storage instance"""
     global _storage
@@ -22,17 +66,41 @@ def get_storage() -> Storage:
             file_db = S3FileDB()
 
         # Select database implementation based on environment variable
-        database_type = config.DATABASE_TYPE.lower()
-        if database_type == "dynamodb":
-            data_db = DynamoDBDataDB()
-        else:
-            # Default to MongoDB
-            data_db = MongoDBDataDB()
+        data_db = create_data_db(config.DATABASE_TYPE)
+
+        if config.CACHE_ENABLED:
+            data_db = CachedDataDB(data_db, shared=_create_shared_cache())
 
         _storage = Storage(file_db, data_db)
     return _storage
 
 
+def get_request_storage(request: Request) -> Storage:
+    """
+    Get a Storage scoped to the current request
+
+    Reads by ID go through a DataLoader attached to the request state, so
+    repeated lookups of the same document within one request are batched
+    and memoized. The loader is discarded when the request ends.
+    """
+    storage = getattr(request.state, "storage", None)
+    if storage is None:
+        shared = get_storage()
+        storage = Storage(shared.file_db, RequestScopedDataDB(shared.data_db))
+        request.state.storage = storage
+    return storage
+
+
+async def secondary_reads() -> None:
+    """
+    Route the reads of the current request to replicas
+
+    For read-only routes that tolerate slightly stale data. Declared async so
+    it runs in the request's context, where the endpoint will see it.
+    """
+    set_read_routing(config.MONGODB_SECONDARY_READ_PREFERENCE, config.MONGODB_SECONDARY_READ_CONCERN)
+
+
 async def startup_storage():
     """Initialize storage on application startup"""
     storage = get_storage()
@@ -0,0 +1,442 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from app.config import config
+from app.utils.protocols import DataDB
+from app.utils.query import match_document
+from app.utils.shared_cache import SharedCache
+
+CacheKey = Tuple[str, str]
+
+
+def _clone(value: Any) -> Any:
+    """Copy documents and arrays so callers never share cached state"""
+    if isinstance(value, dict):
+        return {k: _clone(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_clone(v) for v in value]
+    return value
+
+
+class DocumentCache:
+    """
+    Size-bounded LRU cache of documents by (collection, _id), with a TTL
+
+    Entries expire after ttl_seconds, which bounds how stale a document can
+    be when another process writes it. Writes made through this process
+    invalidate their entries immediately.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[CacheKey, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: CacheKey) -> Optional[Dict[str, Any]]:
+        """Return the cached document, or None if absent or expired"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, doc = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self.expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return doc
+
+    def put(self, key: CacheKey, doc: Dict[str, Any]) -> None:
+        """Cache a document, evicting the least recently used entries if full"""
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, doc)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def discard(self, key: CacheKey) -> None:
+        self._entries.pop(key, None)
+
+    def items(self, collection: str) -> List[Tuple[CacheKey, Dict[str, Any]]]:
+        """Cached entries of a collection, including expired ones"""
+        return [(key, doc) for key, (_, doc) in self._entries.items() if key[0] == collection]
+
+
+class CachedDataDB(DataDB):
+    """
+    DataDB decorator caching documents read by ID across requests
+
+    Lookups by ID (read_one with an _id-only filter, read_many_by_ids) are
+    served from a DocumentCache. Concurrent misses on the same document share
+    a single database read. Documents returned by other reads are cached as
+    well. Every write invalidates the entries it may have changed, and a read
+    that overlapped a write to its collection is not cached, so this process
+    never serves a document older than its own last write. Reads with lookups
+    are served from the cache only when their document is cached; otherwise
+    the wrapped database joins them, so MongoDB still takes one round trip.
+
+    With a SharedCache, misses are looked up in the shared tier before the
+    database, and writes evict their documents from the shared tier and from
+    the in-process cache of every other worker.
+    """
+
+    def __init__(self, data_db: DataDB, shared: Optional[SharedCache] = None):
+        self.data_db = data_db
+        self.shared = shared
+        self.cache = DocumentCache(config.CACHE_MAX_ENTRIES, config.CACHE_TTL_SECONDS)
+        self._inflight: Dict[CacheKey, asyncio.Future] = {}
+        # Bumped on every invalidation; fills that saw another epoch are stale
+        self._epochs: Dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _id_only(filter_dict: Optional[Dict[str, Any]]) -> Optional[str]:
+        """Return the ID when the filter is a plain lookup by ID"""
+        if filter_dict and len(filter_dict) == 1 and "_id" in filter_dict:
+            doc_id = filter_dict["_id"]
+            if not isinstance(doc_id, dict):
+                return str(doc_id)
+        return None
+
+    async def connect(self) -> None:
+        """Connect the wrapped database and the shared tier"""
+        await self.data_db.connect()
+        if self.shared is not None:
+            await self.shared.connect(self._on_remote_invalidation)
+
+    async def disconnect(self) -> None:
+        """Disconnect the wrapped database and the shared tier, and drop the cache"""
+        if self.shared is not None:
+            await self.shared.disconnect()
+        await self.data_db.disconnect()
+        self.cache = DocumentCache(config.CACHE_MAX_ENTRIES, config.CACHE_TTL_SECONDS)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Cache hit ratio and occupancy, and the metrics of the wrapped database"""
+        lookups = self.hits + self.misses + self.coalesced
+        metrics = {
+            "cache": {
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "entries": len(self.cache),
+                "max_entries": self.cache.max_entries,
+                "evictions": self.cache.evictions,
+                "expirations": self.cache.expirations,
+                "invalidations": self.invalidations,
+            },
+            "database": self.data_db.metrics(),
+        }
+        if self.shared is not None:
+            metrics["shared_cache"] = self.shared.metrics()
+        return metrics
+
+    # Cache maintenance
+
+    def _store(self, collection: str, doc: Optional[Dict[str, Any]], epoch: int) -> None:
+        """Cache a document read while the collection was at the given epoch"""
+        if doc and "_id" in doc and self._epochs.get(collection, 0) == epoch:
+            self.cache.put((collection, str(doc["_id"])), _clone(doc))
+
+    def _invalidate(self, collection: str, filter_dict: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Drop the cached documents a write may have changed
+
+        Args:
+            collection: Name of the collection
+            filter_dict: Filter of the write; None drops the whole collection
+        """
+        self._epochs[collection] = self._epochs.get(collection, 0) + 1
+        self.invalidations += 1
+
+        doc_id = self._id_only(filter_dict)
+        if doc_id is not None:
+            keys = [(collection, doc_id)]
+        else:
+            keys = []
+            for key, doc in self.cache.items(collection):
+                try:
+                    matched = filter_dict is None or match_document(doc, filter_dict)
+                except (ValueError, TypeError):
+                    matched = True
+                if matched:
+                    keys.append(key)
+            # Fills in flight cannot be checked against the filter
+            keys.extend(key for key in self._inflight if key[0] == collection)
+
+        self._drop(keys)
+
+    def _drop(self, keys: List[CacheKey]) -> None:
+        for key in keys:
+            self.cache.discard(key)
+            # Later readers must not join a read that may predate the write
+            self._inflight.pop(key, None)
+
+    def _on_remote_invalidation(self, collection: Optional[str], doc_ids: Optional[List[str]]) -> None:
+        """Evict the documents written by another worker"""
+        if collection is None:
+            # Invalidations may have been missed: nothing cached can be trusted
+            for name in list(self._epochs):
+                self._epochs[name] += 1
+            self.cache = DocumentCache(self.cache.max_entries, self.cache.ttl_seconds)
+            self._inflight.clear()
+            return
+        self._epochs[collection] = self._epochs.get(collection, 0) + 1
+        self._drop([(collection, str(doc_id)) for doc_id in doc_ids or []])
+
+    async def _affected_ids(
+        self, collection: str, filter_dict: Dict[str, Any], many: bool = False
+    ) -> List[str]:
+        """IDs of the documents a write is about to change, for the shared tier"""
+        if self.shared is None:
+            return []
+        doc_id = self._id_only(filter_dict)
+        if doc_id is not None:
+            return [doc_id]
+        if not many:
+            doc = await self.data_db.read_one(collection, filter_dict)
+            return [str(doc["_id"])] if doc else []
+        # Streamed, keeping only the IDs rather than every matching document
+        return [str(doc["_id"]) async for doc in self.data_db.iter_many(collection, filter_dict)]
+
+    async def _broadcast(self, collection: str, doc_ids: List[str]) -> None:
+        """Evict written documents from the shared tier and every other worker"""
+        if self.shared is not None and doc_ids:
+            await self.shared.invalidate(collection, list(dict.fromkeys(doc_ids)))
+
+    async def _fill(self, collection: str, doc_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Read missing documents from the database, resolving their in-flight futures"""
+        loop = asyncio.get_running_loop()
+        futures = {}
+        for doc_id in doc_ids:
+            future = loop.create_future()
+            self._inflight[(collection, doc_id)] = future
+            futures[doc_id] = future
+
+        epoch = self._epochs.get(collection, 0)
+        try:
+            shared_docs: Dict[str, Dict[str, Any]] = {}
+            if self.shared is not None:
+                shared_docs = await self.shared.get_many(collection, doc_ids)
+            remaining = [doc_id for doc_id in doc_ids if doc_id not in shared_docs]
+
+            if not remaining:
+                docs = []
+            elif len(remaining) == 1:
+                doc = await self.data_db.read_one(collection, {"_id": remaining[0]})
+                docs = [doc] if doc else []
+            else:
+                docs = await self.data_db.read_many_by_ids(collection, remaining)
+
+            if self.shared is not None and docs and self._epochs.get(collection, 0) == epoch:
+                await self.shared.set_many(collection, docs)
+            docs = list(shared_docs.values()) + docs
+        except Exception as e:
+            for doc_id, future in futures.items():
+                if self._inflight.get((collection, doc_id)) is future:
+                    del self._inflight[(collection, doc_id)]
+                future.set_exception(e)
+                # Waiters are optional; the caller of the fill gets the error anyway
+                future.exception()
+            raise
+
+        by_id = {str(doc["_id"]): doc for doc in docs}
+        for doc_id, future in futures.items():
+            doc = by_id.get(doc_id)
+            self._store(collection, doc, epoch)
+            if self._inflight.get((collection, doc_id)) is future:
+                del self._inflight[(collection, doc_id)]
+            future.set_result(doc)
+        return by_id
+
+    async def _lookup(self, collection: str, doc_ids: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Resolve documents by ID from the cache, in-flight reads or one database read"""
+        found: Dict[str, Optional[Dict[str, Any]]] = {}
+        waiting: Dict[str, asyncio.Future] = {}
+        missing: List[str] = []
+        for doc_id in doc_ids:
+            key = (collection, doc_id)
+            doc = self.cache.get(key)
+            if doc is not None:
+                self.hits += 1
+                found[doc_id] = doc
+            elif key in self._inflight:
+                self.coalesced += 1
+                waiting[doc_id] = self._inflight[key]
+            else:
+                self.misses += 1
+                missing.append(doc_id)
+
+        if missing:
+            read = await self._fill(collection, missing)
+            for doc_id in missing:
+                found[doc_id] = read.get(doc_id)
+        for doc_id, future in waiting.items():
+            found[doc_id] = await asyncio.shield(future)
+        return found
+
+    # DataDB
+
+    async def create(self, collection: str, document: Dict[str, Any]) -> Dict[str, Any]:
+        """Create a document"""
+        created = await self.data_db.create(collection, document)
+        self._invalidate(collection, {"_id": created.get("_id")})
+        return created
+
+    async def create_many(
+        self, collection: str, documents: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """Create documents"""
+        created = await self.data_db.create_many(collection, documents)
+        for document in created:
+            self._invalidate(collection, {"_id": document.get("_id")})
+        return created
+
+    async def read_one(
+        self, collection: str, filter_dict: Dict[str, Any]
+    ) -> Optional[Dict[str, Any]]:
+        """Read a document, from the cache when filtering by ID only"""
+        doc_id = self._id_only(filter_dict)
+        if doc_id is None:
+            epoch = self._epochs.get(collection, 0)
+            doc = await self.data_db.read_one(collection, filter_dict)
+            self._store(collection, doc, epoch)
+            return doc
+
+        doc = (await self._lookup(collection, [doc_id])).get(doc_id)
+        return _clone(doc) if doc is not None else None
+
+    async def read_many(
+        self,
+        collection: str,
+        filter_dict: Optional[Dict[str, Any]] = None,
+        skip: int = 0,
+        limit: int = 100,
+        sort_dict: Optional[Dict[str, int]] = None,
+    ) -> List[Dict[str, Any]]:
+        """Read documents from the wrapped database and cache them by ID"""
+        epoch = self._epochs.get(collection, 0)
+        docs = await self.data_db.read_many(collection, filter_dict, skip, limit, sort_dict)
+        for doc in docs:
+            self._store(collection, doc, epoch)
+        return docs
+
+    def iter_many(
+        self,
+        collection: str,
+        filter_dict: Optional[Dict[str, Any]] = None,
+        batch_size: int = 1000,
+        start_after: Optional[str] = None,
+        segment: int = 0,
+        total_segments: int = 1,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Full scans are not cached, so they do not evict the working set"""
+        return self.data_db.iter_many(collection, filter_dict, batch_size, start_after, segment, total_segments)
+
+    async def read_many_by_ids(
+        self, collection: str, ids: List[str]
+    ) -> List[Dict[str, Any]]:
+        """Read documents by ID, fetching only the uncached ones in one batch"""
+        doc_ids = list(dict.fromkeys(str(doc_id) for doc_id in ids))
+        found = await self._lookup(collection, doc_ids)
+        return [_clone(found[doc_id]) for doc_id in doc_ids if found.get(doc_id) is not None]
+
+    async def read_one_with_lookups(
+        self, collection: str, filter_dict: Dict[str, Any], lookups: List[Dict[str, Any]]
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Read a document with its related data, joining in the database on a miss
+
+        When the document is cached (or being read), the lookups run through
+        this cache like the default implementation. Otherwise the wrapped
+        database reads it with its lookups, server-side when it can, and the
+        document without the lookup results is cached.
+        """
+        doc_id = self._id_only(filter_dict)
+        key = (collection, doc_id)
+        if doc_id is not None and (self.cache.get(key) is not None or key in self._inflight):
+            return await super().read_one_with_lookups(collection, filter_dict, lookups)
+
+        if doc_id is not None:
+            self.misses += 1
+        epoch = self._epochs.get(collection, 0)
+        doc = await self.data_db.read_one_with_lookups(collection, filter_dict, lookups)
+        if doc:
+            names = {lookup["as"] for lookup in lookups}
+            self._store(collection, {k: v for k, v in doc.items() if k not in names}, epoch)
+        return doc
+
+    async def count(
+        self,
+        collection: str,
+        filter_dict: Optional[Dict[str, Any]] = None,
+        estimated: bool = False,
+    ) -> int:
+        """Counts are not cached"""
+        return await self.data_db.count(collection, filter_dict, estimated)
+
+    async def update_one(
+        self, collection: str, filter_dict: Dict[str, Any], update_dict: Dict[str, Any]
+    ) -> bool:
+        """Update a document and invalidate its cached copies"""
+        doc_ids = await self._affected_ids(collection, filter_dict)
+        try:
+            return await self.data_db.update_one(collection, filter_dict, update_dict)
+        finally:
+            self._invalidate(collection, filter_dict)
+            await self._broadcast(collection, doc_ids)
+
+    async def delete_one(self, collection: str, filter_dict: Dict[str, Any]) -> bool:
+        """Delete a document and invalidate its cached copies"""
+        doc_ids = await self._affected_ids(collection, filter_dict)
+        try:
+            return await self.data_db.delete_one(collection, filter_dict)
+        finally:
+            self._invalidate(collection, filter_dict)
+            await self._broadcast(collection, doc_ids)
+
+    async def delete_many(self, collection: str, filter_dict: Dict[str, Any]) -> int:
+        """Delete documents and invalidate the cached ones matching the filter"""
+        doc_ids = await self._affected_ids(collection, filter_dict, many=True)
+        try:
+            return await self.data_db.delete_many(collection, filter_dict)
+        finally:
+            self._invalidate(collection, filter_dict)
+            await self._broadcast(collection, doc_ids)
+
+    async def bulk_write(
+        self, collection: str, operations: List[Dict[str, Any]], ordered: bool = True
+    ) -> Dict[str, int]:
+        """Apply write operations and invalidate the cached collection"""
+        doc_ids: List[str] = []
+        for operation in operations:
+            for name, spec in operation.items():
+                if name != "insert_one":
+                    doc_ids.extend(await self._affected_ids(collection, spec.get("filter", {})))
+        try:
+            return await self.data_db.bulk_write(collection, operations, ordered)
+        finally:
+            self._invalidate(collection)
+            await self._broadcast(collection, doc_ids)
+
+    async def aggregate(
+        self, collection: str, pipeline: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """Aggregations are not cached"""
+        return await self.data_db.aggregate(collection, pipeline)
+
+    def aggregate_iter(
+        self, collection: str, pipeline: List[Dict[str, Any]], batch_size: int = 1000
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Aggregations are not cached"""
+        return self.data_db.aggregate_iter(collection, pipeline, batch_size)
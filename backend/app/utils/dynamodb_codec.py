@@ -0,0 +1,394 @@
+"""
+Schema-compiled codecs between documents and DynamoDB items
+
+Each collection gets a codec built from its Pydantic model: a converter for
+all the known fields is generated from their types, and only items that do
+not fit it (unknown fields, NULLs, legacy formats) go through the generic,
+type-dispatching converter. DynamoDBDataDB decodes every read with these
+codecs; writes still use its _dict_to_dynamodb until the codec encoder is
+measurably faster.
+"""
+import types
+import typing
+from datetime import datetime
+from decimal import Decimal
+from operator import itemgetter
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type
+
+from pydantic import BaseModel
+
+from app.models.photo import Photo
+from app.models.poi import POI
+from app.models.rating import Rating
+from app.models.user import User
+
+# Model describing the documents stored in each collection
+COLLECTION_MODELS: Dict[str, Type[BaseModel]] = {
+    "users": User,
+    "pois": POI,
+    "photos": Photo,
+    "ratings": Rating,
+}
+
+
+def _decode_number(text: str) -> Any:
+    """Decode a DynamoDB number, as int when it has no fractional part"""
+    if "." in text or "e" in text or "E" in text:
+        return float(text)
+    return int(text)
+
+
+def decode_value(value: Dict[str, Any]) -> Any:
+    """Convert any DynamoDB attribute value to a Python value"""
+    tag, raw = next(iter(value.items()))
+    if tag == 'S':
+        return raw
+    if tag == 'N':
+        return _decode_number(raw)
+    if tag == 'BOOL':
+        return raw
+    if tag == 'NULL':
+        return None
+    if tag == 'L':
+        return [decode_value(v) for v in raw]
+    if tag == 'M':
+        return {k: decode_value(v) for k, v in raw.items()}
+    if tag == 'SS':
+        return list(raw)
+    if tag == 'NS':
+        return [_decode_number(n) for n in raw]
+    if tag == 'B':
+        return raw
+    if tag == 'BS':
+        return list(raw)
+    raise ValueError(f"Unsupported DynamoDB attribute type: {tag}")
+
+
+def encode_value(value: Any) -> Dict[str, Any]:
+    """Convert any Python value to a DynamoDB attribute value"""
+    # bool must be checked before int, since bool is a subclass of int
+    if isinstance(value, bool):
+        return {'BOOL': value}
+    if isinstance(value, str):
+        return {'S': value}
+    if isinstance(value, (int, float, Decimal)):
+        return {'N': str(value)}
+    if value is None:
+        return {'NULL': True}
+    if isinstance(value, datetime):
+        return {'S': value.isoformat()}
+    if isinstance(value, (list, tuple, set)):
+        # Lists keep their order and element types; string/number sets would not
+        return {'L': [encode_value(v) for v in value]}
+    if isinstance(value, dict):
+        return {'M': {str(k): encode_value(v) for k, v in value.items()}}
+    if isinstance(value, bytes):
+        return {'B': value}
+    return {'S': str(value)}
+
+
+def _decode_datetime(value: Dict[str, Any]) -> Any:
+    """Decode an ISO timestamp, keeping non-string values as they are"""
+    text = value.get('S')
+    if text is None:
+        return decode_value(value)
+    try:
+        return datetime.fromisoformat(text)
+    except ValueError:
+        return text
+
+
+def _decode_string_list(value: Dict[str, Any]) -> Any:
+    """Decode a list of strings stored as L or SS"""
+    items = value.get('L')
+    if items is None:
+        return decode_value(value)
+    try:
+        return [v['S'] for v in items]
+    except KeyError:
+        return [decode_value(v) for v in items]
+
+
+def _field_kind(annotation: Any) -> str:
+    """Classify a model field annotation into a codec kind"""
+    origin = typing.get_origin(annotation)
+    if origin in (typing.Union, types.UnionType):
+        args = [a for a in typing.get_args(annotation) if a is not type(None)]
+        return _field_kind(args[0]) if len(args) == 1 else "any"
+    if origin is typing.Literal:
+        literals = typing.get_args(annotation)
+        return "str" if all(isinstance(v, str) for v in literals) else "any"
+    if origin in (list, List):
+        args = typing.get_args(annotation)
+        return "str_list" if args and _field_kind(args[0]) == "str" else "any"
+    if annotation is bool:
+        return "bool"
+    if annotation is int:
+        return "int"
+    if annotation is float:
+        return "float"
+    if annotation is datetime:
+        return "datetime"
+    if isinstance(annotation, type) and issubclass(annotation, str):
+        return "str"
+    # EmailStr and similar annotated string types
+    if getattr(annotation, "__name__", "") == "EmailStr":
+        return "str"
+    return "any"
+
+
+# Attributes stored alongside model fields, decoded with the fast path too
+COLLECTION_EXTRA_FIELDS: Dict[str, Dict[str, str]] = {
+    "users": {"hashed_password": "str"},
+    "ratings": {"target_key": "str", "updated_at": "datetime"},
+}
+
+# Fast-path expressions per kind, converting the DynamoDB attribute {v}. They
+# carry no type checks: anything unexpected (NULL, legacy SS lists, non-ISO
+# timestamps...) raises KeyError/TypeError/ValueError, which sends the item
+# to the careful path.
+_FAST_DECODERS: Dict[str, str] = {
+    "str": "{v}['S']",
+    "int": "int({v}['N'])",
+    "float": "float({v}['N'])",
+    "bool": "{v}['BOOL']",
+    "datetime": "fromisoformat({v}['S'])",
+    # Written as SS by DynamoDBDataDB._dict_to_dynamodb, as L by update expressions
+    "str_list": "(list(map(get_string, {v}['L'])) if 'L' in {v} else list({v}['SS']))",
+    "any": "decode_value({v})",
+}
+
+# Fast-path expressions per kind, converting the document value {v}. The
+# unbound methods raise TypeError for values of another type (and the bool
+# table KeyError), which sends the document to the careful path.
+_FAST_ENCODERS: Dict[str, str] = {
+    "str": "{{'S': str_value({v})}}",
+    "int": "{{'N': int_text({v})}}",
+    "float": "{{'N': float_text({v})}}",
+    "bool": "{{'BOOL': BOOLS[{v}]}}",
+    "datetime": "{{'S': isoformat({v})}}",
+    "str_list": "{{'L': [{{'S': str_value(s)}} for s in list_items({v})]}}",
+    "any": "encode_value({v})",
+}
+
+# Names the generated converters can use
+_FAST_NAMESPACE: Dict[str, Any] = {
+    "fromisoformat": datetime.fromisoformat,
+    "isoformat": datetime.isoformat,
+    "get_string": itemgetter('S'),
+    "str_value": str.__str__,
+    "int_text": int.__repr__,
+    "float_text": float.__repr__,
+    "list_items": list.__iter__,
+    "BOOLS": {True: True, False: False},
+    "decode_value": decode_value,
+    "encode_value": encode_value,
+}
+
+
+def _compile_converters(arg: str, fields: Dict[str, str], expressions: Dict[str, str]) -> Tuple[Callable, Callable]:
+    """
+    Generate the fast-path converters for one codec direction
+
+    Both convert every field in a single dict display built from the kind
+    expressions, so there is no per-field call or type dispatch. The batch
+    version hands values whose attribute count differs from the fields to
+    the given careful converter.
+
+    Args:
+        arg: Name of the converted value in the generated code (item or doc)
+        fields: Attribute name -> kind
+        expressions: Kind -> expression template
+
+    Returns:
+        (convert(value), convert_many(values, careful)) functions
+    """
+    display = "{" + ", ".join(
+        f"{field!r}: " + expressions[kind].format(v=f"{arg}[{field!r}]")
+        for field, kind in fields.items()
+    ) + "}"
+    source = (
+        f"def convert({arg}):\n"
+        f"    return {display}\n"
+        f"def convert_many({arg}s, careful):\n"
+        f"    return [{display} if len({arg}) == {len(fields)} else careful({arg}) for {arg} in {arg}s]\n"
+    )
+    namespace = dict(_FAST_NAMESPACE)
+    exec(source, namespace)
+    return namespace["convert"], namespace["convert_many"]
+
+
+def _decode_int(value: Dict[str, Any]) -> int:
+    return int(value['N'])
+
+
+def _decode_float(value: Dict[str, Any]) -> float:
+    return float(value['N'])
+
+
+def _careful(fast: Callable[[Dict[str, Any]], Any], tag: str) -> Callable[[Dict[str, Any]], Any]:
+    """Decoder using fast when the value has the expected tag, the generic decoder otherwise"""
+    def decode(value: Dict[str, Any]) -> Any:
+        if tag in value:
+            try:
+                return fast(value)
+            except ValueError:
+                pass
+        return decode_value(value)
+    return decode
+
+
+# Careful decoders per kind, falling back to the generic decoder
+_SAFE_DECODERS: Dict[str, Callable[[Dict[str, Any]], Any]] = {
+    "str": _careful(itemgetter('S'), 'S'),
+    "int": _careful(_decode_int, 'N'),
+    "float": _careful(_decode_float, 'N'),
+    "bool": _careful(itemgetter('BOOL'), 'BOOL'),
+    "datetime": _decode_datetime,
+    "str_list": _decode_string_list,
+    "any": decode_value,
+}
+
+
+def _encode_str(value: Any) -> Dict[str, Any]:
+    return {'S': value} if value.__class__ is str else encode_value(value)
+
+
+def _encode_int(value: Any) -> Dict[str, Any]:
+    return {'N': str(value)} if value.__class__ in (int, float) else encode_value(value)
+
+
+def _encode_float(value: Any) -> Dict[str, Any]:
+    return {'N': repr(value)} if value.__class__ is float else encode_value(value)
+
+
+def _encode_bool(value: Any) -> Dict[str, Any]:
+    return {'BOOL': value} if value.__class__ is bool else encode_value(value)
+
+
+def _encode_datetime(value: Any) -> Dict[str, Any]:
+    return {'S': value.isoformat()} if value.__class__ is datetime else encode_value(value)
+
+
+def _encode_strings(value: Any) -> Dict[str, Any]:
+    if value.__class__ is not list:
+        return encode_value(value)
+    return {'L': [{'S': v} if v.__class__ is str else encode_value(v) for v in value]}
+
+
+# Encoders per kind; values of an unexpected type go through the generic encoder
+_ENCODERS: Dict[str, Callable[[Any], Dict[str, Any]]] = {
+    "str": _encode_str,
+    "int": _encode_int,
+    "float": _encode_float,
+    "bool": _encode_bool,
+    "datetime": _encode_datetime,
+    "str_list": _encode_strings,
+    "any": encode_value,
+}
+
+
+class ItemCodec:
+    """
+    Converts documents of one collection to and from DynamoDB items
+
+    Items holding exactly the known attributes with their expected types are
+    converted by the generated functions in one dict display; anything else
+    takes a careful per-attribute path that also handles NULLs, legacy
+    formats and extra attributes.
+    """
+
+    def __init__(self, fields: Dict[str, str]):
+        self.fields = fields
+        self._fast_decode, self._fast_decode_many = _compile_converters("item", fields, _FAST_DECODERS)
+        self._fast_encode, self._fast_encode_many = _compile_converters("doc", fields, _FAST_ENCODERS)
+        self._safe_decoders = [(name, _SAFE_DECODERS[kind]) for name, kind in fields.items()]
+        self._encoders = [(name, _ENCODERS[kind]) for name, kind in fields.items()]
+
+    @classmethod
+    def from_model(
+        cls,
+        model: Optional[Type[BaseModel]],
+        extra_fields: Optional[Dict[str, str]] = None,
+    ) -> "ItemCodec":
+        """Build a codec from a Pydantic model, using field aliases as attribute names"""
+        fields: Dict[str, str] = {}
+        if model is not None:
+            for name, field in model.model_fields.items():
+                fields[field.alias or name] = _field_kind(field.annotation)
+        fields.update(extra_fields or {})
+        # Primary keys are always strings
+        fields["_id"] = "str"
+        return cls(fields)
+
+    def decode(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        """Convert a DynamoDB item to a document"""
+        if len(item) == len(self.fields):
+            try:
+                return self._fast_decode(item)
+            except (KeyError, TypeError, ValueError):
+                pass
+        return self._careful_decode(item)
+
+    def encode(self, doc: Dict[str, Any]) -> Dict[str, Any]:
+        """Convert a document to a DynamoDB item"""
+        if len(doc) == len(self.fields):
+            try:
+                return self._fast_encode(doc)
+            except (KeyError, TypeError):
+                pass
+        return self._careful_encode(doc)
+
+    def decode_many(self, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Decode a page of items, one item at a time if any of them needs the careful path"""
+        try:
+            return self._fast_decode_many(items, self._careful_decode)
+        except (KeyError, TypeError, ValueError):
+            decode = self.decode
+            return [decode(item) for item in items]
+
+    def encode_many(self, docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Encode a batch of documents, one document at a time if any of them needs the careful path"""
+        try:
+            return self._fast_encode_many(docs, self._careful_encode)
+        except (KeyError, TypeError):
+            encode = self.encode
+            return [encode(doc) for doc in docs]
+
+    def _careful_decode(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        """Decode one attribute at a time, unknown attributes generically"""
+        doc = {}
+        for name, decode in self._safe_decoders:
+            value = item.get(name)
+            if value is not None:
+                doc[name] = decode(value)
+        if len(doc) != len(item):
+            for key, value in item.items():
+                if key not in doc:
+                    doc[key] = decode_value(value)
+        return doc
+
+    def _careful_encode(self, doc: Dict[str, Any]) -> Dict[str, Any]:
+        """Encode one field at a time, unknown fields generically"""
+        item = {}
+        for name, encode in self._encoders:
+            if name in doc:
+                item[name] = encode(doc[name])
+        if len(item) != len(doc):
+            for key, value in doc.items():
+                if key not in item:
+                    item[key] = encode_value(value)
+        return item
+
+
+_CODECS: Dict[str, ItemCodec] = {}
+
+
+def get_codec(collection: str) -> ItemCodec:
+    """Get the compiled codec for a collection (generic for unknown collections)"""
+    codec = _CODECS.get(collection)
+    if codec is None:
+        codec = _CODECS[collection] = ItemCodec.from_model(
+            COLLECTION_MODELS.get(collection), COLLECTION_EXTRA_FIELDS.get(collection)
+        )
+    return codec
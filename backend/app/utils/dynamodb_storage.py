@@ -1,12 +1,86 @@
+import asyncio
+import time
 import uuid
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
 
 import boto3
 from botocore.exceptions import ClientError
 
 from app.config import config
+from app.utils.aggregation import AggregationPipeline
+from app.utils.dynamodb_codec import encode_value, get_codec
 from app.utils.protocols import DataDB
+from app.utils.query import in_segment, match_document, sort_documents
+
+# Declarative table schema, one entry per collection. Tables and their global
+# secondary indexes are provisioned from this at startup, never on the data path.
+# Composite keys are synthesized attributes ("a#b") that let a single GSI hash key
+# serve multi-field equality filters such as (target_type, target_id).
+TABLE_SCHEMAS: Dict[str, Dict[str, Any]] = {
+    "users": {
+        "hash_key": "_id",
+        "indexes": {
+            "email-index": {"hash_key": "email"},
+        },
+    },
+    "pois": {
+        "hash_key": "_id",
+        "indexes": {
+            "author_id-created_at-index": {"hash_key": "author_id", "range_key": "created_at"},
+        },
+    },
+    "photos": {
+        "hash_key": "_id",
+        "indexes": {
+            "poi_id-created_at-index": {"hash_key": "poi_id", "range_key": "created_at"},
+            "author_id-created_at-index": {"hash_key": "author_id", "range_key": "created_at"},
+        },
+    },
+    "ratings": {
+        "hash_key": "_id",
+        "composite_keys": {
+            "target_key": ["target_type", "target_id"],
+        },
+        "indexes": {
+            "user_id-created_at-index": {"hash_key": "user_id", "range_key": "created_at"},
+            "target_key-created_at-index": {"hash_key": "target_key", "range_key": "created_at"},
+        },
+    },
+}
+
+# Separator used to build composite key values
+COMPOSITE_KEY_SEPARATOR = "#"
+
+# BatchGetItem accepts at most 100 keys per request
+BATCH_GET_SIZE = 100
+
+# BatchWriteItem accepts at most 25 put/delete requests
+BATCH_WRITE_SIZE = 25
+
+# Retries for unprocessed keys/items returned by batch operations
+BATCH_MAX_RETRIES = 8
+
+# Tables already provisioned by this process
+_PROVISIONED_TABLES: Set[str] = set()
+
+# Status of each global secondary index ("CREATING", "ACTIVE"...), by table.
+# Only ACTIVE indexes serve queries: one still being built fails or returns
+# partial results.
+_INDEX_STATUS: Dict[str, Dict[str, str]] = {}
+
+# Composite key attributes present on every item of a table, by table. Items
+# written before a composite key was declared lack it until backfilled, so
+# indexes on it only serve queries once it is listed here.
+_BACKFILLED_KEYS: Dict[str, Set[str]] = {}
+
+# Table tag recording the backfilled composite keys (space-separated)
+BACKFILL_TAG = "urbanspot:composite-keys"
+
+# Estimated item counts by table, as (monotonic time fetched, ItemCount).
+# DescribeTable is a rate-limited control-plane call and ItemCount is only
+# refreshed every six hours, so it is fetched at most once per TTL.
+_ESTIMATED_COUNTS: Dict[str, Tuple[float, int]] = {}
 
 
 class DynamoDBDataDB(DataDB):
@@ -16,6 +90,7 @@ class DynamoDBDataDB(DataDB):
         self.client: Any = None
         self.region = config.AWS_REGION
         self.table_prefix = config.DYNAMODB_TABLE_PREFIX
+        self._index_watcher: Optional[asyncio.Task] = None
 
     async def connect(self) -> None:
         """Establish connection to DynamoDB"""
@@ -29,7 +104,16 @@ class DynamoDBDataDB(DataDB):
             )
 
             # Test connection by listing tables
-            self.client.list_tables()
+            await asyncio.to_thread(self.client.list_tables)
+
+            # Provision tables and indexes once, so the data path never hits the control plane
+            if config.DYNAMODB_AUTO_CREATE_TABLES:
+                await asyncio.to_thread(self._provision_tables)
+
+            # Learn which indexes can serve queries, and keep watching the others
+            await asyncio.to_thread(self._refresh_indexes)
+            if self._pending_indexes() and self._index_watcher is None:
+                self._index_watcher = asyncio.ensure_future(self._watch_indexes())
         except ClientError as e:
             error_code = e.response.get('Error', {}).get('Code', 'Unknown')
             if error_code == 'ResourceNotFoundException':
@@ -49,6 +133,9 @@ class DynamoDBDataDB(DataDB):
 
     async def disconnect(self) -> None:
         """Close connection to DynamoDB"""
+        if self._index_watcher is not None:
+            self._index_watcher.cancel()
+            self._index_watcher = None
         # DynamoDB client doesn't require explicit closing, but we can set it to None
         self.client = None
 
@@ -56,89 +143,309 @@ class DynamoDBDataDB(DataDB):
         """Get DynamoDB table name from collection name"""
         return f"{self.table_prefix}-{collection}"
 
-    def _ensure_table_exists(self, table_name: str) -> None:
-        """Ensure table exists, create if it doesn't"""
+    def _provision_tables(self) -> None:
+        """
+        Create every table and secondary index declared in TABLE_SCHEMAS
+
+        Runs once per process at connect time. Existing tables are left untouched
+        except for missing global secondary indexes, which are added in place.
+        Provisioned table names are cached so later connects skip the control plane.
+        """
         if self.client is None:
             raise Exception("Database not connected")
-        try:
-            # Check if table exists
-            self.client.describe_table(TableName=table_name)
-        except ClientError as e:
-            if e.response['Error']['Code'] == 'ResourceNotFoundException':
-                # Table doesn't exist, create it
-                self._create_table(table_name)
+
+        pending = [
+            collection for collection in TABLE_SCHEMAS
+            if self._get_table_name(collection) not in _PROVISIONED_TABLES
+        ]
+        if not pending:
+            return
+
+        existing = set()
+        paginator = self.client.get_paginator('list_tables')
+        for page in paginator.paginate():
+            existing.update(page.get('TableNames', []))
+
+        created = []
+        for collection in pending:
+            table_name = self._get_table_name(collection)
+            schema = TABLE_SCHEMAS[collection]
+            if table_name in existing:
+                self._add_missing_indexes(table_name, schema)
             else:
-                raise
+                self._create_table(table_name, schema)
+                created.append(table_name)
+
+        # Wait for all new tables at once instead of blocking per table
+        waiter = self.client.get_waiter('table_exists')
+        for table_name in created:
+            waiter.wait(TableName=table_name)
+
+        _PROVISIONED_TABLES.update(self._get_table_name(c) for c in pending)
+
+    def _attribute_definitions(self, schema: Dict[str, Any]) -> List[Dict[str, str]]:
+        """Build AttributeDefinitions for the table key and all index keys"""
+        attributes = {schema["hash_key"]: 'S'}
+        for index in schema.get("indexes", {}).values():
+            attributes[index["hash_key"]] = index.get("hash_type", 'S')
+            if index.get("range_key"):
+                attributes[index["range_key"]] = index.get("range_type", 'S')
+        return [
+            {'AttributeName': name, 'AttributeType': attr_type}
+            for name, attr_type in attributes.items()
+        ]
+
+    def _index_definition(self, index_name: str, index: Dict[str, Any]) -> Dict[str, Any]:
+        """Build a GlobalSecondaryIndex definition from its declarative spec"""
+        key_schema = [{'AttributeName': index["hash_key"], 'KeyType': 'HASH'}]
+        if index.get("range_key"):
+            key_schema.append({'AttributeName': index["range_key"], 'KeyType': 'RANGE'})
+        return {
+            'IndexName': index_name,
+            'KeySchema': key_schema,
+            'Projection': {'ProjectionType': 'ALL'},
+        }
 
-    def _create_table(self, table_name: str) -> None:
-        """Create a DynamoDB table"""
+    def _create_table(self, table_name: str, schema: Dict[str, Any]) -> None:
+        """Create a DynamoDB table with its secondary indexes"""
         if self.client is None:
             raise Exception("Database not connected")
+        params: Dict[str, Any] = {
+            'TableName': table_name,
+            'KeySchema': [
+                {
+                    'AttributeName': schema["hash_key"],
+                    'KeyType': 'HASH'  # Partition key
+                }
+            ],
+            'AttributeDefinitions': self._attribute_definitions(schema),
+            'BillingMode': 'PAY_PER_REQUEST'  # On-demand pricing (Free Tier compatible)
+        }
+        indexes = schema.get("indexes", {})
+        if indexes:
+            params['GlobalSecondaryIndexes'] = [
+                self._index_definition(name, index) for name, index in indexes.items()
+            ]
+        composite_keys = schema.get("composite_keys", {})
+        if composite_keys:
+            # Every item of a new table gets its composite keys, none to backfill
+            params['Tags'] = [{'Key': BACKFILL_TAG, 'Value': " ".join(composite_keys)}]
         try:
-            self.client.create_table(
-                TableName=table_name,
-                KeySchema=[
-                    {
-                        'AttributeName': '_id',
-                        'KeyType': 'HASH'  # Partition key
-                    }
-                ],
-                AttributeDefinitions=[
-                    {
-                        'AttributeName': '_id',
-                        'AttributeType': 'S'  # String
-                    }
-                ],
-                BillingMode='PAY_PER_REQUEST'  # On-demand pricing (Free Tier compatible)
-            )
-            # Wait for table to be created
-            waiter = self.client.get_waiter('table_exists')
-            waiter.wait(TableName=table_name)
+            self.client.create_table(**params)
         except ClientError as e:
-            # If table already exists, ignore the error
+            # If table already exists (e.g. created by another worker), ignore the error
             if e.response['Error']['Code'] != 'ResourceInUseException':
                 raise Exception(f"Error creating DynamoDB table {table_name}: {str(e)}")
 
-    def _dynamodb_to_dict(self, item: Dict[str, Any]) -> Dict[str, Any]:
-        """Convert DynamoDB item format to Python dict"""
-        result = {}
-        for key, value in item.items():
-            # DynamoDB uses type descriptors like {'S': 'value'} for strings
-            if 'S' in value:
-                result[key] = value['S']
-            elif 'N' in value:
-                # Try to convert to int first, then float
-                num_str = value['N']
-                try:
-                    result[key] = int(num_str)
-                except ValueError:
-                    result[key] = float(num_str)
-            elif 'BOOL' in value:
-                result[key] = value['BOOL']
-            elif 'NULL' in value:
-                result[key] = None
-            elif 'L' in value:
-                result[key] = [self._dynamodb_to_dict({'item': v})['item'] if isinstance(v, dict) else v for v in value['L']]
-            elif 'M' in value:
-                result[key] = self._dynamodb_to_dict(value['M'])
-            elif 'SS' in value:
-                result[key] = list(value['SS'])
-            elif 'NS' in value:
-                result[key] = [int(n) if '.' not in n else float(n) for n in value['NS']]
-        return result
+    def _add_missing_indexes(self, table_name: str, schema: Dict[str, Any]) -> None:
+        """Add declared global secondary indexes that an existing table lacks"""
+        if self.client is None:
+            raise Exception("Database not connected")
+        indexes = schema.get("indexes", {})
+        if not indexes:
+            return
+
+        description = self.client.describe_table(TableName=table_name)['Table']
+        present = {
+            index['IndexName'] for index in description.get('GlobalSecondaryIndexes', [])
+        }
+        # DynamoDB accepts a single index creation per UpdateTable call
+        for index_name, index in indexes.items():
+            if index_name in present:
+                continue
+            try:
+                self.client.update_table(
+                    TableName=table_name,
+                    AttributeDefinitions=self._attribute_definitions(schema),
+                    GlobalSecondaryIndexUpdates=[
+                        {'Create': self._index_definition(index_name, index)}
+                    ],
+                )
+            except ClientError as e:
+                # Too many index builds at once: the next startup adds this one,
+                # and the remaining indexes may still be accepted
+                if e.response['Error']['Code'] not in ('LimitExceededException', 'ResourceInUseException'):
+                    raise Exception(
+                        f"Error adding index {index_name} to DynamoDB table {table_name}: {str(e)}"
+                    )
+                print(f"Index {index_name} of DynamoDB table {table_name} not added yet: {str(e)}")
+
+    def _refresh_indexes(self) -> None:
+        """Record the status of every declared index and the backfilled composite keys"""
+        if self.client is None:
+            raise Exception("Database not connected")
+        for collection in TABLE_SCHEMAS:
+            table_name = self._get_table_name(collection)
+            try:
+                description = self.client.describe_table(TableName=table_name)['Table']
+            except ClientError as e:
+                if e.response['Error']['Code'] != 'ResourceNotFoundException':
+                    raise
+                _INDEX_STATUS[table_name] = {}
+                continue
+            _INDEX_STATUS[table_name] = {
+                index['IndexName']: index.get('IndexStatus', 'ACTIVE')
+                for index in description.get('GlobalSecondaryIndexes', [])
+            }
+            backfilled: Set[str] = set()
+            if TABLE_SCHEMAS[collection].get("composite_keys"):
+                tags = self.client.list_tags_of_resource(ResourceArn=description['TableArn'])
+                for tag in tags.get('Tags', []):
+                    if tag['Key'] == BACKFILL_TAG:
+                        backfilled.update(tag['Value'].split())
+            _BACKFILLED_KEYS[table_name] = backfilled
+
+    def _usable_indexes(self, collection: str) -> Set[str]:
+        """Indexes of a collection that are ACTIVE and whose keys every item has"""
+        table_name = self._get_table_name(collection)
+        schema = TABLE_SCHEMAS.get(collection, {})
+        composite_keys = schema.get("composite_keys", {})
+        status = _INDEX_STATUS.get(table_name, {})
+        backfilled = _BACKFILLED_KEYS.get(table_name, set())
+        return {
+            index_name for index_name, index in schema.get("indexes", {}).items()
+            if status.get(index_name) == 'ACTIVE'
+            and (index["hash_key"] not in composite_keys or index["hash_key"] in backfilled)
+        }
+
+    def _pending_indexes(self) -> bool:
+        """Whether some declared index cannot serve queries yet"""
+        return any(
+            self._usable_indexes(collection) != set(schema.get("indexes", {}))
+            for collection, schema in TABLE_SCHEMAS.items()
+        )
+
+    async def _watch_indexes(self) -> None:
+        """Poll index builds and backfills until every declared index is usable"""
+        while self._pending_indexes():
+            await asyncio.sleep(config.DYNAMODB_INDEX_REFRESH_SECONDS)
+            try:
+                await asyncio.to_thread(self._refresh_indexes)
+            except Exception as e:
+                print(f"Error refreshing DynamoDB index status: {str(e)}")
+        self._index_watcher = None
+
+    async def backfill_composite_keys(self) -> Dict[str, int]:
+        """
+        Set the composite key attributes missing from existing items
+
+        Items written before a composite key was declared lack it, so they
+        would be missing from Queries on its index. Once every item of a table
+        has its keys, the table is tagged and the indexes start serving
+        queries (at the next index status refresh of each process).
+
+        Returns:
+            Number of items updated per collection
+        """
+        if self.client is None:
+            raise Exception("Database not connected")
+
+        updated: Dict[str, int] = {}
+        for collection, schema in TABLE_SCHEMAS.items():
+            composite_keys = schema.get("composite_keys", {})
+            if not composite_keys:
+                continue
+            table_name = self._get_table_name(collection)
+            updated[collection] = 0
+            for attribute, fields in composite_keys.items():
+                names = {'#pk': '_id', '#c': attribute}
+                names.update({f"#f{i}": field for i, field in enumerate(fields)})
+                present = " AND ".join(f"attribute_exists(#f{i})" for i in range(len(fields)))
+                params = {
+                    'TableName': table_name,
+                    'FilterExpression': f"attribute_not_exists(#c) AND {present}",
+                    'ProjectionExpression': ", ".join(["#pk"] + [f"#f{i}" for i in range(len(fields))]),
+                    'ExpressionAttributeNames': names,
+                }
+
+                def set_key(doc: Dict[str, Any]) -> None:
+                    # Conditional, so items deleted meanwhile are not recreated
+                    try:
+                        self.client.update_item(
+                            TableName=table_name,
+                            Key={'_id': {'S': str(doc["_id"])}},
+                            UpdateExpression="SET #c = :c",
+                            ConditionExpression="attribute_exists(#pk)",
+                            ExpressionAttributeNames={'#pk': '_id', '#c': attribute},
+                            ExpressionAttributeValues={
+                                ':c': {'S': COMPOSITE_KEY_SEPARATOR.join(str(doc[f]) for f in fields)}
+                            },
+                        )
+                    except ClientError as e:
+                        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                            raise
+
+                async for page in self._iter_pages(
+                    collection, "scan", params, config.DYNAMODB_SCAN_SEGMENTS
+                ):
+                    await asyncio.gather(*(asyncio.to_thread(set_key, doc) for doc in page))
+                    updated[collection] += len(page)
+
+            description = await asyncio.to_thread(self.client.describe_table, TableName=table_name)
+            await asyncio.to_thread(
+                self.client.tag_resource,
+                ResourceArn=description['Table']['TableArn'],
+                Tags=[{'Key': BACKFILL_TAG, 'Value': " ".join(composite_keys)}],
+            )
+        return updated
+
+    async def create(self, collection: str, document: Dict[str, Any]) -> Dict[str, Any]:
+        """Create a new document in a collection"""
+        if self.client is None:
+            raise Exception("Database not connected")
+
+        table_name = self._get_table_name(collection)
+
+        # Generate ID and timestamps, and convert to DynamoDB format
+        dynamodb_item = self._prepare_new(collection, document)
+
+        try:
+            await asyncio.to_thread(self.client.put_item, TableName=table_name, Item=dynamodb_item)
+            # Return the created document
+            return document
+        except ClientError as e:
+            raise Exception(f"Error creating document in DynamoDB: {str(e)}")
+
+    async def _batch_write(self, table_name: str, requests: List[Dict[str, Any]]) -> None:
+        """Send put/delete requests with BatchWriteItem, retrying unprocessed items"""
+        for start in range(0, len(requests), BATCH_WRITE_SIZE):
+            pending = {table_name: requests[start:start + BATCH_WRITE_SIZE]}
+            attempt = 0
+            while pending:
+                # In a worker thread, so concurrent batches (e.g. a migration) overlap
+                response = await asyncio.to_thread(self.client.batch_write_item, RequestItems=pending)
+                pending = response.get('UnprocessedItems') or {}
+                if pending:
+                    attempt += 1
+                    if attempt > BATCH_MAX_RETRIES:
+                        raise Exception(
+                            f"DynamoDB left items unprocessed after {BATCH_MAX_RETRIES} retries"
+                        )
+                    # Exponential backoff before retrying throttled items
+                    await asyncio.sleep(min(0.05 * (2 ** attempt), 2.0))
 
     def _dict_to_dynamodb(self, item: Dict[str, Any]) -> Dict[str, Any]:
-        """Convert Python dict to DynamoDB item format"""
+        """
+        Convert Python dict to DynamoDB item format
+
+        Writes still go through this converter rather than the collection
+        codecs: on batches the codec encoder is not reliably faster (see
+        benchmarks/bench_dynamodb_codec.py). The codecs decode what it writes.
+        """
         result = {}
         for key, value in item.items():
             if isinstance(value, str):
                 result[key] = {'S': value}
-            elif isinstance(value, (int, float)):
-                result[key] = {'N': str(value)}
             elif isinstance(value, bool):
+                # Checked before numbers, since bool is a subclass of int
                 result[key] = {'BOOL': value}
+            elif isinstance(value, (int, float)):
+                result[key] = {'N': str(value)}
             elif value is None:
                 result[key] = {'NULL': True}
+            elif isinstance(value, datetime):
+                # Same format as query values, so range keys compare correctly
+                result[key] = {'S': value.isoformat()}
             elif isinstance(value, list):
                 # Check if it's a list of strings (SS) or numbers (NS)
                 if value and isinstance(value[0], str):
@@ -153,31 +460,336 @@ class DynamoDBDataDB(DataDB):
                 result[key] = {'S': str(value)}
         return result
 
-    async def create(self, collection: str, document: Dict[str, Any]) -> Dict[str, Any]:
-        """Create a new document in a collection"""
+    def _prepare_new(self, collection: str, document: Dict[str, Any]) -> Dict[str, Any]:
+        """Assign an ID and timestamps to a new document and encode it"""
+        # Generate ID if not provided
+        if "_id" not in document:
+            document["_id"] = str(uuid.uuid4())
+        # Add timestamps (stored as ISO strings)
+        now = datetime.utcnow()
+        document["created_at"] = now
+        document["updated_at"] = now
+        return self._dict_to_dynamodb({**document, **self._composite_values(collection, document)})
+
+    async def create_many(
+        self, collection: str, documents: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """Create several documents with BatchWriteItem"""
         if self.client is None:
             raise Exception("Database not connected")
 
         table_name = self._get_table_name(collection)
-        self._ensure_table_exists(table_name)
+        requests = [
+            {'PutRequest': {'Item': self._prepare_new(collection, document)}}
+            for document in documents
+        ]
 
-        # Generate ID if not provided
-        if "_id" not in document:
-            document["_id"] = str(uuid.uuid4())
+        try:
+            await self._batch_write(table_name, requests)
+            return documents
+        except ClientError as e:
+            raise Exception(f"Error creating documents in DynamoDB: {str(e)}")
+
+    def _composite_values(self, collection: str, document: Dict[str, Any]) -> Dict[str, str]:
+        """Compute the synthesized composite key attributes for a document"""
+        values = {}
+        composite_keys = TABLE_SCHEMAS.get(collection, {}).get("composite_keys", {})
+        for attribute, fields in composite_keys.items():
+            if all(field in document for field in fields):
+                values[attribute] = COMPOSITE_KEY_SEPARATOR.join(
+                    str(document[field]) for field in fields
+                )
+        return values
+
+    def _strip_composite_keys(self, collection: str, item: Dict[str, Any]) -> Dict[str, Any]:
+        """Remove synthesized composite key attributes from a decoded item"""
+        for attribute in TABLE_SCHEMAS.get(collection, {}).get("composite_keys", {}):
+            item.pop(attribute, None)
+        return item
+
+    def _decode_items(self, collection: str, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Convert raw DynamoDB items to documents"""
+        documents = get_codec(collection).decode_many(items)
+        if TABLE_SCHEMAS.get(collection, {}).get("composite_keys"):
+            for document in documents:
+                self._strip_composite_keys(collection, document)
+        return documents
 
-        # Add timestamps
-        document["created_at"] = datetime.utcnow().isoformat()
-        document["updated_at"] = datetime.utcnow().isoformat()
+    def _build_condition(
+        self,
+        collection: str,
+        filter_dict: Dict[str, Any],
+        names: Dict[str, str],
+        values: Dict[str, Any],
+    ) -> Optional[str]:
+        """
+        Translate a Mongo-style filter into a DynamoDB condition expression
+
+        Supports equality and the $eq, $ne, $gt, $gte, $lt, $lte, $in and $exists
+        operators. $in matches list attributes by membership; on other
+        attributes contains() would be a substring test, so they are matched
+        by value only. Placeholders are added to the given names/values maps.
+
+        Returns:
+            Condition expression, or None if the filter is empty
+        """
+        comparisons = {"$eq": "=", "$ne": "<>", "$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<="}
+        fields = get_codec(collection).fields
+        parts = []
+        for key, condition in filter_dict.items():
+            attr_name = f"#f{len(names)}"
+            names[attr_name] = key
+
+            def placeholder(value: Any) -> str:
+                attr_value = f":f{len(values)}"
+                values[attr_value] = encode_value(value)
+                return attr_value
+
+            operators = condition if isinstance(condition, dict) and condition and all(
+                op.startswith("$") for op in condition
+            ) else {"$eq": condition}
+
+            for op, value in operators.items():
+                if op in comparisons:
+                    parts.append(f"{attr_name} {comparisons[op]} {placeholder(value)}")
+                elif op == "$in":
+                    if not value:
+                        parts.append(f"attribute_exists({attr_name}) AND attribute_not_exists({attr_name})")
+                        continue
+                    placeholders = [placeholder(v) for v in value]
+                    if fields.get(key) == "str_list":
+                        alternatives = [f"contains({attr_name}, {p})" for p in placeholders]
+                        parts.append(f"({' OR '.join(alternatives)})")
+                    else:
+                        parts.append(f"{attr_name} IN ({', '.join(placeholders)})")
+                elif op == "$exists":
+                    function = "attribute_exists" if value else "attribute_not_exists"
+                    parts.append(f"{function}({attr_name})")
+                else:
+                    raise ValueError(f"Unsupported filter operator for DynamoDB: {op}")
+
+        return " AND ".join(parts) if parts else None
+
+    def _plan_query(
+        self,
+        collection: str,
+        filter_dict: Dict[str, Any],
+        sort_dict: Optional[Dict[str, int]] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Pick a global secondary index able to serve a filter with a Query
+
+        An index matches when its hash key is fully determined by equality
+        conditions in the filter. Indexes whose range key also satisfies the
+        requested sort are preferred, so the sort is pushed down to DynamoDB.
+        Indexes still being built, or on composite keys not yet backfilled,
+        are skipped.
 
-        # Convert to DynamoDB format
-        dynamodb_item = self._dict_to_dynamodb(document)
+        Returns:
+            Query plan (index, key condition, remaining filter, sort direction)
+            or None if no index fits and a scan is required
+        """
+        schema = TABLE_SCHEMAS.get(collection)
+        if not schema or not filter_dict:
+            return None
+
+        equalities = {
+            key: value for key, value in filter_dict.items()
+            if not isinstance(value, (dict, list))
+        }
+        composite_keys = schema.get("composite_keys", {})
+
+        sort_field, sort_direction = None, 1
+        if sort_dict and len(sort_dict) == 1:
+            sort_field, sort_direction = next(iter(sort_dict.items()))
+
+        usable = self._usable_indexes(collection)
+        best = None
+        for index_name, index in schema.get("indexes", {}).items():
+            if index_name not in usable:
+                continue
+            hash_key = index["hash_key"]
+            if hash_key in composite_keys:
+                fields = composite_keys[hash_key]
+                if not all(field in equalities for field in fields):
+                    continue
+                used_fields = list(fields)
+                hash_value = COMPOSITE_KEY_SEPARATOR.join(str(equalities[f]) for f in fields)
+            elif hash_key in equalities:
+                used_fields = [hash_key]
+                hash_value = equalities[hash_key]
+            else:
+                continue
+
+            sorts = sort_field is not None and index.get("range_key") == sort_field
+            plan = {
+                "index_name": index_name,
+                "hash_key": hash_key,
+                "hash_value": hash_value,
+                "remaining": {k: v for k, v in filter_dict.items() if k not in used_fields},
+                "sorted": sorts or not sort_dict,
+                "scan_forward": sort_direction != -1,
+            }
+            if best is None or (plan["sorted"] and not best["sorted"]):
+                best = plan
+        return best
+
+    def _paginate(
+        self,
+        operation: str,
+        params: Dict[str, Any],
+        wanted: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Run a Query or Scan following LastEvaluatedKey (blocking, call from a worker thread)
+
+        Args:
+            operation: "query" or "scan"
+            params: Request parameters
+            wanted: Stop once this many items were collected (None reads everything)
+
+        Returns:
+            Raw DynamoDB items
+        """
+        call = getattr(self.client, operation)
+        items: List[Dict[str, Any]] = []
+        params = dict(params)
+        while True:
+            # Limit is applied before FilterExpression, so only use it as a page
+            # size hint when every evaluated item is returned
+            if wanted is not None and "FilterExpression" not in params:
+                params["Limit"] = wanted - len(items)
+            response = call(**params)
+            items.extend(response.get('Items', []))
+            last_key = response.get('LastEvaluatedKey')
+            if not last_key or (wanted is not None and len(items) >= wanted):
+                break
+            params["ExclusiveStartKey"] = last_key
+        return items[:wanted] if wanted is not None else items
+
+    def _build_request(
+        self,
+        collection: str,
+        filter_dict: Dict[str, Any],
+        sort_dict: Optional[Dict[str, int]] = None,
+    ) -> Tuple[str, Dict[str, Any], bool]:
+        """
+        Build the cheapest request able to serve a filter
 
+        Uses a Query on a matching index when possible and falls back to a Scan.
+
+        Returns:
+            Operation name ("query" or "scan"), request parameters, and whether
+            results already come back in the requested sort order
+        """
+        table_name = self._get_table_name(collection)
+        names: Dict[str, str] = {}
+        values: Dict[str, Any] = {}
+        plan = self._plan_query(collection, filter_dict, sort_dict)
+
+        if plan:
+            params: Dict[str, Any] = {
+                'TableName': table_name,
+                'IndexName': plan["index_name"],
+                'KeyConditionExpression': "#k0 = :k0",
+                'ScanIndexForward': plan["scan_forward"],
+            }
+            names["#k0"] = plan["hash_key"]
+            values[":k0"] = encode_value(plan["hash_value"])
+            condition = self._build_condition(collection, plan["remaining"], names, values)
+            operation = "query"
+            presorted = plan["sorted"]
+        else:
+            params = {'TableName': table_name}
+            condition = self._build_condition(collection, filter_dict, names, values)
+            operation = "scan"
+            presorted = not sort_dict
+
+        if condition:
+            params['FilterExpression'] = condition
+        if names:
+            params['ExpressionAttributeNames'] = names
+        if values:
+            params['ExpressionAttributeValues'] = values
+        return operation, params, presorted
+
+    def _find(
+        self,
+        collection: str,
+        filter_dict: Dict[str, Any],
+        sort_dict: Optional[Dict[str, int]] = None,
+        wanted: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Execute a filter with the best available access path
+
+        Results are sorted when sort_dict is given and truncated to wanted items.
+        Blocking: pages are fetched, decoded and sorted in the calling thread.
+        """
+        operation, params, presorted = self._build_request(collection, filter_dict, sort_dict)
+
+        # Client-side sorting needs every matching item before truncating
+        items = self._decode_items(
+            collection, self._paginate(operation, params, wanted if presorted else None)
+        )
+        if not presorted:
+            items = sort_documents(items, sort_dict)
+        return items[:wanted] if wanted is not None else items
+
+    async def _iter_pages(
+        self,
+        collection: str,
+        operation: str,
+        params: Dict[str, Any],
+        segments: int = 1,
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        Stream decoded pages of a Query or Scan
+
+        Requests run in worker threads so the event loop is not blocked. A Scan
+        with several segments reads them in parallel; pages are handed over
+        through a bounded queue, so at most a few pages are held in memory.
+        """
+        call = getattr(self.client, operation)
+        queue: asyncio.Queue = asyncio.Queue(maxsize=max(2, segments * 2))
+        finished = object()
+
+        def fetch(request: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+            response = call(**request)
+            items = self._decode_items(collection, response.get('Items', []))
+            return items, response.get('LastEvaluatedKey')
+
+        async def read_segment(segment: int) -> None:
+            request = dict(params)
+            if segments > 1:
+                request['Segment'] = segment
+                request['TotalSegments'] = segments
+            try:
+                while True:
+                    items, last_key = await asyncio.to_thread(fetch, request)
+                    if items:
+                        await queue.put(items)
+                    if not last_key:
+                        break
+                    request['ExclusiveStartKey'] = last_key
+            except Exception as e:
+                await queue.put(e)
+            await queue.put(finished)
+
+        workers = [asyncio.ensure_future(read_segment(segment)) for segment in range(segments)]
         try:
-            self.client.put_item(TableName=table_name, Item=dynamodb_item)
-            # Return the created document
-            return document
-        except ClientError as e:
-            raise Exception(f"Error creating document in DynamoDB: {str(e)}")
+            remaining = segments
+            while remaining:
+                page = await queue.get()
+                if page is finished:
+                    remaining -= 1
+                elif isinstance(page, Exception):
+                    raise page
+                else:
+                    yield page
+        finally:
+            for worker in workers:
+                worker.cancel()
 
     async def read_one(
         self, collection: str, filter_dict: Dict[str, Any]
@@ -191,48 +803,23 @@ class DynamoDBDataDB(DataDB):
         # If filtering by _id, use get_item (more efficient)
         if "_id" in filter_dict and len(filter_dict) == 1:
             try:
-                response = self.client.get_item(
+                response = await asyncio.to_thread(
+                    self.client.get_item,
                     TableName=table_name,
                     Key={'_id': {'S': str(filter_dict["_id"])}}
                 )
                 if 'Item' in response:
-                    return self._dynamodb_to_dict(response['Item'])
+                    return self._decode_items(collection, [response['Item']])[0]
                 return None
             except ClientError as e:
                 if e.response['Error']['Code'] == 'ResourceNotFoundException':
                     return None
                 raise Exception(f"Error reading document from DynamoDB: {str(e)}")
 
-        # For other filters, use scan (less efficient but necessary for non-key attributes)
+        # For other filters, query an index when one fits, otherwise scan
         try:
-            # Build filter expression
-            filter_expression_parts = []
-            expression_attribute_names = {}
-            expression_attribute_values = {}
-
-            for idx, (key, value) in enumerate(filter_dict.items()):
-                attr_name = f"#attr{idx}"
-                attr_value = f":val{idx}"
-                filter_expression_parts.append(f"{attr_name} = {attr_value}")
-                expression_attribute_names[attr_name] = key
-                if isinstance(value, str):
-                    expression_attribute_values[attr_value] = {'S': str(value)}
-                else:
-                    expression_attribute_values[attr_value] = {'N': str(value)}
-
-            filter_expression = " AND ".join(filter_expression_parts)
-
-            response = self.client.scan(
-                TableName=table_name,
-                FilterExpression=filter_expression,
-                ExpressionAttributeNames=expression_attribute_names,
-                ExpressionAttributeValues=expression_attribute_values,
-                Limit=1
-            )
-
-            if response.get('Items'):
-                return self._dynamodb_to_dict(response['Items'][0])
-            return None
+            items = await asyncio.to_thread(self._find, collection, filter_dict, None, 1)
+            return items[0] if items else None
         except ClientError as e:
             if e.response['Error']['Code'] == 'ResourceNotFoundException':
                 return None
@@ -250,63 +837,178 @@ class DynamoDBDataDB(DataDB):
         if self.client is None:
             raise Exception("Database not connected")
 
-        table_name = self._get_table_name(collection)
-
         try:
-            if filter_dict is None or len(filter_dict) == 0:
-                # Simple scan without filters
-                response = self.client.scan(
-                    TableName=table_name,
-                    Limit=limit + skip
-                )
-            else:
-                # Build filter expression
-                filter_expression_parts = []
-                expression_attribute_names = {}
-                expression_attribute_values = {}
-
-                for idx, (key, value) in enumerate(filter_dict.items()):
-                    attr_name = f"#attr{idx}"
-                    attr_value = f":val{idx}"
-                    filter_expression_parts.append(f"{attr_name} = {attr_value}")
-                    expression_attribute_names[attr_name] = key
-                    if isinstance(value, str):
-                        expression_attribute_values[attr_value] = {'S': str(value)}
-                    else:
-                        expression_attribute_values[attr_value] = {'N': str(value)}
+            items = await asyncio.to_thread(
+                self._find, collection, filter_dict or {}, sort_dict, skip + limit
+            )
+            return items[skip:skip + limit]
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'ResourceNotFoundException':
+                return []
+            raise Exception(f"Error reading documents from DynamoDB: {str(e)}")
 
-                filter_expression = " AND ".join(filter_expression_parts)
+    async def iter_many(
+        self,
+        collection: str,
+        filter_dict: Optional[Dict[str, Any]] = None,
+        batch_size: int = 1000,
+        start_after: Optional[str] = None,
+        segment: int = 0,
+        total_segments: int = 1,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Iterate over matching documents page by page
 
-                response = self.client.scan(
-                    TableName=table_name,
-                    FilterExpression=filter_expression,
-                    ExpressionAttributeNames=expression_attribute_names,
-                    ExpressionAttributeValues=expression_attribute_values,
-                    Limit=limit + skip
-                )
+        Uses a Query when an index serves the filter, otherwise a Scan, with
+        batch_size as the page size; the next page is fetched while the
+        current one is consumed. Segments map to the segments of a parallel
+        Scan. Documents come in table (or index) order, and start_after
+        resumes from that document's position.
+        """
+        if self.client is None:
+            raise Exception("Database not connected")
+        if not 0 <= segment < total_segments:
+            raise ValueError(f"Invalid segment {segment} of {total_segments}")
 
-            items = [self._dynamodb_to_dict(item) for item in response.get('Items', [])]
+        filter_dict = filter_dict or {}
+        table_name = self._get_table_name(collection)
+        residual = None
+        try:
+            operation, params, _ = self._build_request(collection, filter_dict)
+        except ValueError:
+            # Operators DynamoDB cannot express are evaluated on the client
+            operation, params, residual = "scan", {'TableName': table_name}, filter_dict
+        params['Limit'] = batch_size
+        if operation == "scan" and total_segments > 1:
+            params['Segment'] = segment
+            params['TotalSegments'] = total_segments
 
-            # Apply skip
-            if skip > 0:
-                items = items[skip:]
+        try:
+            if start_after is not None:
+                params['ExclusiveStartKey'] = await self._start_key(collection, params, str(start_after))
+            async for page in self._iter_pages(collection, operation, params):
+                for doc in page:
+                    if residual is not None and not match_document(doc, residual):
+                        continue
+                    if operation == "query" and not in_segment(doc["_id"], segment, total_segments):
+                        continue
+                    yield doc
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'ResourceNotFoundException':
+                return
+            raise Exception(f"Error reading documents from DynamoDB: {str(e)}")
+
+    async def _start_key(self, collection: str, params: Dict[str, Any], doc_id: str) -> Dict[str, Any]:
+        """
+        Build the ExclusiveStartKey resuming a Query or Scan after a document
+
+        A table Scan only needs the _id; a Query on an index also needs the
+        index key attributes, read from the document itself.
+        """
+        key = {'_id': {'S': doc_id}}
+        index_name = params.get('IndexName')
+        if index_name is None:
+            return key
+        response = await asyncio.to_thread(
+            self.client.get_item, TableName=params['TableName'], Key=key
+        )
+        item = response.get('Item')
+        if item is None:
+            raise Exception(f"Cannot resume after document {doc_id}: it no longer exists")
+        index = TABLE_SCHEMAS[collection]["indexes"][index_name]
+        for attribute in (index["hash_key"], index.get("range_key")):
+            if attribute:
+                key[attribute] = item[attribute]
+        return key
 
-            # Apply limit
-            items = items[:limit]
+    async def read_many_by_ids(
+        self, collection: str, ids: List[str]
+    ) -> List[Dict[str, Any]]:
+        """Read several documents by ID with chunked BatchGetItem requests"""
+        if self.client is None:
+            raise Exception("Database not connected")
 
-            # Apply sorting (Note: DynamoDB doesn't support server-side sorting easily,
-            # so we do it client-side. For production, consider using GSIs)
-            if sort_dict:
-                for field, direction in sort_dict.items():
-                    reverse = direction == -1
-                    items.sort(key=lambda x: x.get(field, ""), reverse=reverse)
+        table_name = self._get_table_name(collection)
+        # BatchGetItem rejects duplicate keys
+        unique_ids = list(dict.fromkeys(str(doc_id) for doc_id in ids))
+        found: Dict[str, Dict[str, Any]] = {}
 
-            return items
+        try:
+            for start in range(0, len(unique_ids), BATCH_GET_SIZE):
+                chunk = unique_ids[start:start + BATCH_GET_SIZE]
+                request = {table_name: {'Keys': [{'_id': {'S': doc_id}} for doc_id in chunk]}}
+                attempt = 0
+                while request:
+                    response = await asyncio.to_thread(self.client.batch_get_item, RequestItems=request)
+                    for item in self._decode_items(
+                        collection, response.get('Responses', {}).get(table_name, [])
+                    ):
+                        found[item["_id"]] = item
+                    request = response.get('UnprocessedKeys') or {}
+                    if request:
+                        attempt += 1
+                        if attempt > BATCH_MAX_RETRIES:
+                            raise Exception(
+                                f"DynamoDB left keys unprocessed after {BATCH_MAX_RETRIES} retries"
+                            )
+                        # Exponential backoff before retrying throttled keys
+                        await asyncio.sleep(min(0.05 * (2 ** attempt), 2.0))
         except ClientError as e:
             if e.response['Error']['Code'] == 'ResourceNotFoundException':
                 return []
             raise Exception(f"Error reading documents from DynamoDB: {str(e)}")
 
+        return [found[doc_id] for doc_id in unique_ids if doc_id in found]
+
+    async def count(
+        self,
+        collection: str,
+        filter_dict: Optional[Dict[str, Any]] = None,
+        estimated: bool = False,
+    ) -> int:
+        """Count documents with Select='COUNT', so no items are transferred"""
+        if self.client is None:
+            raise Exception("Database not connected")
+
+        table_name = self._get_table_name(collection)
+
+        try:
+            if estimated and not filter_dict:
+                return await self._estimated_count(table_name)
+
+            operation, params, _ = self._build_request(collection, filter_dict or {})
+            return await asyncio.to_thread(self._count_pages, operation, params)
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'ResourceNotFoundException':
+                return 0
+            raise Exception(f"Error counting documents in DynamoDB: {str(e)}")
+
+    async def _estimated_count(self, table_name: str) -> int:
+        """Get a table's ItemCount, cached for DYNAMODB_ESTIMATED_COUNT_TTL_SECONDS"""
+        cached = _ESTIMATED_COUNTS.get(table_name)
+        now = time.monotonic()
+        if cached is not None and now - cached[0] < config.DYNAMODB_ESTIMATED_COUNT_TTL_SECONDS:
+            return cached[1]
+
+        # ItemCount is refreshed by DynamoDB roughly every six hours
+        response = await asyncio.to_thread(self.client.describe_table, TableName=table_name)
+        item_count = response['Table'].get('ItemCount', 0)
+        _ESTIMATED_COUNTS[table_name] = (now, item_count)
+        return item_count
+
+    def _count_pages(self, operation: str, params: Dict[str, Any]) -> int:
+        """Add up Select='COUNT' pages of a Query or Scan (blocking, call from a worker thread)"""
+        call = getattr(self.client, operation)
+        params = {**params, 'Select': 'COUNT'}
+        total = 0
+        while True:
+            response = call(**params)
+            total += response.get('Count', 0)
+            last_key = response.get('LastEvaluatedKey')
+            if not last_key:
+                return total
+            params['ExclusiveStartKey'] = last_key
+
     async def update_one(
         self, collection: str, filter_dict: Dict[str, Any], update_dict: Dict[str, Any]
     ) -> bool:
@@ -332,26 +1034,21 @@ class DynamoDBDataDB(DataDB):
             updates = update_dict
 
         # Add updated_at timestamp
-        updates["updated_at"] = datetime.utcnow().isoformat()
+        updates["updated_at"] = datetime.utcnow()
 
-        for idx, (key, value) in enumerate(updates.items()):
+        # Keep composite index keys in sync when all their parts are updated
+        for idx, (key, value) in enumerate({**updates, **self._composite_values(collection, updates)}.items()):
             attr_name = f"#attr{idx}"
             attr_value = f":val{idx}"
             update_expression_parts.append(f"{attr_name} = {attr_value}")
             expression_attribute_names[attr_name] = key
-            if isinstance(value, str):
-                expression_attribute_values[attr_value] = {'S': value}
-            elif isinstance(value, (int, float)):
-                expression_attribute_values[attr_value] = {'N': str(value)}
-            elif isinstance(value, bool):
-                expression_attribute_values[attr_value] = {'BOOL': value}
-            else:
-                expression_attribute_values[attr_value] = {'S': str(value)}
+            expression_attribute_values[attr_value] = encode_value(value)
 
         update_expression = "SET " + ", ".join(update_expression_parts)
 
         try:
-            self.client.update_item(
+            await asyncio.to_thread(
+                self.client.update_item,
                 TableName=table_name,
                 Key={'_id': {'S': str(filter_dict["_id"])}},
                 UpdateExpression=update_expression,
@@ -376,7 +1073,8 @@ class DynamoDBDataDB(DataDB):
             raise ValueError("DynamoDB delete_one requires '_id' in filter_dict")
 
         try:
-            self.client.delete_item(
+            await asyncio.to_thread(
+                self.client.delete_item,
                 TableName=table_name,
                 Key={'_id': {'S': str(filter_dict["_id"])}}
             )
@@ -386,50 +1084,184 @@ class DynamoDBDataDB(DataDB):
                 return False
             raise Exception(f"Error deleting document from DynamoDB: {str(e)}")
 
+    async def delete_many(self, collection: str, filter_dict: Dict[str, Any]) -> int:
+        """Delete every document matching a filter, fetching only their keys"""
+        if self.client is None:
+            raise Exception("Database not connected")
+
+        table_name = self._get_table_name(collection)
+
+        try:
+            operation, params, _ = self._build_request(collection, filter_dict)
+            names = {**params.get('ExpressionAttributeNames', {}), '#pk': '_id'}
+            params = {**params, 'ProjectionExpression': '#pk', 'ExpressionAttributeNames': names}
+            items = await asyncio.to_thread(self._paginate, operation, params)
+            keys = [{'_id': item['_id']} for item in items]
+            await self._batch_write(table_name, [{'DeleteRequest': {'Key': key}} for key in keys])
+            return len(keys)
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'ResourceNotFoundException':
+                return 0
+            raise Exception(f"Error deleting documents from DynamoDB: {str(e)}")
+
+    def _bulk_key(self, name: str, spec: Dict[str, Any]) -> str:
+        """Get the document ID targeted by a bulk operation filter"""
+        filter_dict = spec.get("filter", {})
+        if "_id" not in filter_dict or len(filter_dict) != 1:
+            raise ValueError(f"DynamoDB bulk {name} requires a filter on '_id' only")
+        return str(filter_dict["_id"])
+
+    async def bulk_write(
+        self, collection: str, operations: List[Dict[str, Any]], ordered: bool = True
+    ) -> Dict[str, int]:
+        """
+        Apply a batch of write operations
+
+        Consecutive inserts, upserting replacements and deletes are grouped into
+        BatchWriteItem requests; updates and non-upserting replacements are
+        conditional and go one by one. A batch cannot tell whether an upsert
+        replaced an item, so batched replacements are counted as modified and
+        deletes are counted whether or not the item existed.
+        """
+        if self.client is None:
+            raise Exception("Database not connected")
+
+        table_name = self._get_table_name(collection)
+        result = {"inserted_count": 0, "modified_count": 0, "upserted_count": 0, "deleted_count": 0}
+        errors: List[str] = []
+
+        # Batched requests waiting to be sent, with the counter each one adds to
+        pending: List[Tuple[Dict[str, Any], str]] = []
+        pending_ids: Set[str] = set()
+
+        async def flush() -> None:
+            if not pending:
+                return
+            try:
+                await self._batch_write(table_name, [request for request, _ in pending])
+                for _, counter in pending:
+                    result[counter] += 1
+            finally:
+                pending.clear()
+                pending_ids.clear()
+
+        async def queue(doc_id: str, request: Dict[str, Any], counter: str) -> None:
+            # BatchWriteItem rejects two requests on the same key
+            if doc_id in pending_ids:
+                await flush()
+            pending.append((request, counter))
+            pending_ids.add(doc_id)
+
+        async def apply(operation: Dict[str, Any]) -> None:
+            if len(operation) != 1:
+                raise ValueError(f"Invalid bulk operation: {operation}")
+            name, spec = next(iter(operation.items()))
+
+            if name == "insert_one":
+                item = self._prepare_new(collection, spec["document"])
+                await queue(item['_id']['S'], {'PutRequest': {'Item': item}}, "inserted_count")
+            elif name == "replace_one":
+                doc_id = self._bulk_key(name, spec)
+                replacement = {**spec["replacement"], "_id": doc_id}
+                item = self._dict_to_dynamodb({**replacement, **self._composite_values(collection, replacement)})
+                if spec.get("upsert", False):
+                    await queue(doc_id, {'PutRequest': {'Item': item}}, "modified_count")
+                    return
+                await flush()
+                try:
+                    await asyncio.to_thread(
+                        self.client.put_item,
+                        TableName=table_name,
+                        Item=item,
+                        ConditionExpression="attribute_exists(#pk)",
+                        ExpressionAttributeNames={'#pk': '_id'},
+                    )
+                    result["modified_count"] += 1
+                except ClientError as e:
+                    if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                        raise
+            elif name == "update_one":
+                doc_id = self._bulk_key(name, spec)
+                await flush()
+                if await self.update_one(collection, {"_id": doc_id}, dict(spec["update"])):
+                    result["modified_count"] += 1
+            elif name == "delete_one":
+                doc_id = self._bulk_key(name, spec)
+                await queue(doc_id, {'DeleteRequest': {'Key': {'_id': {'S': doc_id}}}}, "deleted_count")
+            else:
+                raise ValueError(f"Unsupported bulk operation: {name}")
+
+        for operation in operations:
+            try:
+                await apply(operation)
+                if len(pending) >= BATCH_WRITE_SIZE:
+                    await flush()
+            except Exception as e:
+                if ordered:
+                    raise Exception(f"Error in DynamoDB bulk write: {str(e)}")
+                errors.append(str(e))
+
+        try:
+            await flush()
+        except Exception as e:
+            if ordered:
+                raise Exception(f"Error in DynamoDB bulk write: {str(e)}")
+            errors.append(str(e))
+
+        if errors:
+            raise Exception(f"Error in DynamoDB bulk write: {'; '.join(errors)}")
+        return result
+
     async def aggregate(
         self, collection: str, pipeline: List[Dict[str, Any]]
     ) -> List[Dict[str, Any]]:
-        """Perform aggregation operations"""
+        """
+        Perform aggregation operations
+
+        DynamoDB has no native aggregation, so the pipeline is evaluated by a
+        streaming engine over paginated reads. A leading $match is pushed down
+        to DynamoDB (as a Query when an index fits, otherwise as the filter of a
+        parallel Scan) and evaluated again in the engine for exact semantics.
+        Supported stages: $match, $group ($sum, $avg, $count, $max, $min),
+        $sort, $skip, $limit, $project and $count.
+        """
+        return [doc async for doc in self._aggregate_stream(collection, pipeline)]
+
+    def aggregate_iter(
+        self, collection: str, pipeline: List[Dict[str, Any]], batch_size: int = 1000
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Perform aggregation operations, yielding results page by page
+
+        Same evaluation as aggregate, with batch_size as the page size of the
+        underlying Query or Scan.
+        """
+        return self._aggregate_stream(collection, pipeline, batch_size)
+
+    async def _aggregate_stream(
+        self, collection: str, pipeline: List[Dict[str, Any]], page_size: Optional[int] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Evaluate a pipeline over paginated reads; pages default to DynamoDB's 1 MB"""
         if self.client is None:
             raise Exception("Database not connected")
 
-        table_name = self._get_table_name(collection)
+        engine = AggregationPipeline(pipeline)
 
-        # DynamoDB doesn't have native aggregation like MongoDB
-        # This is a simplified implementation that handles basic $match and $group operations
-        # For complex aggregations, consider using DynamoDB Streams + Lambda or AWS AppSync
+        operation, params = "scan", {'TableName': self._get_table_name(collection)}
+        if pipeline and "$match" in pipeline[0]:
+            try:
+                operation, params, _ = self._build_request(collection, pipeline[0]["$match"])
+            except ValueError:
+                # Operators DynamoDB cannot express are only evaluated in the engine
+                pass
+        if page_size is not None:
+            params['Limit'] = page_size
+        segments = config.DYNAMODB_SCAN_SEGMENTS if operation == "scan" else 1
 
         try:
-            # Start with a scan
-            response = self.client.scan(TableName=table_name)
-            items = [self._dynamodb_to_dict(item) for item in response.get('Items', [])]
-
-            # Apply pipeline stages
-            for stage in pipeline:
-                if "$match" in stage:
-                    # Filter documents
-                    match_filter = stage["$match"]
-                    items = [
-                        item for item in items
-                        if all(item.get(k) == v for k, v in match_filter.items())
-                    ]
-                elif "$group" in stage:
-                    # Group documents (simplified implementation)
-                    group_by = stage["$group"]
-                    _id = group_by.get("_id", {})
-                    # This is a basic implementation - complex grouping may require more logic
-                    grouped = {}
-                    for item in items:
-                        group_key = tuple(item.get(k) for k in (_id if isinstance(_id, dict) else [_id]))
-                        if group_key not in grouped:
-                            grouped[group_key] = []
-                        grouped[group_key].append(item)
-                    items = [{"_id": key, "items": group} for key, group in grouped.items()]
-                # Add more pipeline stages as needed
-
-            return items
+            async for doc in engine.stream(self._iter_pages(collection, operation, params, segments)):
+                yield doc
         except ClientError as e:
             if e.response['Error']['Code'] == 'ResourceNotFoundException':
-                return []
+                return
             raise Exception(f"Error aggregating documents in DynamoDB: {str(e)}")
-
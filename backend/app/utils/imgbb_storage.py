@@ -1,9 +1,86 @@
 import aiohttp
+import time
 from io import BytesIO
-from typing import Optional
+from types import SimpleNamespace
+from typing import Any, AsyncIterator, Dict, Optional
 
 from app.config import config
 from app.utils.protocols import FileDB
+from app.utils.uploads import FileTooLargeError, UploadDigest
+
+
+class HTTPPoolMetrics:
+    """
+    Collects connection pool statistics of an aiohttp session from its trace events
+
+    Callbacks run on the event loop, so no locking is needed.
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.request_errors = 0
+        self.connections_created = 0
+        self.connections_reused = 0
+        self.queued = 0
+        self.queue_wait_total_ms = 0.0
+        self.queue_wait_max_ms = 0.0
+        self.dns_cache_hits = 0
+        self.dns_cache_misses = 0
+
+    def trace_config(self) -> aiohttp.TraceConfig:
+        """TraceConfig feeding these metrics"""
+        trace = aiohttp.TraceConfig()
+        trace.on_request_start.append(self._on_request_start)
+        trace.on_request_exception.append(self._on_request_exception)
+        trace.on_connection_create_end.append(self._on_connection_create_end)
+        trace.on_connection_reuseconn.append(self._on_connection_reuseconn)
+        trace.on_connection_queued_start.append(self._on_connection_queued_start)
+        trace.on_connection_queued_end.append(self._on_connection_queued_end)
+        trace.on_dns_cache_hit.append(self._on_dns_cache_hit)
+        trace.on_dns_cache_miss.append(self._on_dns_cache_miss)
+        return trace
+
+    async def _on_request_start(self, session: Any, context: SimpleNamespace, params: Any) -> None:
+        self.requests += 1
+
+    async def _on_request_exception(self, session: Any, context: SimpleNamespace, params: Any) -> None:
+        self.request_errors += 1
+
+    async def _on_connection_create_end(self, session: Any, context: SimpleNamespace, params: Any) -> None:
+        self.connections_created += 1
+
+    async def _on_connection_reuseconn(self, session: Any, context: SimpleNamespace, params: Any) -> None:
+        self.connections_reused += 1
+
+    async def _on_connection_queued_start(self, session: Any, context: SimpleNamespace, params: Any) -> None:
+        # All connections are in use: the request waits for one to be released
+        self.queued += 1
+        context.queued_at = time.perf_counter()
+
+    async def _on_connection_queued_end(self, session: Any, context: SimpleNamespace, params: Any) -> None:
+        wait_ms = (time.perf_counter() - context.queued_at) * 1000
+        self.queue_wait_total_ms += wait_ms
+        self.queue_wait_max_ms = max(self.queue_wait_max_ms, wait_ms)
+
+    async def _on_dns_cache_hit(self, session: Any, context: SimpleNamespace, params: Any) -> None:
+        self.dns_cache_hits += 1
+
+    async def _on_dns_cache_miss(self, session: Any, context: SimpleNamespace, params: Any) -> None:
+        self.dns_cache_misses += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Current pool statistics"""
+        return {
+            "requests": self.requests,
+            "request_errors": self.request_errors,
+            "connections_created": self.connections_created,
+            "connections_reused": self.connections_reused,
+            "queued": self.queued,
+            "queue_wait_avg_ms": self.queue_wait_total_ms / self.queued if self.queued else 0.0,
+            "queue_wait_max_ms": self.queue_wait_max_ms,
+            "dns_cache_hits": self.dns_cache_hits,
+            "dns_cache_misses": self.dns_cache_misses,
+        }
 
 
 class ImgBBFileDB(FileDB):
@@ -11,12 +88,54 @@ class ImgBBFileDB(FileDB):
 
     def __init__(self):
         self.api_key = config.IMGBB_API_KEY
-        self.api_url = "https://api.imgbb.com/1/upload"
+        self.api_url = config.IMGBB_API_URL
         if not self.api_key:
             raise ValueError(
                 "IMGBB_API_KEY is not set. Please configure it in your .env file. "
                 "You can get an API key from https://api.imgbb.com/"
             )
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.pool_metrics = HTTPPoolMetrics()
+
+    async def initialize(self) -> None:
+        """
+        Open the HTTP session shared by all uploads
+
+        Its connector keeps connections alive between uploads, so only the
+        first requests (up to IMGBB_MAX_CONNECTIONS in parallel) pay for DNS,
+        TCP and TLS setup.
+        """
+        if self.session is not None:
+            return
+        connector = aiohttp.TCPConnector(
+            limit=config.IMGBB_MAX_CONNECTIONS,
+            keepalive_timeout=config.IMGBB_KEEPALIVE_SECONDS,
+            use_dns_cache=True,
+            ttl_dns_cache=config.IMGBB_DNS_CACHE_SECONDS,
+        )
+        self.session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(
+                total=config.IMGBB_TIMEOUT_SECONDS,
+                connect=config.IMGBB_CONNECT_TIMEOUT_SECONDS,
+            ),
+            trace_configs=[self.pool_metrics.trace_config()],
+        )
+
+    async def shutdown(self) -> None:
+        """Close the shared HTTP session and its pooled connections"""
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    def metrics(self) -> Dict[str, Any]:
+        """Connection pool statistics and pool settings"""
+        return {
+            "backend": "imgbb",
+            "max_connections": config.IMGBB_MAX_CONNECTIONS,
+            "session_open": self.session is not None,
+            **self.pool_metrics.snapshot(),
+        }
 
     async def upload_file(
         self, file_content: BytesIO, file_name: str, content_type: str, folder: Optional[str] = None
@@ -45,34 +164,95 @@ class ImgBBFileDB(FileDB):
             data.add_field('key', self.api_key)
             data.add_field('image', file_data, filename=file_name, content_type=content_type)
 
-            # Upload to ImgBB
-            async with aiohttp.ClientSession() as session:
-                async with session.post(self.api_url, data=data) as response:
-                    if response.status != 200:
-                        error_text = await response.text()
-                        raise Exception(
-                            f"Error uploading file to ImgBB: HTTP {response.status} - {error_text}"
-                        )
-                    
-                    result = await response.json()
-                    
-                    # Check if upload was successful
-                    if not result.get("success", False):
-                        error_msg = result.get("error", {}).get("message", "Unknown error")
-                        raise Exception(f"ImgBB API error: {error_msg}")
-                    
-                    # Return the image URL
-                    image_url = result.get("data", {}).get("url")
-                    if not image_url:
-                        raise Exception("ImgBB response missing image URL")
-                    
-                    return image_url
+            # Upload to ImgBB through the shared session (opened on first use
+            # when the storage was not initialized, e.g. in scripts)
+            if self.session is None:
+                await self.initialize()
+            async with self.session.post(self.api_url, data=data) as response:
+                if response.status != 200:
+                    error_text = await response.text()
+                    raise Exception(
+                        f"Error uploading file to ImgBB: HTTP {response.status} - {error_text}"
+                    )
+
+                result = await response.json()
+
+                # Check if upload was successful
+                if not result.get("success", False):
+                    error_msg = result.get("error", {}).get("message", "Unknown error")
+                    raise Exception(f"ImgBB API error: {error_msg}")
+
+                # Return the image URL
+                image_url = result.get("data", {}).get("url")
+                if not image_url:
+                    raise Exception("ImgBB response missing image URL")
+
+                return image_url
 
         except aiohttp.ClientError as e:
             raise Exception(f"Error uploading file to ImgBB: {str(e)}")
         except Exception as e:
             raise Exception(f"Error uploading file to ImgBB: {str(e)}")
 
+    async def upload_stream(
+        self,
+        chunks: AsyncIterator[bytes],
+        file_name: str,
+        content_type: str,
+        folder: Optional[str] = None,
+        max_size: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Upload a file to ImgBB as it is received
+
+        The chunks are written to the request body as they arrive (chunked
+        transfer encoding), so only the chunk in transit is held in memory.
+        An oversized file aborts the request before ImgBB stores anything.
+
+        Args:
+            chunks: File content
+            file_name: Name of the file
+            content_type: MIME type of the file
+            folder: Optional folder/path prefix (not used in ImgBB, kept for compatibility)
+            max_size: Maximum size in bytes, None for no limit
+
+        Returns:
+            {"url": URL of the uploaded file, "size": bytes, "sha256": hex digest}
+
+        Raises:
+            FileTooLargeError: If the file exceeds max_size
+        """
+        digest = UploadDigest(max_size)
+        try:
+            # Prepare form data, the image part being read from the stream
+            data = aiohttp.FormData()
+            data.add_field('key', self.api_key)
+            data.add_field('image', digest.wrap(chunks), filename=file_name, content_type=content_type)
+
+            if self.session is None:
+                await self.initialize()
+            async with self.session.post(self.api_url, data=data) as response:
+                if response.status != 200:
+                    error_text = await response.text()
+                    raise Exception(f"HTTP {response.status} - {error_text}")
+
+                result = await response.json()
+                if not result.get("success", False):
+                    error_msg = result.get("error", {}).get("message", "Unknown error")
+                    raise Exception(f"ImgBB API error: {error_msg}")
+
+                image_url = result.get("data", {}).get("url")
+                if not image_url:
+                    raise Exception("ImgBB response missing image URL")
+
+                return {"url": image_url, "size": digest.size, "sha256": digest.sha256}
+
+        except Exception as e:
+            # aiohttp wraps errors raised while writing the body
+            if digest.too_large:
+                raise FileTooLargeError(max_size)
+            raise Exception(f"Error uploading file to ImgBB: {str(e)}")
+
     async def delete_file(self, file_url: str) -> bool:
         """
         Delete a file from ImgBB by its URL
@@ -0,0 +1,472 @@
+import asyncio
+import bisect
+import heapq
+import random
+import uuid
+from datetime import datetime
+from itertools import islice
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Set, Tuple
+
+from app.config import config
+from app.utils.aggregation import AggregationPipeline
+from app.utils.protocols import DataDB
+from app.utils.query import MISSING, apply_update, get_field, in_segment, match_document, sort_key
+
+# Secondary indexes per collection: hash indexes serve equality and $in
+# filters (array fields index each element), sorted indexes serve sorts and
+# range filters on a single field.
+MEMORY_INDEXES: Dict[str, Dict[str, List[str]]] = {
+    "users": {"hash": ["email"], "sorted": ["total_score"]},
+    "pois": {"hash": ["author_id", "tags"], "sorted": ["created_at"]},
+    "photos": {"hash": ["poi_id", "author_id"], "sorted": ["created_at"]},
+    "ratings": {"hash": ["user_id", "target_id"], "sorted": ["created_at"]},
+}
+
+RANGE_OPERATORS = {"$gt", "$gte", "$lt", "$lte"}
+
+
+def _clone(value: Any) -> Any:
+    """Copy documents and arrays so callers never share stored state"""
+    if isinstance(value, dict):
+        return {k: _clone(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_clone(v) for v in value]
+    return value
+
+
+def _sort_value(value: Any) -> Tuple[int, Any]:
+    """
+    Totally ordered key for sorted indexes
+
+    Missing and null values sort first; other values are grouped by type so
+    that values of different types never need to be compared.
+    """
+    if value is MISSING or value is None:
+        return (0, 0)
+    if isinstance(value, datetime):
+        return (1, value)
+    if isinstance(value, (int, float)):
+        return (2, value)
+    if isinstance(value, str):
+        return (3, value)
+    return (4, repr(value))
+
+
+def _equality_values(condition: Any) -> Optional[List[Any]]:
+    """Values a field must equal (one of) under a condition, None if not an equality"""
+    if isinstance(condition, dict) and condition and all(k.startswith("$") for k in condition):
+        if "$eq" in condition:
+            return [condition["$eq"]]
+        if isinstance(condition.get("$in"), list):
+            return list(condition["$in"])
+        return None
+    return [condition]
+
+
+def _hashable(value: Any) -> bool:
+    return value is not None and not isinstance(value, (dict, list))
+
+
+class _CollectionIndexes:
+    """Hash and sorted secondary indexes of one collection"""
+
+    def __init__(self, hash_fields: List[str], sorted_fields: List[str]):
+        self.hash: Dict[str, Dict[Any, Set[str]]] = {field: {} for field in hash_fields}
+        # Entries are (sort value, document ID), kept ordered
+        self.sorted: Dict[str, List[Tuple[Tuple[int, Any], str]]] = {field: [] for field in sorted_fields}
+
+    def add(self, doc: Dict[str, Any]) -> None:
+        doc_id = doc["_id"]
+        for field, index in self.hash.items():
+            for value in self._hash_values(doc, field):
+                index.setdefault(value, set()).add(doc_id)
+        for field, entries in self.sorted.items():
+            bisect.insort(entries, (_sort_value(get_field(doc, field)), doc_id))
+
+    def remove(self, doc: Dict[str, Any]) -> None:
+        doc_id = doc["_id"]
+        for field, index in self.hash.items():
+            for value in self._hash_values(doc, field):
+                ids = index.get(value)
+                if ids is not None:
+                    ids.discard(doc_id)
+                    if not ids:
+                        del index[value]
+        for field, entries in self.sorted.items():
+            entry = (_sort_value(get_field(doc, field)), doc_id)
+            position = bisect.bisect_left(entries, entry)
+            if position < len(entries) and entries[position] == entry:
+                del entries[position]
+
+    @staticmethod
+    def _hash_values(doc: Dict[str, Any], field: str) -> Set[Any]:
+        value = get_field(doc, field)
+        values = value if isinstance(value, list) else [value]
+        return {v for v in values if v is not MISSING and _hashable(v)}
+
+
+class MemoryDataDB(DataDB):
+    """
+    In-process implementation of DataDB protocol
+
+    Documents live in dictionaries with secondary indexes, so services can be
+    load-tested and profiled offline, or run as a single-node demo. Every
+    call can simulate a network round trip with configurable latency, jitter
+    and error rate.
+    """
+
+    def __init__(self):
+        self.collections: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self.indexes: Dict[str, _CollectionIndexes] = {}
+        self.latency_ms = config.MEMORY_DB_LATENCY_MS
+        self.jitter_ms = config.MEMORY_DB_JITTER_MS
+        self.error_rate = config.MEMORY_DB_ERROR_RATE
+        self.random = random.Random(config.MEMORY_DB_SEED or None)
+        self.operations: Dict[str, int] = {}
+        self.simulated_errors = 0
+        self.connected = False
+
+    async def connect(self) -> None:
+        """Nothing to connect to; data is kept for the lifetime of the process"""
+        self.connected = True
+
+    async def disconnect(self) -> None:
+        """Nothing to disconnect from"""
+        self.connected = False
+
+    def metrics(self) -> Dict[str, Any]:
+        """Operation counts, simulated errors and collection sizes"""
+        return {
+            "backend": "memory",
+            "operations": dict(self.operations),
+            "simulated_errors": self.simulated_errors,
+            "documents": {name: len(docs) for name, docs in self.collections.items()},
+        }
+
+    async def _round_trip(self, operation: str) -> None:
+        """Simulate the latency and failures of a remote database call"""
+        if not self.connected:
+            raise Exception("Database not connected")
+
+        self.operations[operation] = self.operations.get(operation, 0) + 1
+        delay_ms = self.latency_ms
+        if self.jitter_ms:
+            delay_ms += self.random.uniform(0, self.jitter_ms)
+        # Always yield to the event loop, like a real network call would
+        await asyncio.sleep(delay_ms / 1000 if delay_ms > 0 else 0)
+
+        if self.error_rate and self.random.random() < self.error_rate:
+            self.simulated_errors += 1
+            raise Exception(f"Simulated database error during {operation}")
+
+    def _collection(self, collection: str) -> Dict[str, Dict[str, Any]]:
+        if collection not in self.collections:
+            spec = MEMORY_INDEXES.get(collection, {})
+            self.collections[collection] = {}
+            self.indexes[collection] = _CollectionIndexes(spec.get("hash", []), spec.get("sorted", []))
+        return self.collections[collection]
+
+    def _plan(
+        self,
+        collection: str,
+        filter_dict: Dict[str, Any],
+        sort_dict: Optional[Dict[str, int]] = None,
+    ) -> Tuple[Iterable[str], bool]:
+        """
+        Pick candidate document IDs for a filter
+
+        Returns:
+            Candidate IDs (a superset of the matches) and whether they are
+            already in the requested sort order
+        """
+        docs = self._collection(collection)
+        indexes = self.indexes[collection]
+
+        # Equality on _id or on a hash-indexed field: use the smallest candidate set
+        best: Optional[Set[str]] = None
+        for field, condition in filter_dict.items():
+            values = None if field.startswith("$") else _equality_values(condition)
+            if values is None or not all(_hashable(v) for v in values):
+                continue
+            if field == "_id":
+                candidates = {str(v) for v in values if str(v) in docs}
+            elif field in indexes.hash:
+                index = indexes.hash[field]
+                candidates = set()
+                for value in values:
+                    candidates |= index.get(value, set())
+            else:
+                continue
+            if best is None or len(candidates) < len(best):
+                best = candidates
+        if best is not None:
+            return best, not sort_dict
+
+        # Sorted index: serves the sort order, narrowed by range conditions on its field
+        sort_field = next(iter(sort_dict)) if sort_dict and len(sort_dict) == 1 else None
+        range_fields = [
+            field for field, condition in filter_dict.items()
+            if field in indexes.sorted and isinstance(condition, dict) and RANGE_OPERATORS & condition.keys()
+        ]
+        field = sort_field if sort_field in indexes.sorted else (range_fields[0] if range_fields else None)
+        if field is None:
+            return list(docs), not sort_dict
+
+        entries = indexes.sorted[field]
+        start, stop = 0, len(entries)
+        condition = filter_dict.get(field)
+        if isinstance(condition, dict):
+            for op, operand in condition.items():
+                if op not in RANGE_OPERATORS:
+                    continue
+                bound = _sort_value(operand)
+                if op in ("$gt", "$gte"):
+                    # Values of other types never match a range on this type
+                    find = bisect.bisect_right if op == "$gt" else bisect.bisect_left
+                    start = max(start, find(entries, bound, key=lambda e: e[0]))
+                    stop = min(stop, bisect.bisect_left(entries, (bound[0] + 1,), key=lambda e: e[0]))
+                else:
+                    find = bisect.bisect_left if op == "$lt" else bisect.bisect_right
+                    stop = min(stop, find(entries, bound, key=lambda e: e[0]))
+                    start = max(start, bisect.bisect_left(entries, (bound[0],), key=lambda e: e[0]))
+
+        selected = entries[start:stop] if start < stop else []
+        if field != sort_field:
+            return [doc_id for _, doc_id in selected], not sort_dict
+        if sort_dict[field] == -1:
+            selected = reversed(selected)
+        return [doc_id for _, doc_id in selected], True
+
+    def _find(
+        self,
+        collection: str,
+        filter_dict: Optional[Dict[str, Any]] = None,
+        sort_dict: Optional[Dict[str, int]] = None,
+        skip: int = 0,
+        limit: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """Select matching stored documents (not copies) in order"""
+        filter_dict = filter_dict or {}
+        docs = self._collection(collection)
+        ids, ordered = self._plan(collection, filter_dict, sort_dict)
+        matches = (doc for doc in (docs.get(i) for i in ids) if doc is not None and match_document(doc, filter_dict))
+
+        if ordered:
+            return list(islice(matches, skip, None if limit is None else skip + limit))
+        if limit is None:
+            return sorted(matches, key=sort_key(sort_dict))[skip:]
+        # Bounded top-k instead of sorting every match
+        return heapq.nsmallest(skip + limit, matches, key=sort_key(sort_dict))[skip:]
+
+    def _insert(self, collection: str, document: Dict[str, Any]) -> Dict[str, Any]:
+        """Store a new document, assigning its ID and timestamps"""
+        docs = self._collection(collection)
+        if "_id" not in document:
+            document["_id"] = str(uuid.uuid4())
+        document["_id"] = str(document["_id"])
+        if document["_id"] in docs:
+            raise Exception(f"Duplicate _id {document['_id']} in {collection}")
+        document["created_at"] = datetime.utcnow()
+        document["updated_at"] = document["created_at"]
+        self._store(collection, _clone(document))
+        return document
+
+    def _store(self, collection: str, document: Dict[str, Any]) -> None:
+        docs = self._collection(collection)
+        previous = docs.get(document["_id"])
+        if previous is not None:
+            self.indexes[collection].remove(previous)
+        docs[document["_id"]] = document
+        self.indexes[collection].add(document)
+
+    def _update(self, collection: str, filter_dict: Dict[str, Any], update_dict: Dict[str, Any]) -> bool:
+        found = self._find(collection, filter_dict, limit=1)
+        if not found:
+            return False
+        updated = _clone(found[0])
+        apply_update(updated, update_dict)
+        updated["_id"] = found[0]["_id"]
+        updated["updated_at"] = datetime.utcnow()
+        self._store(collection, updated)
+        return True
+
+    def _delete(self, collection: str, doc: Dict[str, Any]) -> None:
+        self.indexes[collection].remove(doc)
+        del self.collections[collection][doc["_id"]]
+
+    async def create(self, collection: str, document: Dict[str, Any]) -> Dict[str, Any]:
+        """Create a new document in a collection"""
+        await self._round_trip("create")
+        return self._insert(collection, document)
+
+    async def create_many(
+        self, collection: str, documents: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """Create several documents in one simulated round trip"""
+        await self._round_trip("create_many")
+        return [self._insert(collection, document) for document in documents]
+
+    async def read_one(
+        self, collection: str, filter_dict: Dict[str, Any]
+    ) -> Optional[Dict[str, Any]]:
+        """Read a single document from a collection"""
+        await self._round_trip("read_one")
+        found = self._find(collection, filter_dict, limit=1)
+        return _clone(found[0]) if found else None
+
+    async def read_many(
+        self,
+        collection: str,
+        filter_dict: Optional[Dict[str, Any]] = None,
+        skip: int = 0,
+        limit: int = 100,
+        sort_dict: Optional[Dict[str, int]] = None,
+    ) -> List[Dict[str, Any]]:
+        """Read multiple documents from a collection"""
+        await self._round_trip("read_many")
+        return [_clone(doc) for doc in self._find(collection, filter_dict, sort_dict, skip, limit)]
+
+    async def iter_many(
+        self,
+        collection: str,
+        filter_dict: Optional[Dict[str, Any]] = None,
+        batch_size: int = 1000,
+        start_after: Optional[str] = None,
+        segment: int = 0,
+        total_segments: int = 1,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Iterate over matching documents by _id, one simulated round trip per batch
+
+        Matching IDs are selected once; each batch returns the documents as
+        they are when it is read, skipping those deleted or no longer matching.
+        """
+        if not 0 <= segment < total_segments:
+            raise ValueError(f"Invalid segment {segment} of {total_segments}")
+        await self._round_trip("iter_many")
+        ids = sorted(
+            doc["_id"] for doc in self._find(collection, filter_dict)
+            if (start_after is None or doc["_id"] > start_after) and in_segment(doc["_id"], segment, total_segments)
+        )
+        docs = self._collection(collection)
+        for offset in range(0, len(ids), batch_size):
+            if offset:
+                await self._round_trip("iter_many")
+            batch = [docs.get(doc_id) for doc_id in ids[offset:offset + batch_size]]
+            for doc in [_clone(doc) for doc in batch if doc is not None and match_document(doc, filter_dict)]:
+                yield doc
+
+    async def read_many_by_ids(
+        self, collection: str, ids: List[str]
+    ) -> List[Dict[str, Any]]:
+        """Read several documents by ID in one simulated round trip"""
+        await self._round_trip("read_many_by_ids")
+        docs = self._collection(collection)
+        unique_ids = dict.fromkeys(str(doc_id) for doc_id in ids)
+        return [_clone(docs[doc_id]) for doc_id in unique_ids if doc_id in docs]
+
+    async def count(
+        self,
+        collection: str,
+        filter_dict: Optional[Dict[str, Any]] = None,
+        estimated: bool = False,
+    ) -> int:
+        """Count matching documents using the indexes"""
+        await self._round_trip("count")
+        if not filter_dict:
+            return len(self._collection(collection))
+        return len(self._find(collection, filter_dict))
+
+    async def update_one(
+        self, collection: str, filter_dict: Dict[str, Any], update_dict: Dict[str, Any]
+    ) -> bool:
+        """Update a single document in a collection"""
+        await self._round_trip("update_one")
+        return self._update(collection, filter_dict, update_dict)
+
+    async def delete_one(self, collection: str, filter_dict: Dict[str, Any]) -> bool:
+        """Delete a single document from a collection"""
+        await self._round_trip("delete_one")
+        found = self._find(collection, filter_dict, limit=1)
+        if not found:
+            return False
+        self._delete(collection, found[0])
+        return True
+
+    async def delete_many(self, collection: str, filter_dict: Dict[str, Any]) -> int:
+        """Delete every document matching a filter"""
+        await self._round_trip("delete_many")
+        found = self._find(collection, filter_dict)
+        for doc in found:
+            self._delete(collection, doc)
+        return len(found)
+
+    def _bulk_operation(self, collection: str, operation: Dict[str, Any], result: Dict[str, int]) -> None:
+        if len(operation) != 1:
+            raise ValueError(f"Invalid bulk operation: {operation}")
+        name, spec = next(iter(operation.items()))
+
+        if name == "insert_one":
+            self._insert(collection, spec["document"])
+            result["inserted_count"] += 1
+        elif name == "replace_one":
+            found = self._find(collection, spec["filter"], limit=1)
+            replacement = _clone(spec["replacement"])
+            if found:
+                replacement["_id"] = found[0]["_id"]
+                self._store(collection, replacement)
+                result["modified_count"] += 1
+            elif spec.get("upsert", False):
+                filter_id = spec["filter"].get("_id")
+                replacement["_id"] = str(replacement.get("_id", filter_id if filter_id is not None else uuid.uuid4()))
+                self._store(collection, replacement)
+                result["upserted_count"] += 1
+        elif name == "update_one":
+            if self._update(collection, spec["filter"], spec["update"]):
+                result["modified_count"] += 1
+        elif name == "delete_one":
+            found = self._find(collection, spec["filter"], limit=1)
+            if found:
+                self._delete(collection, found[0])
+                result["deleted_count"] += 1
+        else:
+            raise ValueError(f"Unsupported bulk operation: {name}")
+
+    async def bulk_write(
+        self, collection: str, operations: List[Dict[str, Any]], ordered: bool = True
+    ) -> Dict[str, int]:
+        """Apply a batch of write operations in one simulated round trip"""
+        await self._round_trip("bulk_write")
+        result = {"inserted_count": 0, "modified_count": 0, "upserted_count": 0, "deleted_count": 0}
+        errors: List[str] = []
+        for operation in operations:
+            try:
+                self._bulk_operation(collection, operation, result)
+            except Exception as e:
+                if ordered:
+                    raise Exception(f"Error in bulk write: {str(e)}")
+                errors.append(str(e))
+        if errors:
+            raise Exception(f"Error in bulk write: {'; '.join(errors)}")
+        return result
+
+    async def aggregate(
+        self, collection: str, pipeline: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Perform aggregation operations
+
+        A leading $match selects its candidates through the indexes; the
+        pipeline is then evaluated by the streaming aggregation engine.
+        """
+        await self._round_trip("aggregate")
+        engine = AggregationPipeline(pipeline)
+        match = pipeline[0].get("$match") if pipeline else None
+        if match is not None:
+            docs = self._find(collection, match)
+        else:
+            docs = list(self._collection(collection).values())
+        # Stages may modify their input, so they get copies
+        results = engine.feed([_clone(doc) for doc in docs])
+        results.extend(engine.finish())
+        return results
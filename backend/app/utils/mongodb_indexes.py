@@ -0,0 +1,212 @@
+"""
+Declarative MongoDB index specification
+
+INDEX_SPECS lists the indexes each collection needs to serve the queries the
+services issue. ensure_indexes() creates the missing ones idempotently,
+check_drift() compares the live indexes against the spec, and
+explain_hot_queries() asks the query planner how the hot query shapes are
+served, flagging collection scans.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+# Indexes per collection. Keys are (field, direction) pairs; options are passed
+# through to createIndexes (e.g. "unique").
+INDEX_SPECS: Dict[str, List[Dict[str, Any]]] = {
+    "users": [
+        {"name": "email_1", "keys": [("email", ASCENDING)]},
+        {"name": "total_score_-1", "keys": [("total_score", DESCENDING)]},
+    ],
+    "pois": [
+        {"name": "created_at_-1", "keys": [("created_at", DESCENDING)]},
+        {"name": "tags_1_created_at_-1", "keys": [("tags", ASCENDING), ("created_at", DESCENDING)]},
+        {"name": "author_id_1_created_at_-1", "keys": [("author_id", ASCENDING), ("created_at", DESCENDING)]},
+    ],
+    "photos": [
+        {"name": "poi_id_1_created_at_-1", "keys": [("poi_id", ASCENDING), ("created_at", DESCENDING)]},
+        {"name": "author_id_1_created_at_-1", "keys": [("author_id", ASCENDING), ("created_at", DESCENDING)]},
+    ],
+    "ratings": [
+        {
+            "name": "target_type_1_target_id_1",
+            "keys": [("target_type", ASCENDING), ("target_id", ASCENDING)],
+        },
+        # Also serves lookups by user_id alone (index prefix)
+        {
+            "name": "user_id_1_target_type_1_target_id_1",
+            "keys": [("user_id", ASCENDING), ("target_type", ASCENDING), ("target_id", ASCENDING)],
+        },
+    ],
+}
+
+# Query shapes issued on hot paths, checked with explain()
+HOT_QUERIES: List[Dict[str, Any]] = [
+    {"name": "recent POIs", "collection": "pois", "filter": {}, "sort": {"created_at": -1}, "limit": 100},
+    {
+        "name": "POIs by tag",
+        "collection": "pois",
+        "filter": {"tags": {"$in": ["tag"]}},
+        "sort": {"created_at": -1},
+        "limit": 100,
+    },
+    {"name": "POIs by author", "collection": "pois", "filter": {"author_id": "id"}},
+    {"name": "photos of a POI", "collection": "photos", "filter": {"poi_id": "id"}, "sort": {"created_at": -1}},
+    {"name": "photos by author", "collection": "photos", "filter": {"author_id": "id"}},
+    {"name": "ratings of a target", "collection": "ratings", "filter": {"target_type": "poi", "target_id": "id"}},
+    {"name": "ratings by user", "collection": "ratings", "filter": {"user_id": "id"}},
+    {
+        "name": "existing rating",
+        "collection": "ratings",
+        "filter": {"user_id": "id", "target_type": "poi", "target_id": "id"},
+    },
+    {"name": "user by email", "collection": "users", "filter": {"email": "user@example.com"}},
+    {"name": "ranking", "collection": "users", "filter": {}, "sort": {"total_score": -1}, "limit": 100},
+]
+
+# Index options compared when looking for drift
+_COMPARED_OPTIONS = ("unique", "sparse", "expireAfterSeconds", "partialFilterExpression")
+
+
+def _normalize_keys(keys: Any) -> List[Tuple[str, Any]]:
+    """Normalize index keys from a spec or from index_information()"""
+    items = keys.items() if isinstance(keys, dict) else keys
+    return [(field, int(direction) if isinstance(direction, (int, float)) else direction) for field, direction in items]
+
+
+def _options(index: Dict[str, Any]) -> Dict[str, Any]:
+    return {option: index[option] for option in _COMPARED_OPTIONS if option in index}
+
+
+def index_model(spec: Dict[str, Any]) -> IndexModel:
+    """Build a pymongo IndexModel from an index spec entry"""
+    options = {k: v for k, v in spec.items() if k != "keys"}
+    return IndexModel(spec["keys"], **options)
+
+
+async def check_drift(
+    database: AsyncIOMotorDatabase,
+    specs: Optional[Dict[str, List[Dict[str, Any]]]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Compare the live indexes with the declared ones
+
+    Args:
+        database: Motor database
+        specs: Index specs per collection (defaults to INDEX_SPECS)
+
+    Returns:
+        Drift entries with the collection, index name and kind: "missing"
+        (declared, not present), "changed" (same name, different keys or
+        options) or "unexpected" (present, not declared)
+    """
+    specs = INDEX_SPECS if specs is None else specs
+    drift: List[Dict[str, Any]] = []
+
+    for collection, declared in specs.items():
+        live = await database[collection].index_information()
+        declared_names = set()
+        for spec in declared:
+            name = spec["name"]
+            declared_names.add(name)
+            current = live.get(name)
+            if current is None:
+                drift.append({"collection": collection, "index": name, "kind": "missing"})
+            elif _normalize_keys(current["key"]) != _normalize_keys(spec["keys"]) or (
+                _options(current) != _options(spec)
+            ):
+                drift.append({
+                    "collection": collection,
+                    "index": name,
+                    "kind": "changed",
+                    "expected": {"keys": _normalize_keys(spec["keys"]), **_options(spec)},
+                    "actual": {"keys": _normalize_keys(current["key"]), **_options(current)},
+                })
+        for name in live:
+            if name != "_id_" and name not in declared_names:
+                drift.append({"collection": collection, "index": name, "kind": "unexpected"})
+
+    return drift
+
+
+async def ensure_indexes(
+    database: AsyncIOMotorDatabase,
+    specs: Optional[Dict[str, List[Dict[str, Any]]]] = None,
+) -> Dict[str, Any]:
+    """
+    Create the declared indexes that are missing
+
+    Existing indexes are never dropped or rebuilt; differences are reported
+    as drift so they can be fixed deliberately.
+
+    Args:
+        database: Motor database
+        specs: Index specs per collection (defaults to INDEX_SPECS)
+
+    Returns:
+        Report with the created index names, errors, and the remaining drift
+    """
+    specs = INDEX_SPECS if specs is None else specs
+    created: List[str] = []
+    errors: List[str] = []
+
+    for collection, declared in specs.items():
+        live = await database[collection].index_information()
+        missing = [spec for spec in declared if spec["name"] not in live]
+        if not missing:
+            continue
+        try:
+            names = await database[collection].create_indexes([index_model(spec) for spec in missing])
+            created.extend(f"{collection}.{name}" for name in names)
+        except OperationFailure as e:
+            # e.g. an index with the same keys under another name
+            errors.append(f"{collection}: {str(e)}")
+
+    return {"created": created, "errors": errors, "drift": await check_drift(database, specs)}
+
+
+def _plan_stages(plan: Dict[str, Any]) -> List[str]:
+    """Flatten the stage names of a query plan tree"""
+    stages = [plan["stage"]] if "stage" in plan else []
+    if "queryPlan" in plan:
+        stages.extend(_plan_stages(plan["queryPlan"]))
+    if "inputStage" in plan:
+        stages.extend(_plan_stages(plan["inputStage"]))
+    for child in plan.get("inputStages", []):
+        stages.extend(_plan_stages(child))
+    return stages
+
+
+async def explain_hot_queries(
+    database: AsyncIOMotorDatabase,
+    queries: Optional[List[Dict[str, Any]]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Explain the hot query shapes and flag the ones served by a collection scan
+
+    Args:
+        database: Motor database
+        queries: Query shapes (defaults to HOT_QUERIES)
+
+    Returns:
+        One entry per query with its winning plan stages and a "collscan" flag
+    """
+    queries = HOT_QUERIES if queries is None else queries
+    results = []
+    for query in queries:
+        command: Dict[str, Any] = {"find": query["collection"], "filter": query["filter"]}
+        if query.get("sort"):
+            command["sort"] = query["sort"]
+        if query.get("limit"):
+            command["limit"] = query["limit"]
+        explained = await database.command("explain", command, verbosity="queryPlanner")
+        stages = _plan_stages(explained["queryPlanner"]["winningPlan"])
+        results.append({
+            "name": query["name"],
+            "collection": query["collection"],
+            "stages": stages,
+            "collscan": "COLLSCAN" in stages,
+        })
+    return results
@@ -1,10 +1,101 @@
-from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
-from typing import Optional, Dict, Any, List
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorCollection, AsyncIOMotorDatabase
+from typing import Optional, Dict, Any, List, Tuple, AsyncIterator
 from bson import ObjectId
+from bson.errors import InvalidId
 from datetime import datetime
+import threading
+from pymongo import DeleteOne, InsertOne, ReplaceOne, UpdateOne
+from pymongo.errors import BulkWriteError
+from pymongo.monitoring import ConnectionPoolListener
+from pymongo.read_concern import ReadConcern
+from pymongo.read_preferences import make_read_preference, read_pref_mode_from_name
 
 from app.config import config
+from app.utils.mongodb_indexes import ensure_indexes
 from app.utils.protocols import DataDB
+from app.utils.query import in_segment
+from app.utils.read_routing import current_read_routing
+
+
+class PoolMetricsListener(ConnectionPoolListener):
+    """
+    Collects connection pool statistics from driver events
+
+    Events are delivered from driver threads, so counters are updated under a lock.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.pools = 0
+        self.pool_clears = 0
+        self.connections_created = 0
+        self.connections_closed = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.checkout_failures: Dict[str, int] = {}
+        self.checkout_wait_total_ms = 0.0
+        self.checkout_wait_max_ms = 0.0
+
+    def pool_created(self, event):
+        with self._lock:
+            self.pools += 1
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self.pool_clears += 1
+
+    def pool_closed(self, event):
+        with self._lock:
+            self.pools -= 1
+
+    def connection_created(self, event):
+        with self._lock:
+            self.connections_created += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.connections_closed += 1
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            reason = str(event.reason)
+            self.checkout_failures[reason] = self.checkout_failures.get(reason, 0) + 1
+
+    def connection_checked_out(self, event):
+        # Time spent waiting for the connection, including establishing it
+        wait_ms = (getattr(event, "duration", None) or 0.0) * 1000
+        with self._lock:
+            self.checkouts += 1
+            self.checkout_wait_total_ms += wait_ms
+            self.checkout_wait_max_ms = max(self.checkout_wait_max_ms, wait_ms)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checkins += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Current pool statistics"""
+        with self._lock:
+            return {
+                "pools": self.pools,
+                "pool_clears": self.pool_clears,
+                "connections_open": self.connections_created - self.connections_closed,
+                "connections_in_use": self.checkouts - self.checkins,
+                "connections_created": self.connections_created,
+                "checkouts": self.checkouts,
+                "checkout_failures": dict(self.checkout_failures),
+                "checkout_wait_avg_ms": self.checkout_wait_total_ms / self.checkouts if self.checkouts else 0.0,
+                "checkout_wait_max_ms": self.checkout_wait_max_ms,
+            }
 
 
 class MongoDBDataDB(DataDB):
@@ -15,6 +106,31 @@ class MongoDBDataDB(DataDB):
         self.database: Optional[AsyncIOMotorDatabase] = None
         self.uri = config.MONGODB_URI
         self.db_name = config.MONGODB_DATABASE
+        self.pool_metrics = PoolMetricsListener()
+        # Collection handles with non-default read options, by (collection, preference, concern)
+        self._routed_collections: Dict[Tuple[str, str, str], AsyncIOMotorCollection] = {}
+
+    def _client_options(self) -> Dict[str, Any]:
+        """Driver options from the settings (they take precedence over URI options)"""
+        options: Dict[str, Any] = {
+            "maxPoolSize": config.MONGODB_MAX_POOL_SIZE,
+            "minPoolSize": config.MONGODB_MIN_POOL_SIZE,
+            "connectTimeoutMS": config.MONGODB_CONNECT_TIMEOUT_MS,
+            "serverSelectionTimeoutMS": config.MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+            "readPreference": config.MONGODB_READ_PREFERENCE,
+            "event_listeners": [self.pool_metrics],
+        }
+        if config.MONGODB_MAX_IDLE_TIME_MS:
+            options["maxIdleTimeMS"] = config.MONGODB_MAX_IDLE_TIME_MS
+        if config.MONGODB_SOCKET_TIMEOUT_MS:
+            options["socketTimeoutMS"] = config.MONGODB_SOCKET_TIMEOUT_MS
+        if config.MONGODB_WAIT_QUEUE_TIMEOUT_MS:
+            options["waitQueueTimeoutMS"] = config.MONGODB_WAIT_QUEUE_TIMEOUT_MS
+        if config.MONGODB_COMPRESSORS:
+            options["compressors"] = config.MONGODB_COMPRESSORS
+        if config.MONGODB_READ_CONCERN:
+            options["readConcernLevel"] = config.MONGODB_READ_CONCERN
+        return options
 
     async def connect(self) -> None:
         """Establish connection to MongoDB Atlas"""
@@ -33,8 +149,9 @@ class MongoDBDataDB(DataDB):
             )
 
         try:
-            self.client = AsyncIOMotorClient(self.uri)
+            self.client = AsyncIOMotorClient(self.uri, **self._client_options())
             self.database = self.client[self.db_name]
+            self._routed_collections.clear()
             # Test connection
             await self.client.admin.command("ping")
         except Exception as e:
@@ -57,11 +174,51 @@ class MongoDBDataDB(DataDB):
             else:
                 raise Exception(f"Error connecting to MongoDB: {error_msg}")
 
+        if config.MONGODB_ENSURE_INDEXES:
+            await self._ensure_indexes()
+
+    async def _ensure_indexes(self) -> None:
+        """Create missing declared indexes and report drift from the spec"""
+        report = await ensure_indexes(self.database)
+        for name in report["created"]:
+            print(f"Created MongoDB index {name}")
+        for error in report["errors"]:
+            print(f"Error creating MongoDB indexes: {error}")
+        for entry in report["drift"]:
+            print(f"MongoDB index drift: {entry['kind']} index {entry['index']} on {entry['collection']}")
+
     async def disconnect(self) -> None:
         """Close connection to MongoDB"""
         if self.client:
             self.client.close()
 
+    def _read_collection(self, collection: str) -> AsyncIOMotorCollection:
+        """Get a collection handle for reads, honoring the read routing of the current request"""
+        routing = current_read_routing()
+        if routing is None:
+            return self.database[collection]
+
+        read_preference, read_concern = routing
+        key = (collection, read_preference, read_concern)
+        handle = self._routed_collections.get(key)
+        if handle is None:
+            options: Dict[str, Any] = {
+                "read_preference": make_read_preference(read_pref_mode_from_name(read_preference), None)
+            }
+            if read_concern:
+                options["read_concern"] = ReadConcern(read_concern)
+            handle = self._routed_collections[key] = self.database[collection].with_options(**options)
+        return handle
+
+    def metrics(self) -> Dict[str, Any]:
+        """Connection pool statistics and pool settings"""
+        return {
+            "backend": "mongodb",
+            "max_pool_size": config.MONGODB_MAX_POOL_SIZE,
+            "min_pool_size": config.MONGODB_MIN_POOL_SIZE,
+            **self.pool_metrics.snapshot(),
+        }
+
     def _convert_objectid(self, doc: Dict[str, Any]) -> Dict[str, Any]:
         """Convert ObjectId to string in document"""
         if doc and "_id" in doc:
@@ -81,9 +238,27 @@ class MongoDBDataDB(DataDB):
         document["created_at"] = datetime.utcnow()
         document["updated_at"] = datetime.utcnow()
 
-        result = await self.database[collection].insert_one(document)
-        created_doc = await self.database[collection].find_one({"_id": result.inserted_id})
-        return self._convert_objectid(created_doc)
+        # insert_one sets the generated _id on the document, no need to read it back
+        await self.database[collection].insert_one(document)
+        return self._convert_objectid(document)
+
+    async def create_many(
+        self, collection: str, documents: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """Create several documents with a single insert_many"""
+        if self.database is None:
+            raise Exception("Database not connected")
+
+        if not documents:
+            return []
+
+        now = datetime.utcnow()
+        for document in documents:
+            document["created_at"] = now
+            document["updated_at"] = now
+
+        await self.database[collection].insert_many(documents)
+        return self._convert_objectids_in_list(documents)
 
     async def read_one(
         self, collection: str, filter_dict: Dict[str, Any]
@@ -99,7 +274,7 @@ class MongoDBDataDB(DataDB):
             except:
                 pass
 
-        doc = await self.database[collection].find_one(filter_dict)
+        doc = await self._read_collection(collection).find_one(filter_dict)
         return self._convert_objectid(doc) if doc else None
 
     async def read_many(
@@ -124,7 +299,7 @@ class MongoDBDataDB(DataDB):
             except:
                 pass
 
-        cursor = self.database[collection].find(filter_dict)
+        cursor = self._read_collection(collection).find(filter_dict)
 
         if sort_dict:
             cursor = cursor.sort(list(sort_dict.items()))
@@ -133,6 +308,88 @@ class MongoDBDataDB(DataDB):
         docs = await cursor.to_list(length=limit)
         return self._convert_objectids_in_list(docs)
 
+    async def iter_many(
+        self,
+        collection: str,
+        filter_dict: Optional[Dict[str, Any]] = None,
+        batch_size: int = 1000,
+        start_after: Optional[str] = None,
+        segment: int = 0,
+        total_segments: int = 1,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Iterate over matching documents with a server-side cursor sorted by _id
+
+        The cursor fetches batch_size documents per round trip (getMore), so
+        one batch at a time is held in memory. Segments are selected by a hash
+        of the _id on the client; each one still reads the whole cursor.
+        """
+        if self.database is None:
+            raise Exception("Database not connected")
+        if not 0 <= segment < total_segments:
+            raise ValueError(f"Invalid segment {segment} of {total_segments}")
+
+        filter_dict = self._convert_filter_ids(filter_dict or {})
+        if start_after is not None:
+            after = {"_id": {"$gt": ObjectId(start_after) if ObjectId.is_valid(start_after) else start_after}}
+            filter_dict = {"$and": [filter_dict, after]} if filter_dict else after
+
+        cursor = self._read_collection(collection).find(filter_dict, sort=[("_id", 1)], batch_size=batch_size)
+        try:
+            async for doc in cursor:
+                if in_segment(doc["_id"], segment, total_segments):
+                    yield self._convert_objectid(doc)
+        finally:
+            await cursor.close()
+
+    async def read_many_by_ids(
+        self, collection: str, ids: List[str]
+    ) -> List[Dict[str, Any]]:
+        """Read several documents by ID with a single $in query"""
+        if self.database is None:
+            raise Exception("Database not connected")
+
+        unique_ids = list(dict.fromkeys(str(doc_id) for doc_id in ids))
+        if not unique_ids:
+            return []
+
+        object_ids = []
+        for doc_id in unique_ids:
+            try:
+                object_ids.append(ObjectId(doc_id))
+            except Exception:
+                object_ids.append(doc_id)
+
+        cursor = self._read_collection(collection).find({"_id": {"$in": object_ids}})
+        docs = await cursor.to_list(length=len(object_ids))
+        by_id = {doc["_id"]: doc for doc in self._convert_objectids_in_list(docs)}
+        return [by_id[doc_id] for doc_id in unique_ids if doc_id in by_id]
+
+    async def count(
+        self,
+        collection: str,
+        filter_dict: Optional[Dict[str, Any]] = None,
+        estimated: bool = False,
+    ) -> int:
+        """Count documents on the server"""
+        if self.database is None:
+            raise Exception("Database not connected")
+
+        if not filter_dict:
+            if estimated:
+                # Reads collection metadata instead of scanning
+                return await self._read_collection(collection).estimated_document_count()
+            filter_dict = {}
+
+        # Convert string IDs to ObjectId if needed
+        if "_id" in filter_dict and isinstance(filter_dict["_id"], str):
+            try:
+                filter_dict["_id"] = ObjectId(filter_dict["_id"])
+            except InvalidId:
+                pass
+
+        return await self._read_collection(collection).count_documents(filter_dict)
+
     async def update_one(
         self, collection: str, filter_dict: Dict[str, Any], update_dict: Dict[str, Any]
     ) -> bool:
@@ -171,6 +428,76 @@ class MongoDBDataDB(DataDB):
         result = await self.database[collection].delete_one(filter_dict)
         return result.deleted_count > 0
 
+    def _convert_filter_ids(self, filter_dict: Dict[str, Any]) -> Dict[str, Any]:
+        """Convert string IDs (plain or in an $in list) to ObjectId where valid"""
+        def to_object_id(value: Any) -> Any:
+            if isinstance(value, str) and ObjectId.is_valid(value):
+                return ObjectId(value)
+            return value
+
+        doc_id = filter_dict.get("_id")
+        if isinstance(doc_id, str):
+            return {**filter_dict, "_id": to_object_id(doc_id)}
+        if isinstance(doc_id, dict) and isinstance(doc_id.get("$in"), list):
+            return {**filter_dict, "_id": {**doc_id, "$in": [to_object_id(v) for v in doc_id["$in"]]}}
+        return filter_dict
+
+    async def delete_many(self, collection: str, filter_dict: Dict[str, Any]) -> int:
+        """Delete every document matching a filter"""
+        if self.database is None:
+            raise Exception("Database not connected")
+
+        result = await self.database[collection].delete_many(self._convert_filter_ids(filter_dict))
+        return result.deleted_count
+
+    def _bulk_request(self, operation: Dict[str, Any]) -> Any:
+        """Translate a bulk operation dictionary into a pymongo request"""
+        if len(operation) != 1:
+            raise ValueError(f"Invalid bulk operation: {operation}")
+        name, spec = next(iter(operation.items()))
+
+        if name == "insert_one":
+            document = spec["document"]
+            document["created_at"] = datetime.utcnow()
+            document["updated_at"] = datetime.utcnow()
+            return InsertOne(document)
+        if name == "replace_one":
+            # Replacements keep the document as given, timestamps included
+            replacement = {k: v for k, v in spec["replacement"].items() if k != "_id"}
+            return ReplaceOne(
+                self._convert_filter_ids(spec["filter"]), replacement, upsert=spec.get("upsert", False)
+            )
+        if name == "update_one":
+            update = dict(spec["update"])
+            update["$set"] = {**update.get("$set", {}), "updated_at": datetime.utcnow()}
+            return UpdateOne(self._convert_filter_ids(spec["filter"]), update)
+        if name == "delete_one":
+            return DeleteOne(self._convert_filter_ids(spec["filter"]))
+        raise ValueError(f"Unsupported bulk operation: {name}")
+
+    async def bulk_write(
+        self, collection: str, operations: List[Dict[str, Any]], ordered: bool = True
+    ) -> Dict[str, int]:
+        """Apply a batch of write operations with a single bulk_write"""
+        if self.database is None:
+            raise Exception("Database not connected")
+
+        result = {"inserted_count": 0, "modified_count": 0, "upserted_count": 0, "deleted_count": 0}
+        if not operations:
+            return result
+
+        requests = [self._bulk_request(operation) for operation in operations]
+        try:
+            response = await self.database[collection].bulk_write(requests, ordered=ordered)
+        except BulkWriteError as e:
+            raise Exception(f"Error in MongoDB bulk write: {str(e.details.get('writeErrors', e))}")
+
+        result["inserted_count"] = response.inserted_count
+        result["modified_count"] = response.modified_count
+        result["upserted_count"] = response.upserted_count
+        result["deleted_count"] = response.deleted_count
+        return result
+
     async def aggregate(
         self, collection: str, pipeline: List[Dict[str, Any]]
     ) -> List[Dict[str, Any]]:
@@ -178,6 +505,75 @@ class MongoDBDataDB(DataDB):
         if self.database is None:
             raise Exception("Database not connected")
 
-        cursor = self.database[collection].aggregate(pipeline)
+        cursor = self._read_collection(collection).aggregate(pipeline)
         docs = await cursor.to_list(length=None)
         return self._convert_objectids_in_list(docs)
+
+    async def aggregate_iter(
+        self, collection: str, pipeline: List[Dict[str, Any]], batch_size: int = 1000
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Run the pipeline server-side, reading its cursor batch_size results per round trip"""
+        if self.database is None:
+            raise Exception("Database not connected")
+
+        cursor = self._read_collection(collection).aggregate(pipeline, batchSize=batch_size, allowDiskUse=True)
+        try:
+            async for doc in cursor:
+                yield self._convert_objectid(doc)
+        finally:
+            await cursor.close()
+
+    @staticmethod
+    def _lookup_stages(lookup: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Translate a DataDB lookup into $lookup stages"""
+        local_field = lookup.get("local_field", "_id")
+        foreign_field = lookup.get("foreign_field", "_id")
+        output = lookup["as"]
+
+        # Documents reference each other by the string form of their ObjectId
+        local_value: Any = f"${local_field}"
+        if local_field == "_id":
+            local_value = {"$toString": "$_id"}
+        elif foreign_field == "_id":
+            local_value = {"$convert": {"input": local_value, "to": "objectId", "onError": local_value, "onNull": None}}
+
+        # An equality $expr on the foreign field can use its index
+        pipeline: List[Dict[str, Any]] = [{"$match": {"$expr": {"$eq": [f"${foreign_field}", "$$value"]}}}]
+        if lookup.get("count"):
+            pipeline.append({"$count": "count"})
+            value = {"$ifNull": [{"$arrayElemAt": [f"${output}.count", 0]}, 0]}
+        else:
+            pipeline.append({"$limit": 1})
+            if lookup.get("fields"):
+                pipeline.append({"$project": {field: 1 for field in lookup["fields"]}})
+            value = {"$arrayElemAt": [f"${output}", 0]}
+
+        return [
+            {"$lookup": {"from": lookup["from"], "let": {"value": local_value}, "pipeline": pipeline, "as": output}},
+            {"$set": {output: value}},
+        ]
+
+    async def read_one_with_lookups(
+        self, collection: str, filter_dict: Dict[str, Any], lookups: List[Dict[str, Any]]
+    ) -> Optional[Dict[str, Any]]:
+        """Read a document and its related data in one round trip, joined with $lookup"""
+        if self.database is None:
+            raise Exception("Database not connected")
+
+        pipeline = [{"$match": self._convert_filter_ids(filter_dict)}, {"$limit": 1}]
+        for lookup in lookups:
+            pipeline.extend(self._lookup_stages(lookup))
+
+        cursor = self._read_collection(collection).aggregate(pipeline)
+        docs = await cursor.to_list(length=1)
+        if not docs:
+            return None
+
+        doc = self._convert_objectid(docs[0])
+        for lookup in lookups:
+            value = doc.get(lookup["as"])
+            if lookup.get("count"):
+                doc[lookup["as"]] = value or 0
+            else:
+                doc[lookup["as"]] = self._convert_objectid(value) if value else None
+        return doc
@@ -0,0 +1,159 @@
+"""
+Columnar snapshot of POIs for the map
+
+The map only needs IDs, coordinates, rating and primary tag. They are kept
+in NumPy arrays built from one read of the POI collection, and served as
+parallel arrays (one entry per POI) in JSON or MessagePack. Coordinates and
+ratings can be quantized to fixed-point integers. Encoded bodies are cached
+with the snapshot, so repeated requests cost no encoding at all.
+
+POI writes in this process invalidate the snapshot; the TTL bounds how long
+writes made by other processes stay invisible.
+"""
+import hashlib
+import json
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import msgpack
+import numpy as np
+
+from app.config import config
+from app.utils.protocols import DataDB
+from app.utils.singleflight import service_flights
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+
+# Ratings are stored rounded to one decimal
+RATING_SCALE = 10
+
+
+class POIMapSnapshot:
+    """Immutable columns of every POI, with a cache of encoded payloads"""
+
+    def __init__(self, documents: List[Dict[str, Any]], version: int):
+        self.version = version
+        self.built_at = time.monotonic()
+        self.ids = [str(doc["_id"]) for doc in documents]
+        count = len(self.ids)
+        self.lat = np.fromiter((doc.get("latitude", 0.0) for doc in documents), dtype=np.float64, count=count)
+        self.lon = np.fromiter((doc.get("longitude", 0.0) for doc in documents), dtype=np.float64, count=count)
+        self.rating = np.fromiter((doc.get("average_rating") or 0.0 for doc in documents), dtype=np.float64, count=count)
+        # Primary tags are dictionary-encoded: an index into self.tags, -1 without tags
+        codes: Dict[str, int] = {}
+        self.tag = np.full(count, -1, dtype=np.int32)
+        for i, doc in enumerate(documents):
+            tags = doc.get("tags")
+            if tags:
+                self.tag[i] = codes.setdefault(tags[0], len(codes))
+        self.tags: List[str] = list(codes)
+        self._encoded: Dict[Tuple[str, Optional[int]], Tuple[bytes, str]] = {}
+
+    def payload(self, precision: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Build the columnar payload
+
+        Args:
+            precision: Decimal digits kept in coordinates when quantizing to
+                integers, or None for floats
+
+        Returns:
+            Parallel arrays; each value is the encoded number divided by its scale
+        """
+        if precision is None:
+            coordinate_scale, rating_scale = 1, 1
+            lat, lon, rating = self.lat.tolist(), self.lon.tolist(), self.rating.tolist()
+        else:
+            coordinate_scale, rating_scale = 10 ** precision, RATING_SCALE
+            lat = np.rint(self.lat * coordinate_scale).astype(np.int64).tolist()
+            lon = np.rint(self.lon * coordinate_scale).astype(np.int64).tolist()
+            rating = np.rint(self.rating * rating_scale).astype(np.int64).tolist()
+        return {
+            "count": len(self.ids),
+            "coordinate_scale": coordinate_scale,
+            "rating_scale": rating_scale,
+            "ids": self.ids,
+            "lat": lat,
+            "lon": lon,
+            "rating": rating,
+            "tag": self.tag.tolist(),
+            "tags": self.tags,
+        }
+
+    def encode(self, media_type: str, precision: Optional[int] = None) -> Tuple[bytes, str]:
+        """
+        Encode the payload, once per media type and precision
+
+        Returns:
+            Body and its ETag
+        """
+        key = (media_type, precision)
+        encoded = self._encoded.get(key)
+        if encoded is None:
+            payload = self.payload(precision)
+            if media_type == MSGPACK:
+                body = msgpack.packb(payload, use_bin_type=True)
+            else:
+                body = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+            encoded = (body, f'"{hashlib.blake2b(body, digest_size=12).hexdigest()}"')
+            self._encoded[key] = encoded
+        return encoded
+
+
+class POIMapCache:
+    """Holds the current snapshot, rebuilding it after writes or when it expires"""
+
+    def __init__(self, ttl_seconds: float = 60.0):
+        self.ttl_seconds = ttl_seconds
+        self._snapshot: Optional[POIMapSnapshot] = None
+        self._version = 0
+        self.builds = 0
+        self.invalidations = 0
+
+    def invalidate(self) -> None:
+        """Mark the snapshot stale after a POI write"""
+        self._version += 1
+        self.invalidations += 1
+        # Requests arriving after the write must not join a build that read before it
+        service_flights.forget(("poi_map",))
+
+    async def get(self, data_db: DataDB) -> POIMapSnapshot:
+        """
+        Get a snapshot reflecting every POI write made by this process
+
+        Concurrent requests finding the snapshot stale share one rebuild.
+        """
+        snapshot = self._snapshot
+        if (
+            snapshot is not None
+            and snapshot.version == self._version
+            and time.monotonic() - snapshot.built_at < self.ttl_seconds
+        ):
+            return snapshot
+        return await service_flights.do(("poi_map",), lambda: self._build(data_db))
+
+    async def _build(self, data_db: DataDB) -> POIMapSnapshot:
+        version = self._version
+        total = await data_db.count("pois")
+        documents = await data_db.read_many("pois", limit=max(total, 1), sort_dict={"_id": 1})
+        snapshot = POIMapSnapshot(documents, version)
+        self.builds += 1
+        # A write during the read leaves the snapshot usable by this request only
+        if version == self._version:
+            self._snapshot = snapshot
+        return snapshot
+
+    def metrics(self) -> Dict[str, Any]:
+        """Size and age of the snapshot, rebuilds and invalidations"""
+        snapshot = self._snapshot
+        return {
+            "pois": len(snapshot.ids) if snapshot else 0,
+            "age_seconds": round(time.monotonic() - snapshot.built_at, 3) if snapshot else None,
+            "builds": self.builds,
+            "invalidations": self.invalidations,
+        }
+
+
+# Shared by every request handled by this process
+poi_map = POIMapCache(config.POI_MAP_TTL_SECONDS)
@@ -1,11 +1,29 @@
+import asyncio
+import tempfile
 from abc import ABC, abstractmethod
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, AsyncIterator
 from io import BytesIO
 
+from app.utils.aggregation import AggregationPipeline, batched
+from app.utils.query import in_segment
+from app.utils.uploads import UploadDigest
+
+# Streamed uploads buffered by the default upload_stream stay in memory up to
+# this size, and go to a temporary file past it
+SPOOL_MAX_MEMORY_BYTES = 1024 * 1024
+
 
 class FileDB(ABC):
     """Protocol for file storage operations"""
     
+    async def initialize(self) -> None:
+        """Open shared resources (HTTP sessions, connection pools), if any"""
+        pass
+
+    async def shutdown(self) -> None:
+        """Release the resources opened by initialize"""
+        pass
+
     @abstractmethod
     async def upload_file(
         self, 
@@ -28,6 +46,43 @@ class FileDB(ABC):
         """
         pass
     
+    async def upload_stream(
+        self,
+        chunks: AsyncIterator[bytes],
+        file_name: str,
+        content_type: str,
+        folder: Optional[str] = None,
+        max_size: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Upload a file received as a stream of chunks
+
+        The size limit is enforced and the SHA-256 computed as the chunks
+        arrive. This default spools the chunks to a temporary file (in
+        memory up to SPOOL_MAX_MEMORY_BYTES) and hands it to upload_file;
+        backends that can send a file as it is read override it.
+
+        Args:
+            chunks: File content
+            file_name: Name of the file
+            content_type: MIME type of the file
+            folder: Optional folder/path prefix
+            max_size: Maximum size in bytes, None for no limit
+
+        Returns:
+            {"url": URL of the uploaded file, "size": bytes, "sha256": hex digest}
+
+        Raises:
+            FileTooLargeError: If the file exceeds max_size (nothing is stored)
+        """
+        digest = UploadDigest(max_size)
+        with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY_BYTES) as spool:
+            async for chunk in digest.wrap(chunks):
+                await asyncio.to_thread(spool.write, chunk)
+            spool.seek(0)
+            url = await self.upload_file(spool, file_name, content_type, folder)
+        return {"url": url, "size": digest.size, "sha256": digest.sha256}
+
     @abstractmethod
     async def delete_file(self, file_url: str) -> bool:
         """
@@ -54,6 +109,15 @@ class FileDB(ABC):
         """
         pass
 
+    def metrics(self) -> Dict[str, Any]:
+        """
+        Get operational statistics (connection pools, request counts...)
+
+        Returns:
+            Metrics as a JSON-serializable dictionary, empty if not supported
+        """
+        return {}
+
 
 class DataDB(ABC):
     """Protocol for database operations"""
@@ -68,6 +132,15 @@ class DataDB(ABC):
         """Close connection to the database"""
         pass
     
+    def metrics(self) -> Dict[str, Any]:
+        """
+        Get operational statistics (connection pools, request counts...)
+
+        Returns:
+            Metrics as a JSON-serializable dictionary, empty if not supported
+        """
+        return {}
+
     @abstractmethod
     async def create(self, collection: str, document: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -82,6 +155,24 @@ class DataDB(ABC):
         """
         pass
     
+    @abstractmethod
+    async def create_many(
+        self,
+        collection: str,
+        documents: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Create several documents in as few round trips as possible
+
+        Args:
+            collection: Name of the collection
+            documents: Documents data as dictionaries
+
+        Returns:
+            Created documents with generated IDs, in the given order
+        """
+        pass
+
     @abstractmethod
     async def read_one(
         self, 
@@ -124,6 +215,95 @@ class DataDB(ABC):
         """
         pass
     
+    async def iter_many(
+        self,
+        collection: str,
+        filter_dict: Optional[Dict[str, Any]] = None,
+        batch_size: int = 1000,
+        start_after: Optional[str] = None,
+        segment: int = 0,
+        total_segments: int = 1
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Iterate over every document matching a filter, one batch at a time
+
+        Memory use is bounded by the batch size, whatever the collection size.
+        Documents come in a stable order (by _id, or the storage order of a
+        DynamoDB scan), so an interrupted iteration is resumed by passing the
+        _id of the last document received as start_after. With
+        total_segments > 1, the collection is split into disjoint segments
+        that separate iterations can read in parallel.
+
+        The default implementation pages through read_many by _id (keyset
+        pagination) and keeps the documents of the segment by a hash of their
+        _id. Backends with server-side cursors or parallel scans override it.
+
+        Args:
+            collection: Name of the collection
+            filter_dict: Filter criteria
+            batch_size: Documents fetched per round trip
+            start_after: Resume after the document with this _id
+            segment: Segment to read, from 0 to total_segments - 1
+            total_segments: Number of segments the collection is split into
+
+        Yields:
+            Matching documents
+        """
+        if not 0 <= segment < total_segments:
+            raise ValueError(f"Invalid segment {segment} of {total_segments}")
+        last_id = start_after
+        while True:
+            page_filter = dict(filter_dict or {})
+            if last_id is not None:
+                after = {"_id": {"$gt": last_id}}
+                page_filter = {"$and": [page_filter, after]} if "_id" in page_filter else {**page_filter, **after}
+            page = await self.read_many(collection, page_filter, limit=batch_size, sort_dict={"_id": 1})
+            for doc in page:
+                if in_segment(doc["_id"], segment, total_segments):
+                    yield doc
+            if len(page) < batch_size:
+                return
+            last_id = page[-1]["_id"]
+
+    @abstractmethod
+    async def read_many_by_ids(
+        self,
+        collection: str,
+        ids: List[str]
+    ) -> List[Dict[str, Any]]:
+        """
+        Read several documents by their IDs in as few round trips as possible
+
+        Args:
+            collection: Name of the collection
+            ids: Document IDs to fetch (duplicates are ignored)
+
+        Returns:
+            Found documents, in the order of the given IDs. Missing IDs are skipped.
+        """
+        pass
+
+    @abstractmethod
+    async def count(
+        self,
+        collection: str,
+        filter_dict: Optional[Dict[str, Any]] = None,
+        estimated: bool = False
+    ) -> int:
+        """
+        Count the documents matching a filter without fetching them
+
+        Args:
+            collection: Name of the collection
+            filter_dict: Filter criteria
+            estimated: Allow a cheaper, possibly stale count from collection
+                metadata. Only used when there is no filter.
+
+        Returns:
+            Number of matching documents
+        """
+        pass
+
     @abstractmethod
     async def update_one(
         self, 
@@ -162,6 +342,51 @@ class DataDB(ABC):
         """
         pass
     
+    @abstractmethod
+    async def delete_many(
+        self,
+        collection: str,
+        filter_dict: Dict[str, Any]
+    ) -> int:
+        """
+        Delete every document matching a filter
+
+        Args:
+            collection: Name of the collection
+            filter_dict: Filter criteria
+
+        Returns:
+            Number of deleted documents
+        """
+        pass
+
+    @abstractmethod
+    async def bulk_write(
+        self,
+        collection: str,
+        operations: List[Dict[str, Any]],
+        ordered: bool = True
+    ) -> Dict[str, int]:
+        """
+        Apply a batch of write operations
+
+        Each operation is a single-key dictionary, as in MongoDB:
+            {"insert_one": {"document": {...}}}
+            {"replace_one": {"filter": {...}, "replacement": {...}, "upsert": False}}
+            {"update_one": {"filter": {...}, "update": {...}}}
+            {"delete_one": {"filter": {...}}}
+
+        Args:
+            collection: Name of the collection
+            operations: Write operations
+            ordered: Apply operations in order and stop at the first error.
+                When False, operations may be reordered and every one is attempted.
+
+        Returns:
+            Counts of inserted, modified, upserted and deleted documents
+        """
+        pass
+
     @abstractmethod
     async def aggregate(
         self, 
@@ -180,3 +405,96 @@ class DataDB(ABC):
         """
         pass
 
+    async def aggregate_iter(
+        self,
+        collection: str,
+        pipeline: List[Dict[str, Any]],
+        batch_size: int = 1000
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Perform aggregation operations, yielding results as they are produced
+
+        Unlike aggregate, the result set is never held in memory as a whole;
+        only stages that need all of their input ($group, $sort, $count) keep
+        state, bounded by their output.
+
+        The default implementation streams the documents selected by a
+        leading $match from iter_many through the aggregation engine.
+        Backends that aggregate server-side override it.
+
+        Args:
+            collection: Name of the collection
+            pipeline: Aggregation pipeline
+            batch_size: Documents fetched per round trip
+
+        Yields:
+            Aggregated results
+        """
+        match = pipeline[0].get("$match") if pipeline else None
+        source = batched(self.iter_many(collection, match, batch_size), batch_size)
+        async for doc in AggregationPipeline(pipeline).stream(source):
+            yield doc
+
+    async def read_one_with_lookups(
+        self,
+        collection: str,
+        filter_dict: Dict[str, Any],
+        lookups: List[Dict[str, Any]]
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Read a document together with related data from other collections
+
+        Each lookup is a dictionary:
+            {"from": "users", "local_field": "author_id", "as": "author", "fields": ["name"]}
+            {"from": "photos", "foreign_field": "poi_id", "as": "photo_count", "count": True}
+        It matches local_field of the document (default "_id") against
+        foreign_field of the other collection (default "_id"), and stores
+        under "as" either the first related document (only _id and "fields",
+        when given; None if there is none) or, with "count", the number of
+        related documents.
+
+        The default implementation runs the lookups concurrently, starting
+        those keyed on the _id of an _id-only filter together with the read of
+        the document itself. Backends that can join server-side override it.
+
+        Args:
+            collection: Name of the collection
+            filter_dict: Filter criteria for the document
+            lookups: Related data to attach
+
+        Returns:
+            The document with the lookup results if found, None otherwise
+        """
+        async def run(lookup: Dict[str, Any], value: Any) -> Any:
+            related_filter = {lookup.get("foreign_field", "_id"): value}
+            if lookup.get("count"):
+                return await self.count(lookup["from"], related_filter)
+            related = await self.read_one(lookup["from"], related_filter)
+            if related is not None and lookup.get("fields"):
+                related = {k: v for k, v in related.items() if k == "_id" or k in lookup["fields"]}
+            return related
+
+        tasks: Dict[int, asyncio.Future] = {}
+        doc_id = filter_dict.get("_id") if len(filter_dict) == 1 else None
+        if isinstance(doc_id, str):
+            for index, lookup in enumerate(lookups):
+                if lookup.get("local_field", "_id") == "_id":
+                    tasks[index] = asyncio.ensure_future(run(lookup, doc_id))
+
+        doc = None
+        try:
+            doc = await self.read_one(collection, filter_dict)
+        finally:
+            if doc is None:
+                for task in tasks.values():
+                    task.cancel()
+        if doc is None:
+            return None
+
+        for index, lookup in enumerate(lookups):
+            if index not in tasks:
+                tasks[index] = asyncio.ensure_future(run(lookup, doc.get(lookup.get("local_field", "_id"))))
+        results = await asyncio.gather(*tasks.values())
+        for index, result in zip(tasks, results):
+            doc[lookups[index]["as"]] = result
+        return doc
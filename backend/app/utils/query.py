@@ -0,0 +1,242 @@
+"""
+In-process evaluation of Mongo-style queries and updates
+
+Used by backends that cannot evaluate filters or sorts server-side, and by
+the aggregation engine.
+"""
+import functools
+import zlib
+from typing import Any, Dict, List, Optional
+
+# Sentinel for fields absent from a document
+MISSING = object()
+
+COMPARISON_OPERATORS = {"$eq", "$ne", "$gt", "$gte", "$lt", "$lte", "$in", "$nin", "$exists"}
+
+UPDATE_OPERATORS = {"$set", "$unset", "$inc", "$min", "$max", "$push", "$addToSet", "$pull"}
+
+
+def get_field(doc: Dict[str, Any], path: str) -> Any:
+    """
+    Get a possibly dotted field from a document
+
+    Returns:
+        The field value, or MISSING if any path component is absent
+    """
+    value: Any = doc
+    for part in path.split("."):
+        if isinstance(value, dict) and part in value:
+            value = value[part]
+        else:
+            return MISSING
+    return value
+
+
+def _compare(left: Any, right: Any) -> Optional[int]:
+    """Three-way compare two values, None if they are not comparable"""
+    try:
+        if left < right:
+            return -1
+        if left > right:
+            return 1
+        return 0
+    except TypeError:
+        return None
+
+
+def _matches_value(value: Any, op: str, operand: Any) -> bool:
+    """Evaluate one operator against a present, scalar field value"""
+    if op == "$eq":
+        return value == operand
+    if op == "$ne":
+        return value != operand
+    if op == "$in":
+        return value in operand
+    if op == "$nin":
+        return value not in operand
+    result = _compare(value, operand)
+    if result is None:
+        return False
+    if op == "$gt":
+        return result > 0
+    if op == "$gte":
+        return result >= 0
+    if op == "$lt":
+        return result < 0
+    if op == "$lte":
+        return result <= 0
+    raise ValueError(f"Unsupported filter operator: {op}")
+
+
+def _matches_condition(value: Any, condition: Any) -> bool:
+    """Evaluate a field condition (plain value or operator dict)"""
+    if isinstance(condition, dict) and condition and all(k.startswith("$") for k in condition):
+        operators = condition
+    else:
+        operators = {"$eq": condition}
+
+    for op, operand in operators.items():
+        if op not in COMPARISON_OPERATORS:
+            raise ValueError(f"Unsupported filter operator: {op}")
+        if op == "$exists":
+            if (value is not MISSING) != bool(operand):
+                return False
+            continue
+        if value is MISSING:
+            # Missing fields compare equal to null and unequal to anything else
+            if op == "$eq":
+                matched = operand is None
+            elif op == "$ne":
+                matched = operand is not None
+            elif op in ("$in", "$nin"):
+                matched = (None in operand) == (op == "$in")
+            else:
+                matched = False
+            if not matched:
+                return False
+            continue
+        # Array fields match when the whole array or any element matches
+        if isinstance(value, list) and (op in ("$in", "$nin") or not isinstance(operand, list)):
+            candidates = [value] + value
+        else:
+            candidates = [value]
+        if op in ("$ne", "$nin"):
+            positive = "$eq" if op == "$ne" else "$in"
+            if any(_matches_value(v, positive, operand) for v in candidates):
+                return False
+        elif not any(_matches_value(v, op, operand) for v in candidates):
+            return False
+    return True
+
+
+def match_document(doc: Dict[str, Any], filter_dict: Optional[Dict[str, Any]]) -> bool:
+    """
+    Check whether a document matches a Mongo-style filter
+
+    Supports equality, $eq, $ne, $gt, $gte, $lt, $lte, $in, $nin, $exists,
+    and the $and / $or / $nor logical operators, on dotted field paths.
+    """
+    if not filter_dict:
+        return True
+    for key, condition in filter_dict.items():
+        if key == "$and":
+            if not all(match_document(doc, sub) for sub in condition):
+                return False
+        elif key == "$or":
+            if not any(match_document(doc, sub) for sub in condition):
+                return False
+        elif key == "$nor":
+            if any(match_document(doc, sub) for sub in condition):
+                return False
+        elif not _matches_condition(get_field(doc, key), condition):
+            return False
+    return True
+
+
+def compare_documents(a: Dict[str, Any], b: Dict[str, Any], sort_dict: Dict[str, int]) -> int:
+    """Three-way compare two documents by a Mongo-style sort spec, missing values first"""
+    for field, direction in sort_dict.items():
+        left, right = get_field(a, field), get_field(b, field)
+        left_missing = left is MISSING or left is None
+        right_missing = right is MISSING or right is None
+        if left_missing or right_missing:
+            result = (not left_missing) - (not right_missing)
+        else:
+            result = _compare(left, right)
+            if result is None:
+                # Fall back to ordering incomparable values by type name
+                result = _compare(type(left).__name__, type(right).__name__) or 0
+        if result:
+            return result if direction != -1 else -result
+    return 0
+
+
+def sort_key(sort_dict: Dict[str, int]):
+    """Build a key function for sorted()/heapq from a Mongo-style sort spec"""
+    return functools.cmp_to_key(lambda a, b: compare_documents(a, b, sort_dict))
+
+
+def sort_documents(docs: List[Dict[str, Any]], sort_dict: Optional[Dict[str, int]]) -> List[Dict[str, Any]]:
+    """Sort documents in place by a Mongo-style sort spec"""
+    if sort_dict:
+        docs.sort(key=sort_key(sort_dict))
+    return docs
+
+
+def in_segment(doc_id: Any, segment: int, total_segments: int) -> bool:
+    """Check whether a document ID falls in a segment, by a hash that is stable across processes"""
+    if total_segments <= 1:
+        return True
+    return zlib.crc32(str(doc_id).encode("utf-8")) % total_segments == segment
+
+
+def _parent(doc: Dict[str, Any], path: str, create: bool) -> Any:
+    """Get the dict holding the last component of a dotted path"""
+    parts = path.split(".")
+    target: Any = doc
+    for part in parts[:-1]:
+        if not isinstance(target, dict):
+            return None
+        if part not in target:
+            if not create:
+                return None
+            target[part] = {}
+        target = target[part]
+    return target if isinstance(target, dict) else None
+
+
+def set_field(doc: Dict[str, Any], path: str, value: Any) -> None:
+    """Set a possibly dotted field, creating intermediate documents"""
+    parent = _parent(doc, path, create=True)
+    if parent is None:
+        raise ValueError(f"Cannot set field '{path}' inside a non-document value")
+    parent[path.rsplit(".", 1)[-1]] = value
+
+
+def unset_field(doc: Dict[str, Any], path: str) -> None:
+    """Remove a possibly dotted field if present"""
+    parent = _parent(doc, path, create=False)
+    if parent is not None:
+        parent.pop(path.rsplit(".", 1)[-1], None)
+
+
+def apply_update(doc: Dict[str, Any], update_dict: Dict[str, Any]) -> None:
+    """
+    Apply a Mongo-style update to a document in place
+
+    Supports $set, $unset, $inc, $min, $max, $push (with $each), $addToSet
+    (with $each) and $pull (by value). An update without operators is applied
+    as a $set of its fields.
+    """
+    if not any(key.startswith("$") for key in update_dict):
+        update_dict = {"$set": update_dict}
+
+    for op, fields in update_dict.items():
+        if op not in UPDATE_OPERATORS:
+            raise ValueError(f"Unsupported update operator: {op}")
+        for path, operand in fields.items():
+            current = get_field(doc, path)
+            if op == "$set":
+                set_field(doc, path, operand)
+            elif op == "$unset":
+                unset_field(doc, path)
+            elif op == "$inc":
+                set_field(doc, path, operand if current is MISSING else current + operand)
+            elif op in ("$min", "$max"):
+                if current is MISSING or current is None:
+                    set_field(doc, path, operand)
+                else:
+                    result = _compare(operand, current)
+                    if result is not None and (result < 0 if op == "$min" else result > 0):
+                        set_field(doc, path, operand)
+            else:
+                items = current if isinstance(current, list) else []
+                if current is not MISSING and not isinstance(current, list):
+                    raise ValueError(f"Cannot apply {op} to non-array field '{path}'")
+                if op == "$pull":
+                    set_field(doc, path, [item for item in items if item != operand])
+                    continue
+                values = operand["$each"] if isinstance(operand, dict) and "$each" in operand else [operand]
+                if op == "$addToSet":
+                    values = [value for i, value in enumerate(values) if value not in items and value not in values[:i]]
+                set_field(doc, path, items + list(values))
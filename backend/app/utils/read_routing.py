@@ -0,0 +1,30 @@
+"""
+Per-request read routing
+
+Read-only routes that tolerate slightly stale data can send their reads to
+replicas. The choice is kept in a context variable, so it applies to every
+read made while handling the request without threading it through the
+services. Backends without replicas ignore it.
+"""
+from contextvars import ContextVar
+from typing import Optional, Tuple
+
+# (read preference, read concern level) for reads in the current context;
+# None means the connection defaults
+_read_routing: ContextVar[Optional[Tuple[str, str]]] = ContextVar("read_routing", default=None)
+
+
+def current_read_routing() -> Optional[Tuple[str, str]]:
+    """Get the read preference and read concern requested for the current context"""
+    return _read_routing.get()
+
+
+def set_read_routing(read_preference: str, read_concern: str = "") -> None:
+    """
+    Route the reads of the current context (e.g. the current request)
+
+    Args:
+        read_preference: MongoDB read preference mode name (e.g. "secondaryPreferred")
+        read_concern: Read concern level (e.g. "local"), empty for the default
+    """
+    _read_routing.set((read_preference, read_concern))
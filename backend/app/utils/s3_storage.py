@@ -1,26 +1,94 @@
+import asyncio
 import boto3
+import time
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
 from botocore.exceptions import ClientError
 from io import BytesIO
-from typing import Optional
+from typing import Any, AsyncIterator, Dict, List, Optional
 from urllib.parse import urlparse
 import uuid
 from datetime import datetime
 
 from app.config import config
 from app.utils.protocols import FileDB
+from app.utils.uploads import FileTooLargeError, UploadDigest
+
+MB = 1024 * 1024
 
 
 class S3FileDB(FileDB):
     """S3 implementation of FileDB protocol"""
 
     def __init__(self):
+        # One client for the process: its connection pool is shared by all
+        # transfers and must fit the parts uploaded in parallel
         self.s3_client = boto3.client(
             "s3",
             aws_access_key_id=config.AWS_ACCESS_KEY_ID,
             aws_secret_access_key=config.AWS_SECRET_ACCESS_KEY,
             region_name=config.AWS_REGION,
+            endpoint_url=config.S3_ENDPOINT_URL or None,
+            config=Config(
+                max_pool_connections=max(config.S3_MAX_POOL_CONNECTIONS, config.S3_MAX_CONCURRENCY),
+                connect_timeout=config.S3_CONNECT_TIMEOUT_SECONDS,
+                read_timeout=config.S3_READ_TIMEOUT_SECONDS,
+                retries={"max_attempts": config.S3_MAX_ATTEMPTS, "mode": "standard"},
+                s3={"addressing_style": "path"} if config.S3_ENDPOINT_URL else None,
+            ),
         )
         self.bucket_name = config.S3_BUCKET_NAME
+        self.transfer_config = TransferConfig(
+            multipart_threshold=config.S3_MULTIPART_THRESHOLD_MB * MB,
+            multipart_chunksize=config.S3_MULTIPART_CHUNKSIZE_MB * MB,
+            max_concurrency=config.S3_MAX_CONCURRENCY,
+            use_threads=True,
+        )
+        self.stats = {
+            "uploads": 0,
+            "multipart_uploads": 0,
+            "upload_errors": 0,
+            "bytes_uploaded": 0,
+            "uploads_in_flight": 0,
+            "upload_seconds_total": 0.0,
+            "deletes": 0,
+        }
+
+    def metrics(self) -> Dict[str, Any]:
+        """Upload statistics and transfer settings"""
+        stats = dict(self.stats)
+        seconds = stats.pop("upload_seconds_total")
+        done = stats["uploads"] + stats["upload_errors"]
+        return {
+            "backend": "s3",
+            "max_concurrency": config.S3_MAX_CONCURRENCY,
+            "multipart_threshold_mb": config.S3_MULTIPART_THRESHOLD_MB,
+            "multipart_chunksize_mb": config.S3_MULTIPART_CHUNKSIZE_MB,
+            **stats,
+            "upload_avg_ms": seconds * 1000 / done if done else 0.0,
+        }
+
+    def _public_url(self, s3_key: str) -> str:
+        if config.S3_ENDPOINT_URL:
+            return f"{config.S3_ENDPOINT_URL.rstrip('/')}/{self.bucket_name}/{s3_key}"
+        return f"https://{self.bucket_name}.s3.{config.AWS_REGION}.amazonaws.com/{s3_key}"
+
+    def _new_key(self, file_name: str, folder: Optional[str]) -> str:
+        """Unique S3 key keeping the extension of file_name"""
+        # Generate unique file name
+        timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
+        unique_id = str(uuid.uuid4())[:8]
+        file_extension = file_name.split(".")[-1] if "." in file_name else ""
+        safe_file_name = (
+            f"{timestamp}_{unique_id}.{file_extension}"
+            if file_extension
+            else f"{timestamp}_{unique_id}"
+        )
+
+        # Construct S3 key
+        if folder:
+            return f"{folder}/{safe_file_name}"
+        return safe_file_name
 
     async def upload_file(
         self, file_content: BytesIO, file_name: str, content_type: str, folder: Optional[str] = None
@@ -28,6 +96,10 @@ class S3FileDB(FileDB):
         """
         Upload a file to S3 and return its URL
 
+        The transfer runs in a worker thread, so the event loop keeps serving
+        requests. Files over S3_MULTIPART_THRESHOLD_MB are uploaded as
+        multipart uploads, S3_MAX_CONCURRENCY parts at a time.
+
         Args:
             file_content: File content as BytesIO
             file_name: Name of the file
@@ -37,28 +109,18 @@ class S3FileDB(FileDB):
         Returns:
             URL of the uploaded file
         """
-        # Generate unique file name
-        timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-        unique_id = str(uuid.uuid4())[:8]
-        file_extension = file_name.split(".")[-1] if "." in file_name else ""
-        safe_file_name = (
-            f"{timestamp}_{unique_id}.{file_extension}"
-            if file_extension
-            else f"{timestamp}_{unique_id}"
-        )
+        s3_key = self._new_key(file_name, folder)
 
-        # Construct S3 key
-        if folder:
-            s3_key = f"{folder}/{safe_file_name}"
-        else:
-            s3_key = safe_file_name
+        # Measure the file and reset file pointer to beginning
+        size = file_content.seek(0, 2)
+        file_content.seek(0)
 
+        started = time.perf_counter()
+        self.stats["uploads_in_flight"] += 1
         try:
-            # Reset file pointer to beginning
-            file_content.seek(0)
-
-            # Upload to S3
-            self.s3_client.upload_fileobj(
+            # Upload to S3, in a worker thread
+            await asyncio.to_thread(
+                self.s3_client.upload_fileobj,
                 file_content,
                 self.bucket_name,
                 s3_key,
@@ -66,14 +128,145 @@ class S3FileDB(FileDB):
                     "ContentType": content_type,
                     # "ACL": "public-read",  # Make file publicly accessible
                 },
+                Config=self.transfer_config,
             )
 
+            self.stats["uploads"] += 1
+            self.stats["bytes_uploaded"] += size
+            if size >= self.transfer_config.multipart_threshold:
+                self.stats["multipart_uploads"] += 1
+
             # Generate public URL
-            url = f"https://{self.bucket_name}.s3.{config.AWS_REGION}.amazonaws.com/{s3_key}"
-            return url
+            return self._public_url(s3_key)
 
         except ClientError as e:
+            self.stats["upload_errors"] += 1
+            raise Exception(f"Error uploading file to S3: {str(e)}")
+        except Exception as e:
+            self.stats["upload_errors"] += 1
+            raise Exception(f"Error uploading file to S3: {str(e)}")
+        finally:
+            self.stats["uploads_in_flight"] -= 1
+            self.stats["upload_seconds_total"] += time.perf_counter() - started
+
+    async def upload_stream(
+        self,
+        chunks: AsyncIterator[bytes],
+        file_name: str,
+        content_type: str,
+        folder: Optional[str] = None,
+        max_size: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Upload a file to S3 as it is received
+
+        Files up to S3_MULTIPART_THRESHOLD_MB are buffered and sent with one
+        PutObject. Larger ones become multipart uploads as soon as the
+        threshold is crossed: every S3_MULTIPART_CHUNKSIZE_MB received are
+        sent as a part, up to S3_MAX_CONCURRENCY parts at a time, and reading
+        waits while that many are in flight. Memory use is bounded by the
+        parts in flight, whatever the file size. A failed or oversized
+        upload is aborted, so no parts are left behind.
+
+        Args:
+            chunks: File content
+            file_name: Name of the file
+            content_type: MIME type of the file
+            folder: Optional folder/path prefix
+            max_size: Maximum size in bytes, None for no limit
+
+        Returns:
+            {"url": URL of the uploaded file, "size": bytes, "sha256": hex digest}
+
+        Raises:
+            FileTooLargeError: If the file exceeds max_size
+        """
+        s3_key = self._new_key(file_name, folder)
+        digest = UploadDigest(max_size)
+        threshold = self.transfer_config.multipart_threshold
+        part_size = self.transfer_config.multipart_chunksize
+        slots = asyncio.Semaphore(config.S3_MAX_CONCURRENCY)
+        buffer = bytearray()
+        upload_id = None
+        parts: List[Dict[str, Any]] = []
+        in_flight: List[asyncio.Task] = []
+
+        async def send_part(number: int, body: bytes) -> None:
+            try:
+                response = await asyncio.to_thread(
+                    self.s3_client.upload_part,
+                    Bucket=self.bucket_name, Key=s3_key, UploadId=upload_id, PartNumber=number, Body=body
+                )
+                parts.append({"ETag": response["ETag"], "PartNumber": number})
+            finally:
+                slots.release()
+
+        async def flush(body: bytes) -> None:
+            await slots.acquire()
+            in_flight.append(asyncio.ensure_future(send_part(len(in_flight) + 1, body)))
+
+        started = time.perf_counter()
+        self.stats["uploads_in_flight"] += 1
+        try:
+            async for chunk in digest.wrap(chunks):
+                buffer += chunk
+                if upload_id is None:
+                    if len(buffer) < threshold:
+                        continue
+                    response = await asyncio.to_thread(
+                        self.s3_client.create_multipart_upload,
+                        Bucket=self.bucket_name, Key=s3_key, ContentType=content_type
+                    )
+                    upload_id = response["UploadId"]
+                while len(buffer) >= part_size:
+                    body = bytes(buffer[:part_size])
+                    del buffer[:part_size]
+                    await flush(body)
+                # Surface a failed part without reading the rest of the file
+                for task in in_flight:
+                    if task.done() and task.exception() is not None:
+                        raise task.exception()
+
+            if upload_id is None:
+                await asyncio.to_thread(
+                    self.s3_client.put_object,
+                    Bucket=self.bucket_name, Key=s3_key, Body=bytes(buffer), ContentType=content_type
+                )
+            else:
+                if buffer:
+                    await flush(bytes(buffer))
+                    buffer.clear()
+                await asyncio.gather(*in_flight)
+                await asyncio.to_thread(
+                    self.s3_client.complete_multipart_upload,
+                    Bucket=self.bucket_name,
+                    Key=s3_key,
+                    UploadId=upload_id,
+                    MultipartUpload={"Parts": sorted(parts, key=lambda part: part["PartNumber"])}
+                )
+                self.stats["multipart_uploads"] += 1
+
+            self.stats["uploads"] += 1
+            self.stats["bytes_uploaded"] += digest.size
+            return {"url": self._public_url(s3_key), "size": digest.size, "sha256": digest.sha256}
+
+        except BaseException as e:
+            self.stats["upload_errors"] += 1
+            await asyncio.gather(*in_flight, return_exceptions=True)
+            if upload_id is not None:
+                try:
+                    await asyncio.to_thread(
+                        self.s3_client.abort_multipart_upload,
+                        Bucket=self.bucket_name, Key=s3_key, UploadId=upload_id
+                    )
+                except ClientError as abort_error:
+                    print(f"Error aborting S3 multipart upload {upload_id}: {str(abort_error)}")
+            if isinstance(e, (FileTooLargeError, asyncio.CancelledError)):
+                raise
             raise Exception(f"Error uploading file to S3: {str(e)}")
+        finally:
+            self.stats["uploads_in_flight"] -= 1
+            self.stats["upload_seconds_total"] += time.perf_counter() - started
 
     async def delete_file(self, file_url: str) -> bool:
         """
@@ -86,12 +279,15 @@ class S3FileDB(FileDB):
             True if deleted successfully, False otherwise
         """
         try:
-            # Extract S3 key from URL
+            # Extract S3 key from URL (path-style URLs start with the bucket)
             parsed_url = urlparse(file_url)
             s3_key = parsed_url.path.lstrip("/")
+            if config.S3_ENDPOINT_URL and s3_key.startswith(f"{self.bucket_name}/"):
+                s3_key = s3_key[len(self.bucket_name) + 1:]
 
-            # Delete from S3
-            self.s3_client.delete_object(Bucket=self.bucket_name, Key=s3_key)
+            # Delete from S3, in a worker thread
+            await asyncio.to_thread(self.s3_client.delete_object, Bucket=self.bucket_name, Key=s3_key)
+            self.stats["deletes"] += 1
             return True
 
         except ClientError as e:
@@ -108,4 +304,4 @@ class S3FileDB(FileDB):
         Returns:
             Public URL of the file
         """
-        return f"https://{self.bucket_name}.s3.{config.AWS_REGION}.amazonaws.com/{file_path}"
+        return self._public_url(file_path)
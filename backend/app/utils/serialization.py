@@ -0,0 +1,56 @@
+"""
+Fast path for returning database-sourced lists
+
+List endpoints used to build each model with Model(**doc), then FastAPI
+validated the list again against the route's response_model and encoded it
+with jsonable_encoder + json.dumps. Documents read from our own database
+are now loaded in a single pass of the compiled list validator, and
+returned as a TrustedJSONResponse, serialized once by pydantic-core.
+Returning a Response keeps FastAPI from validating the objects again; the
+response_model stays declared for the OpenAPI schema.
+
+model_construct is not used: in pydantic 2 it runs in Python and costs
+more per item than the compiled validator.
+"""
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Type, TypeVar
+
+from fastapi import Response
+from pydantic import BaseModel, TypeAdapter
+
+M = TypeVar("M", bound=BaseModel)
+
+
+@lru_cache(maxsize=None)
+def _list_adapter(model: Type[BaseModel]) -> TypeAdapter:
+    return TypeAdapter(List[model])
+
+
+def load_many(model: Type[M], docs: Iterable[Dict[str, Any]]) -> List[M]:
+    """
+    Build models from database documents in one call to the compiled validator
+
+    Same result as [model(**doc) for doc in docs], without a Python-level
+    call per document.
+    """
+    return _list_adapter(model).validate_python(docs if isinstance(docs, list) else list(docs))
+
+
+def dump_json_list(model: Type[M], items: List[M]) -> bytes:
+    """Serialize models to a JSON array, with field aliases like FastAPI responses"""
+    return _list_adapter(model).dump_json(items, by_alias=True)
+
+
+class TrustedJSONResponse(Response):
+    """JSON response for a list of models that are known to be valid"""
+
+    media_type = "application/json"
+
+    def __init__(
+        self,
+        model: Type[M],
+        items: List[M],
+        status_code: int = 200,
+        headers: Optional[Mapping[str, str]] = None,
+    ):
+        super().__init__(content=dump_json_list(model, items), status_code=status_code, headers=headers)
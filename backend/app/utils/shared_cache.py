@@ -0,0 +1,341 @@
+"""
+Shared second-level document cache
+
+Workers and replicas share one cache tier, so a document read by one of
+them is a hit for all, and memory is not multiplied per process. Entries
+are msgpack-encoded documents keyed by collection and ID. Writes delete
+their keys and broadcast an invalidation on a pub/sub channel; every
+worker then evicts the keys from its own in-process cache.
+
+RedisSharedCache talks to Redis; LocalSharedCache is an in-process
+stand-in with the same behaviour, for tests and single-process runs.
+"""
+import asyncio
+import struct
+import time
+import uuid
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import msgpack
+
+# Called with (collection, ids) for invalidations published by other workers,
+# or (None, None) when messages may have been lost and everything is suspect
+InvalidationCallback = Callable[[Optional[str], Optional[List[str]]], None]
+
+# msgpack extension types
+_EXT_DATETIME = 1  # naive datetime, microseconds since the epoch
+_EXT_DATETIME_UTC = 2  # aware datetime, microseconds since the epoch in UTC
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _pack_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            return msgpack.ExtType(_EXT_DATETIME, struct.pack(">q", (value - _EPOCH) // timedelta(microseconds=1)))
+        utc = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return msgpack.ExtType(_EXT_DATETIME_UTC, struct.pack(">q", (utc - _EPOCH) // timedelta(microseconds=1)))
+    if isinstance(value, (set, tuple)):
+        return list(value)
+    return str(value)
+
+
+def _ext_hook(code: int, data: bytes) -> Any:
+    if code in (_EXT_DATETIME, _EXT_DATETIME_UTC):
+        value = _EPOCH + timedelta(microseconds=struct.unpack(">q", data)[0])
+        return value if code == _EXT_DATETIME else value.replace(tzinfo=timezone.utc)
+    return msgpack.ExtType(code, data)
+
+
+def pack_document(document: Dict[str, Any]) -> bytes:
+    """Serialize a document to compact msgpack bytes, keeping datetimes"""
+    return msgpack.packb(document, default=_pack_default, use_bin_type=True)
+
+
+def unpack_document(data: bytes) -> Dict[str, Any]:
+    """Deserialize a document packed by pack_document"""
+    return msgpack.unpackb(data, ext_hook=_ext_hook, raw=False, strict_map_key=False)
+
+
+class SharedCache(ABC):
+    """Protocol for the shared cache tier"""
+
+    def __init__(self, prefix: str, channel: str, ttl_seconds: float, redelete_ms: float):
+        self.prefix = prefix
+        self.channel = channel
+        self.ttl_ms = max(1, int(ttl_seconds * 1000))
+        self.redelete_ms = redelete_ms
+        # Identifies this worker's own broadcasts, which it does not need to apply
+        self.origin = uuid.uuid4().hex
+        self._callback: Optional[InvalidationCallback] = None
+        self._redeletes: set = set()
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.published = 0
+        self.received = 0
+
+    def key(self, collection: str, doc_id: str) -> str:
+        return f"{self.prefix}:{collection}:{doc_id}"
+
+    def metrics(self) -> Dict[str, Any]:
+        """Hit ratio of the shared tier, errors and invalidation traffic"""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "errors": self.errors,
+            "invalidations_published": self.published,
+            "invalidations_received": self.received,
+        }
+
+    @abstractmethod
+    async def connect(self, callback: InvalidationCallback) -> None:
+        """Connect and start receiving the invalidations of other workers"""
+        pass
+
+    @abstractmethod
+    async def disconnect(self) -> None:
+        """Stop receiving invalidations and close the connection"""
+        pass
+
+    @abstractmethod
+    async def _mget(self, keys: List[str]) -> List[Optional[bytes]]:
+        """Fetch several keys in one round trip"""
+        pass
+
+    @abstractmethod
+    async def _mset(self, items: List[Tuple[str, bytes]]) -> None:
+        """Store several keys with the TTL in one round trip"""
+        pass
+
+    @abstractmethod
+    async def _delete(self, keys: List[str], message: Optional[bytes]) -> None:
+        """Delete keys and, if given, publish the message, in one round trip"""
+        pass
+
+    async def get_many(self, collection: str, doc_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Fetch cached documents
+
+        Args:
+            collection: Name of the collection
+            doc_ids: Document IDs
+
+        Returns:
+            The cached documents by ID; misses and failures are left out
+        """
+        if not doc_ids:
+            return {}
+        try:
+            values = await self._mget([self.key(collection, doc_id) for doc_id in doc_ids])
+        except Exception:
+            self.errors += 1
+            return {}
+        found = {}
+        for doc_id, value in zip(doc_ids, values):
+            if value is None:
+                self.misses += 1
+                continue
+            try:
+                found[doc_id] = unpack_document(value)
+                self.hits += 1
+            except Exception:
+                self.errors += 1
+        return found
+
+    async def set_many(self, collection: str, documents: List[Dict[str, Any]]) -> None:
+        """Cache documents by their _id; failures only cost future hits"""
+        items = [(self.key(collection, str(doc["_id"])), pack_document(doc)) for doc in documents]
+        if not items:
+            return
+        try:
+            await self._mset(items)
+        except Exception:
+            self.errors += 1
+
+    async def invalidate(self, collection: str, doc_ids: List[str]) -> None:
+        """
+        Delete documents from the shared tier and tell every worker to evict them
+
+        The keys are deleted a second time after redelete_ms, in case another
+        worker stored a copy it had read just before the write.
+        """
+        if not doc_ids:
+            return
+        keys = [self.key(collection, doc_id) for doc_id in doc_ids]
+        message = msgpack.packb({"origin": self.origin, "collection": collection, "ids": list(doc_ids)})
+        try:
+            await self._delete(keys, message)
+            self.published += 1
+        except Exception:
+            self.errors += 1
+        if self.redelete_ms > 0:
+            task = asyncio.ensure_future(self._redelete(keys))
+            self._redeletes.add(task)
+            task.add_done_callback(self._redeletes.discard)
+
+    async def _redelete(self, keys: List[str]) -> None:
+        await asyncio.sleep(self.redelete_ms / 1000)
+        try:
+            await self._delete(keys, None)
+        except Exception:
+            self.errors += 1
+
+    def _cancel_redeletes(self) -> None:
+        for task in list(self._redeletes):
+            task.cancel()
+
+    def _receive(self, data: Optional[bytes]) -> None:
+        """Apply a broadcast invalidation; None signals possibly lost messages"""
+        if self._callback is None:
+            return
+        if data is None:
+            self._callback(None, None)
+            return
+        try:
+            message = msgpack.unpackb(data, raw=False)
+        except Exception:
+            self.errors += 1
+            return
+        if message.get("origin") == self.origin:
+            return
+        self.received += 1
+        self._callback(message["collection"], message["ids"])
+
+
+class RedisSharedCache(SharedCache):
+    """Shared cache on Redis: MGET, pipelined SET PX, DEL + PUBLISH"""
+
+    def __init__(self, url: str, prefix: str, channel: str, ttl_seconds: float, redelete_ms: float):
+        super().__init__(prefix, channel, ttl_seconds, redelete_ms)
+        self.url = url
+        self.client = None
+        self._pubsub = None
+        self._listener: Optional[asyncio.Task] = None
+
+    async def connect(self, callback: InvalidationCallback) -> None:
+        # Only deployments using Redis need the client library
+        import redis.asyncio as redis
+
+        self._callback = callback
+        self.client = redis.from_url(self.url)
+        await self.client.ping()
+        self._pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        await self._pubsub.subscribe(self.channel)
+        self._listener = asyncio.create_task(self._listen())
+
+    async def disconnect(self) -> None:
+        self._cancel_redeletes()
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+        if self._pubsub is not None:
+            await self._pubsub.aclose()
+            self._pubsub = None
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    async def _listen(self) -> None:
+        """Apply invalidations as they arrive, resubscribing after connection losses"""
+        while True:
+            try:
+                async for message in self._pubsub.listen():
+                    if message["type"] == "message":
+                        self._receive(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self.errors += 1
+            # The subscription dropped: invalidations sent meanwhile are lost
+            self._receive(None)
+            await asyncio.sleep(1)
+            try:
+                await self._pubsub.subscribe(self.channel)
+            except Exception:
+                self.errors += 1
+
+    async def _mget(self, keys: List[str]) -> List[Optional[bytes]]:
+        return await self.client.mget(keys)
+
+    async def _mset(self, items: List[Tuple[str, bytes]]) -> None:
+        async with self.client.pipeline(transaction=False) as pipe:
+            for key, value in items:
+                pipe.set(key, value, px=self.ttl_ms)
+            await pipe.execute()
+
+    async def _delete(self, keys: List[str], message: Optional[bytes]) -> None:
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.delete(*keys)
+            if message is not None:
+                pipe.publish(self.channel, message)
+            await pipe.execute()
+
+
+class _LocalServer:
+    """Keys with expiry and channel subscribers, shared by LocalSharedCache instances"""
+
+    def __init__(self):
+        self.entries: Dict[str, Tuple[float, bytes]] = {}
+        self.subscribers: Dict[str, List[Callable[[bytes], None]]] = {}
+
+
+_LOCAL_SERVERS: Dict[str, _LocalServer] = {}
+
+
+class LocalSharedCache(SharedCache):
+    """
+    In-process stand-in for RedisSharedCache
+
+    Instances created with the same name share one store and channel, like
+    workers connected to the same Redis server. Values are serialized and
+    messages delivered asynchronously, as over the network.
+    """
+
+    def __init__(self, name: str, prefix: str, channel: str, ttl_seconds: float, redelete_ms: float):
+        super().__init__(prefix, channel, ttl_seconds, redelete_ms)
+        self.server = _LOCAL_SERVERS.setdefault(name, _LocalServer())
+
+    async def connect(self, callback: InvalidationCallback) -> None:
+        self._callback = callback
+        self.server.subscribers.setdefault(self.channel, []).append(self._deliver)
+
+    async def disconnect(self) -> None:
+        self._cancel_redeletes()
+        subscribers = self.server.subscribers.get(self.channel, [])
+        if self._deliver in subscribers:
+            subscribers.remove(self._deliver)
+
+    def _deliver(self, data: bytes) -> None:
+        asyncio.get_running_loop().call_soon(self._receive, data)
+
+    async def _mget(self, keys: List[str]) -> List[Optional[bytes]]:
+        now = time.monotonic()
+        values = []
+        for key in keys:
+            entry = self.server.entries.get(key)
+            if entry is not None and entry[0] <= now:
+                del self.server.entries[key]
+                entry = None
+            values.append(entry[1] if entry is not None else None)
+        return values
+
+    async def _mset(self, items: List[Tuple[str, bytes]]) -> None:
+        expires_at = time.monotonic() + self.ttl_ms / 1000
+        for key, value in items:
+            self.server.entries[key] = (expires_at, value)
+
+    async def _delete(self, keys: List[str], message: Optional[bytes]) -> None:
+        for key in keys:
+            self.server.entries.pop(key, None)
+        if message is not None:
+            for deliver in list(self.server.subscribers.get(self.channel, [])):
+                deliver(message)
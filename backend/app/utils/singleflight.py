@@ -0,0 +1,98 @@
+"""
+Single-flight deduplication of identical concurrent calls
+
+When many requests ask for the same thing at the same moment (a popular
+POI being shared), only the first one runs the call; the others await its
+result. Keys name the operation and its arguments, e.g. ("poi_detail", id).
+Results are shared between callers, so they must be treated as read-only.
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple, TypeVar
+
+T = TypeVar("T")
+
+# Number of keys with the largest fan-in kept in the metrics
+HOT_KEYS = 20
+
+
+class SingleFlight:
+    """Registry of in-flight calls by key"""
+
+    def __init__(self):
+        self._calls: Dict[Hashable, Tuple[asyncio.Task, int]] = {}
+        # Per operation: calls, executions, and peak concurrency of a single key
+        self._operations: Dict[str, Dict[str, int]] = {}
+        # Largest number of callers seen sharing one execution, by key
+        self._hot_keys: Dict[str, int] = {}
+
+    async def do(self, key: Tuple[Any, ...], call: Callable[[], Awaitable[T]]) -> T:
+        """
+        Run a call, or join the identical call already in flight
+
+        Args:
+            key: Operation name followed by the call arguments
+            call: Starts the call; only invoked when no call with this key is running
+
+        Returns:
+            The result of the shared call (raises its exception)
+        """
+        stats = self._operations.setdefault(
+            str(key[0]), {"calls": 0, "executions": 0, "shared": 0, "peak_concurrency": 0}
+        )
+        stats["calls"] += 1
+
+        entry = self._calls.get(key)
+        if entry is None:
+            stats["executions"] += 1
+            # A task of its own, so a caller going away does not cancel the others
+            task = asyncio.ensure_future(call())
+            task.add_done_callback(lambda done, key=key: self._finish(key, done))
+            concurrency = 1
+        else:
+            stats["shared"] += 1
+            task, concurrency = entry
+            concurrency += 1
+        self._calls[key] = (task, concurrency)
+        stats["peak_concurrency"] = max(stats["peak_concurrency"], concurrency)
+
+        return await asyncio.shield(task)
+
+    def forget(self, key: Tuple[Any, ...]) -> None:
+        """
+        Let later callers start a new call instead of joining the one in flight
+
+        Used after a write, so readers do not get a result read before it.
+        """
+        self._calls.pop(key, None)
+
+    def _finish(self, key: Hashable, task: asyncio.Task) -> None:
+        if not task.cancelled():
+            # Mark the exception retrieved; the callers have already received it
+            task.exception()
+        entry = self._calls.get(key)
+        if entry is None or entry[0] is not task:
+            return
+        del self._calls[key]
+
+        concurrency = entry[1]
+        if concurrency > 1:
+            name = repr(key)
+            if name in self._hot_keys or len(self._hot_keys) < HOT_KEYS:
+                self._hot_keys[name] = max(self._hot_keys.get(name, 0), concurrency)
+            else:
+                coldest = min(self._hot_keys, key=self._hot_keys.get)
+                if self._hot_keys[coldest] < concurrency:
+                    del self._hot_keys[coldest]
+                    self._hot_keys[name] = concurrency
+
+    def metrics(self) -> Dict[str, Any]:
+        """Per-operation deduplication counts, and the keys with the largest fan-in"""
+        return {
+            "operations": {name: dict(stats) for name, stats in self._operations.items()},
+            "in_flight": {repr(key): concurrency for key, (_, concurrency) in self._calls.items()},
+            "hot_keys": dict(sorted(self._hot_keys.items(), key=lambda item: -item[1])),
+        }
+
+
+# Shared by every request handled by this process
+service_flights = SingleFlight()
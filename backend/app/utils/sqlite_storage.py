@@ -0,0 +1,762 @@
+import asyncio
+import json
+import queue
+import sqlite3
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Set, Tuple
+
+from app.config import config
+from app.utils.aggregation import AggregationPipeline
+from app.utils.dynamodb_codec import get_codec
+from app.utils.protocols import DataDB
+from app.utils.query import COMPARISON_OPERATORS, apply_update
+
+# Hot fields per collection, materialized as generated columns and indexed.
+# Other fields are read from the JSON document with json_extract.
+SQLITE_SCHEMAS: Dict[str, Dict[str, List[Any]]] = {
+    "users": {
+        "columns": ["email", "total_score"],
+        "indexes": [["email"], ["total_score"]],
+    },
+    "pois": {
+        "columns": ["author_id", "created_at"],
+        "indexes": [["created_at"], ["author_id", "created_at"]],
+    },
+    "photos": {
+        "columns": ["poi_id", "author_id", "created_at"],
+        "indexes": [["poi_id", "created_at"], ["author_id", "created_at"]],
+    },
+    "ratings": {
+        "columns": ["user_id", "target_type", "target_id", "created_at"],
+        "indexes": [["target_type", "target_id"], ["user_id", "target_type", "target_id"]],
+    },
+}
+
+# Maximum queued writes committed together in one transaction
+WRITE_BATCH_SIZE = 100
+
+# Stay well below SQLite's limit on bound parameters per statement
+MAX_VARIABLES = 500
+
+# SQL aggregate functions for $group accumulators over a field
+_SQL_ACCUMULATORS = {"$sum": "SUM", "$avg": "AVG", "$min": "MIN", "$max": "MAX"}
+
+
+def _encode_json(value: Any) -> Any:
+    """json.dumps fallback: timestamps as ISO strings, which sort chronologically"""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def _sql_value(value: Any) -> Any:
+    """Convert a filter operand to the value json_extract would return"""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, separators=(",", ":"), default=_encode_json)
+    return value
+
+
+def _quote(identifier: str) -> str:
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+class SQLiteDataDB(DataDB):
+    """
+    SQLite implementation of DataDB protocol, for single-node deployments
+
+    Each collection is a table of JSON documents keyed by _id, with the hot
+    fields exposed as indexed generated columns. The database runs in WAL
+    mode: a single writer thread commits queued writes in batches, while a
+    pool of reader connections serves queries concurrently, both off the
+    event loop.
+    """
+
+    def __init__(self):
+        self.path = config.SQLITE_PATH
+        self.reader_count = max(1, config.SQLITE_READERS)
+        self._write_queue: "queue.Queue[Any]" = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+        self._readers: Optional[ThreadPoolExecutor] = None
+        self._local = threading.local()
+        self._reader_connections: List[sqlite3.Connection] = []
+        self._reader_lock = threading.Lock()
+        self._tables: Set[str] = set()
+        self.reads = 0
+        self.writes = 0
+        self.write_batches = 0
+        self.largest_batch = 0
+
+    def metrics(self) -> Dict[str, Any]:
+        """Read and write counts, and how well writes are grouped into transactions"""
+        return {
+            "backend": "sqlite",
+            "reads": self.reads,
+            "writes": self.writes,
+            "write_batches": self.write_batches,
+            "largest_batch": self.largest_batch,
+            "queued_writes": self._write_queue.qsize(),
+        }
+
+    # Connections and threads
+
+    def _open(self, read_only: bool) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.path,
+            timeout=config.SQLITE_BUSY_TIMEOUT_MS / 1000,
+            isolation_level=None,
+            check_same_thread=False,
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        # In WAL mode NORMAL only risks the last transactions on power loss, never corruption
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA cache_size=-16000")
+        conn.execute("PRAGMA mmap_size=268435456")
+        if read_only:
+            conn.execute("PRAGMA query_only=1")
+        return conn
+
+    async def connect(self) -> None:
+        """Create the tables and start the writer thread and reader pool"""
+        if self._writer is not None:
+            return
+
+        conn = self._open(read_only=False)
+        try:
+            existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            self._tables = existing
+            for collection in SQLITE_SCHEMAS:
+                self._ensure_table(conn, collection)
+        finally:
+            conn.close()
+
+        self._writer = threading.Thread(target=self._writer_loop, name="sqlite-writer", daemon=True)
+        self._writer.start()
+        self._readers = ThreadPoolExecutor(max_workers=self.reader_count, thread_name_prefix="sqlite-reader")
+
+    async def disconnect(self) -> None:
+        """Flush pending writes and close every connection"""
+        if self._writer is None:
+            return
+        self._write_queue.put(None)
+        await asyncio.to_thread(self._writer.join)
+        self._writer = None
+        self._readers.shutdown(wait=True)
+        self._readers = None
+        with self._reader_lock:
+            for conn in self._reader_connections:
+                conn.close()
+            self._reader_connections.clear()
+        self._local = threading.local()
+
+    def _ensure_table(self, conn: sqlite3.Connection, collection: str) -> None:
+        """Create a collection table, its generated columns and indexes if missing"""
+        table = _quote(collection)
+        schema = SQLITE_SCHEMAS.get(collection, {"columns": [], "indexes": []})
+        conn.execute(f"CREATE TABLE IF NOT EXISTS {table} (id TEXT PRIMARY KEY, doc TEXT NOT NULL)")
+        present = {row[1] for row in conn.execute(f"PRAGMA table_xinfo({table})")}
+        for column in schema["columns"]:
+            if column not in present:
+                conn.execute(
+                    f"ALTER TABLE {table} ADD COLUMN {_quote(column)} "
+                    f"GENERATED ALWAYS AS (json_extract(doc, '$.{column}')) VIRTUAL"
+                )
+        for columns in schema["indexes"]:
+            name = _quote(f"idx_{collection}_{'_'.join(columns)}")
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({', '.join(map(_quote, columns))})")
+        self._tables.add(collection)
+
+    def _writer_loop(self) -> None:
+        """Apply queued writes, committing each batch in a single transaction"""
+        conn = self._open(read_only=False)
+        running = True
+        while running:
+            batch = [self._write_queue.get()]
+            while len(batch) < WRITE_BATCH_SIZE:
+                try:
+                    batch.append(self._write_queue.get_nowait())
+                except queue.Empty:
+                    break
+            if None in batch:
+                running = False
+                batch = [job for job in batch if job is not None]
+            if not batch:
+                continue
+            self.write_batches += 1
+            self.largest_batch = max(self.largest_batch, len(batch))
+
+            outcomes: List[Tuple[Any, Optional[BaseException]]] = []
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                for work, _, _ in batch:
+                    # A savepoint per write, so one failure does not undo the others
+                    conn.execute("SAVEPOINT write")
+                    try:
+                        outcomes.append((work(conn), None))
+                        conn.execute("RELEASE write")
+                    except Exception as e:
+                        conn.execute("ROLLBACK TO write")
+                        conn.execute("RELEASE write")
+                        outcomes.append((None, e))
+                conn.execute("COMMIT")
+            except Exception as e:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                outcomes = [(None, e)] * len(batch)
+
+            # Results are only reported once committed
+            for (_, future, loop), (result, error) in zip(batch, outcomes):
+                loop.call_soon_threadsafe(self._resolve, future, result, error)
+        conn.close()
+
+    @staticmethod
+    def _resolve(future: asyncio.Future, result: Any, error: Optional[BaseException]) -> None:
+        if future.cancelled():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    async def _write(self, work: Callable[[sqlite3.Connection], Any]) -> Any:
+        """Run a write on the writer thread and wait until it is committed"""
+        if self._writer is None:
+            raise Exception("Database not connected")
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.writes += 1
+        self._write_queue.put((work, future, loop))
+        return await future
+
+    def _reader_connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._open(read_only=True)
+            with self._reader_lock:
+                self._reader_connections.append(conn)
+        return conn
+
+    async def _read(self, work: Callable[[sqlite3.Connection], Any]) -> Any:
+        """Run a query on a pooled reader connection"""
+        if self._readers is None:
+            raise Exception("Database not connected")
+        self.reads += 1
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._readers, lambda: work(self._reader_connection()))
+
+    # Documents
+
+    def _encode(self, document: Dict[str, Any]) -> str:
+        return json.dumps(document, separators=(",", ":"), default=_encode_json)
+
+    def _decode(self, collection: str, text: str) -> Dict[str, Any]:
+        document = json.loads(text)
+        for field, kind in get_codec(collection).fields.items():
+            if kind == "datetime" and isinstance(document.get(field), str):
+                try:
+                    document[field] = datetime.fromisoformat(document[field])
+                except ValueError:
+                    pass
+        return document
+
+    def _datetime_fields(self, collection: str) -> Set[str]:
+        return {field for field, kind in get_codec(collection).fields.items() if kind == "datetime"}
+
+    # Query translation
+
+    def _path(self, field: str) -> str:
+        """JSON path literal for a (possibly dotted) document field"""
+        path = "$." + ".".join('"' + part.replace('"', '') + '"' for part in field.split("."))
+        return "'" + path.replace("'", "''") + "'"
+
+    def _field(self, collection: str, field: str) -> str:
+        """SQL expression for a document field, using its generated column when there is one"""
+        if field == "_id":
+            return "id"
+        if field in SQLITE_SCHEMAS.get(collection, {}).get("columns", []):
+            return _quote(field)
+        return f"json_extract(doc, {self._path(field)})"
+
+    def _is_array(self, collection: str, field: str) -> bool:
+        return get_codec(collection).fields.get(field) == "str_list"
+
+    def _condition(
+        self, collection: str, field: str, condition: Any, params: List[Any]
+    ) -> str:
+        """Translate the condition on one field"""
+        if isinstance(condition, dict) and condition and all(k.startswith("$") for k in condition):
+            operators = condition
+        else:
+            operators = {"$eq": condition}
+
+        expr = self._field(collection, field)
+        array = self._is_array(collection, field)
+        element = f"EXISTS (SELECT 1 FROM json_each(doc, {self._path(field)}) WHERE value"
+        clauses = []
+        for op, operand in operators.items():
+            if op not in COMPARISON_OPERATORS:
+                raise ValueError(f"Unsupported filter operator: {op}")
+            if op == "$exists":
+                clauses.append(f"json_type(doc, {self._path(field)}) IS {'NOT ' if operand else ''}NULL")
+            elif op in ("$eq", "$ne"):
+                if operand is None:
+                    clause = f"{expr} IS NULL"
+                elif array and not isinstance(operand, list):
+                    params.append(_sql_value(operand))
+                    clause = f"{element} = ?)"
+                else:
+                    params.append(_sql_value(operand))
+                    clause = f"{expr} = ?"
+                # $ne also matches documents missing the field
+                clauses.append(clause if op == "$eq" else f"NOT COALESCE({clause}, 0)")
+            elif op in ("$in", "$nin"):
+                values = [v for v in operand if v is not None]
+                placeholders = ", ".join("?" for _ in values)
+                params.extend(_sql_value(v) for v in values)
+                clause = f"{element} IN ({placeholders}))" if array else f"{expr} IN ({placeholders})"
+                if len(values) != len(operand):
+                    clause = f"({clause} OR {expr} IS NULL)"
+                clauses.append(clause if op == "$in" else f"NOT COALESCE({clause}, 0)")
+            else:
+                params.append(_sql_value(operand))
+                sql_op = {"$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<="}[op]
+                clauses.append(f"{expr} {sql_op} ?")
+        return " AND ".join(f"({c})" for c in clauses) or "1"
+
+    def _where(self, collection: str, filter_dict: Optional[Dict[str, Any]], params: List[Any]) -> str:
+        """Translate a Mongo-style filter into a WHERE expression"""
+        if not filter_dict:
+            return "1"
+        clauses = []
+        for key, condition in filter_dict.items():
+            if key in ("$and", "$or", "$nor"):
+                parts = [self._where(collection, sub, params) for sub in condition] or ["1"]
+                joined = (" AND " if key == "$and" else " OR ").join(f"({p})" for p in parts)
+                clauses.append(f"NOT ({joined})" if key == "$nor" else joined)
+            elif key.startswith("$"):
+                raise ValueError(f"Unsupported filter operator: {key}")
+            else:
+                clauses.append(self._condition(collection, key, condition, params))
+        return " AND ".join(f"({c})" for c in clauses)
+
+    def _order_by(self, collection: str, sort_dict: Optional[Dict[str, int]]) -> str:
+        """Translate a sort spec; NULLs sort first ascending, like missing fields in MongoDB"""
+        if not sort_dict:
+            return ""
+        terms = [f"{self._field(collection, f)} {'DESC' if d == -1 else 'ASC'}" for f, d in sort_dict.items()]
+        return " ORDER BY " + ", ".join(terms)
+
+    def _select(
+        self,
+        collection: str,
+        filter_dict: Optional[Dict[str, Any]] = None,
+        sort_dict: Optional[Dict[str, int]] = None,
+        skip: int = 0,
+        limit: Optional[int] = None,
+        columns: str = "doc",
+    ) -> Tuple[str, List[Any]]:
+        params: List[Any] = []
+        sql = f"SELECT {columns} FROM {_quote(collection)} WHERE {self._where(collection, filter_dict, params)}"
+        sql += self._order_by(collection, sort_dict)
+        if limit is not None or skip:
+            sql += " LIMIT ? OFFSET ?"
+            params.extend([-1 if limit is None else limit, skip])
+        return sql, params
+
+    def _query(self, conn: sqlite3.Connection, collection: str, sql: str, params: List[Any]) -> List[Any]:
+        """Execute a query, treating a table that was never written as empty"""
+        if collection not in self._tables:
+            return []
+        return conn.execute(sql, params).fetchall()
+
+    # DataDB
+
+    def _prepare_new(self, document: Dict[str, Any]) -> Tuple[str, str]:
+        if "_id" not in document:
+            document["_id"] = str(uuid.uuid4())
+        document["_id"] = str(document["_id"])
+        now = datetime.utcnow()
+        document["created_at"] = now
+        document["updated_at"] = now
+        return document["_id"], self._encode(document)
+
+    def _insert_rows(self, collection: str, rows: List[Tuple[str, str]]) -> Callable[[sqlite3.Connection], None]:
+        def work(conn: sqlite3.Connection) -> None:
+            if collection not in self._tables:
+                self._ensure_table(conn, collection)
+            conn.executemany(f"INSERT INTO {_quote(collection)} (id, doc) VALUES (?, ?)", rows)
+        return work
+
+    async def create(self, collection: str, document: Dict[str, Any]) -> Dict[str, Any]:
+        """Create a new document in a collection"""
+        row = self._prepare_new(document)
+        try:
+            await self._write(self._insert_rows(collection, [row]))
+        except sqlite3.Error as e:
+            raise Exception(f"Error creating document in SQLite: {str(e)}")
+        return document
+
+    async def create_many(
+        self, collection: str, documents: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """Create several documents in a single transaction"""
+        rows = [self._prepare_new(document) for document in documents]
+        if not rows:
+            return []
+        try:
+            await self._write(self._insert_rows(collection, rows))
+        except sqlite3.Error as e:
+            raise Exception(f"Error creating documents in SQLite: {str(e)}")
+        return documents
+
+    async def read_one(
+        self, collection: str, filter_dict: Dict[str, Any]
+    ) -> Optional[Dict[str, Any]]:
+        """Read a single document from a collection"""
+        sql, params = self._select(collection, filter_dict, limit=1)
+        try:
+            rows = await self._read(lambda conn: self._query(conn, collection, sql, params))
+        except sqlite3.Error as e:
+            raise Exception(f"Error reading document from SQLite: {str(e)}")
+        return self._decode(collection, rows[0][0]) if rows else None
+
+    async def read_many(
+        self,
+        collection: str,
+        filter_dict: Optional[Dict[str, Any]] = None,
+        skip: int = 0,
+        limit: int = 100,
+        sort_dict: Optional[Dict[str, int]] = None,
+    ) -> List[Dict[str, Any]]:
+        """Read multiple documents from a collection"""
+        sql, params = self._select(collection, filter_dict, sort_dict, skip, limit)
+        try:
+            rows = await self._read(lambda conn: self._query(conn, collection, sql, params))
+        except sqlite3.Error as e:
+            raise Exception(f"Error reading documents from SQLite: {str(e)}")
+        return [self._decode(collection, row[0]) for row in rows]
+
+    async def read_many_by_ids(
+        self, collection: str, ids: List[str]
+    ) -> List[Dict[str, Any]]:
+        """Read several documents by ID with IN queries"""
+        unique_ids = list(dict.fromkeys(str(doc_id) for doc_id in ids))
+
+        def work(conn: sqlite3.Connection) -> List[Any]:
+            rows = []
+            for start in range(0, len(unique_ids), MAX_VARIABLES):
+                chunk = unique_ids[start:start + MAX_VARIABLES]
+                sql = f"SELECT id, doc FROM {_quote(collection)} WHERE id IN ({', '.join('?' for _ in chunk)})"
+                rows.extend(self._query(conn, collection, sql, chunk))
+            return rows
+
+        try:
+            rows = await self._read(work)
+        except sqlite3.Error as e:
+            raise Exception(f"Error reading documents from SQLite: {str(e)}")
+        by_id = {doc_id: text for doc_id, text in rows}
+        return [self._decode(collection, by_id[doc_id]) for doc_id in unique_ids if doc_id in by_id]
+
+    async def count(
+        self,
+        collection: str,
+        filter_dict: Optional[Dict[str, Any]] = None,
+        estimated: bool = False,
+    ) -> int:
+        """Count matching documents with COUNT(*)"""
+        sql, params = self._select(collection, filter_dict, columns="COUNT(*)")
+        try:
+            rows = await self._read(lambda conn: self._query(conn, collection, sql, params))
+        except sqlite3.Error as e:
+            raise Exception(f"Error counting documents in SQLite: {str(e)}")
+        return rows[0][0] if rows else 0
+
+    def _update_work(
+        self, collection: str, filter_dict: Dict[str, Any], update_dict: Dict[str, Any]
+    ) -> Callable[[sqlite3.Connection], bool]:
+        """Read-modify-write on the writer thread, so no other write interleaves"""
+        sql, params = self._select(collection, filter_dict, limit=1, columns="id, doc")
+
+        def work(conn: sqlite3.Connection) -> bool:
+            rows = self._query(conn, collection, sql, params)
+            if not rows:
+                return False
+            doc_id, text = rows[0]
+            document = self._decode(collection, text)
+            apply_update(document, update_dict)
+            document["_id"] = doc_id
+            document["updated_at"] = datetime.utcnow()
+            conn.execute(f"UPDATE {_quote(collection)} SET doc = ? WHERE id = ?", (self._encode(document), doc_id))
+            return True
+        return work
+
+    async def update_one(
+        self, collection: str, filter_dict: Dict[str, Any], update_dict: Dict[str, Any]
+    ) -> bool:
+        """Update a single document in a collection"""
+        try:
+            return await self._write(self._update_work(collection, filter_dict, update_dict))
+        except sqlite3.Error as e:
+            raise Exception(f"Error updating document in SQLite: {str(e)}")
+
+    async def delete_one(self, collection: str, filter_dict: Dict[str, Any]) -> bool:
+        """Delete a single document from a collection"""
+        select, params = self._select(collection, filter_dict, limit=1, columns="id")
+        sql = f"DELETE FROM {_quote(collection)} WHERE id IN ({select})"
+        try:
+            deleted = await self._write(
+                lambda conn: conn.execute(sql, params).rowcount if collection in self._tables else 0
+            )
+        except sqlite3.Error as e:
+            raise Exception(f"Error deleting document from SQLite: {str(e)}")
+        return deleted > 0
+
+    async def delete_many(self, collection: str, filter_dict: Dict[str, Any]) -> int:
+        """Delete every document matching a filter"""
+        params: List[Any] = []
+        sql = f"DELETE FROM {_quote(collection)} WHERE {self._where(collection, filter_dict, params)}"
+        try:
+            return await self._write(
+                lambda conn: conn.execute(sql, params).rowcount if collection in self._tables else 0
+            )
+        except sqlite3.Error as e:
+            raise Exception(f"Error deleting documents from SQLite: {str(e)}")
+
+    def _bulk_operation(
+        self, conn: sqlite3.Connection, collection: str, operation: Dict[str, Any], result: Dict[str, int]
+    ) -> None:
+        if len(operation) != 1:
+            raise ValueError(f"Invalid bulk operation: {operation}")
+        name, spec = next(iter(operation.items()))
+        table = _quote(collection)
+
+        if name == "insert_one":
+            self._insert_rows(collection, [self._prepare_new(spec["document"])])(conn)
+            result["inserted_count"] += 1
+        elif name == "replace_one":
+            select, params = self._select(collection, spec["filter"], limit=1, columns="id")
+            rows = self._query(conn, collection, select, params)
+            replacement = dict(spec["replacement"])
+            if rows:
+                replacement["_id"] = rows[0][0]
+                conn.execute(f"UPDATE {table} SET doc = ? WHERE id = ?", (self._encode(replacement), rows[0][0]))
+                result["modified_count"] += 1
+            elif spec.get("upsert", False):
+                filter_id = spec["filter"].get("_id")
+                replacement["_id"] = str(replacement.get("_id", filter_id if filter_id is not None else uuid.uuid4()))
+                self._insert_rows(collection, [(replacement["_id"], self._encode(replacement))])(conn)
+                result["upserted_count"] += 1
+        elif name == "update_one":
+            if self._update_work(collection, spec["filter"], spec["update"])(conn):
+                result["modified_count"] += 1
+        elif name == "delete_one":
+            select, params = self._select(collection, spec["filter"], limit=1, columns="id")
+            if collection in self._tables:
+                result["deleted_count"] += conn.execute(f"DELETE FROM {table} WHERE id IN ({select})", params).rowcount
+        else:
+            raise ValueError(f"Unsupported bulk operation: {name}")
+
+    async def bulk_write(
+        self, collection: str, operations: List[Dict[str, Any]], ordered: bool = True
+    ) -> Dict[str, int]:
+        """Apply a batch of write operations in one transaction"""
+        def work(conn: sqlite3.Connection) -> Tuple[Dict[str, int], List[str]]:
+            result = {"inserted_count": 0, "modified_count": 0, "upserted_count": 0, "deleted_count": 0}
+            errors: List[str] = []
+            for operation in operations:
+                # Failed operations are rolled back individually; earlier ones are kept
+                conn.execute("SAVEPOINT operation")
+                try:
+                    self._bulk_operation(conn, collection, operation, result)
+                    conn.execute("RELEASE operation")
+                except Exception as e:
+                    conn.execute("ROLLBACK TO operation")
+                    conn.execute("RELEASE operation")
+                    errors.append(str(e))
+                    if ordered:
+                        break
+            return result, errors
+
+        result, errors = await self._write(work)
+        if errors:
+            raise Exception(f"Error in SQLite bulk write: {'; '.join(errors)}")
+        return result
+
+    # Aggregation
+
+    def _translate_pipeline(
+        self, collection: str, pipeline: List[Dict[str, Any]]
+    ) -> Tuple[str, List[Any], Callable[[Tuple[Any, ...]], Dict[str, Any]]]:
+        """
+        Translate [$match] $group [$sort] [$skip] [$limit], or [$match] $count, to SQL
+
+        Raises:
+            ValueError: If the pipeline has another shape
+        """
+        stages = [next(iter(stage.items())) for stage in pipeline if len(stage) == 1]
+        if len(stages) != len(pipeline):
+            raise ValueError("Invalid pipeline stage")
+
+        params: List[Any] = []
+        where = "1"
+        if stages and stages[0][0] == "$match":
+            where = self._where(collection, stages.pop(0)[1], params)
+        table = _quote(collection)
+
+        if len(stages) == 1 and stages[0][0] == "$count":
+            field = stages[0][1]
+            # Like MongoDB, no document at all when nothing matched
+            return (
+                f"SELECT COUNT(*) FROM {table} WHERE {where} HAVING COUNT(*) > 0",
+                params,
+                lambda row: {field: row[0]},
+            )
+
+        if not stages or stages[0][0] != "$group":
+            raise ValueError("Pipeline not translatable to SQL")
+        spec = stages.pop(0)[1]
+        datetime_fields = self._datetime_fields(collection)
+
+        # Group key: a field reference, a document of field references, or a constant
+        key = spec.get("_id")
+        key_names: Optional[List[str]] = None
+        if isinstance(key, str) and key.startswith("$"):
+            key_sources = [key[1:]]
+        elif isinstance(key, dict) and all(isinstance(v, str) and v.startswith("$") for v in key.values()):
+            key_names = list(key)
+            key_sources = [v[1:] for v in key.values()]
+        elif not isinstance(key, (dict, list)):
+            key_sources = []
+        else:
+            raise ValueError("Unsupported $group key")
+        key_exprs = [self._field(collection, source) for source in key_sources]
+
+        outputs: List[Tuple[str, Optional[str]]] = []
+        select = list(key_exprs)
+        for field, accumulator in spec.items():
+            if field == "_id":
+                continue
+            if not isinstance(accumulator, dict) or len(accumulator) != 1:
+                raise ValueError(f"Invalid accumulator for field '{field}' in $group")
+            op, expression = next(iter(accumulator.items()))
+            source = expression[1:] if isinstance(expression, str) and expression.startswith("$") else None
+            if op == "$count" or (op == "$sum" and isinstance(expression, (int, float)) and source is None):
+                select.append(f"COUNT(*) * {expression if op == '$sum' else 1}")
+            elif op in _SQL_ACCUMULATORS and source is not None:
+                column = self._field(collection, source)
+                if op == "$sum":
+                    select.append(f"COALESCE(SUM({column}), 0)")
+                else:
+                    select.append(f"{_SQL_ACCUMULATORS[op]}({column})")
+            else:
+                raise ValueError(f"Unsupported accumulator {op} in SQL translation")
+            outputs.append((field, source if op in ("$min", "$max") else None))
+
+        sql = f"SELECT {', '.join(select) or '1'} FROM {table} WHERE {where}"
+        if key_exprs:
+            sql += f" GROUP BY {', '.join(key_exprs)}"
+        else:
+            # A single group, which does not exist without input
+            sql += " HAVING COUNT(*) > 0"
+
+        aliases = {"_id": 1} if key_exprs else {}
+        aliases.update({field: position + 1 + len(key_exprs) for position, (field, _) in enumerate(outputs)})
+        if stages and stages[0][0] == "$sort":
+            terms = []
+            for field, direction in stages.pop(0)[1].items():
+                if field not in aliases or (field == "_id" and key_names is not None):
+                    raise ValueError("Unsupported $sort after $group")
+                terms.append(f"{aliases[field]} {'DESC' if direction == -1 else 'ASC'}")
+            sql += " ORDER BY " + ", ".join(terms)
+        skip = limit = None
+        while stages and stages[0][0] in ("$skip", "$limit") and not (stages[0][0] == "$skip" and limit is not None):
+            name, value = stages.pop(0)
+            if name == "$skip":
+                skip = int(value)
+            else:
+                limit = int(value)
+        if stages:
+            raise ValueError("Pipeline not translatable to SQL")
+        if skip is not None or limit is not None:
+            sql += " LIMIT ? OFFSET ?"
+            params.extend([-1 if limit is None else limit, skip or 0])
+
+        def convert(value: Any, source: Optional[str]) -> Any:
+            if source in datetime_fields and isinstance(value, str):
+                try:
+                    return datetime.fromisoformat(value)
+                except ValueError:
+                    return value
+            return value
+
+        def build(row: Tuple[Any, ...]) -> Dict[str, Any]:
+            keys = [convert(value, source) for value, source in zip(row, key_sources)]
+            if key_names is not None:
+                group_id: Any = dict(zip(key_names, keys))
+            else:
+                group_id = keys[0] if keys else key
+            document = {"_id": group_id}
+            for (field, source), value in zip(outputs, row[len(key_exprs):]):
+                document[field] = convert(value, source)
+            return document
+
+        return sql, params, build
+
+    async def aggregate(
+        self, collection: str, pipeline: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Perform aggregation operations
+
+        Grouping pipelines are translated to SQL. Other shapes stream the
+        documents selected by a leading $match through the aggregation engine.
+        """
+        try:
+            sql, params, build = self._translate_pipeline(collection, pipeline)
+        except ValueError:
+            sql = None
+
+        try:
+            if sql is not None:
+                rows = await self._read(lambda conn: self._query(conn, collection, sql, params))
+                return [build(row) for row in rows]
+            match = pipeline[0].get("$match") if pipeline else None
+            select, select_params = self._select(collection, match)
+            rows = await self._read(lambda conn: self._query(conn, collection, select, select_params))
+        except sqlite3.Error as e:
+            raise Exception(f"Error aggregating documents in SQLite: {str(e)}")
+
+        engine = AggregationPipeline(pipeline)
+        results = engine.feed([self._decode(collection, row[0]) for row in rows])
+        results.extend(engine.finish())
+        return results
+
+    async def aggregate_iter(
+        self, collection: str, pipeline: List[Dict[str, Any]], batch_size: int = 1000
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Perform aggregation operations, yielding results as they are produced
+
+        Grouping pipelines are translated to SQL, whose result has one row per
+        group. Other shapes stream batches of documents through the engine.
+        """
+        try:
+            sql, params, build = self._translate_pipeline(collection, pipeline)
+        except ValueError:
+            async for doc in super().aggregate_iter(collection, pipeline, batch_size):
+                yield doc
+            return
+
+        try:
+            rows = await self._read(lambda conn: self._query(conn, collection, sql, params))
+        except sqlite3.Error as e:
+            raise Exception(f"Error aggregating documents in SQLite: {str(e)}")
+        for row in rows:
+            yield build(row)
@@ -1,3 +1,5 @@
+from typing import Any, Dict
+
 from app.utils.protocols import FileDB, DataDB
 
 
@@ -17,9 +19,17 @@ class Storage:
     
     async def initialize(self) -> None:
         """Initialize connections to storage systems"""
+        await self.file_db.initialize()
         await self.data_db.connect()
     
     async def shutdown(self) -> None:
         """Close connections to storage systems"""
+        await self.file_db.shutdown()
         await self.data_db.disconnect()
 
+    def metrics(self) -> Dict[str, Any]:
+        """Collect the metrics of both storage systems"""
+        return {
+            "file_db": self.file_db.metrics(),
+            "data_db": self.data_db.metrics()
+        }
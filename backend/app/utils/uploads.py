@@ -0,0 +1,89 @@
+import hashlib
+from typing import Any, AsyncIterator, Dict, Optional
+
+from fastapi import HTTPException, UploadFile, status
+
+from app.config import config
+
+
+class FileTooLargeError(Exception):
+    """Raised while streaming an upload that exceeds the maximum size"""
+
+    def __init__(self, max_size: int):
+        super().__init__(f"File is larger than {max_size} bytes")
+        self.max_size = max_size
+
+
+class UploadDigest:
+    """
+    Measures and hashes a stream of chunks as it is consumed
+
+    wrap() passes the chunks through, updating size and sha256, and raises
+    FileTooLargeError as soon as more than max_size bytes went through, so
+    an oversized upload is rejected without reading the rest of it.
+    """
+
+    def __init__(self, max_size: Optional[int] = None):
+        self.max_size = max_size
+        self.size = 0
+        self.too_large = False
+        self._hash = hashlib.sha256()
+
+    async def wrap(self, chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        async for chunk in chunks:
+            self.size += len(chunk)
+            if self.max_size is not None and self.size > self.max_size:
+                self.too_large = True
+                raise FileTooLargeError(self.max_size)
+            self._hash.update(chunk)
+            yield chunk
+
+    @property
+    def sha256(self) -> str:
+        return self._hash.hexdigest()
+
+
+async def read_chunks(upload: UploadFile, chunk_size: Optional[int] = None) -> AsyncIterator[bytes]:
+    """Read an uploaded file chunk by chunk (the request body was spooled to disk past 1 MB)"""
+    chunk_size = chunk_size or config.UPLOAD_CHUNK_BYTES
+    while True:
+        chunk = await upload.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+async def store_upload(file_db: Any, upload: UploadFile, default_name: str, folder: str) -> Dict[str, Any]:
+    """
+    Stream an uploaded image to the file storage
+
+    Args:
+        file_db: FileDB of the request's storage
+        upload: Uploaded file
+        default_name: File name used when the client sent none
+        folder: Folder/path prefix
+
+    Returns:
+        {"url": URL of the uploaded file, "size": bytes, "sha256": hex digest}
+
+    Raises:
+        HTTPException: 413 if the file is larger than MAX_UPLOAD_BYTES
+    """
+    max_size = config.MAX_UPLOAD_BYTES
+    try:
+        # The declared size is known once the form was parsed; the stream
+        # check still catches clients that misreport it
+        if upload.size is not None and upload.size > max_size:
+            raise FileTooLargeError(max_size)
+        return await file_db.upload_stream(
+            read_chunks(upload),
+            upload.filename or default_name,
+            upload.content_type or "image/jpeg",
+            folder=folder,
+            max_size=max_size
+        )
+    except FileTooLargeError as e:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=str(e)
+        )
@@ -0,0 +1,59 @@
+"""
+Microbenchmark: POI map payload
+
+Size and encode time of the map data for every POI, as the full POI list
+(GET /pois/) and as the columnar payload of GET /pois/map, in JSON and
+MessagePack, with and without quantized coordinates. Encode times are for
+a fresh snapshot; the endpoint caches the encoded body until the next write.
+
+Run from the backend directory:
+    python -m benchmarks.bench_poi_map
+"""
+import argparse
+import time
+from typing import Callable
+
+from app.models.poi import POI
+from app.utils.poi_map import JSON, MSGPACK, POIMapSnapshot
+from app.utils.serialization import TrustedJSONResponse, load_many
+from benchmarks.bench_serialization import make_pois
+
+
+def best_ms(call: Callable[[], bytes], repeat: int) -> float:
+    """Best-of-N milliseconds"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        call()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pois", type=int, default=10000, help="Number of POIs")
+    parser.add_argument("--repeat", type=int, default=10, help="Repetitions (best is reported)")
+    args = parser.parse_args()
+
+    docs = make_pois(args.pois)
+    variants = [
+        ("full POI list, JSON", lambda: TrustedJSONResponse(POI, load_many(POI, docs)).body),
+        ("columnar, JSON", lambda: POIMapSnapshot(docs, 0).encode(JSON)[0]),
+        ("columnar, JSON, precision 5", lambda: POIMapSnapshot(docs, 0).encode(JSON, 5)[0]),
+        ("columnar, MessagePack", lambda: POIMapSnapshot(docs, 0).encode(MSGPACK)[0]),
+        ("columnar, MessagePack, precision 5", lambda: POIMapSnapshot(docs, 0).encode(MSGPACK, 5)[0]),
+    ]
+
+    snapshot = POIMapSnapshot(docs, 0)
+    snapshot.encode(JSON, 5)
+    cached_ms = best_ms(lambda: snapshot.encode(JSON, 5)[0], args.repeat)
+
+    print(f"{args.pois} POIs, best of {args.repeat}")
+    print(f"{'payload':<38}{'bytes':>12}{'ms':>10}")
+    for name, encode in variants:
+        print(f"{name:<38}{len(encode()):>12}{best_ms(encode, args.repeat):>10.2f}")
+    print(f"{'cached snapshot body':<38}{'':>12}{cached_ms:>10.4f}")
+
+
+if __name__ == "__main__":
+    main()
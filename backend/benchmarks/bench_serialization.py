@@ -0,0 +1,142 @@
+"""
+Microbenchmark: serialization of list responses
+
+Per-item cost of turning database documents into the JSON body of the POI,
+photo and ranking lists, for three pipelines:
+
+    validated   Model(**doc), validated again against the response model,
+                then jsonable_encoder + json.dumps (FastAPI's classic path)
+    revalidated Model(**doc), validated against the response model, then
+                serialized by pydantic-core (recent FastAPI versions)
+    trusted     load_many (one call to the compiled list validator)
+                + TrustedJSONResponse
+
+Run from the backend directory:
+    python -m benchmarks.bench_serialization
+"""
+import argparse
+import json
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Type
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel, TypeAdapter
+
+from app.models.photo import Photo
+from app.models.poi import POI
+from app.models.user import UserProfile
+from app.utils.serialization import TrustedJSONResponse, load_many
+
+BASE = datetime(2025, 1, 1)
+
+
+def make_pois(count: int) -> List[Dict[str, Any]]:
+    return [
+        {
+            "_id": f"poi-{i:08d}",
+            "name": f"Point of interest {i}",
+            "description": "A short description of a place worth visiting in the city",
+            "latitude": 40.4168 + i * 1e-5,
+            "longitude": -3.7038 - i * 1e-5,
+            "tags": ["cultura", "turismo", "movilidad"][: 1 + i % 3],
+            "image_url": f"https://i.ibb.co/abc{i}/photo.jpg",
+            "author_id": f"user-{i % 500:05d}",
+            "rating_count": i % 40,
+            "average_rating": round((i % 100) / 10, 1),
+            "created_at": BASE + timedelta(seconds=i),
+            "updated_at": BASE + timedelta(seconds=i, minutes=5),
+        }
+        for i in range(count)
+    ]
+
+
+def make_photos(count: int) -> List[Dict[str, Any]]:
+    return [
+        {
+            "_id": f"photo-{i:08d}",
+            "poi_id": f"poi-{i % 100:08d}",
+            "image_url": f"https://i.ibb.co/def{i}/photo.jpg",
+            "description": "View from the square" if i % 2 else None,
+            "author_id": f"user-{i % 500:05d}",
+            "rating_count": i % 25,
+            "average_rating": round((i % 100) / 10, 1),
+            "created_at": BASE + timedelta(seconds=i),
+            "updated_at": BASE + timedelta(seconds=i),
+        }
+        for i in range(count)
+    ]
+
+
+def make_profiles(count: int) -> List[Dict[str, Any]]:
+    return [
+        {
+            "id": f"user-{i:05d}",
+            "name": f"User {i}",
+            "email": f"user{i}@example.com",
+            "poi_score": 10 * (count - i),
+            "photo_score": 5 * (count - i),
+            "total_score": 15 * (count - i),
+            "poi_count": count - i,
+            "photo_count": count - i,
+            "rating_count": i % 30,
+        }
+        for i in range(count)
+    ]
+
+
+def validated(model: Type[BaseModel], docs: List[Dict[str, Any]]) -> bytes:
+    items = [model(**doc) for doc in docs]
+    adapter = TypeAdapter(List[model])
+    checked = adapter.validate_python([item.model_dump() for item in items])
+    content = jsonable_encoder(checked)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def revalidated(model: Type[BaseModel], docs: List[Dict[str, Any]]) -> bytes:
+    items = [model(**doc) for doc in docs]
+    adapter = TypeAdapter(List[model])
+    return adapter.dump_json(adapter.validate_python(items), by_alias=True)
+
+
+def trusted(model: Type[BaseModel], docs: List[Dict[str, Any]]) -> bytes:
+    return TrustedJSONResponse(model, load_many(model, docs)).body
+
+
+def per_item_us(pipeline: Callable, model: Type[BaseModel], docs: List[Dict[str, Any]], repeat: int) -> float:
+    """Best-of-N microseconds per item"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        pipeline(model, docs)
+        best = min(best, time.perf_counter() - start)
+    return best / len(docs) * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=1000, help="Items per list")
+    parser.add_argument("--repeat", type=int, default=20, help="Repetitions (best is reported)")
+    args = parser.parse_args()
+
+    lists = [
+        ("POI", POI, make_pois(args.items)),
+        ("photo", Photo, make_photos(args.items)),
+        ("ranking", UserProfile, make_profiles(args.items)),
+    ]
+
+    for _, model, docs in lists:
+        # Same JSON documents from every pipeline
+        expected = json.loads(validated(model, docs))
+        assert json.loads(revalidated(model, docs)) == expected
+        assert json.loads(trusted(model, docs)) == expected
+
+    print(f"{args.items} items per list, best of {args.repeat}, microseconds per item")
+    print(f"{'list':<10}{'validated':>12}{'revalidated':>14}{'trusted':>10}{'speed-up':>11}")
+    for name, model, docs in lists:
+        costs = [per_item_us(pipeline, model, docs, args.repeat) for pipeline in (validated, revalidated, trusted)]
+        print(f"{name:<10}{costs[0]:>12.2f}{costs[1]:>14.2f}{costs[2]:>10.2f}{costs[0] / costs[2]:>10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Local fake of the ImgBB upload API, and upload benchmark
+
+The server accepts POST /1/upload multipart forms (key, image) like ImgBB
+and answers with a URL. The first request of every connection is delayed by
+--handshake-ms, standing in for the DNS, TCP and TLS setup of a real HTTPS
+connection, so reusing connections shows up in the timings.
+
+Run from the backend directory:
+    python -m benchmarks.fake_imgbb serve --port 8081
+        then start the API with FILE_STORAGE_TYPE=imgbb IMGBB_API_KEY=fake
+        IMGBB_API_URL=http://127.0.0.1:8081/1/upload
+    python -m benchmarks.fake_imgbb bench --uploads 500 --concurrency 20
+        compares one session per upload with the pooled ImgBBFileDB session
+"""
+import argparse
+import asyncio
+import time
+from io import BytesIO
+from typing import Any, Dict
+
+import aiohttp
+from aiohttp import web
+
+
+def make_app(handshake_ms: float = 50.0, latency_ms: float = 5.0) -> web.Application:
+    """Fake ImgBB application; app["stats"] counts uploads and connections"""
+    stats: Dict[str, Any] = {"uploads": 0, "connections": 0, "transports": set()}
+
+    async def upload(request: web.Request) -> web.Response:
+        if request.transport not in stats["transports"]:
+            stats["transports"].add(request.transport)
+            stats["connections"] += 1
+            await asyncio.sleep(handshake_ms / 1000)
+        await asyncio.sleep(latency_ms / 1000)
+
+        form = await request.post()
+        image = form.get("image")
+        if not form.get("key"):
+            return web.json_response(
+                {"status_code": 400, "error": {"message": "Invalid API v1 key."}, "status_txt": "Bad Request"},
+                status=400
+            )
+        if not isinstance(image, web.FileField):
+            return web.json_response(
+                {"status_code": 400, "error": {"message": "Empty upload source."}, "status_txt": "Bad Request"},
+                status=400
+            )
+
+        stats["uploads"] += 1
+        image_id = f"{stats['uploads']:08x}"
+        host = request.host
+        return web.json_response({
+            "data": {
+                "id": image_id,
+                "url": f"http://{host}/i/{image_id}/{image.filename}",
+                "delete_url": f"http://{host}/delete/{image_id}",
+                "size": len(image.file.read()),
+            },
+            "success": True,
+            "status": 200,
+        })
+
+    app = web.Application(client_max_size=32 * 1024 * 1024)
+    app["stats"] = stats
+    app.router.add_post("/1/upload", upload)
+    return app
+
+
+async def start(app: web.Application, host: str, port: int) -> web.AppRunner:
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
+
+
+async def serve(args: argparse.Namespace) -> None:
+    await start(make_app(args.handshake_ms, args.latency_ms), args.host, args.port)
+    print(f"Fake ImgBB listening on http://{args.host}:{args.port}/1/upload")
+    await asyncio.Event().wait()
+
+
+async def upload_with_new_session(api_url: str, content: bytes) -> str:
+    """Upload the way ImgBBFileDB did before pooling: a new session (and connection) per upload"""
+    data = aiohttp.FormData()
+    data.add_field("key", "fake")
+    data.add_field("image", content, filename="image.jpg", content_type="image/jpeg")
+    async with aiohttp.ClientSession() as session:
+        async with session.post(api_url, data=data) as response:
+            return (await response.json())["data"]["url"]
+
+
+async def bench(args: argparse.Namespace) -> None:
+    from app.config import config
+
+    app = make_app(args.handshake_ms, args.latency_ms)
+    runner = await start(app, args.host, args.port)
+    config.IMGBB_API_KEY = "fake"
+    config.IMGBB_API_URL = f"http://{args.host}:{args.port}/1/upload"
+    config.IMGBB_MAX_CONNECTIONS = args.concurrency
+
+    from app.utils.imgbb_storage import ImgBBFileDB
+
+    content = bytes(args.size)
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def run(upload) -> float:
+        async def one() -> None:
+            async with semaphore:
+                await upload()
+
+        stats = app["stats"]
+        stats["connections"] = 0
+        stats["transports"].clear()
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(args.uploads)))
+        return time.perf_counter() - started
+
+    print(
+        f"{args.uploads} uploads of {args.size} bytes, {args.concurrency} concurrent, "
+        f"{args.handshake_ms} ms handshake, {args.latency_ms} ms latency"
+    )
+    print(f"{'client':<28}{'seconds':>10}{'uploads/s':>12}{'connections':>13}")
+
+    seconds = await run(lambda: upload_with_new_session(config.IMGBB_API_URL, content))
+    print(f"{'new session per upload':<28}{seconds:>10.2f}{args.uploads / seconds:>12.0f}{app['stats']['connections']:>13}")
+
+    file_db = ImgBBFileDB()
+    await file_db.initialize()
+    try:
+        seconds = await run(lambda: file_db.upload_file(BytesIO(content), "image.jpg", "image/jpeg"))
+        print(f"{'pooled ImgBBFileDB':<28}{seconds:>10.2f}{args.uploads / seconds:>12.0f}{app['stats']['connections']:>13}")
+        print(file_db.metrics())
+    finally:
+        await file_db.shutdown()
+        await runner.cleanup()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["serve", "bench"])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--handshake-ms", type=float, default=50.0, help="Delay of the first request of a connection")
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="Delay of every request")
+    parser.add_argument("--uploads", type=int, default=500, help="Uploads (bench)")
+    parser.add_argument("--concurrency", type=int, default=20, help="Concurrent uploads and pool size (bench)")
+    parser.add_argument("--size", type=int, default=100 * 1024, help="Image size in bytes (bench)")
+    args = parser.parse_args()
+    asyncio.run(serve(args) if args.command == "serve" else bench(args))
+
+
+if __name__ == "__main__":
+    main()
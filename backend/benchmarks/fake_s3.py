@@ -0,0 +1,246 @@
+"""
+Local S3-compatible stand-in, and S3 upload throughput benchmark
+
+The server implements the calls S3FileDB makes (PutObject, the multipart
+upload calls and DeleteObject) on path-style URLs, discarding the data.
+Each connection is throttled to --mbps, like a single S3 connection, so
+parallel parts show up in the throughput; every request also waits
+--latency-ms.
+
+Run from the backend directory:
+    python -m benchmarks.fake_s3 serve --port 9000
+        then start the API with FILE_STORAGE_TYPE=s3 S3_BUCKET_NAME=photos
+        S3_ENDPOINT_URL=http://127.0.0.1:9000 AWS_ACCESS_KEY_ID=x AWS_SECRET_ACCESS_KEY=x
+    python -m benchmarks.fake_s3 bench --files 20 --size-mb 20
+        compares blocking upload_fileobj calls with S3FileDB, reporting
+        throughput and the longest event loop stall while uploading
+"""
+import argparse
+import asyncio
+import hashlib
+import multiprocessing
+import time
+import uuid
+from io import BytesIO
+from typing import Any, Dict
+
+from aiohttp import web
+
+CHUNK = 64 * 1024
+
+
+def make_app(latency_ms: float = 5.0, mbps: float = 100.0) -> web.Application:
+    """Fake S3 application; app["stats"] counts requests and bytes received"""
+    stats: Dict[str, Any] = {"requests": 0, "objects": 0, "parts": 0, "bytes": 0, "deletes": 0}
+    uploads: Dict[str, int] = {}
+
+    async def read_body(request: web.Request) -> str:
+        """Consume the body at the throttled rate, decoding aws-chunked bodies; returns its MD5"""
+        digest = hashlib.md5()
+        started = time.perf_counter()
+        received = 0
+
+        async def throttle(data: bytes) -> None:
+            nonlocal received
+            digest.update(data)
+            received += len(data)
+            ahead = received / (mbps * 1024 * 1024) - (time.perf_counter() - started)
+            if ahead > 0:
+                await asyncio.sleep(ahead)
+
+        if "aws-chunked" in request.headers.get("Content-Encoding", ""):
+            # <hex size>[;chunk-signature=...]\r\n<data>\r\n ... 0\r\n<trailers>\r\n
+            while True:
+                size = int((await request.content.readline()).split(b";")[0].strip(), 16)
+                if size == 0:
+                    break
+                remaining = size
+                while remaining:
+                    data = await request.content.read(min(CHUNK, remaining))
+                    remaining -= len(data)
+                    await throttle(data)
+                await request.content.readline()
+            await request.content.read()
+        else:
+            async for data in request.content.iter_chunked(CHUNK):
+                await throttle(data)
+        stats["bytes"] += received
+        return digest.hexdigest()
+
+    def xml(body: str) -> web.Response:
+        return web.Response(
+            text=f'<?xml version="1.0" encoding="UTF-8"?>\n{body}', content_type="application/xml"
+        )
+
+    async def handle(request: web.Request) -> web.Response:
+        stats["requests"] += 1
+        await asyncio.sleep(latency_ms / 1000)
+        bucket, key = request.match_info["bucket"], request.match_info["key"]
+        query = request.query
+
+        if request.method == "PUT":
+            etag = await read_body(request)
+            if "uploadId" in query:
+                if query["uploadId"] not in uploads:
+                    return web.Response(status=404, text="NoSuchUpload")
+                stats["parts"] += 1
+            else:
+                stats["objects"] += 1
+            return web.Response(headers={"ETag": f'"{etag}"'})
+
+        if request.method == "POST" and "uploads" in query:
+            upload_id = uuid.uuid4().hex
+            uploads[upload_id] = 0
+            return xml(
+                f"<InitiateMultipartUploadResult><Bucket>{bucket}</Bucket><Key>{key}</Key>"
+                f"<UploadId>{upload_id}</UploadId></InitiateMultipartUploadResult>"
+            )
+
+        if request.method == "POST" and "uploadId" in query:
+            await request.read()
+            if uploads.pop(query["uploadId"], None) is None:
+                return web.Response(status=404, text="NoSuchUpload")
+            stats["objects"] += 1
+            return xml(
+                f"<CompleteMultipartUploadResult><Bucket>{bucket}</Bucket><Key>{key}</Key>"
+                f'<ETag>"{uuid.uuid4().hex}-1"</ETag></CompleteMultipartUploadResult>'
+            )
+
+        if request.method == "DELETE":
+            if "uploadId" in query:
+                uploads.pop(query["uploadId"], None)
+            else:
+                stats["deletes"] += 1
+            return web.Response(status=204)
+
+        return web.Response(status=405)
+
+    app = web.Application(client_max_size=1024 * 1024 * 1024)
+    app["stats"] = stats
+    app.router.add_route("*", "/{bucket}/{key:.+}", handle)
+    return app
+
+
+def _serve_forever(host: str, port: int, latency_ms: float, mbps: float, ready: Any) -> None:
+    async def run() -> None:
+        runner = web.AppRunner(make_app(latency_ms, mbps))
+        await runner.setup()
+        await web.TCPSite(runner, host, port).start()
+        ready.set()
+        await asyncio.Event().wait()
+
+    asyncio.run(run())
+
+
+def start_in_process(host: str, port: int, latency_ms: float, mbps: float) -> multiprocessing.Process:
+    """
+    Serve from a separate process
+
+    Blocking clients cannot stall it, and it does not compete for the GIL
+    with the client threads whose effect on the event loop is measured.
+    """
+    ready = multiprocessing.Event()
+    process = multiprocessing.Process(
+        target=_serve_forever, args=(host, port, latency_ms, mbps, ready), daemon=True
+    )
+    process.start()
+    ready.wait()
+    return process
+
+
+async def serve(args: argparse.Namespace) -> None:
+    runner = web.AppRunner(make_app(args.latency_ms, args.mbps))
+    await runner.setup()
+    await web.TCPSite(runner, args.host, args.port).start()
+    print(f"Fake S3 listening on http://{args.host}:{args.port} (any bucket)")
+    await asyncio.Event().wait()
+
+
+async def measure(upload, files: int, concurrency: int) -> Dict[str, float]:
+    """Run the uploads with bounded concurrency while measuring event loop stalls"""
+    semaphore = asyncio.Semaphore(concurrency)
+    stall = {"max": 0.0}
+    running = True
+
+    async def heartbeat() -> None:
+        while running:
+            before = time.perf_counter()
+            await asyncio.sleep(0.01)
+            stall["max"] = max(stall["max"], time.perf_counter() - before - 0.01)
+
+    async def one(index: int) -> None:
+        async with semaphore:
+            await upload(index)
+
+    monitor = asyncio.ensure_future(heartbeat())
+    await asyncio.sleep(0)
+    started = time.perf_counter()
+    await asyncio.gather(*(one(index) for index in range(files)))
+    seconds = time.perf_counter() - started
+    running = False
+    await monitor
+    return {"seconds": seconds, "stall_ms": stall["max"] * 1000}
+
+
+async def bench(args: argparse.Namespace) -> None:
+    from app.config import config
+
+    server = start_in_process(args.host, args.port, args.latency_ms, args.mbps)
+    config.S3_ENDPOINT_URL = f"http://{args.host}:{args.port}"
+    config.S3_BUCKET_NAME = "bench"
+    config.AWS_ACCESS_KEY_ID = config.AWS_ACCESS_KEY_ID or "fake"
+    config.AWS_SECRET_ACCESS_KEY = config.AWS_SECRET_ACCESS_KEY or "fake"
+    config.S3_MULTIPART_CHUNKSIZE_MB = args.chunksize_mb
+    config.S3_MULTIPART_THRESHOLD_MB = args.chunksize_mb
+    config.S3_MAX_CONCURRENCY = args.concurrency
+
+    from app.utils.s3_storage import S3FileDB
+
+    content = bytes(int(args.size_mb * 1024 * 1024))
+    total_mb = args.files * args.size_mb
+    print(
+        f"{args.files} files of {args.size_mb} MB, {args.concurrency} concurrent, "
+        f"{args.chunksize_mb} MB parts, {args.mbps} MB/s per connection, {args.latency_ms} ms latency"
+    )
+    print(f"{'client':<34}{'seconds':>10}{'MB/s':>10}{'max loop stall ms':>20}")
+
+    file_db = S3FileDB()
+
+    async def blocking(index: int) -> None:
+        # What upload_file did before: a synchronous transfer inside the coroutine
+        file_db.s3_client.upload_fileobj(BytesIO(content), "bench", f"blocking/{index}")
+
+    result = await measure(blocking, args.files, args.concurrency)
+    print(f"{'blocking upload_fileobj':<34}{result['seconds']:>10.2f}{total_mb / result['seconds']:>10.1f}{result['stall_ms']:>20.0f}")
+
+    await file_db.initialize()
+    try:
+        result = await measure(
+            lambda index: file_db.upload_file(BytesIO(content), f"{index}.jpg", "image/jpeg", folder="bench"),
+            args.files,
+            args.concurrency
+        )
+        print(f"{'S3FileDB (worker thread)':<34}{result['seconds']:>10.2f}{total_mb / result['seconds']:>10.1f}{result['stall_ms']:>20.0f}")
+        print(file_db.metrics())
+    finally:
+        await file_db.shutdown()
+        server.terminate()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["serve", "bench"])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="Delay of every request")
+    parser.add_argument("--mbps", type=float, default=50.0, help="Throughput of each connection, MB/s")
+    parser.add_argument("--files", type=int, default=20, help="Uploads (bench)")
+    parser.add_argument("--size-mb", type=float, default=20.0, help="File size in MB (bench)")
+    parser.add_argument("--concurrency", type=int, default=10, help="Concurrent uploads and S3_MAX_CONCURRENCY (bench)")
+    parser.add_argument("--chunksize-mb", type=int, default=8, help="Multipart threshold and part size (bench)")
+    args = parser.parse_args()
+    asyncio.run(serve(args) if args.command == "serve" else bench(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+import pytest
+
+from app.config import config
+from app.utils.memory_storage import MemoryDataDB
+from app.utils.sqlite_storage import SQLiteDataDB
+
+
+@pytest.fixture
+async def memory_db():
+    """Connected in-memory database without simulated latency or errors"""
+    db = MemoryDataDB()
+    db.latency_ms = db.jitter_ms = db.error_rate = 0
+    await db.connect()
+    yield db
+    await db.disconnect()
+
+
+@pytest.fixture
+async def sqlite_db(tmp_path, monkeypatch):
+    """Connected SQLite database in a temporary file"""
+    monkeypatch.setattr(config, "SQLITE_PATH", str(tmp_path / "test.db"))
+    db = SQLiteDataDB()
+    await db.connect()
+    yield db
+    await db.disconnect()
@@ -0,0 +1,114 @@
+from datetime import datetime
+
+import pytest
+
+from app.utils.aggregation import AggregationPipeline
+
+RATINGS = [
+    {"_id": "r1", "target_id": "p1", "score": 8, "user": "u1", "created_at": datetime(2025, 1, 1)},
+    {"_id": "r2", "target_id": "p1", "score": 6, "user": "u2", "created_at": datetime(2025, 1, 3)},
+    {"_id": "r3", "target_id": "p2", "score": 9.5, "user": "u1", "created_at": datetime(2025, 1, 2)},
+    {"_id": "r4", "target_id": "p2", "score": "n/a", "user": "u3", "created_at": datetime(2025, 1, 5)},
+    {"_id": "r5", "target_id": "p3", "user": "u2", "created_at": datetime(2025, 1, 4)},
+]
+
+
+def run(pipeline, docs=RATINGS, batch_size=2):
+    engine = AggregationPipeline(pipeline)
+    output = []
+    for start in range(0, len(docs), batch_size):
+        output += engine.feed([dict(doc) for doc in docs[start:start + batch_size]])
+    return output + engine.finish()
+
+
+def test_group_accumulators():
+    results = run([
+        {"$group": {
+            "_id": "$target_id",
+            "total": {"$sum": "$score"},
+            "average": {"$avg": "$score"},
+            "ratings": {"$count": {}},
+            "best": {"$max": "$score"},
+            "worst": {"$min": "$score"},
+            "first": {"$min": "$created_at"},
+        }},
+        {"$sort": {"_id": 1}},
+    ])
+
+    assert results == [
+        {"_id": "p1", "total": 14, "average": 7.0, "ratings": 2, "best": 8, "worst": 6,
+         "first": datetime(2025, 1, 1)},
+        # Non-numeric values are ignored by $sum/$avg, and sort after numbers in $max
+        {"_id": "p2", "total": 9.5, "average": 9.5, "ratings": 2, "best": "n/a", "worst": 9.5,
+         "first": datetime(2025, 1, 2)},
+        {"_id": "p3", "total": 0, "average": None, "ratings": 1, "best": None, "worst": None,
+         "first": datetime(2025, 1, 4)},
+    ]
+
+
+def test_group_by_compound_key_and_many_groups():
+    docs = [{"_id": str(i), "a": i % 3, "b": i % 2, "n": 1} for i in range(100)]
+    results = run([{"$group": {"_id": {"a": "$a", "b": "$b"}, "n": {"$sum": "$n"}}}], docs, batch_size=7)
+
+    assert sorted((r["_id"]["a"], r["_id"]["b"], r["n"]) for r in results) == [
+        (0, 0, 17), (0, 1, 17), (1, 0, 16), (1, 1, 17), (2, 0, 17), (2, 1, 16),
+    ]
+
+
+@pytest.mark.parametrize("batch_size", [1, 2, 5, 100])
+def test_results_do_not_depend_on_batching(batch_size):
+    pipeline = [
+        {"$match": {"user": {"$in": ["u1", "u2"]}}},
+        {"$sort": {"created_at": -1}},
+        {"$skip": 1},
+        {"$limit": 2},
+        {"$project": {"_id": 0, "target_id": 1, "day": "$created_at"}},
+    ]
+    assert run(pipeline, batch_size=batch_size) == [
+        {"target_id": "p1", "day": datetime(2025, 1, 3)},
+        {"target_id": "p2", "day": datetime(2025, 1, 2)},
+    ]
+
+
+def test_sort_with_limit_keeps_only_the_top_documents():
+    engine = AggregationPipeline([{"$sort": {"created_at": 1}}, {"$limit": 2}])
+    engine.feed([dict(doc) for doc in RATINGS])
+
+    assert len(engine.stages) == 1
+    assert len(engine.stages[0].docs) == 2
+    assert [doc["_id"] for doc in engine.finish()] == ["r1", "r3"]
+
+
+def test_limit_stops_consuming_input():
+    engine = AggregationPipeline([{"$match": {"user": "u1"}}, {"$limit": 1}])
+
+    assert [doc["_id"] for doc in engine.feed([dict(doc) for doc in RATINGS])] == ["r1"]
+    assert engine.exhausted
+    assert engine.feed([{"_id": "r9", "user": "u1"}]) == []
+
+
+def test_count_and_exclusion_projection():
+    assert run([{"$match": {"score": {"$gte": 8}}}, {"$count": "high"}]) == [{"high": 2}]
+    assert run([{"$match": {"user": "u9"}}, {"$count": "none"}]) == []
+    assert run([{"$match": {"_id": "r1"}}, {"$project": {"created_at": 0, "user": 0}}]) == [
+        {"_id": "r1", "target_id": "p1", "score": 8}
+    ]
+
+
+async def test_run_consumes_an_async_stream():
+    async def batches():
+        yield [dict(doc) for doc in RATINGS[:3]]
+        yield [dict(doc) for doc in RATINGS[3:]]
+
+    results = await AggregationPipeline([{"$group": {"_id": None, "n": {"$count": {}}}}]).run(batches())
+    assert results == [{"_id": None, "n": 5}]
+
+
+@pytest.mark.parametrize("pipeline", [
+    [{"$lookup": {}}],
+    [{"$group": {"_id": "$a", "x": {"$push": "$b"}}}],
+    [{"$match": {}, "$limit": 1}],
+])
+def test_unsupported_pipelines_raise(pipeline):
+    with pytest.raises(ValueError):
+        AggregationPipeline(pipeline)
@@ -0,0 +1,93 @@
+import asyncio
+
+import pytest
+
+from app.utils.dataloader import DataLoader, RequestScopedDataDB, unscoped
+
+
+@pytest.fixture
+async def users(memory_db):
+    for doc_id in ("u1", "u2", "u3"):
+        await memory_db.create("users", {"_id": doc_id, "name": doc_id.upper()})
+    memory_db.operations.clear()
+    return memory_db
+
+
+async def test_loads_in_one_tick_are_batched(users):
+    loader = DataLoader(users)
+    docs = await asyncio.gather(
+        loader.load("users", "u1"),
+        loader.load("users", "u2"),
+        loader.load("users", "missing"),
+        loader.load("users", "u1"),
+    )
+
+    assert [doc and doc["_id"] for doc in docs] == ["u1", "u2", None, "u1"]
+    assert users.operations == {"read_many_by_ids": 1}
+
+
+async def test_results_and_misses_are_memoized(users):
+    loader = DataLoader(users)
+    await loader.load_many("users", ["u1", "missing"])
+    doc = await loader.load("users", "u1")
+    doc["name"] = "changed by the caller"
+
+    assert (await loader.load("users", "u1"))["name"] == "U1"
+    assert await loader.load("users", "missing") is None
+    assert users.operations == {"read_many_by_ids": 1}
+
+
+async def test_single_load_uses_read_one(users):
+    assert (await DataLoader(users).load("users", "u3"))["name"] == "U3"
+    assert users.operations == {"read_one": 1}
+
+
+async def test_failures_are_not_memoized(users, monkeypatch):
+    loader = DataLoader(users)
+    users.error_rate = 1.0
+    with pytest.raises(Exception, match="Simulated"):
+        await loader.load("users", "u1")
+
+    users.error_rate = 0.0
+    assert (await loader.load("users", "u1"))["_id"] == "u1"
+
+
+async def test_prime_and_clear(users):
+    loader = DataLoader(users)
+    loader.prime("users", {"_id": "u1", "name": "primed"})
+    assert (await loader.load("users", "u1"))["name"] == "primed"
+    assert users.operations == {}
+
+    loader.clear("users", "u1")
+    assert (await loader.load("users", "u1"))["name"] == "U1"
+
+
+async def test_request_scope_invalidates_on_writes(users):
+    scoped = RequestScopedDataDB(users)
+    assert (await scoped.read_one("users", {"_id": "u1"}))["name"] == "U1"
+
+    await scoped.update_one("users", {"_id": "u1"}, {"$set": {"name": "Ana"}})
+    assert (await scoped.read_one("users", {"_id": "u1"}))["name"] == "Ana"
+
+    assert await scoped.read_one("users", {"_id": "u9"}) is None
+    await scoped.create("users", {"_id": "u9", "name": "new"})
+    assert (await scoped.read_one("users", {"_id": "u9"}))["name"] == "new"
+
+    await scoped.delete_many("users", {"name": "U2"})
+    assert await scoped.read_many_by_ids("users", ["u2", "u3"]) == [
+        await users.read_one("users", {"_id": "u3"})
+    ]
+
+
+async def test_queries_prime_the_loader(users):
+    scoped = RequestScopedDataDB(users)
+    await scoped.read_many("users", {"name": {"$in": ["U1", "U2"]}})
+    users.operations.clear()
+
+    assert len(await scoped.read_many_by_ids("users", ["u1", "u2"])) == 2
+    assert users.operations == {}
+
+
+async def test_unscoped_returns_the_shared_database(users):
+    assert unscoped(RequestScopedDataDB(users)) is users
+    assert unscoped(users) is users
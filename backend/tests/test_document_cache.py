@@ -0,0 +1,156 @@
+import asyncio
+import uuid
+
+import pytest
+
+from app.utils.document_cache import CachedDataDB, DocumentCache
+from app.utils.shared_cache import LocalSharedCache
+
+
+@pytest.fixture
+async def cached(memory_db):
+    db = CachedDataDB(memory_db)
+    await db.create("pois", {"_id": "a", "author_id": "u1", "name": "Prado"})
+    await db.create("pois", {"_id": "b", "author_id": "u2", "name": "Retiro"})
+    return db
+
+
+def _database_reads(db):
+    operations = db.data_db.operations
+    return operations.get("read_one", 0) + operations.get("read_many_by_ids", 0)
+
+
+async def test_reads_by_id_are_served_from_the_cache(cached):
+    first = await cached.read_one("pois", {"_id": "a"})
+    first["name"] = "changed by the caller"
+    reads = _database_reads(cached)
+
+    assert (await cached.read_one("pois", {"_id": "a"}))["name"] == "Prado"
+    assert [d["_id"] for d in await cached.read_many_by_ids("pois", ["a", "b"])] == ["a", "b"]
+    assert _database_reads(cached) == reads + 1
+    assert cached.hits == 2
+
+
+async def test_concurrent_misses_share_one_read(cached):
+    docs = await asyncio.gather(*(cached.read_one("pois", {"_id": "a"}) for _ in range(5)))
+
+    assert all(doc["name"] == "Prado" for doc in docs)
+    assert _database_reads(cached) == 1
+    assert (cached.misses, cached.coalesced) == (1, 4)
+
+
+async def test_read_overlapping_a_write_is_not_cached(cached, monkeypatch):
+    """A fill that started before a write must not cache what it read (epoch check)"""
+    release = asyncio.Event()
+    read_one = cached.data_db.read_one
+
+    async def slow_read_one(collection, filter_dict):
+        doc = await read_one(collection, filter_dict)
+        await release.wait()
+        return doc
+
+    monkeypatch.setattr(cached.data_db, "read_one", slow_read_one)
+    pending = asyncio.ensure_future(cached.read_one("pois", {"_id": "a"}))
+    await asyncio.sleep(0)
+    await cached.update_one("pois", {"_id": "a"}, {"$set": {"name": "Museo del Prado"}})
+    release.set()
+
+    assert (await pending)["name"] == "Prado"
+    assert (await cached.read_one("pois", {"_id": "a"}))["name"] == "Museo del Prado"
+
+
+async def test_read_after_write_does_not_join_an_older_read(cached, monkeypatch):
+    release = asyncio.Event()
+    read_one = cached.data_db.read_one
+
+    async def slow_read_one(collection, filter_dict):
+        doc = await read_one(collection, filter_dict)
+        await release.wait()
+        return doc
+
+    monkeypatch.setattr(cached.data_db, "read_one", slow_read_one)
+    before = asyncio.ensure_future(cached.read_one("pois", {"_id": "a"}))
+    await asyncio.sleep(0)
+    await cached.update_one("pois", {"_id": "a"}, {"$set": {"name": "Museo del Prado"}})
+    after = asyncio.ensure_future(cached.read_one("pois", {"_id": "a"}))
+    await asyncio.sleep(0)
+    release.set()
+
+    assert (await before)["name"] == "Prado"
+    assert (await after)["name"] == "Museo del Prado"
+
+
+async def test_writes_by_filter_drop_only_matching_entries(cached):
+    await cached.read_many_by_ids("pois", ["a", "b"])
+    reads = _database_reads(cached)
+
+    assert await cached.delete_many("pois", {"author_id": "u1"}) == 1
+
+    assert await cached.read_one("pois", {"_id": "a"}) is None
+    assert (await cached.read_one("pois", {"_id": "b"}))["name"] == "Retiro"
+    assert _database_reads(cached) == reads + 1
+
+
+async def test_writes_on_other_workers_evict_local_copies(memory_db):
+    name = str(uuid.uuid4())
+    workers = []
+    for _ in range(2):
+        shared = LocalSharedCache(name, prefix="test", channel="invalidate", ttl_seconds=60, redelete_ms=0)
+        worker = CachedDataDB(memory_db, shared=shared)
+        await shared.connect(worker._on_remote_invalidation)
+        workers.append(worker)
+    first, second = workers
+    await first.create("users", {"_id": "u1", "name": "Ana"})
+
+    assert (await first.read_one("users", {"_id": "u1"}))["name"] == "Ana"
+    await second.update_one("users", {"_id": "u1"}, {"$set": {"name": "Ana B."}})
+    await asyncio.sleep(0.01)
+
+    assert (await first.read_one("users", {"_id": "u1"}))["name"] == "Ana B."
+    for worker in workers:
+        await worker.shared.disconnect()
+
+
+def test_document_cache_evicts_least_recently_used():
+    cache = DocumentCache(max_entries=2, ttl_seconds=60)
+    cache.put(("pois", "a"), {"_id": "a"})
+    cache.put(("pois", "b"), {"_id": "b"})
+    cache.get(("pois", "a"))
+    cache.put(("pois", "c"), {"_id": "c"})
+
+    assert cache.get(("pois", "b")) is None
+    assert cache.get(("pois", "a")) is not None
+    assert cache.evictions == 1
+
+
+def test_document_cache_expires_entries():
+    cache = DocumentCache(max_entries=10, ttl_seconds=0)
+    cache.put(("pois", "a"), {"_id": "a"})
+
+    assert cache.get(("pois", "a")) is None
+    assert cache.expirations == 1
+
+
+async def test_lookups_are_joined_by_the_database_on_a_miss(cached, monkeypatch):
+    await cached.create("users", {"_id": "u1", "name": "Ana"})
+    joined = []
+    read_one_with_lookups = cached.data_db.read_one_with_lookups
+
+    async def recording_read_one_with_lookups(collection, filter_dict, lookups):
+        joined.append(filter_dict["_id"])
+        return await read_one_with_lookups(collection, filter_dict, lookups)
+
+    monkeypatch.setattr(cached.data_db, "read_one_with_lookups", recording_read_one_with_lookups)
+    lookups = [{"from": "users", "local_field": "author_id", "as": "author", "fields": ["name"]}]
+
+    first = await cached.read_one_with_lookups("pois", {"_id": "a"}, lookups)
+    second = await cached.read_one_with_lookups("pois", {"_id": "a"}, lookups)
+
+    assert first == second
+    assert first["author"] == {"_id": "u1", "name": "Ana"}
+    assert joined == ["a"]
+    # The document is cached without the lookup results
+    assert "author" not in await cached.read_one("pois", {"_id": "a"})
+    await cached.update_one("pois", {"_id": "a"}, {"$set": {"name": "Museo del Prado"}})
+    assert (await cached.read_one_with_lookups("pois", {"_id": "a"}, lookups))["name"] == "Museo del Prado"
+    assert joined == ["a", "a"]
@@ -0,0 +1,66 @@
+from datetime import datetime
+
+import pytest
+
+from app.utils.dynamodb_codec import ItemCodec, get_codec
+from app.utils.dynamodb_storage import DynamoDBDataDB
+
+POI = {
+    "_id": "p1",
+    "name": "Prado",
+    "description": "Museum",
+    "latitude": 40.41,
+    "longitude": -3.69,
+    "tags": ["cultura", "turismo"],
+    "image_url": "https://i.ibb.co/p1.jpg",
+    "author_id": "u1",
+    "rating_count": 3,
+    "average_rating": 8.5,
+    "created_at": datetime(2025, 1, 1, 10, 30),
+    "updated_at": datetime(2025, 1, 2, 11, 0, 0, 123456),
+}
+
+
+def test_round_trip_and_legacy_items():
+    codec = get_codec("pois")
+    item = codec.encode(POI)
+
+    assert item["latitude"] == {"N": "40.41"}
+    assert item["created_at"] == {"S": "2025-01-01T10:30:00"}
+    assert codec.decode(item) == POI
+    assert codec.decode_many([item, item]) == [POI, POI]
+    # What DynamoDBDataDB writes: string sets for string lists
+    assert codec.decode(DynamoDBDataDB()._dict_to_dynamodb(POI)) == POI
+
+
+@pytest.mark.parametrize("changes", [
+    {"name": None},
+    {"rating_count": 3.0},
+    {"average_rating": 8},
+    {"tags": ("cultura",)},
+    {"tags": ["cultura", 7]},
+    {"created_at": "yesterday"},
+    {"extra": {"a": [1, True]}},
+])
+def test_unexpected_values_take_the_careful_path(changes):
+    codec = get_codec("pois")
+    doc = {**POI, **changes}
+    expected = {**doc, "tags": list(doc["tags"])}
+
+    assert codec.decode(codec.encode(doc)) == expected
+    # A single odd document in a batch does not affect the others
+    assert codec.decode_many(codec.encode_many([POI, doc])) == [POI, expected]
+
+
+def test_odd_items_decode_generically():
+    codec = ItemCodec({"_id": "str", "n": "int", "ok": "bool", "when": "datetime", "tags": "str_list"})
+    items = [
+        {"_id": {"S": "a"}, "n": {"N": "1.5"}, "ok": {"NULL": True}, "when": {"S": "not a date"}, "tags": {"L": []}},
+        {"_id": {"S": "b"}, "n": {"N": "2"}, "ok": {"BOOL": False}, "when": {"S": "2025-01-01T00:00:00"},
+         "tags": {"SS": ["x"]}, "other": {"NS": ["1", "2.5"]}},
+    ]
+
+    assert codec.decode_many(items) == [
+        {"_id": "a", "n": 1.5, "ok": None, "when": "not a date", "tags": []},
+        {"_id": "b", "n": 2, "ok": False, "when": datetime(2025, 1, 1), "tags": ["x"], "other": [1, 2.5]},
+    ]
@@ -0,0 +1,142 @@
+import pytest
+
+from app.config import config
+from app.utils import dynamodb_storage
+from app.utils.dynamodb_storage import DynamoDBDataDB
+
+RATINGS_TABLE = f"{config.DYNAMODB_TABLE_PREFIX}-ratings"
+POIS_TABLE = f"{config.DYNAMODB_TABLE_PREFIX}-pois"
+TARGET_INDEX = "target_key-created_at-index"
+USER_INDEX = "user_id-created_at-index"
+AUTHOR_INDEX = "author_id-created_at-index"
+
+
+@pytest.fixture(autouse=True)
+def index_state(monkeypatch):
+    """Start every test from an unprovisioned process"""
+    for name in ("_PROVISIONED_TABLES", "_INDEX_STATUS", "_BACKFILLED_KEYS", "_ESTIMATED_COUNTS"):
+        monkeypatch.setattr(dynamodb_storage, name, type(getattr(dynamodb_storage, name))())
+    return dynamodb_storage
+
+
+def _set_indexes(state, table, statuses, backfilled=()):
+    state._INDEX_STATUS[table] = dict(statuses)
+    state._BACKFILLED_KEYS[table] = set(backfilled)
+
+
+# Query planning
+
+def test_plan_uses_composite_index_once_backfilled(index_state):
+    _set_indexes(index_state, RATINGS_TABLE, {TARGET_INDEX: "ACTIVE", USER_INDEX: "ACTIVE"}, ["target_key"])
+    plan = DynamoDBDataDB()._plan_query("ratings", {"target_type": "poi", "target_id": "p1", "score": 5})
+
+    assert plan["index_name"] == TARGET_INDEX
+    assert plan["hash_value"] == "poi#p1"
+    assert plan["remaining"] == {"score": 5}
+
+
+def test_plan_falls_back_to_scan_before_backfill(index_state):
+    _set_indexes(index_state, RATINGS_TABLE, {TARGET_INDEX: "ACTIVE", USER_INDEX: "ACTIVE"})
+    db = DynamoDBDataDB()
+
+    assert db._plan_query("ratings", {"target_type": "poi", "target_id": "p1"}) is None
+    # Indexes on plain attributes do not depend on the backfill
+    assert db._plan_query("ratings", {"user_id": "u1"})["index_name"] == USER_INDEX
+
+
+@pytest.mark.parametrize("status", ["CREATING", "UPDATING", "DELETING", None])
+def test_plan_skips_indexes_that_are_not_active(index_state, status):
+    statuses = {AUTHOR_INDEX: status} if status else {}
+    _set_indexes(index_state, POIS_TABLE, statuses)
+
+    assert DynamoDBDataDB()._plan_query("pois", {"author_id": "u1"}) is None
+    operation, params, _ = DynamoDBDataDB()._build_request("pois", {"author_id": "u1"})
+    assert operation == "scan"
+    assert "IndexName" not in params
+
+
+def test_plan_pushes_sort_down_to_the_range_key(index_state):
+    _set_indexes(index_state, POIS_TABLE, {AUTHOR_INDEX: "ACTIVE"})
+    db = DynamoDBDataDB()
+
+    plan = db._plan_query("pois", {"author_id": "u1"}, {"created_at": -1})
+    assert plan["sorted"] and not plan["scan_forward"]
+    assert not db._plan_query("pois", {"author_id": "u1"}, {"name": 1})["sorted"]
+    # Filters without an equality on a hash key need a scan
+    assert db._plan_query("pois", {"author_id": {"$in": ["u1", "u2"]}}) is None
+
+
+def test_in_uses_contains_only_on_list_fields():
+    db = DynamoDBDataDB()
+    names, values = {}, {}
+    on_list = db._build_condition("pois", {"tags": {"$in": ["cultura", "ocio"]}}, names, values)
+    on_string = db._build_condition("pois", {"name": {"$in": ["Prado"]}}, names, values)
+
+    assert on_list == "(contains(#f0, :f0) OR contains(#f0, :f1))"
+    assert on_string == "#f1 IN (:f2)"
+    assert db._build_condition("pois", {"name": {"$in": []}}, {}, {}).startswith("attribute_exists")
+
+
+# Against a mocked DynamoDB
+
+@pytest.fixture
+async def dynamodb(monkeypatch):
+    moto = pytest.importorskip("moto")
+    for name in ("AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY"):
+        monkeypatch.setenv(name, "testing")
+    monkeypatch.setattr(config, "AWS_REGION", "us-east-1")
+    with moto.mock_aws():
+        db = DynamoDBDataDB()
+        await db.connect()
+        yield db
+        await db.disconnect()
+
+
+async def test_in_on_strings_and_lists(dynamodb):
+    await dynamodb.create("pois", {"_id": "p1", "name": "Prado", "tags": ["cultura", "turismo"], "author_id": "u1"})
+    await dynamodb.create("pois", {"_id": "p2", "name": "Retiro", "tags": ["ocio"], "author_id": "u2"})
+
+    async def ids(filter_dict):
+        return sorted(doc["_id"] for doc in await dynamodb.read_many("pois", filter_dict))
+
+    assert await ids({"name": {"$in": ["Prado", "Bicing"]}}) == ["p1"]
+    # A substring of a stored string is not a match
+    assert await ids({"name": {"$in": ["Pra"]}}) == []
+    assert await ids({"tags": {"$in": ["turismo", "ocio"]}}) == ["p1", "p2"]
+    assert await ids({"tags": {"$in": ["cult"]}}) == []
+
+
+async def test_legacy_items_are_found_before_and_after_backfill(dynamodb, index_state):
+    # Items written before target_key existed, on a table never backfilled
+    for doc_id in ("r1", "r2"):
+        dynamodb.client.put_item(TableName=RATINGS_TABLE, Item={
+            "_id": {"S": doc_id}, "target_type": {"S": "poi"}, "target_id": {"S": "p1"},
+            "user_id": {"S": "u1"}, "score": {"N": "4"}, "created_at": {"S": "2025-01-01T00:00:00"},
+        })
+    arn = dynamodb.client.describe_table(TableName=RATINGS_TABLE)["Table"]["TableArn"]
+    dynamodb.client.untag_resource(ResourceArn=arn, TagKeys=[dynamodb_storage.BACKFILL_TAG])
+    dynamodb._refresh_indexes()
+    target = {"target_type": "poi", "target_id": "p1"}
+
+    assert dynamodb._build_request("ratings", target)[0] == "scan"
+    assert await dynamodb.count("ratings", target) == 2
+
+    assert await dynamodb.backfill_composite_keys() == {"ratings": 2}
+    dynamodb._refresh_indexes()
+
+    operation, params, _ = dynamodb._build_request("ratings", target)
+    assert (operation, params["IndexName"]) == ("query", TARGET_INDEX)
+    assert sorted(doc["_id"] for doc in await dynamodb.read_many("ratings", target)) == ["r1", "r2"]
+    assert "target_key" not in (await dynamodb.read_one("ratings", {"_id": "r1"}))
+
+
+async def test_estimated_count_is_cached(dynamodb, monkeypatch):
+    await dynamodb.create("users", {"_id": "u1", "email": "a@example.com"})
+    calls = []
+    describe = dynamodb.client.describe_table
+    monkeypatch.setattr(dynamodb.client, "describe_table", lambda **kw: calls.append(kw) or describe(**kw))
+
+    first = await dynamodb.count("users", estimated=True)
+    assert await dynamodb.count("users", estimated=True) == first
+    assert len(calls) == 1
+    assert await dynamodb.count("users") == 1
@@ -0,0 +1,62 @@
+import json
+
+import pytest
+
+from app.config import config
+from app.services.export_service import ExportService
+from app.utils.dependencies import create_data_db
+from app.utils.storage import Storage
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+async def export_service(request, tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "SQLITE_PATH", str(tmp_path / "test.db"))
+    data_db = create_data_db(request.param)
+    if request.param == "memory":
+        data_db.latency_ms = data_db.jitter_ms = data_db.error_rate = 0
+    await data_db.connect()
+    await data_db.create_many("pois", [{"_id": f"p{i:02d}", "name": f"Place {i}"} for i in range(25)])
+    yield ExportService(Storage(None, data_db))
+    await data_db.disconnect()
+
+
+async def _export(service, **options):
+    chunks = [chunk async for chunk in await service.open_ndjson("pois", **options)]
+    return chunks, [json.loads(line)["_id"] for chunk in chunks for line in chunk.splitlines()]
+
+
+async def test_chunks_hold_batch_size_lines(export_service):
+    chunks, ids = await _export(export_service, batch_size=10)
+
+    assert ids == [f"p{i:02d}" for i in range(25)]
+    assert [chunk.count(b"\n") for chunk in chunks] == [10, 10, 5]
+    assert all(chunk.endswith(b"\n") for chunk in chunks)
+
+
+async def test_resume_after_the_last_line_received(export_service):
+    _, ids = await _export(export_service, batch_size=7)
+    _, resumed = await _export(export_service, batch_size=7, start_after=ids[11])
+
+    assert resumed == ids[12:]
+    assert (await _export(export_service, start_after=ids[-1]))[0] == []
+
+
+async def test_segments_split_the_collection(export_service):
+    _, ids = await _export(export_service)
+    segments = [(await _export(export_service, segment=s, total_segments=3))[1] for s in range(3)]
+
+    assert sorted(sum(segments, [])) == ids
+    assert all(segments)
+    # Resuming stays within the segment
+    _, resumed = await _export(export_service, segment=1, total_segments=3, start_after=segments[1][0])
+    assert resumed == segments[1][1:]
+
+
+async def test_errors_are_raised_when_opening(export_service, monkeypatch):
+    async def failing_iter_many(*args, **kwargs):
+        raise Exception("invalid cursor")
+        yield
+
+    monkeypatch.setattr(export_service.storage.data_db, "iter_many", failing_iter_many)
+    with pytest.raises(Exception, match="invalid cursor"):
+        await export_service.open_ndjson("pois")
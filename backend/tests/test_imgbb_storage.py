@@ -0,0 +1,95 @@
+import hashlib
+from io import BytesIO
+
+import pytest
+
+from app.config import config
+from app.utils.imgbb_storage import ImgBBFileDB
+from app.utils.uploads import FileTooLargeError
+from benchmarks import fake_imgbb
+
+
+@pytest.fixture
+async def imgbb(monkeypatch):
+    """Fake ImgBB server on a free local port, and the stats it keeps"""
+    app = fake_imgbb.make_app(handshake_ms=0, latency_ms=0)
+    runner = await fake_imgbb.start(app, "127.0.0.1", 0)
+    port = runner.addresses[0][1]
+    monkeypatch.setattr(config, "IMGBB_API_KEY", "fake")
+    monkeypatch.setattr(config, "IMGBB_API_URL", f"http://127.0.0.1:{port}/1/upload")
+    monkeypatch.setattr(config, "IMGBB_MAX_CONNECTIONS", 2)
+    yield app["stats"]
+    await runner.cleanup()
+
+
+@pytest.fixture
+async def file_db(imgbb):
+    file_db = ImgBBFileDB()
+    await file_db.initialize()
+    yield file_db
+    await file_db.shutdown()
+
+
+async def _chunks(data, size=4096):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+async def test_initialize_and_shutdown(imgbb):
+    file_db = ImgBBFileDB()
+    assert file_db.metrics()["session_open"] is False
+
+    await file_db.initialize()
+    session = file_db.session
+    await file_db.initialize()
+    assert file_db.session is session
+    assert file_db.metrics()["session_open"] is True
+
+    await file_db.shutdown()
+    assert session.closed
+    assert file_db.session is None
+    await file_db.shutdown()
+
+    # Scripts that never initialize the storage still upload
+    assert (await file_db.upload_file(BytesIO(b"x"), "a.jpg", "image/jpeg")).endswith("/a.jpg")
+    await file_db.shutdown()
+
+
+async def test_uploads_reuse_pooled_connections(file_db, imgbb):
+    urls = [await file_db.upload_file(BytesIO(b"\xff\xd8" * 100), f"{i}.jpg", "image/jpeg") for i in range(5)]
+
+    assert len(set(urls)) == 5
+    metrics = file_db.metrics()
+    assert metrics["requests"] == 5
+    assert metrics["connections_created"] == 1
+    assert metrics["connections_reused"] == 4
+    assert imgbb["connections"] == 1
+
+
+async def test_stream_upload_reports_size_and_hash(file_db, imgbb):
+    data = bytes(range(256)) * 300
+
+    result = await file_db.upload_stream(_chunks(data), "photo.jpg", "image/jpeg", max_size=len(data))
+
+    assert result["url"].endswith("/photo.jpg")
+    assert result["size"] == len(data)
+    assert result["sha256"] == hashlib.sha256(data).hexdigest()
+    assert imgbb["uploads"] == 1
+
+
+async def test_stream_upload_over_max_size_is_aborted(file_db, imgbb):
+    with pytest.raises(FileTooLargeError):
+        await file_db.upload_stream(_chunks(b"x" * 50_000), "big.jpg", "image/jpeg", max_size=20_000)
+
+    assert imgbb["uploads"] == 0
+    # The pool is still usable afterwards
+    assert (await file_db.upload_stream(_chunks(b"small"), "ok.jpg", "image/jpeg"))["size"] == 5
+
+
+async def test_api_errors_are_raised(file_db):
+    file_db.api_key = ""
+
+    with pytest.raises(Exception, match="Invalid API v1 key"):
+        await file_db.upload_file(BytesIO(b"x"), "a.jpg", "image/jpeg")
+    with pytest.raises(Exception, match="Invalid API v1 key"):
+        await file_db.upload_stream(_chunks(b"x"), "a.jpg", "image/jpeg")
@@ -0,0 +1,74 @@
+import asyncio
+
+import pytest
+
+from app.config import config
+from app.services.import_service import (
+    ImportService,
+    PublicAddressResolver,
+    _check_image_url,
+    _is_public_address,
+)
+from app.utils.storage import Storage
+from tests.test_uploads import RecordingFileDB
+
+
+@pytest.mark.parametrize("address, public", [
+    ("8.8.8.8", True),
+    ("2606:4700:4700::1111", True),
+    ("10.0.0.1", False),
+    ("192.168.1.10", False),
+    ("127.0.0.1", False),
+    ("169.254.169.254", False),
+    ("::1", False),
+    ("fe80::1%eth0", False),
+    ("224.0.0.1", False),
+])
+def test_is_public_address(address, public):
+    assert _is_public_address(address) is public
+
+
+@pytest.mark.parametrize("url", [
+    "file:///etc/passwd",
+    "ftp://example.com/a.jpg",
+    "http://127.0.0.1/a.jpg",
+    "http://169.254.169.254/latest/meta-data/",
+    "http://[::1]:8080/a.jpg",
+])
+def test_check_image_url_rejects_local_targets(url):
+    with pytest.raises(Exception):
+        _check_image_url(url)
+
+
+def test_check_image_url_leaves_hostnames_to_the_resolver(monkeypatch):
+    _check_image_url("https://images.example.com/a.jpg")
+    _check_image_url("http://8.8.8.8/a.jpg")
+
+    monkeypatch.setattr(config, "IMPORT_ALLOW_PRIVATE_URLS", True)
+    _check_image_url("http://127.0.0.1/a.jpg")
+
+
+async def test_resolver_refuses_hosts_resolving_to_private_addresses():
+    resolver = PublicAddressResolver()
+    try:
+        with pytest.raises(OSError, match="non-public"):
+            await resolver.resolve("localhost", 80)
+    finally:
+        await resolver.close()
+
+
+@pytest.mark.parametrize("source", ["../secret.jpg", "photos/../../secret.jpg", "/etc/hostname", "link.jpg"])
+async def test_image_paths_must_stay_under_the_image_root(tmp_path, source):
+    root = tmp_path / "images"
+    (root / "photos").mkdir(parents=True)
+    (root / "photos" / "ok.jpg").write_bytes(b"\xff\xd8image")
+    (tmp_path / "secret.jpg").write_bytes(b"secret")
+    (root / "link.jpg").symlink_to(tmp_path / "secret.jpg")
+    file_db = RecordingFileDB()
+    service = ImportService(Storage(file_db, None), None)
+
+    with pytest.raises(Exception, match="outside"):
+        await service._ingest_image(None, asyncio.Semaphore(1), source, root)
+
+    assert await service._ingest_image(None, asyncio.Semaphore(1), "photos/ok.jpg", root) == "memory://pois/ok.jpg"
+    assert file_db.files == {"ok.jpg": b"\xff\xd8image"}
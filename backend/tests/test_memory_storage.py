@@ -0,0 +1,113 @@
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.utils.query import match_document, sort_documents
+
+TAGS = ["cultura", "turismo", "movilidad", "ocio"]
+
+
+async def _seed_pois(db, count=120):
+    rng = random.Random(7)
+    start = datetime(2025, 1, 1)
+    docs = [
+        {
+            "_id": f"poi-{i:03d}",
+            "author_id": f"user-{rng.randrange(6)}",
+            "tags": rng.sample(TAGS, rng.randrange(3)),
+            "rating_count": rng.randrange(10),
+        }
+        for i in range(count)
+    ]
+    for doc in docs:
+        await db.create("pois", doc)
+    # Distinct timestamps, so sorts have a single correct order
+    for i, doc in enumerate(docs):
+        await db.update_one("pois", {"_id": doc["_id"]}, {"$set": {"created_at": start + timedelta(hours=i)}})
+    return await db.read_many("pois", limit=count)
+
+
+@pytest.mark.parametrize("filter_dict, sort_dict", [
+    ({"author_id": "user-1"}, None),
+    ({"author_id": {"$in": ["user-2", "user-3"]}}, {"created_at": -1}),
+    ({"tags": "cultura"}, {"created_at": 1}),
+    ({"tags": {"$in": ["ocio", "movilidad"]}, "rating_count": {"$gte": 5}}, None),
+    ({"created_at": {"$gte": datetime(2025, 1, 3), "$lt": datetime(2025, 1, 4)}}, None),
+    ({"created_at": {"$gt": datetime(2025, 1, 2)}, "author_id": "user-4"}, {"created_at": -1}),
+    ({}, {"created_at": -1}),
+    ({"rating_count": {"$lt": 2}}, {"rating_count": 1, "created_at": 1}),
+])
+async def test_indexed_reads_match_a_full_scan(memory_db, filter_dict, sort_dict):
+    docs = await _seed_pois(memory_db)
+    expected = sort_documents([d for d in docs if match_document(d, filter_dict)], sort_dict)
+
+    found = await memory_db.read_many("pois", filter_dict, limit=1000, sort_dict=sort_dict)
+    if sort_dict:
+        assert [d["_id"] for d in found] == [d["_id"] for d in expected]
+    else:
+        assert {d["_id"] for d in found} == {d["_id"] for d in expected}
+    assert await memory_db.count("pois", filter_dict) == len(expected)
+
+    page = await memory_db.read_many("pois", filter_dict, skip=3, limit=5, sort_dict=sort_dict or {"created_at": 1})
+    assert [d["_id"] for d in page] == [d["_id"] for d in sort_documents(expected, sort_dict or {"created_at": 1})[3:8]]
+
+
+async def test_indexes_follow_updates_and_deletes(memory_db):
+    await memory_db.create("pois", {"_id": "a", "author_id": "u1", "tags": ["cultura"]})
+    await memory_db.update_one("pois", {"_id": "a"}, {"$set": {"author_id": "u2", "tags": ["ocio"]}})
+
+    assert await memory_db.read_many("pois", {"author_id": "u1"}) == []
+    assert await memory_db.read_many("pois", {"tags": "cultura"}) == []
+    assert [d["_id"] for d in await memory_db.read_many("pois", {"author_id": "u2"})] == ["a"]
+
+    assert await memory_db.delete_many("pois", {"tags": "ocio"}) == 1
+    assert await memory_db.read_many("pois", {"author_id": "u2"}) == []
+
+
+async def test_reads_return_copies(memory_db):
+    await memory_db.create("pois", {"_id": "a", "tags": ["cultura"]})
+    doc = await memory_db.read_one("pois", {"_id": "a"})
+    doc["tags"].append("ocio")
+
+    assert (await memory_db.read_one("pois", {"_id": "a"}))["tags"] == ["cultura"]
+
+
+async def test_read_many_by_ids_skips_missing_and_duplicates(memory_db):
+    for doc_id in ("a", "b", "c"):
+        await memory_db.create("users", {"_id": doc_id})
+
+    docs = await memory_db.read_many_by_ids("users", ["c", "x", "a", "c"])
+    assert [d["_id"] for d in docs] == ["c", "a"]
+
+
+async def test_iter_many_segments_cover_every_document_once(memory_db):
+    docs = await _seed_pois(memory_db, count=50)
+
+    seen = []
+    for segment in range(3):
+        seen += [d["_id"] async for d in memory_db.iter_many("pois", batch_size=7, segment=segment, total_segments=3)]
+    assert sorted(seen) == sorted(d["_id"] for d in docs)
+
+    after = [d["_id"] async for d in memory_db.iter_many("pois", start_after="poi-044")]
+    assert after == [f"poi-{i:03d}" for i in range(45, 50)]
+
+
+async def test_bulk_write_counts(memory_db):
+    await memory_db.create("ratings", {"_id": "r1", "score": 5})
+    result = await memory_db.bulk_write("ratings", [
+        {"insert_one": {"document": {"_id": "r2", "score": 1}}},
+        {"update_one": {"filter": {"_id": "r1"}, "update": {"$inc": {"score": 1}}}},
+        {"replace_one": {"filter": {"_id": "r3"}, "replacement": {"score": 9}, "upsert": True}},
+        {"delete_one": {"filter": {"_id": "r2"}}},
+    ])
+
+    assert result == {"inserted_count": 1, "modified_count": 1, "upserted_count": 1, "deleted_count": 1}
+    assert {d["_id"]: d["score"] for d in await memory_db.read_many("ratings")} == {"r1": 6, "r3": 9}
+
+
+async def test_simulated_errors(memory_db):
+    memory_db.error_rate = 1.0
+    with pytest.raises(Exception, match="Simulated database error"):
+        await memory_db.count("pois")
+    assert memory_db.metrics()["simulated_errors"] == 1
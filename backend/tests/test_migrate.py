@@ -0,0 +1,118 @@
+import argparse
+import json
+from datetime import datetime
+
+import pytest
+
+from app.commands import migrate
+from app.config import config
+from app.utils.sqlite_storage import SQLiteDataDB
+
+DOCS = {
+    "users": [{"_id": f"u{i}", "name": f"User {i}", "total_score": i} for i in range(5)],
+    "pois": [
+        {"_id": f"p{i}", "name": f"Place {i}", "tags": ["cultura"], "seen_at": datetime(2025, 1, i + 1)}
+        for i in range(7)
+    ],
+}
+
+
+def _args(command, source, target, **options):
+    defaults = {
+        "collections": "users,pois", "segments": 0, "writers": 2, "batch_size": 2,
+        "checkpoint": None, "fresh": False, "report_interval": 60.0,
+    }
+    return argparse.Namespace(command=command, source=source, target=target, **{**defaults, **options})
+
+
+async def _read_all(path, monkeypatch):
+    monkeypatch.setattr(config, "SQLITE_PATH", str(path))
+    db = SQLiteDataDB()
+    await db.connect()
+    try:
+        return {name: await db.read_many(name, sort_dict={"_id": 1}) for name in DOCS}
+    finally:
+        await db.disconnect()
+
+
+@pytest.fixture
+async def source_db(tmp_path, monkeypatch):
+    """SQLite database holding DOCS, selected through config.SQLITE_PATH"""
+    path = tmp_path / "source.db"
+    monkeypatch.setattr(config, "SQLITE_PATH", str(path))
+    db = SQLiteDataDB()
+    await db.connect()
+    for name, docs in DOCS.items():
+        await db.create_many(name, [dict(doc) for doc in docs])
+    await db.disconnect()
+    return path
+
+
+async def test_backup_then_restore(source_db, tmp_path, monkeypatch):
+    backup = tmp_path / "backup"
+    expected = await _read_all(source_db, monkeypatch)
+
+    assert await migrate.run(_args("backup", "sqlite", str(backup))) == 0
+    manifest = json.loads((backup / "manifest.json").read_text())
+    assert manifest["collections"] == {"users": 5, "pois": 7}
+    assert [path.name for path in (backup / "pois").iterdir()] == ["segment-0-000.ndjson.gz"]
+    # A completed job is not run again
+    assert await migrate.run(_args("backup", "sqlite", str(backup))) == 0
+
+    monkeypatch.setattr(config, "SQLITE_PATH", str(tmp_path / "restored.db"))
+    assert await migrate.run(_args("restore", str(backup), "sqlite")) == 0
+
+    restored = await _read_all(tmp_path / "restored.db", monkeypatch)
+    assert restored == expected
+
+
+async def test_interrupted_restore_resumes_from_the_checkpoint(source_db, tmp_path, monkeypatch):
+    backup = tmp_path / "backup"
+    assert await migrate.run(_args("backup", "sqlite", str(backup))) == 0
+    monkeypatch.setattr(config, "SQLITE_PATH", str(tmp_path / "restored.db"))
+
+    written = []
+    write = migrate.DataDBTarget.write
+
+    async def failing_write(self, collection, segment, docs):
+        if collection == "pois" and any(doc["_id"] >= "p4" for doc in docs):
+            raise Exception("connection lost")
+        written.extend(doc["_id"] for doc in docs)
+        await write(self, collection, segment, docs)
+
+    monkeypatch.setattr(migrate.DataDBTarget, "write", failing_write)
+    assert await migrate.run(_args("restore", str(backup), "sqlite", writers=1)) == 1
+    checkpoint = json.loads((backup / "restore-to-sqlite.checkpoint.json").read_text())
+    assert checkpoint["collections"]["users"]["segment-0-000.ndjson.gz"]["done"]
+    assert checkpoint["collections"]["pois"]["segment-0-000.ndjson.gz"] == {"position": 4, "count": 4, "done": False}
+
+    async def recording_write(self, collection, segment, docs):
+        written.extend(doc["_id"] for doc in docs)
+        await write(self, collection, segment, docs)
+
+    written.clear()
+    monkeypatch.setattr(migrate.DataDBTarget, "write", recording_write)
+    assert await migrate.run(_args("restore", str(backup), "sqlite")) == 0
+
+    # Only the pois after the checkpoint were written again
+    assert sorted(written) == ["p4", "p5", "p6"]
+    restored = await _read_all(tmp_path / "restored.db", monkeypatch)
+    assert [doc["_id"] for doc in restored["pois"]] == [f"p{i}" for i in range(7)]
+    assert len(restored["users"]) == 5
+
+
+async def test_checkpoint_of_another_job_is_refused(source_db, tmp_path, capsys):
+    backup = tmp_path / "backup"
+    assert await migrate.run(_args("backup", "sqlite", str(backup), collections="users")) == 0
+
+    assert await migrate.run(_args("backup", "sqlite", str(backup))) == 1
+    assert "different job" in capsys.readouterr().out
+    assert await migrate.run(_args("backup", "sqlite", str(backup), fresh=True)) == 0
+
+
+def test_lines_round_trip_datetimes():
+    doc = {"_id": "p1", "at": datetime(2025, 6, 1, 12, 30), "nested": {"at": datetime(2025, 1, 1)}}
+    line = migrate.encode_line(doc)
+
+    assert line.endswith("\n") and "\n" not in line[:-1]
+    assert migrate.decode_line(line) == doc
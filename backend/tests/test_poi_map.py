@@ -0,0 +1,104 @@
+import asyncio
+import json
+
+import msgpack
+import pytest
+
+from app.utils.poi_map import JSON, MSGPACK, POIMapCache, POIMapSnapshot
+
+POIS = [
+    {"_id": "p1", "latitude": 40.416775, "longitude": -3.703790, "average_rating": 8.5, "tags": ["cultura", "ocio"]},
+    {"_id": "p2", "latitude": 41.387400, "longitude": 2.168600, "average_rating": None, "tags": []},
+    {"_id": "p3", "latitude": 37.389100, "longitude": -5.984500, "average_rating": 7.25, "tags": ["cultura"]},
+]
+
+
+def test_payload_columns_and_quantization():
+    snapshot = POIMapSnapshot(POIS, version=0)
+
+    assert snapshot.payload() == {
+        "count": 3, "coordinate_scale": 1, "rating_scale": 1, "ids": ["p1", "p2", "p3"],
+        "lat": [40.416775, 41.3874, 37.3891], "lon": [-3.70379, 2.1686, -5.9845], "rating": [8.5, 0.0, 7.25],
+        "tag": [0, -1, 0], "tags": ["cultura"],
+    }
+    quantized = snapshot.payload(precision=4)
+    assert quantized["coordinate_scale"] == 10_000 and quantized["rating_scale"] == 10
+    assert quantized["lat"] == [404168, 413874, 373891]
+    assert quantized["rating"] == [85, 0, 72]
+
+
+def test_encodings_are_cached_per_media_type_and_precision():
+    snapshot = POIMapSnapshot(POIS, version=0)
+    body, etag = snapshot.encode(JSON)
+
+    assert json.loads(body) == snapshot.payload()
+    assert snapshot.encode(JSON) == (body, etag)
+    assert snapshot.encode(JSON)[0] is body
+    packed, packed_etag = snapshot.encode(MSGPACK, precision=5)
+    assert msgpack.unpackb(packed) == snapshot.payload(precision=5)
+    assert packed_etag != etag
+
+
+@pytest.fixture
+async def pois(memory_db):
+    await memory_db.create_many("pois", [dict(poi) for poi in POIS])
+    return memory_db
+
+
+async def test_snapshot_is_reused_until_a_write(pois):
+    cache = POIMapCache(ttl_seconds=60)
+    first = await cache.get(pois)
+
+    assert await cache.get(pois) is first
+    await pois.create("pois", {"_id": "p4", "latitude": 1.0, "longitude": 2.0})
+    assert (await cache.get(pois)) is first
+    cache.invalidate()
+    assert (await cache.get(pois)).ids == ["p1", "p2", "p3", "p4"]
+    assert cache.metrics()["builds"] == 2
+
+
+async def test_snapshot_expires(pois):
+    cache = POIMapCache(ttl_seconds=0)
+    first = await cache.get(pois)
+
+    assert await cache.get(pois) is not first
+    assert cache.builds == 2
+
+
+async def test_concurrent_requests_share_one_build(pois):
+    cache = POIMapCache(ttl_seconds=60)
+    snapshots = await asyncio.gather(*(cache.get(pois) for _ in range(5)))
+
+    assert all(snapshot is snapshots[0] for snapshot in snapshots)
+    assert cache.builds == 1
+
+
+async def test_write_during_a_build(pois, monkeypatch):
+    """A build that read before a write is neither kept nor joined by later requests"""
+    cache = POIMapCache(ttl_seconds=60)
+    read_many = pois.read_many
+    reading = asyncio.Event()
+    release = asyncio.Event()
+
+    async def slow_read_many(*args, **kwargs):
+        documents = await read_many(*args, **kwargs)
+        if not reading.is_set():
+            reading.set()
+            await release.wait()
+        return documents
+
+    monkeypatch.setattr(pois, "read_many", slow_read_many)
+    stale = asyncio.ensure_future(cache.get(pois))
+    await reading.wait()
+
+    await pois.create("pois", {"_id": "p4", "latitude": 1.0, "longitude": 2.0})
+    cache.invalidate()
+    fresh = await cache.get(pois)
+    assert fresh.ids == ["p1", "p2", "p3", "p4"]
+
+    # The request that started before the write still gets its own snapshot,
+    # which does not replace the newer one
+    release.set()
+    assert (await stale).ids == ["p1", "p2", "p3"]
+    assert await cache.get(pois) is fresh
+    assert cache.builds == 2
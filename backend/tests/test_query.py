@@ -0,0 +1,74 @@
+import pytest
+
+from app.utils.query import apply_update, match_document, sort_documents
+
+POI = {
+    "_id": "p1",
+    "name": "Museo del Prado",
+    "tags": ["cultura", "turismo"],
+    "rating_count": 3,
+    "location": {"city": "Madrid"},
+}
+
+
+@pytest.mark.parametrize("filter_dict, expected", [
+    ({}, True),
+    ({"name": "Museo del Prado"}, True),
+    ({"name": "Museo"}, False),
+    ({"rating_count": {"$gte": 3, "$lt": 4}}, True),
+    ({"rating_count": {"$gt": 3}}, False),
+    ({"location.city": "Madrid"}, True),
+    ({"location.country": None}, True),
+    ({"missing": {"$exists": False}}, True),
+    ({"name": {"$exists": False}}, False),
+    ({"$or": [{"name": "x"}, {"rating_count": 3}]}, True),
+    ({"$nor": [{"rating_count": 3}]}, False),
+])
+def test_match_document_operators(filter_dict, expected):
+    assert match_document(POI, filter_dict) is expected
+
+
+def test_in_on_string_field_matches_whole_values():
+    """$in on a string compares the value, it is not a substring test"""
+    assert match_document(POI, {"name": {"$in": ["Museo del Prado", "Retiro"]}})
+    assert not match_document(POI, {"name": {"$in": ["Museo", "Prado"]}})
+
+
+def test_in_on_list_field_matches_any_element():
+    assert match_document(POI, {"tags": {"$in": ["turismo", "deporte"]}})
+    assert not match_document(POI, {"tags": {"$in": ["cult", "deporte"]}})
+
+
+def test_equality_on_list_field_matches_element_or_whole_list():
+    assert match_document(POI, {"tags": "cultura"})
+    assert match_document(POI, {"tags": ["cultura", "turismo"]})
+    assert not match_document(POI, {"tags": ["turismo"]})
+
+
+def test_ne_and_nin_exclude_any_matching_element():
+    assert not match_document(POI, {"tags": {"$ne": "cultura"}})
+    assert not match_document(POI, {"tags": {"$nin": ["turismo"]}})
+    assert match_document(POI, {"tags": {"$nin": ["deporte"]}})
+
+
+def test_unsupported_operator_raises():
+    with pytest.raises(ValueError):
+        match_document(POI, {"name": {"$regex": "Prado"}})
+
+
+def test_sort_documents_puts_missing_fields_first():
+    docs = [{"_id": "a", "score": 2}, {"_id": "b"}, {"_id": "c", "score": 1}]
+    assert [d["_id"] for d in sort_documents(docs, {"score": 1})] == ["b", "c", "a"]
+    assert [d["_id"] for d in sort_documents(docs, {"score": -1})] == ["a", "c", "b"]
+
+
+def test_apply_update_operators():
+    doc = {"count": 1, "tags": ["a"], "nested": {"x": 1}}
+    apply_update(doc, {
+        "$inc": {"count": 2},
+        "$addToSet": {"tags": "a"},
+        "$push": {"tags": "b"},
+        "$set": {"nested.y": 2},
+        "$unset": {"nested.x": ""},
+    })
+    assert doc == {"count": 3, "tags": ["a", "b"], "nested": {"y": 2}}
@@ -0,0 +1,100 @@
+import asyncio
+
+import pytest
+
+from app.utils.singleflight import SingleFlight
+
+
+class Backend:
+    """Slow reads of a value that tests can change"""
+
+    def __init__(self):
+        self.value = "v1"
+        self.reads = 0
+        self.release = asyncio.Event()
+
+    async def read(self):
+        self.reads += 1
+        value, release = self.value, self.release
+        await release.wait()
+        return value
+
+    async def reads_started(self, count):
+        while self.reads < count:
+            await asyncio.sleep(0)
+
+
+async def test_concurrent_identical_calls_share_one_execution():
+    flights = SingleFlight()
+    backend = Backend()
+
+    calls = [asyncio.ensure_future(flights.do(("poi", "p1"), backend.read)) for _ in range(5)]
+    other = asyncio.ensure_future(flights.do(("poi", "p2"), backend.read))
+    await backend.reads_started(2)
+    backend.release.set()
+
+    assert await asyncio.gather(*calls, other) == ["v1"] * 6
+    assert backend.reads == 2
+    metrics = flights.metrics()
+    assert metrics["operations"]["poi"] == {"calls": 6, "executions": 2, "shared": 4, "peak_concurrency": 5}
+    assert metrics["in_flight"] == {}
+    assert metrics["hot_keys"] == {"('poi', 'p1')": 5}
+
+
+async def test_forget_lets_readers_after_a_write_start_a_new_call():
+    flights = SingleFlight()
+    backend = Backend()
+
+    before = asyncio.ensure_future(flights.do(("poi", "p1"), backend.read))
+    await backend.reads_started(1)
+    first_release = backend.release
+    # A write lands while the first read is in flight
+    backend.value = "v2"
+    backend.release = asyncio.Event()
+    flights.forget(("poi", "p1"))
+    after = asyncio.ensure_future(flights.do(("poi", "p1"), backend.read))
+    joined = asyncio.ensure_future(flights.do(("poi", "p1"), backend.read))
+    await backend.reads_started(2)
+
+    first_release.set()
+    assert await before == "v1"
+    # The forgotten call finishing leaves the newer call in flight
+    assert flights.metrics()["in_flight"] == {"('poi', 'p1')": 2}
+
+    backend.release.set()
+    assert await asyncio.gather(after, joined) == ["v2", "v2"]
+    assert backend.reads == 2
+    assert flights.metrics()["in_flight"] == {}
+    flights.forget(("poi", "unknown"))
+
+
+async def test_errors_reach_every_caller_and_are_not_cached():
+    flights = SingleFlight()
+    attempts = []
+
+    async def failing():
+        attempts.append(1)
+        await asyncio.sleep(0)
+        raise ValueError("boom")
+
+    results = await asyncio.gather(
+        flights.do(("poi", "p1"), failing), flights.do(("poi", "p1"), failing), return_exceptions=True
+    )
+    assert [str(result) for result in results] == ["boom", "boom"]
+    with pytest.raises(ValueError):
+        await flights.do(("poi", "p1"), failing)
+    assert len(attempts) == 2
+
+
+async def test_a_cancelled_caller_does_not_cancel_the_others():
+    flights = SingleFlight()
+    backend = Backend()
+
+    leaving = asyncio.ensure_future(flights.do(("poi", "p1"), backend.read))
+    staying = asyncio.ensure_future(flights.do(("poi", "p1"), backend.read))
+    await backend.reads_started(1)
+    leaving.cancel()
+    backend.release.set()
+
+    assert await staying == "v1"
+    assert leaving.cancelled()
@@ -0,0 +1,110 @@
+from datetime import datetime
+
+import pytest
+
+from app.utils.aggregation import AggregationPipeline
+from app.utils.query import match_document, sort_documents
+
+POIS = [
+    {"_id": "p1", "name": "Prado", "author_id": "u1", "tags": ["cultura", "turismo"], "rating_count": 3,
+     "average_rating": 8.5, "location": {"city": "Madrid"}},
+    {"_id": "p2", "name": "Retiro", "author_id": "u2", "tags": ["ocio"], "rating_count": 0,
+     "average_rating": 0.0, "location": {"city": "Madrid"}},
+    {"_id": "p3", "name": "Sagrada Familia", "author_id": "u1", "tags": [], "rating_count": 7,
+     "average_rating": 9.1, "location": {"city": "Barcelona"}},
+    {"_id": "p4", "name": "Bicing", "author_id": "u3", "tags": ["movilidad"], "rating_count": 1,
+     "average_rating": 4.0},
+    {"_id": "p5", "name": "cultura", "author_id": "u2", "rating_count": 2, "average_rating": 6.0,
+     "featured": True},
+]
+
+FILTERS = [
+    {},
+    {"author_id": "u1"},
+    {"author_id": {"$ne": "u1"}},
+    {"author_id": {"$in": ["u2", "u3"]}},
+    {"author_id": {"$nin": ["u2"]}},
+    {"tags": "cultura"},
+    {"tags": {"$in": ["ocio", "movilidad"]}},
+    {"tags": {"$nin": ["cultura"]}},
+    {"tags": {"$ne": "ocio"}},
+    {"tags": {"$exists": False}},
+    {"name": {"$in": ["cultura", "Prado"]}},
+    {"name": {"$in": ["Sagrada"]}},
+    {"rating_count": {"$gte": 2, "$lt": 7}},
+    {"average_rating": {"$gt": 5}},
+    {"location.city": "Madrid"},
+    {"location.city": None},
+    {"location.city": {"$ne": "Madrid"}},
+    {"featured": True},
+    {"featured": {"$exists": True}},
+    {"$or": [{"author_id": "u3"}, {"rating_count": {"$gt": 5}}]},
+    {"$nor": [{"author_id": "u1"}, {"tags": "ocio"}]},
+    {"$and": [{"author_id": "u1"}, {"tags": {"$in": ["turismo"]}}]},
+]
+
+
+@pytest.fixture
+async def pois(sqlite_db):
+    for doc in POIS:
+        await sqlite_db.create("pois", dict(doc))
+    return await sqlite_db.read_many("pois", limit=100)
+
+
+@pytest.mark.parametrize("filter_dict", FILTERS)
+async def test_translated_filters_match_in_process_evaluation(sqlite_db, pois, filter_dict):
+    expected = {doc["_id"] for doc in pois if match_document(doc, filter_dict)}
+
+    found = await sqlite_db.read_many("pois", filter_dict, limit=100)
+    assert {doc["_id"] for doc in found} == expected
+    assert await sqlite_db.count("pois", filter_dict) == len(expected)
+
+
+@pytest.mark.parametrize("sort_dict", [
+    {"rating_count": 1},
+    {"average_rating": -1},
+    {"author_id": 1, "rating_count": -1},
+    {"created_at": -1},
+])
+async def test_sorts_match_in_process_sorting(sqlite_db, pois, sort_dict):
+    expected = sort_documents(pois, sort_dict)
+
+    found = await sqlite_db.read_many("pois", sort_dict=sort_dict, skip=1, limit=3)
+    assert [doc["_id"] for doc in found] == [doc["_id"] for doc in expected[1:4]]
+
+
+async def test_documents_round_trip_with_timestamps(sqlite_db, pois):
+    doc = await sqlite_db.read_one("pois", {"_id": "p1"})
+    assert doc["tags"] == ["cultura", "turismo"]
+    assert isinstance(doc["created_at"], datetime)
+
+    assert await sqlite_db.update_one("pois", {"_id": "p1"}, {"$inc": {"rating_count": 1}, "$push": {"tags": "ocio"}})
+    updated = await sqlite_db.read_one("pois", {"_id": "p1"})
+    assert updated["rating_count"] == 4
+    assert updated["tags"] == ["cultura", "turismo", "ocio"]
+    assert [d["_id"] for d in await sqlite_db.read_many("pois", {"tags": "ocio"})] == ["p1", "p2"]
+
+
+async def test_read_many_by_ids_keeps_requested_order(sqlite_db, pois):
+    docs = await sqlite_db.read_many_by_ids("pois", ["p3", "missing", "p1", "p3"])
+    assert [d["_id"] for d in docs] == ["p3", "p1"]
+
+
+async def test_reads_of_unwritten_collection_are_empty(sqlite_db):
+    assert await sqlite_db.read_many("unknown") == []
+    assert await sqlite_db.count("unknown") == 0
+
+
+@pytest.mark.parametrize("pipeline", [
+    [{"$match": {"author_id": {"$in": ["u1", "u2"]}}},
+     {"$group": {"_id": "$author_id", "total": {"$sum": "$rating_count"}, "best": {"$max": "$average_rating"}}},
+     {"$sort": {"_id": 1}}],
+    [{"$group": {"_id": None, "avg": {"$avg": "$average_rating"}, "n": {"$count": {}}}}],
+    [{"$match": {"tags": "cultura"}}, {"$count": "total"}],
+    [{"$sort": {"rating_count": -1}}, {"$limit": 2}, {"$project": {"name": 1}}],
+])
+async def test_aggregate_matches_the_aggregation_engine(sqlite_db, pois, pipeline):
+    expected = AggregationPipeline(pipeline)
+    results = expected.feed([dict(doc) for doc in pois]) + expected.finish()
+
+    assert await sqlite_db.aggregate("pois", pipeline) == pytest.approx(results)
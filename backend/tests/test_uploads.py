@@ -0,0 +1,137 @@
+import hashlib
+from io import BytesIO
+
+import pytest
+from fastapi import HTTPException, UploadFile
+
+from app.config import config
+from app.utils.protocols import FileDB
+from app.utils.uploads import FileTooLargeError, UploadDigest, store_upload
+
+MB = 1024 * 1024
+
+
+class RecordingFileDB(FileDB):
+    """FileDB relying on the default upload_stream, keeping what it received"""
+
+    def __init__(self):
+        self.files = {}
+
+    async def upload_file(self, file_content, file_name, content_type, folder=None):
+        self.files[file_name] = file_content.read()
+        return f"memory://{folder}/{file_name}"
+
+    async def delete_file(self, file_url):
+        return True
+
+    async def get_file_url(self, file_path):
+        return file_path
+
+
+async def _chunks(data, size=1000):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+def _upload(data, size=None):
+    return UploadFile(file=BytesIO(data), filename="photo.jpg", size=size)
+
+
+async def test_digest_measures_and_hashes_the_stream():
+    data = bytes(range(256)) * 40
+    digest = UploadDigest()
+
+    assert b"".join([chunk async for chunk in digest.wrap(_chunks(data))]) == data
+    assert digest.size == len(data)
+    assert digest.sha256 == hashlib.sha256(data).hexdigest()
+
+
+async def test_digest_stops_at_the_first_chunk_over_the_limit():
+    read = []
+
+    async def chunks():
+        for i in range(10):
+            read.append(i)
+            yield b"x" * 100
+
+    digest = UploadDigest(max_size=250)
+    with pytest.raises(FileTooLargeError):
+        async for _ in digest.wrap(chunks()):
+            pass
+    assert digest.too_large
+    assert read == [0, 1, 2]
+
+
+async def test_store_upload_reports_size_and_hash(monkeypatch):
+    monkeypatch.setattr(config, "UPLOAD_CHUNK_BYTES", 1000)
+    data = b"\xff\xd8" + bytes(range(256)) * 50
+    file_db = RecordingFileDB()
+
+    result = await store_upload(file_db, _upload(data), "photo.jpg", folder="photos")
+
+    assert result == {
+        "url": "memory://photos/photo.jpg",
+        "size": len(data),
+        "sha256": hashlib.sha256(data).hexdigest(),
+    }
+    assert file_db.files["photo.jpg"] == data
+
+
+@pytest.mark.parametrize("declared_size", [None, 4096])
+async def test_store_upload_rejects_oversized_files(monkeypatch, declared_size):
+    """Rejected from the declared size, or while streaming when the size is unknown"""
+    monkeypatch.setattr(config, "MAX_UPLOAD_BYTES", 2048)
+    monkeypatch.setattr(config, "UPLOAD_CHUNK_BYTES", 512)
+    file_db = RecordingFileDB()
+
+    with pytest.raises(HTTPException) as error:
+        await store_upload(file_db, _upload(b"x" * 4096, size=declared_size), "photo.jpg", folder="photos")
+    assert error.value.status_code == 413
+    assert file_db.files == {}
+
+
+# S3 streaming, against a mocked S3
+
+@pytest.fixture
+def s3(monkeypatch):
+    moto = pytest.importorskip("moto")
+    for name in ("AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY"):
+        monkeypatch.setattr(config, name, "testing")
+    monkeypatch.setattr(config, "AWS_REGION", "us-east-1")
+    monkeypatch.setattr(config, "S3_BUCKET_NAME", "urbanspot-test")
+    monkeypatch.setattr(config, "S3_MULTIPART_THRESHOLD_MB", 5)
+    monkeypatch.setattr(config, "S3_MULTIPART_CHUNKSIZE_MB", 5)
+    monkeypatch.setattr(config, "S3_MAX_CONCURRENCY", 2)
+    with moto.mock_aws():
+        from app.utils.s3_storage import S3FileDB
+
+        file_db = S3FileDB()
+        file_db.s3_client.create_bucket(Bucket="urbanspot-test")
+        yield file_db
+
+
+def _stored(file_db, result):
+    key = result["url"].split(".amazonaws.com/", 1)[1]
+    return file_db.s3_client.get_object(Bucket="urbanspot-test", Key=key)["Body"].read()
+
+
+@pytest.mark.parametrize("size", [64 * 1024, 12 * MB + 123])
+async def test_s3_stream_uploads_single_and_multipart(s3, size):
+    data = (bytes(range(256)) * (size // 256 + 1))[:size]
+
+    result = await s3.upload_stream(_chunks(data, 256 * 1024), "photo.jpg", "image/jpeg", folder="photos")
+
+    assert result["size"] == size
+    assert result["sha256"] == hashlib.sha256(data).hexdigest()
+    assert _stored(s3, result) == data
+    assert s3.stats["multipart_uploads"] == (1 if size > 5 * MB else 0)
+
+
+async def test_s3_stream_aborts_oversized_multipart_upload(s3):
+    data = b"x" * (11 * MB)
+
+    with pytest.raises(FileTooLargeError):
+        await s3.upload_stream(_chunks(data, 256 * 1024), "big.jpg", "image/jpeg", folder="photos", max_size=8 * MB)
+
+    assert s3.s3_client.list_multipart_uploads(Bucket="urbanspot-test").get("Uploads", []) == []
+    assert s3.s3_client.list_objects_v2(Bucket="urbanspot-test").get("KeyCount") == 0
@@ -0,0 +1,36 @@
+from app.services.user_service import UserService
+from app.utils.storage import Storage
+
+
+async def test_ranking_counts_contributions_with_one_query_per_collection(memory_db):
+    for i, score in enumerate([5, 30, 10]):
+        await memory_db.create("users", {
+            "_id": f"u{i}", "name": f"User {i}", "email": f"u{i}@example.com", "hashed_password": "x",
+            "poi_score": score, "photo_score": 0, "total_score": score,
+        })
+    await memory_db.create_many("pois", [{"author_id": "u1"}, {"author_id": "u1"}, {"author_id": "u2"}])
+    await memory_db.create_many("photos", [{"author_id": "u0"}, {"author_id": "someone else"}])
+    await memory_db.create_many("ratings", [{"user_id": "u1"}, {"user_id": "u1"}, {"user_id": "u1"}])
+    memory_db.operations.clear()
+
+    ranking = await UserService(Storage(None, memory_db)).get_ranking(limit=10)
+
+    assert [(p.id, p.poi_count, p.photo_count, p.rating_count) for p in ranking] == [
+        ("u1", 2, 0, 3),
+        ("u2", 1, 0, 0),
+        ("u0", 0, 1, 0),
+    ]
+    assert memory_db.operations == {"read_many": 1, "aggregate": 3}
+
+
+async def test_profile_counts(memory_db):
+    await memory_db.create("users", {
+        "_id": "u1", "name": "Ana", "email": "ana@example.com", "hashed_password": "x",
+        "poi_score": 0, "photo_score": 0, "total_score": 0,
+    })
+    await memory_db.create_many("ratings", [{"user_id": "u1"}, {"user_id": "u2"}])
+
+    profile = await UserService(Storage(None, memory_db)).get_user_profile("u1")
+
+    assert (profile.poi_count, profile.photo_count, profile.rating_count) == (0, 0, 1)
+    assert await UserService(Storage(None, memory_db)).get_user_profile("missing") is None